@@ -13,6 +13,9 @@ import math
 import random
 import hashlib
 import time
+import hmac
+import threading
+from functools import wraps
 from datetime import datetime
 from pathlib import Path
 from flask import Flask, request, jsonify
@@ -34,7 +37,134 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 
 # 系统配置
-MAX_CONCURRENT = 12  # 最大并发处理数 (平衡性能和稳定性)
+MAX_CONCURRENT = 12  # 最大并发处理数 (平衡性能和稳定性)，运行时可通过 /admin/concurrency 调整
+MAX_CONCURRENT_LIMIT = 64  # 运行时调整的并发上限
+ADMIN_TOKEN = os.environ.get("TTS_ADMIN_TOKEN", "")  # 管理接口令牌，未配置时管理接口禁用
+EDGE_TTS_WSS_URL = os.environ.get("EDGE_TTS_WSS_URL", "")  # 覆盖EdgeTTS上游地址（离线基准测试指向本地模拟服务）
+
+if EDGE_TTS_WSS_URL:
+    import edge_tts.communicate
+    import edge_tts.constants
+    edge_tts.constants.WSS_URL = EDGE_TTS_WSS_URL
+    edge_tts.communicate.WSS_URL = EDGE_TTS_WSS_URL
+    logger.warning(f"🧪 EdgeTTS上游已覆盖为: {EDGE_TTS_WSS_URL}")
+
+
+class ServiceRuntimeState:
+    """服务运行时状态：可在线调整的并发数与排空(drain)模式
+
+    Flask 每个请求在独立线程和事件循环中运行，因此这里只用 threading 原语，
+    异步侧通过轮询读取最新并发数。
+    """
+
+    def __init__(self, max_concurrent):
+        self._lock = threading.Lock()
+        self.max_concurrent = max_concurrent
+        self.draining = False
+        self.drain_started_at = None
+        self.active_jobs = 0
+        self.inflight_scripts = 0
+        self.rejected_jobs = 0
+
+    def set_max_concurrent(self, value):
+        with self._lock:
+            old_value = self.max_concurrent
+            self.max_concurrent = value
+        logger.info(f"⚙️ 并发数调整: {old_value} -> {value}")
+        return old_value
+
+    def set_draining(self, enabled):
+        with self._lock:
+            self.draining = enabled
+            self.drain_started_at = datetime.now().isoformat() if enabled else None
+        logger.info(f"🚰 排空模式: {'开启' if enabled else '关闭'}")
+
+    def try_begin_job(self):
+        """登记一个新任务；排空模式下拒绝并返回 False"""
+        with self._lock:
+            if self.draining:
+                self.rejected_jobs += 1
+                return False
+            self.active_jobs += 1
+            return True
+
+    def end_job(self):
+        with self._lock:
+            self.active_jobs -= 1
+            drained = self.draining and self.active_jobs == 0
+        if drained:
+            logger.info("✅ 排空完成：所有进行中的任务已结束，实例可以安全重启")
+
+    def script_started(self):
+        with self._lock:
+            self.inflight_scripts += 1
+
+    def script_finished(self):
+        with self._lock:
+            self.inflight_scripts -= 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "max_concurrent": self.max_concurrent,
+                "draining": self.draining,
+                "drain_started_at": self.drain_started_at,
+                "drained": self.draining and self.active_jobs == 0,
+                "active_jobs": self.active_jobs,
+                "inflight_scripts": self.inflight_scripts,
+                "rejected_jobs": self.rejected_jobs
+            }
+
+
+runtime_state = ServiceRuntimeState(MAX_CONCURRENT)
+
+
+class AdjustableSemaphore:
+    """上限随 runtime_state.max_concurrent 实时变化的异步信号量"""
+
+    POLL_INTERVAL = 0.2  # 上限被调高时，等待者最迟在该间隔内感知
+
+    def __init__(self, state):
+        self._state = state
+        self._in_use = 0
+        self._condition = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._condition:
+            while self._in_use >= self._state.max_concurrent:
+                try:
+                    await asyncio.wait_for(self._condition.wait(), self.POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+            self._in_use += 1
+        self._state.script_started()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._state.script_finished()
+        async with self._condition:
+            self._in_use -= 1
+            self._condition.notify()
+        return False
+
+
+def require_admin_token(view):
+    """管理接口鉴权：X-Admin-Token 或 Authorization: Bearer <token>"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not ADMIN_TOKEN:
+            return jsonify({"success": False, "error": "管理接口未启用，请设置环境变量 TTS_ADMIN_TOKEN"}), 403
+
+        provided = request.headers.get("X-Admin-Token", "")
+        auth_header = request.headers.get("Authorization", "")
+        if not provided and auth_header.startswith("Bearer "):
+            provided = auth_header[len("Bearer "):]
+
+        if not hmac.compare_digest(provided.encode(), ADMIN_TOKEN.encode()):
+            logger.warning(f"🔒 管理接口鉴权失败: {request.remote_addr} {request.path}")
+            return jsonify({"success": False, "error": "鉴权失败"}), 401
+        return view(*args, **kwargs)
+    return wrapper
 
 # 语音参数映射表（TT-Live-AI 标准）
 EMOTION_PARAMS = {
@@ -708,6 +838,9 @@ async def generate_single_audio(text, voice, emotion, output_path, dynamic_param
 
     output_path_obj = Path(output_path)
     output_path_obj.parent.mkdir(parents=True, exist_ok=True)
+    # 先写临时文件再原子替换：同一脚本被多个实例重复生成（如客户端对冲请求）时，
+    # 不会读到写了一半的文件，落败方失败清理时也不会删掉已完成的文件
+    temp_path_obj = output_path_obj.with_name(f".{output_path_obj.name}.{os.getpid()}_{random.getrandbits(32):08x}.part")
 
     def _is_transient_error(exc: Exception) -> bool:
         transient = (aiohttp.ClientError, asyncio.TimeoutError, ConnectionError)
@@ -761,9 +894,10 @@ async def generate_single_audio(text, voice, emotion, output_path, dynamic_param
 
             logger.info(f"EdgeTTS对象创建成功，开始保存到: {output_path} (尝试 {attempt}/{max_retries})")
 
-            await communicate.save(str(output_path_obj))
+            await communicate.save(str(temp_path_obj))
 
-            if output_path_obj.exists():
+            if temp_path_obj.exists():
+                os.replace(temp_path_obj, output_path_obj)
                 file_size = output_path_obj.stat().st_size
                 logger.info(f"音频文件生成成功: {output_path}, 大小: {file_size} bytes")
                 return {
@@ -777,9 +911,9 @@ async def generate_single_audio(text, voice, emotion, output_path, dynamic_param
             raise FileNotFoundError(f"文件未生成: {output_path}")
 
         except Exception as e:
-            if output_path_obj.exists():
+            if temp_path_obj.exists():
                 try:
-                    output_path_obj.unlink()
+                    temp_path_obj.unlink()
                 except Exception as cleanup_error:
                     logger.warning(f"清理未完成文件失败: {cleanup_error}")
 
@@ -824,8 +958,8 @@ async def process_scripts_batch(scripts, product_name, discount, emotion="Friend
     failed = 0
     start_time = datetime.now()
     
-    # 创建信号量控制并发数
-    semaphore = asyncio.Semaphore(MAX_CONCURRENT)
+    # 创建信号量控制并发数（上限可通过管理接口在线调整）
+    semaphore = AdjustableSemaphore(runtime_state)
     
     async def process_single_script(script, index):
         async with semaphore:
@@ -856,8 +990,10 @@ async def process_scripts_batch(scripts, product_name, discount, emotion="Friend
             dynamic_params = generate_dynamic_params(index, len(scripts), product_name, script_emotion)
             
             # 生成音频文件名（包含语音模型信息和动态参数）
+            # 队列处理器分批提交时通过 script_index 传入脚本在整个文件中的序号，避免批次间文件名冲突
+            script_number = script.get("script_index", index + 1) if isinstance(script, dict) else index + 1
             voice_name = get_voice_info(final_voice)["name"]
-            audio_filename = f"tts_{index+1:04d}_{script_emotion}_{voice_name}_dyn.mp3"
+            audio_filename = f"tts_{script_number:04d}_{script_emotion}_{voice_name}_dyn.mp3"
             audio_path = f"{product_dir}/{audio_filename}"
             
             # 生成音频（使用动态参数）
@@ -879,6 +1015,7 @@ async def process_scripts_batch(scripts, product_name, discount, emotion="Friend
             result = {
                 "success": success,
                 "index": index + 1,
+                "script_index": script_number,
                 "emotion": script_emotion,
                 "voice": script_voice,
                 "voice_info": get_voice_info(script_voice),
@@ -1000,8 +1137,15 @@ def generate_excel_output(scripts, product_name, discount, results, voice=DEFAUL
     excel_filename = f"Lior_{date_str}_{product_name}_Batch1_Voice.xlsx"
     excel_path = f"{product_dir}/{excel_filename}"
     
-    # 保存 Excel 文件
-    df.to_excel(excel_path, index=False)
+    # 保存 Excel 文件：与音频相同，先写临时文件再原子替换，并发或对冲的重复请求不会写出残缺文件
+    # 临时文件保留 .xlsx 扩展名，pandas 按扩展名校验写入引擎
+    temp_path = f"{product_dir}/.{excel_filename}.{os.getpid()}_{random.getrandbits(32):08x}.part.xlsx"
+    try:
+        df.to_excel(temp_path, index=False)
+        os.replace(temp_path, excel_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
     
     return excel_path
 
@@ -1018,61 +1162,83 @@ def generate_voice_content():
         if not scripts:
             return jsonify({"error": "No scripts provided"}), 400
         
-        logger.info(f"开始处理产品: {product_name}, 脚本数量: {len(scripts)}")
+        # 排空模式下拒绝新任务，客户端应转投其他实例
+        if not runtime_state.try_begin_job():
+            logger.warning(f"🚰 排空模式，拒绝新任务: {product_name}")
+            response = jsonify({"error": "Service is draining", "draining": True})
+            response.headers["Retry-After"] = "30"
+            return response, 503
         
-        # 异步处理脚本
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+        # 从接受任务到响应构建完毕都计入进行中任务，排空时等 Excel 写完、响应返回后才算空闲
         try:
-            emotion = data.get('emotion', 'Friendly')
-            voice = data.get('voice', DEFAULT_VOICE)
-            result = loop.run_until_complete(process_scripts_batch(scripts, product_name, discount, emotion, voice))
-        finally:
-            loop.close()
+            logger.info(f"开始处理产品: {product_name}, 脚本数量: {len(scripts)}")
+        
+            # 异步处理脚本
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            try:
+                emotion = data.get('emotion', 'Friendly')
+                voice = data.get('voice', DEFAULT_VOICE)
+                result = loop.run_until_complete(process_scripts_batch(scripts, product_name, discount, emotion, voice))
+            finally:
+                loop.close()
         
-        # 生成 Excel 输出
-        excel_path = generate_excel_output(scripts, product_name, discount, result["results"], voice)
+            # 生成 Excel 输出
+            excel_path = generate_excel_output(scripts, product_name, discount, result["results"], voice)
         
-        # 生成样本音频列表
-        sample_audios = []
-        emotion = data.get('emotion', 'Friendly')  # 从请求中获取情绪
-        for i, script in enumerate(scripts[:3]):  # 取前3个作为样本
-            # 如果script是字典，使用其中的emotion，否则使用默认emotion
-            script_emotion = emotion
-            if isinstance(script, dict) and 'emotion' in script:
-                script_emotion = script['emotion']
+            # 生成样本音频列表
+            sample_audios = []
+            emotion = data.get('emotion', 'Friendly')  # 从请求中获取情绪
+            for i, script in enumerate(scripts[:3]):  # 取前3个作为样本
+                # 如果script是字典，使用其中的emotion，否则使用默认emotion
+                script_emotion = emotion
+                if isinstance(script, dict) and 'emotion' in script:
+                    script_emotion = script['emotion']
             
-            # 获取语音信息
-            script_voice = script.get("voice", DEFAULT_VOICE) if isinstance(script, dict) else DEFAULT_VOICE
+                # 获取语音信息
+                script_voice = script.get("voice", DEFAULT_VOICE) if isinstance(script, dict) else DEFAULT_VOICE
             
-            # 生成音频文件名（包含语音模型信息和动态参数）
-            voice_name = get_voice_info(script_voice)["name"]
-            audio_filename = f"tts_{i+1:04d}_{script_emotion}_{voice_name}_dyn.mp3"
-            # 输出目录也包含语音名称
-            voice_dir_name = script_voice.replace("en-US-", "").replace("Neural", "")
+                # 生成音频文件名（包含语音模型信息和动态参数）
+                voice_name = get_voice_info(script_voice)["name"]
+                audio_filename = f"tts_{i+1:04d}_{script_emotion}_{voice_name}_dyn.mp3"
+                # 输出目录也包含语音名称
+                voice_dir_name = script_voice.replace("en-US-", "").replace("Neural", "")
+                # 提取基础产品名称（去掉Batch信息）
+                base_product_name = product_name.split('_Batch')[0] if '_Batch' in product_name else product_name
+                sample_audios.append(f"20_输出文件_处理完成的音频文件/{base_product_name}_{voice_dir_name}/{audio_filename}")
+        
+            # 返回结果
+            voice_dir_name = voice.replace("en-US-", "").replace("Neural", "")
             # 提取基础产品名称（去掉Batch信息）
             base_product_name = product_name.split('_Batch')[0] if '_Batch' in product_name else product_name
-            sample_audios.append(f"20_输出文件_处理完成的音频文件/{base_product_name}_{voice_dir_name}/{audio_filename}")
-        
-        # 返回结果
-        voice_dir_name = voice.replace("en-US-", "").replace("Neural", "")
-        # 提取基础产品名称（去掉Batch信息）
-        base_product_name = product_name.split('_Batch')[0] if '_Batch' in product_name else product_name
-        response = {
-            "product_name": product_name,
-            "total_scripts": len(scripts),
-            "output_excel": excel_path,
-            "audio_directory": f"20_输出文件_处理完成的音频文件/{base_product_name}_{voice_dir_name}/",
-            "sample_audios": sample_audios,
-            "summary": {
-                "successful": result["successful"],
-                "failed": result["failed"],
-                "duration_seconds": result["duration_seconds"]
+            response = {
+                "product_name": product_name,
+                "total_scripts": len(scripts),
+                "output_excel": excel_path,
+                "audio_directory": f"20_输出文件_处理完成的音频文件/{base_product_name}_{voice_dir_name}/",
+                "sample_audios": sample_audios,
+                "results": [
+                    {
+                        "script_index": item.get("script_index"),
+                        "success": bool(item.get("success")),
+                        "file_path": item.get("file_path"),
+                        "file_size": item.get("file_size", 0),
+                        "attempts": item.get("attempts", 0),
+                        "error": item.get("error")
+                    } if isinstance(item, dict) else {"success": False, "error": str(item)}
+                    for item in result["results"]
+                ],
+                "summary": {
+                    "successful": result["successful"],
+                    "failed": result["failed"],
+                    "duration_seconds": result["duration_seconds"]
+                }
             }
-        }
         
-        logger.info(f"处理完成: {product_name}, 成功: {result['successful']}, 失败: {result['failed']}")
-        return jsonify(response)
+            logger.info(f"处理完成: {product_name}, 成功: {result['successful']}, 失败: {result['failed']}")
+            return jsonify(response)
+        finally:
+            runtime_state.end_job()
         
     except Exception as e:
         logger.error(f"处理请求失败: {str(e)}")
@@ -1080,13 +1246,16 @@ def generate_voice_content():
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    """健康检查接口"""
-    return jsonify({
-        "status": "healthy",
+    """健康检查接口（排空模式下返回 503，使实例退出轮询）"""
+    state = runtime_state.snapshot()
+    response = jsonify({
+        "status": "draining" if state["draining"] else "healthy",
         "service": "TT-Live-AI A3-TK Voice Generation System",
         "version": "1.0.0",
+        "active_jobs": state["active_jobs"],
         "timestamp": datetime.now().isoformat()
     })
+    return (response, 503) if state["draining"] else response
 
 @app.route('/voices', methods=['GET'])
 def get_voices():
@@ -1163,14 +1332,50 @@ def get_voices_for_emotion(emotion):
 @app.route('/status', methods=['GET'])
 def get_status():
     """获取系统状态"""
+    state = runtime_state.snapshot()
     return jsonify({
-        "max_concurrent": MAX_CONCURRENT,
+        "max_concurrent": state["max_concurrent"],
+        "draining": state["draining"],
+        "active_jobs": state["active_jobs"],
+        "inflight_scripts": state["inflight_scripts"],
         "supported_emotions": list(EMOTION_PARAMS.keys()),
         "default_voice": DEFAULT_VOICE,
         "output_directory": "20_输出文件_处理完成的音频文件/",
         "log_directory": "logs/"
     })
 
+@app.route('/admin/concurrency', methods=['GET', 'POST'])
+@require_admin_token
+def admin_concurrency():
+    """查看或在线调整最大并发数"""
+    if request.method == 'GET':
+        return jsonify({"success": True, **runtime_state.snapshot()})
+
+    data = request.get_json(silent=True) or {}
+    try:
+        value = int(data.get('max_concurrent'))
+    except (TypeError, ValueError):
+        return jsonify({"success": False, "error": "max_concurrent 必须是整数"}), 400
+
+    if not 1 <= value <= MAX_CONCURRENT_LIMIT:
+        return jsonify({"success": False, "error": f"max_concurrent 必须在 1-{MAX_CONCURRENT_LIMIT} 之间"}), 400
+
+    old_value = runtime_state.set_max_concurrent(value)
+    return jsonify({"success": True, "previous_max_concurrent": old_value, **runtime_state.snapshot()})
+
+@app.route('/admin/drain', methods=['GET', 'POST'])
+@require_admin_token
+def admin_drain():
+    """查看或切换排空模式：开启后拒绝新任务，进行中的任务完成后 drained=true"""
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        enabled = data.get('enabled', True)
+        # 只接受 JSON 布尔值："false" 之类的字符串用 bool() 会被当成 True
+        if not isinstance(enabled, bool):
+            return jsonify({"success": False, "error": "enabled 必须是 true 或 false"}), 400
+        runtime_state.set_draining(enabled)
+    return jsonify({"success": True, **runtime_state.snapshot()})
+
 def generate_rhythm_profile(script_index, total_scripts):
     """生成节奏配置文件"""
     import math
@@ -1324,5 +1529,6 @@ if __name__ == '__main__':
     logger.info("🔗 生成接口: POST /generate")
     logger.info("❤️ 健康检查: GET /health")
     logger.info("📊 系统状态: GET /status")
+    logger.info("🔧 管理接口: GET/POST /admin/concurrency, /admin/drain" + ("" if ADMIN_TOKEN else " (未设置 TTS_ADMIN_TOKEN，已禁用)"))
     
     app.run(host='0.0.0.0', port=port, debug=True)
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+TT-Live-AI 自适应并发控制
+控制同时运行的 ffmpeg 进程数，替代固定的 "CPU核心数 × 4" 线程：
+- 起始并发按 CPU 核心数 / 每个 ffmpeg 的线程数校准，并受可用内存限制
+- 周期性读取 /proc/stat、/proc/meminfo 的 CPU 占用、iowait 和可用内存
+- 爬山调整：CPU 有余量且有任务排队时加一个并发；吞吐（文件/秒）比调整前下降则回退，
+  并把该并发记为上限；iowait 过高减一个，可用内存不足减四分之一
+- ffmpeg 内部线程固定为 ffmpeg_thread_args() 指定的数量，避免 进程数 × 内部线程数 的嵌套超额订阅
+非 Linux 系统没有 /proc 时用 os.getloadavg() 估算 CPU 占用，iowait 和内存按无压力处理，只按吞吐调整。
+
+用法:
+    limiter = AdaptiveConcurrency()
+    with ThreadPoolExecutor(max_workers=limiter.max_workers) as executor:
+        executor.submit(lambda: limiter.run(process_one, path))
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+FFMPEG_THREADS = 1                 # 每个 ffmpeg 进程的编解码/滤镜线程数
+PER_PROCESS_MEMORY_MB = 150        # 单个 ffmpeg 混音进程的内存估算（用于起始并发和上限）
+MAX_WORKERS_PER_CPU = 2            # 并发上限 = CPU 核心数 × 此值（I/O 等待时留出余量）
+SAMPLE_INTERVAL = 5.0              # 两次调整之间的最短间隔（秒）
+CPU_HIGH = 0.90                    # CPU 占用高于此值不再加并发
+IOWAIT_HIGH = 0.20                 # iowait 高于此值减并发
+MEMORY_RESERVE = 0.10              # 可用内存低于总内存的此比例时减并发
+THROUGHPUT_TOLERANCE = 0.05        # 吞吐下降超过此比例视为上一次调整无效
+
+
+def ffmpeg_thread_args(threads=FFMPEG_THREADS):
+    """ffmpeg 全局线程参数：滤镜图线程数（需放在输出参数之前）"""
+    return ['-filter_complex_threads', str(threads)]
+
+
+def ffmpeg_output_thread_args(threads=FFMPEG_THREADS):
+    """ffmpeg 输出线程参数：编码器线程数（每个输出各加一次）"""
+    return ['-threads', str(threads)]
+
+
+def read_cpu_times():
+    """/proc/stat 汇总行 -> (总时间, 空闲时间, iowait 时间)，不可用时返回 None"""
+    try:
+        with open('/proc/stat') as f:
+            fields = f.readline().split()
+    except OSError:
+        return None
+    if not fields or fields[0] != 'cpu':
+        return None
+    # user nice system idle iowait irq softirq steal（guest 已计入 user，不重复累加）
+    values = [int(value) for value in fields[1:9]]
+    values += [0] * (8 - len(values))
+    return sum(values), values[3], values[4]
+
+
+def read_memory():
+    """/proc/meminfo -> (总内存 MB, 可用内存 MB)，不可用时返回 None"""
+    info = {}
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                key, _, rest = line.partition(':')
+                if key in ('MemTotal', 'MemAvailable'):
+                    info[key] = int(rest.split()[0]) / 1024
+    except (OSError, ValueError, IndexError):
+        return None
+    if 'MemTotal' not in info or 'MemAvailable' not in info:
+        return None
+    return info['MemTotal'], info['MemAvailable']
+
+
+class SystemSampler:
+    """两次 sample() 之间的 CPU 占用、iowait 比例，以及当前可用内存比例"""
+
+    def __init__(self):
+        self.cpu_count = os.cpu_count() or 1
+        self._last = read_cpu_times()
+
+    def sample(self):
+        current = read_cpu_times()
+        if current is not None and self._last is not None and current[0] > self._last[0]:
+            total = current[0] - self._last[0]
+            cpu = 1 - (current[1] - self._last[1] + current[2] - self._last[2]) / total
+            iowait = (current[2] - self._last[2]) / total
+        else:
+            try:
+                cpu = min(1.0, os.getloadavg()[0] / self.cpu_count)
+            except OSError:
+                cpu = 0.0
+            iowait = 0.0
+        self._last = current
+        memory = read_memory()
+        return {
+            'cpu': cpu,
+            'iowait': iowait,
+            'memory_available': memory[1] / memory[0] if memory else None
+        }
+
+
+def calibrated_worker_count(threads=FFMPEG_THREADS, per_process_mb=PER_PROCESS_MEMORY_MB):
+    """起始并发：每个核心跑满一个 ffmpeg，且所有进程的内存估算不超过可用内存减去保留部分"""
+    cpu_count = os.cpu_count() or 1
+    workers = max(1, cpu_count // max(1, threads))
+    memory = read_memory()
+    if memory:
+        total, available = memory
+        workers = min(workers, int((available - total * MEMORY_RESERVE) // per_process_mb))
+    return max(1, workers)
+
+
+class AdaptiveConcurrency:
+    """按吞吐和系统负载调整的并发闸门（线程安全），每个 ffmpeg 任务在 slot() 内运行"""
+
+    def __init__(self, initial=None, min_workers=1, max_workers=None, interval=SAMPLE_INTERVAL, verbose=True):
+        cpu_count = os.cpu_count() or 1
+        self.max_workers = max_workers or cpu_count * MAX_WORKERS_PER_CPU
+        self.min_workers = max(1, min(min_workers, self.max_workers))
+        self.limit = max(self.min_workers, min(initial or calibrated_worker_count(), self.max_workers))
+        self.initial = self.limit
+        self.interval = interval
+        self.verbose = verbose
+        self.sampler = SystemSampler()
+        self._condition = threading.Condition()
+        self.active = 0
+        self.waiting = 0
+        self.completed = 0
+        self.ceiling = self.max_workers   # 加并发后吞吐下降的那一档之下
+        self.adjustments = []             # (时间, 旧并发, 新并发, 原因)
+        self._saturated = False           # 本周期内是否有任务因并发已满而等待
+        self._window_start = time.time()
+        self._window_completed = 0
+        self._last_step = 0
+        self._last_throughput = None
+
+    @contextmanager
+    def slot(self):
+        with self._condition:
+            self.waiting += 1
+            while self.active >= self.limit:
+                self._saturated = True
+                self._condition.wait()
+            self.waiting -= 1
+            self.active += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.active -= 1
+                self.completed += 1
+                self._maybe_adjust()
+                self._condition.notify_all()
+
+    def run(self, func, *args, **kwargs):
+        with self.slot():
+            return func(*args, **kwargs)
+
+    def _decide(self, throughput, sample):
+        """返回 (并发变化量, 原因)"""
+        if sample['memory_available'] is not None and sample['memory_available'] < MEMORY_RESERVE:
+            return -max(1, self.limit // 4), "可用内存不足"
+        if sample['iowait'] > IOWAIT_HIGH:
+            return -1, "iowait 过高"
+        if self._last_step > 0 and self._last_throughput and throughput < self._last_throughput * (1 - THROUGHPUT_TOLERANCE):
+            # 加并发反而变慢：退回并不再超过退回后的并发
+            self.ceiling = self.limit - self._last_step
+            return -self._last_step, "吞吐下降，回退上一次加并发"
+        if self._saturated and sample['cpu'] < CPU_HIGH and self.limit < self.ceiling:
+            return 1, "CPU 有余量且有任务排队"
+        return 0, None
+
+    def _maybe_adjust(self):
+        now = time.time()
+        elapsed = now - self._window_start
+        if elapsed < self.interval:
+            return
+        throughput = (self.completed - self._window_completed) / elapsed
+        sample = self.sampler.sample()
+        step, reason = self._decide(throughput, sample)
+        new_limit = max(self.min_workers, min(self.limit + step, self.max_workers))
+        step = new_limit - self.limit
+        if step:
+            self.adjustments.append((now, self.limit, new_limit, reason))
+            if self.verbose:
+                memory = sample['memory_available']
+                memory_text = f", 可用内存 {memory:.0%}" if memory is not None else ""
+                print(f"🎚️ 并发 {self.limit} → {new_limit}（{reason}; 吞吐 {throughput:.2f} 文件/秒, "
+                      f"CPU {sample['cpu']:.0%}, iowait {sample['iowait']:.0%}{memory_text}）")
+            self.limit = new_limit
+        self._last_step = step
+        self._last_throughput = throughput
+        self._saturated = False
+        self._window_start = now
+        self._window_completed = self.completed
+
+    def snapshot(self):
+        with self._condition:
+            return {
+                'initial': self.initial,
+                'limit': self.limit,
+                'max_workers': self.max_workers,
+                'active': self.active,
+                'completed': self.completed,
+                'adjustments': len(self.adjustments),
+                'peak': max([self.initial] + [new for _, _, new, _ in self.adjustments])
+            }
@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+"""
+TT-Live-AI 音频头解析器
+纯 Python 读取本项目实际产出的音频格式的时长等信息，免去每个文件启动一次 ffprobe 进程：
+- MP3（MPEG-1/2/2.5 Layer III）：优先读 Xing/Info、VBRI 头中的帧数；
+  没有这些头时，前若干帧码率一致按 CBR 由文件大小估算（与 ffprobe 的估算方式一致），否则逐帧扫描
+- M4A/MP4：读 moov 中的 mvhd（整体时长）、mdhd 与 stsd（音轨采样率、声道、编码）
+- WAV：读 fmt 与 data 块
+无法识别的文件返回 None，由调用方退回 ffprobe。
+
+返回值与 ffprobe 解析结果一致：{'duration', 'codec', 'sample_rate', 'channels'}
+
+用法:
+    # 用 ffmpeg 生成各格式测试文件，对比头解析结果与 ffprobe（时长误差不超过 VERIFY_TOLERANCE 秒）
+    python3 audio_header_reader_音频头解析器.py verify
+"""
+import argparse
+import os
+import struct
+import subprocess
+import tempfile
+
+MP3_SAMPLE_RATES = {
+    3: (44100, 48000, 32000),   # MPEG-1
+    2: (22050, 24000, 16000),   # MPEG-2
+    0: (11025, 12000, 8000)     # MPEG-2.5
+}
+MP3_BITRATES_V1 = (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320)
+MP3_BITRATES_V2 = (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160)
+MP3_CBR_PROBE_FRAMES = 8        # 无 Xing/VBRI 头时，用前几帧判断是否为 CBR
+MP3_SYNC_SEARCH_BYTES = 64 * 1024
+
+MP4_CODECS = {b"mp4a": "aac", b"alac": "alac", b"Opus": "opus", b"fLaC": "flac", b".mp3": "mp3", b"ac-3": "ac3"}
+MP4_CONTAINERS = {b"moov", b"trak", b"mdia", b"minf", b"stbl"}
+
+WAV_CODECS = {3: "pcm_f{bits}le", 6: "pcm_alaw", 7: "pcm_mulaw"}   # 其余按 PCM 整数处理
+
+VERIFY_TOLERANCE = 0.05         # verify 允许的时长误差（秒）
+# 测试音频：4 秒正弦 + 4 秒白噪音，前后码率差别大，VBR 时前几帧的码率不能代表全文件
+VERIFY_SOURCE = [
+    '-f', 'lavfi', '-i', 'sine=f=440:d=4:r=24000', '-f', 'lavfi', '-i', 'anoisesrc=d=4:r=24000:a=0.5',
+    '-filter_complex', '[0:a][1:a]concat=n=2:v=0:a=1', '-ac', '1'
+]
+# (文件名, 编码参数, 参照)：ffprobe 为对比 ffprobe；decoded 为对比完整解码的采样数
+VERIFY_FIXTURES = [
+    ("cbr_xing.mp3", ['-c:a', 'libmp3lame', '-b:a', '48k'], "ffprobe"),
+    ("cbr_no_xing.mp3", ['-c:a', 'libmp3lame', '-b:a', '48k', '-write_xing', '0'], "ffprobe"),
+    ("vbr_xing.mp3", ['-c:a', 'libmp3lame', '-q:a', '4'], "ffprobe"),
+    # 没有 Xing 头的 VBR：ffprobe 按首帧码率 × 文件大小估算（本测试源估出约 16.7 秒，实际 8.06 秒），
+    # 头解析逐帧扫描得到准确时长，因此与完整解码对比，ffprobe 的偏差只打印不判定
+    ("vbr_no_xing.mp3", ['-c:a', 'libmp3lame', '-q:a', '4', '-write_xing', '0'], "decoded"),
+    ("aac.m4a", ['-c:a', 'aac', '-b:a', '96k'], "ffprobe"),
+    ("pcm.wav", ['-c:a', 'pcm_s16le'], "ffprobe"),
+]
+
+
+def _parse_mp3_frame_header(header):
+    """解析 4 字节帧头，返回 (帧长, 每帧采样数, 采样率, 声道数, 码率kbps, MPEG版本, 声道模式)，非 Layer III 或无效时返回 None"""
+    if len(header) < 4:
+        return None
+    value = struct.unpack(">I", header)[0]
+    if value >> 21 != 0x7FF:
+        return None
+    version = (value >> 19) & 0x3
+    layer = (value >> 17) & 0x3
+    bitrate_index = (value >> 12) & 0xF
+    sample_rate_index = (value >> 10) & 0x3
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    padding = (value >> 9) & 0x1
+    mode = (value >> 6) & 0x3
+    sample_rate = MP3_SAMPLE_RATES[version][sample_rate_index]
+    if version == 3:
+        bitrate = MP3_BITRATES_V1[bitrate_index]
+        samples_per_frame = 1152
+        frame_length = 144000 * bitrate // sample_rate + padding
+    else:
+        bitrate = MP3_BITRATES_V2[bitrate_index]
+        samples_per_frame = 576
+        frame_length = 72000 * bitrate // sample_rate + padding
+    channels = 1 if mode == 3 else 2
+    return frame_length, samples_per_frame, sample_rate, channels, bitrate, version, mode
+
+
+def _id3v2_size(head):
+    if len(head) < 10 or head[:3] != b"ID3":
+        return 0
+    size = (head[6] << 21) | (head[7] << 14) | (head[8] << 7) | head[9]
+    footer = 10 if head[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def read_mp3_info(path):
+    file_size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        head = f.read(10)
+        audio_start = 0
+        # 可能有多个连续的 ID3v2 标签
+        while True:
+            tag_size = _id3v2_size(head)
+            if not tag_size:
+                break
+            audio_start += tag_size
+            f.seek(audio_start)
+            head = f.read(10)
+
+        f.seek(audio_start)
+        data = f.read(MP3_SYNC_SEARCH_BYTES)
+        first = None
+        offset = 0
+        # 找到第一个有效帧头，并要求紧随其后的位置也是帧头，避免把数据中的 0xFFE 误当成同步字
+        while offset + 4 <= len(data):
+            offset = data.find(b"\xff", offset)
+            if offset < 0 or offset + 4 > len(data):
+                return None
+            frame = _parse_mp3_frame_header(data[offset:offset + 4])
+            if frame:
+                following = data[offset + frame[0]:offset + frame[0] + 4]
+                if len(following) < 4 or _parse_mp3_frame_header(following):
+                    first = frame
+                    break
+            offset += 1
+        if first is None:
+            return None
+
+        frame_length, samples_per_frame, sample_rate, channels, bitrate, version, mode = first
+        frame_start = audio_start + offset
+        frame_data = data[offset:offset + frame_length]
+        info = {"codec": "mp3", "sample_rate": sample_rate, "channels": channels}
+
+        # Xing/Info 头位于帧头 + 侧信息之后
+        if version == 3:
+            side_info = 17 if mode == 3 else 32
+        else:
+            side_info = 9 if mode == 3 else 17
+        xing = frame_data[4 + side_info:4 + side_info + 12]
+        if xing[:4] in (b"Xing", b"Info"):
+            flags = struct.unpack(">I", xing[4:8])[0]
+            if flags & 0x1 and len(xing) >= 12:
+                frames = struct.unpack(">I", xing[8:12])[0]
+                if frames:
+                    info["duration"] = frames * samples_per_frame / sample_rate
+                    return info
+
+        vbri = frame_data[36:36 + 18]
+        if vbri[:4] == b"VBRI" and len(vbri) >= 18:
+            frames = struct.unpack(">I", vbri[14:18])[0]
+            if frames:
+                info["duration"] = frames * samples_per_frame / sample_rate
+                return info
+
+        audio_end = file_size
+        f.seek(max(0, file_size - 128))
+        if f.read(3) == b"TAG":
+            audio_end -= 128
+
+        # 无头信息：前若干帧码率一致视为 CBR，按 (音频字节数 × 8 / 码率) 估算
+        f.seek(frame_start)
+        position = frame_start
+        bitrates = set()
+        for _ in range(MP3_CBR_PROBE_FRAMES):
+            frame = _parse_mp3_frame_header(f.read(4))
+            if not frame:
+                break
+            bitrates.add(frame[4])
+            position += frame[0]
+            f.seek(position)
+        if len(bitrates) == 1:
+            info["duration"] = (audio_end - frame_start) * 8 / (bitrate * 1000)
+            return info
+
+        # VBR 且没有头信息：逐帧扫描
+        f.seek(frame_start)
+        content = f.read(audio_end - frame_start)
+    position = 0
+    samples = 0
+    while position + 4 <= len(content):
+        frame = _parse_mp3_frame_header(content[position:position + 4])
+        if not frame:
+            break
+        samples += frame[1]
+        position += frame[0]
+    if not samples:
+        return None
+    info["duration"] = samples / sample_rate
+    return info
+
+
+def _iter_atoms(f, start, end):
+    """遍历 [start, end) 范围内的 atom，产出 (类型, 数据起点, 数据终点)"""
+    position = start
+    while position + 8 <= end:
+        f.seek(position)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, kind = struct.unpack(">I4s", header)
+        data_start = position + 8
+        if size == 1:
+            size = struct.unpack(">Q", f.read(8))[0]
+            data_start += 8
+        elif size == 0:
+            size = end - position
+        if size < data_start - position:
+            return
+        yield kind, data_start, min(position + size, end)
+        position += size
+
+
+def _read_time_header(f, start):
+    """mvhd / mdhd：返回 (timescale, duration)"""
+    f.seek(start)
+    version = f.read(1)[0]
+    f.read(3)
+    if version == 1:
+        f.read(16)
+        timescale, duration = struct.unpack(">IQ", f.read(12))
+    else:
+        f.read(8)
+        timescale, duration = struct.unpack(">II", f.read(8))
+    return timescale, duration
+
+
+def read_mp4_info(path):
+    with open(path, "rb") as f:
+        file_size = os.path.getsize(path)
+        f.seek(4)
+        if f.read(4) != b"ftyp":
+            return None
+
+        movie = None
+        track = None
+        sound = {}
+
+        def walk(start, end, current):
+            nonlocal movie, track
+            for kind, data_start, data_end in _iter_atoms(f, start, end):
+                if kind == b"mvhd":
+                    movie = _read_time_header(f, data_start)
+                elif kind == b"trak":
+                    candidate = {}
+                    walk(data_start, data_end, candidate)
+                    if candidate.get("handler") == b"soun" and track is None:
+                        track = candidate
+                elif kind in MP4_CONTAINERS:
+                    walk(data_start, data_end, current)
+                elif kind == b"mdhd":
+                    current["time"] = _read_time_header(f, data_start)
+                elif kind == b"hdlr":
+                    f.seek(data_start + 8)
+                    current["handler"] = f.read(4)
+                elif kind == b"stsd":
+                    f.seek(data_start + 8)
+                    entry = f.read(36)
+                    if len(entry) == 36:
+                        channels, = struct.unpack(">H", entry[24:26])
+                        sample_rate = struct.unpack(">I", entry[32:36])[0] >> 16
+                        current["codec"] = MP4_CODECS.get(entry[4:8])
+                        current["channels"] = channels
+                        current["sample_rate"] = sample_rate
+
+        walk(0, file_size, sound)
+
+    if track is None or not track.get("codec"):
+        return None
+    duration = 0
+    if movie and movie[0]:
+        duration = movie[1] / movie[0]
+    if not duration and track.get("time") and track["time"][0]:
+        duration = track["time"][1] / track["time"][0]
+    if duration <= 0:
+        # 分片 MP4 等没有整体时长的文件交给 ffprobe
+        return None
+
+    sample_rate = track.get("sample_rate") or 0
+    # stsd 中的采样率只有 16 位整数部分，超过 65535 Hz 时以音轨 timescale 为准
+    if track.get("time") and (not sample_rate or sample_rate == 0xFFFF):
+        sample_rate = track["time"][0]
+    return {
+        "duration": duration,
+        "codec": track["codec"],
+        "sample_rate": sample_rate,
+        "channels": track.get("channels") or 0
+    }
+
+
+def read_wav_layout(path):
+    """解析 WAV 的 fmt 与 data 块：返回 {'data_offset', 'data_size', 'codec', 'sample_rate', 'channels', 'byte_rate'}，非 WAV 返回 None"""
+    file_size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        header = f.read(12)
+        if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+            return None
+        fmt = None
+        position = 12
+        while position + 8 <= file_size:
+            f.seek(position)
+            kind, size = struct.unpack("<4sI", f.read(8))
+            if kind == b"fmt ":
+                chunk = f.read(min(size, 40))
+                fmt = list(struct.unpack("<HHIIHH", chunk[:16]))
+                if fmt[0] == 0xFFFE and len(chunk) >= 26:
+                    # WAVE_FORMAT_EXTENSIBLE：真实格式在子格式 GUID 的前两个字节
+                    fmt[0] = struct.unpack("<H", chunk[24:26])[0]
+            elif kind == b"data":
+                if fmt is None:
+                    return None
+                audio_format, channels, sample_rate, byte_rate, _, bits = fmt
+                # 流式写出的 WAV 可能把 data 大小写成 0 或 0xFFFFFFFF
+                available = file_size - position - 8
+                data_size = available if size in (0, 0xFFFFFFFF) or size > available else size
+                if audio_format in WAV_CODECS:
+                    codec = WAV_CODECS[audio_format].format(bits=bits)
+                else:
+                    codec = "pcm_u8" if bits == 8 else f"pcm_s{bits}le"
+                return {
+                    "data_offset": position + 8,
+                    "data_size": data_size,
+                    "codec": codec,
+                    "sample_rate": sample_rate,
+                    "channels": channels,
+                    "byte_rate": byte_rate
+                }
+            position += 8 + size + (size & 1)
+    return None
+
+
+def read_wav_info(path):
+    layout = read_wav_layout(path)
+    if layout is None or not layout["byte_rate"]:
+        return None
+    return {
+        "duration": layout["data_size"] / layout["byte_rate"],
+        "codec": layout["codec"],
+        "sample_rate": layout["sample_rate"],
+        "channels": layout["channels"]
+    }
+
+
+READERS = {
+    ".mp3": read_mp3_info,
+    ".m4a": read_mp4_info,
+    ".mp4": read_mp4_info,
+    ".wav": read_wav_info
+}
+
+
+def read_audio_info(path):
+    """按扩展名解析音频头，返回 {'duration', 'codec', 'sample_rate', 'channels'}；无法识别或解析失败返回 None"""
+    reader = READERS.get(os.path.splitext(str(path))[1].lower())
+    if reader is None:
+        return None
+    try:
+        info = reader(path)
+    except (OSError, struct.error, IndexError, ValueError):
+        return None
+    if not info or info["duration"] <= 0:
+        return None
+    return info
+
+
+def decoded_duration(path, sample_rate):
+    """完整解码得到的时长（单声道 s16le 采样数 / 采样率）"""
+    result = subprocess.run(['ffmpeg', '-v', 'error', '-i', str(path), '-f', 's16le', '-ac', '1', '-'],
+                            capture_output=True)
+    return len(result.stdout) / 2 / sample_rate
+
+
+def verify(tolerance=VERIFY_TOLERANCE):
+    """生成测试文件，检查头解析的编码、采样率、声道与 ffprobe 一致，时长误差不超过 tolerance 秒"""
+    from media_metadata_cache_媒体元数据缓存 import run_ffprobe
+
+    passed = True
+    with tempfile.TemporaryDirectory() as work:
+        for name, codec_args, reference in VERIFY_FIXTURES:
+            path = os.path.join(work, name)
+            subprocess.run(['ffmpeg', '-v', 'error'] + VERIFY_SOURCE + codec_args + [path, '-y'], check=True)
+            info = read_audio_info(path)
+            probed = run_ffprobe(path)
+            if info is None or probed is None:
+                print(f"   ❌ {name}: 头解析 {info}, ffprobe {probed}")
+                passed = False
+                continue
+            expected = probed["duration"] if reference == "ffprobe" else decoded_duration(path, info["sample_rate"])
+            gap = info["duration"] - expected
+            ok = abs(gap) <= tolerance and all(info[key] == probed[key] for key in ("codec", "sample_rate", "channels"))
+            passed = passed and ok
+            note = ""
+            if reference == "decoded":
+                note = f", ffprobe 估算 {probed['duration']:.3f}s（偏差 {probed['duration'] - expected:+.3f}s，预期内）"
+            print(f"   {'✅' if ok else '❌'} {name}: 头解析 {info['duration']:.3f}s, {reference} {expected:.3f}s "
+                  f"(误差 {gap:+.3f}s), {info['codec']} {info['sample_rate']}Hz {info['channels']}ch{note}")
+    print(f"{'✅ 头解析与 ffprobe 一致' if passed else '❌ 存在不一致'}（时长容差 {tolerance}s）")
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TT-Live-AI 音频头解析器：生成测试文件与 ffprobe 对比")
+    parser.add_argument("command", choices=["verify"])
+    parser.add_argument("--tolerance", type=float, default=VERIFY_TOLERANCE, help="时长容差（秒）")
+    args = parser.parse_args()
+    return 0 if verify(args.tolerance) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
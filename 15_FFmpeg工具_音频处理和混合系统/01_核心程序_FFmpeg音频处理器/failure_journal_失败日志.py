@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+TT-Live-AI FFmpeg 失败日志（只追加的 JSONL）
+替代每次整体重写的 failed_files.json：
+- 每次失败/恢复/放弃追加一行，多个进程（主批次与重试命令）可同时写入，不会互相覆盖
+- 失败按类型分类：输入缺失、输入损坏、超时、编码失败、磁盘已满
+- 当前状态由日志按文件折叠得到（最后一条事件为准，连续失败次数即已尝试次数）
+- 每种类型有自己的重试策略：是否重试、最多尝试次数、超时倍数、是否重新探测、最低剩余空间
+- claim_output() 用输出文件旁的 .lock 文件互斥，主批次与重试命令不会同时处理同一个文件
+
+用法:
+    journal = FailureJournal("failed_files.jsonl")
+    journal.record_failure(input_file, output_file, TIMEOUT, "处理超时")
+    for entry in journal.pending([TIMEOUT, ENCODER_ERROR]):
+        strategy = RETRY_STRATEGIES[entry['class']]
+"""
+import datetime
+import errno
+import json
+import os
+import shutil
+import socket
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:   # Windows 没有 fcntl，依赖 O_APPEND 的单次写入
+    fcntl = None
+
+MISSING_INPUT = "missing_input"
+CORRUPT_INPUT = "corrupt_input"
+TIMEOUT = "timeout"
+ENCODER_ERROR = "encoder_error"
+OUT_OF_DISK = "out_of_disk"
+
+FAILURE_LABELS = {
+    MISSING_INPUT: "输入缺失",
+    CORRUPT_INPUT: "输入损坏",
+    TIMEOUT: "超时",
+    ENCODER_ERROR: "编码失败",
+    OUT_OF_DISK: "磁盘已满",
+}
+
+# retry: 是否可重试; max_attempts: 累计失败达到此次数后不再重试
+# timeout_factor: 重试时超时倍数; reprobe: 重试前绕过缓存重新 ffprobe; min_free_mb: 输出盘剩余空间下限
+RETRY_STRATEGIES = {
+    MISSING_INPUT: {'retry': False, 'max_attempts': 1, 'timeout_factor': 1.0, 'reprobe': False},
+    CORRUPT_INPUT: {'retry': True, 'max_attempts': 2, 'timeout_factor': 1.0, 'reprobe': True},
+    TIMEOUT: {'retry': True, 'max_attempts': 3, 'timeout_factor': 3.0, 'reprobe': False},
+    ENCODER_ERROR: {'retry': True, 'max_attempts': 3, 'timeout_factor': 1.0, 'reprobe': False},
+    OUT_OF_DISK: {'retry': True, 'max_attempts': 5, 'timeout_factor': 1.0, 'reprobe': False, 'min_free_mb': 1024},
+}
+RETRYABLE_CLASSES = [name for name, strategy in RETRY_STRATEGIES.items() if strategy['retry']]
+
+CORRUPT_PATTERNS = (
+    "Invalid data found when processing input",
+    "could not find codec parameters",
+    "moov atom not found",
+    "Failed to find two consecutive MPEG audio frames",
+    "Header missing",
+    "Error while decoding",
+    "does not contain any stream",
+)
+DISK_FULL_PATTERNS = ("No space left on device", "Disk quota exceeded")
+STALE_CLAIM_SECONDS = 600    # 超过此时长的 .lock 视为进程已崩溃遗留
+
+
+def classify_failure(input_file, stderr="", exception=None):
+    """根据输入文件状态、ffmpeg stderr 和异常判断失败类型"""
+    if not os.path.exists(input_file):
+        return MISSING_INPUT
+    if exception is not None:
+        if getattr(exception, 'errno', None) in (errno.ENOSPC, getattr(errno, 'EDQUOT', errno.ENOSPC)):
+            return OUT_OF_DISK
+        if exception.__class__.__name__ == 'TimeoutExpired':
+            return TIMEOUT
+    stderr = stderr or ""
+    if any(pattern in stderr for pattern in DISK_FULL_PATTERNS):
+        return OUT_OF_DISK
+    if any(pattern in stderr for pattern in CORRUPT_PATTERNS):
+        return CORRUPT_INPUT
+    return ENCODER_ERROR
+
+
+def free_space_mb(path):
+    """path 所在磁盘的剩余空间（MB），path 尚不存在时取最近的已存在上级目录"""
+    directory = os.path.dirname(os.path.abspath(path))
+    while not os.path.isdir(directory) and os.path.dirname(directory) != directory:
+        directory = os.path.dirname(directory)
+    return shutil.disk_usage(directory).free / 1024 / 1024
+
+
+def classify_legacy_reason(reason):
+    """旧 failed_files.json 的中文原因 -> 失败类型"""
+    if "超时" in reason:
+        return TIMEOUT
+    if "无法获取音频时长" in reason:
+        return CORRUPT_INPUT
+    if any(pattern in reason for pattern in DISK_FULL_PATTERNS):
+        return OUT_OF_DISK
+    return ENCODER_ERROR
+
+
+class FailureJournal:
+    """只追加的失败日志；读取时按输入文件折叠出当前状态"""
+
+    def __init__(self, path):
+        self.path = path
+        self.host = socket.gethostname()
+
+    def append(self, event, input_file, output_file, failure_class=None, reason=""):
+        record = {
+            'ts': datetime.datetime.now().isoformat(timespec='seconds'),
+            'event': event,
+            'input_file': input_file,
+            'output_file': output_file,
+            'class': failure_class,
+            'reason': reason,
+            'host': self.host,
+            'pid': os.getpid()
+        }
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode('utf-8')
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            # 一行一次 write；再加文件锁，防止不同进程的长行在非本地文件系统上交错
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            os.write(fd, line)
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+        return record
+
+    def record_failure(self, input_file, output_file, failure_class, reason=""):
+        return self.append("failed", input_file, output_file, failure_class, reason)
+
+    def record_resolved(self, input_file, output_file):
+        return self.append("resolved", input_file, output_file)
+
+    def record_skipped(self, input_file, output_file, failure_class, reason):
+        return self.append("skipped", input_file, output_file, failure_class, reason)
+
+    def state(self):
+        """输入文件 -> 最新状态 {'event', 'class', 'reason', 'output_file', 'attempts', 'ts'}"""
+        entries = {}
+        if not os.path.exists(self.path):
+            return entries
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue   # 崩溃时写了一半的最后一行
+                previous = entries.get(record['input_file'])
+                attempts = previous['attempts'] if previous and previous['event'] == 'failed' else 0
+                if record['event'] == 'failed':
+                    attempts += 1
+                elif record['event'] == 'skipped' and previous:
+                    attempts = previous['attempts']
+                entries[record['input_file']] = {
+                    'input_file': record['input_file'],
+                    'output_file': record['output_file'],
+                    'event': record['event'],
+                    'class': record.get('class') or (previous or {}).get('class'),
+                    'reason': record.get('reason', ''),
+                    'attempts': attempts,
+                    'ts': record.get('ts')
+                }
+        return entries
+
+    def unresolved(self):
+        """最后一条事件为失败的文件"""
+        return [entry for entry in self.state().values() if entry['event'] == 'failed']
+
+    def pending(self, classes=None):
+        """可重试的文件：最后一次失败属于 classes（默认全部可重试类型），且未达到该类型的尝试上限"""
+        classes = set(classes or RETRYABLE_CLASSES)
+        pending = []
+        for entry in self.unresolved():
+            strategy = RETRY_STRATEGIES.get(entry['class'])
+            if entry['class'] in classes and strategy and strategy['retry'] and entry['attempts'] < strategy['max_attempts']:
+                pending.append(entry)
+        return pending
+
+    def summary(self):
+        """未解决失败按类型计数"""
+        counts = {}
+        for entry in self.unresolved():
+            counts[entry['class']] = counts.get(entry['class'], 0) + 1
+        return counts
+
+    def import_legacy(self, legacy_file):
+        """把旧的 failed_files.json 一次性转成日志记录（日志已存在时不导入），返回导入条数"""
+        if os.path.exists(self.path) or not os.path.exists(legacy_file):
+            return 0
+        try:
+            with open(legacy_file, 'r', encoding='utf-8') as f:
+                legacy = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        for failed in legacy:
+            reason = failed.get('last_error') or failed.get('error_reason', '')
+            failure_class = MISSING_INPUT if not os.path.exists(failed['input_file']) else classify_legacy_reason(reason)
+            self.record_failure(failed['input_file'], failed['output_file'], failure_class, reason)
+        return len(legacy)
+
+
+@contextmanager
+def claim_output(output_file, stale_after=STALE_CLAIM_SECONDS):
+    """
+    独占一个输出文件的处理权：成功时 yield True，已被其他进程/线程占用时 yield False
+    占用标记为 输出文件.lock（O_EXCL 创建），超过 stale_after 秒的标记视为遗留并接管
+    """
+    lock_file = f"{output_file}.lock"
+    os.makedirs(os.path.dirname(os.path.abspath(lock_file)), exist_ok=True)
+    fd = None
+    for _ in range(2):
+        try:
+            fd = os.open(lock_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock_file) < stale_after:
+                    break
+                os.remove(lock_file)
+            except FileNotFoundError:
+                pass
+    if fd is None:
+        yield False
+        return
+    try:
+        os.write(fd, f"{socket.gethostname()} {os.getpid()}\n".encode())
+        os.close(fd)
+        yield True
+    finally:
+        try:
+            os.remove(lock_file)
+        except FileNotFoundError:
+            pass
@@ -14,6 +14,8 @@ import tempfile
 import shutil
 from datetime import datetime
 
+from media_metadata_cache_媒体元数据缓存 import get_duration
+
 # 设置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -253,21 +255,12 @@ class FFmpegAudioProcessor:
                 f.write(b'')
     
     def get_audio_duration(self, audio_file: str) -> float:
-        """获取音频文件时长"""
-        try:
-            cmd = [
-                'ffprobe', '-v', 'quiet', '-show_entries', 'format=duration',
-                '-of', 'csv=p=0', audio_file
-            ]
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            if result.returncode == 0:
-                return float(result.stdout.strip())
-            else:
-                logger.error(f"获取音频时长失败: {result.stderr}")
-                return 0.0
-        except Exception as e:
-            logger.error(f"获取音频时长异常: {e}")
+        """获取音频文件时长（经媒体元数据缓存，文件未变化时不再调用 ffprobe）"""
+        duration = get_duration(audio_file)
+        if duration is None:
+            logger.error(f"获取音频时长失败: {audio_file}")
             return 0.0
+        return duration
     
     def process_single_audio(self, input_file: str, output_file: str = None,
                            background_combination: List[str] = None,
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+TT-Live-AI 媒体元数据缓存
+所有 FFmpeg 处理器共用的 ffprobe 结果缓存（SQLite WAL，多线程/多进程安全）：
+- 以 绝对路径 + mtime + 文件大小 为键，保存时长、编码、采样率、声道数
+- 文件未变化时直接命中缓存，重跑、断点续传不再调用 ffprobe
+- 文件被覆盖或修改（mtime/大小变化）时自动重新探测并覆盖旧记录
+- 未命中时先用纯 Python 音频头解析（audio_header_reader_音频头解析器.py），无法识别的文件才调用 ffprobe
+- 探测失败不写入缓存，避免把正在写入的半成品文件记成坏文件
+
+用法:
+    from media_metadata_cache_媒体元数据缓存 import probe_media, get_duration
+    info = probe_media("input.mp3")   # {'duration', 'codec', 'sample_rate', 'channels'} 或 None
+"""
+import json
+import os
+import sqlite3
+import subprocess
+import threading
+from pathlib import Path
+
+from audio_header_reader_音频头解析器 import read_audio_info
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+DEFAULT_CACHE_FILE = str(PROJECT_ROOT / "19_日志文件_系统运行日志和错误记录" / "media_metadata_cache.db")
+CACHE_FILE_ENV = "TT_MEDIA_CACHE"   # 设置为其他路径可改变缓存位置，设置为空字符串则只用内存缓存
+PROBE_TIMEOUT = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS media (
+    path        TEXT    PRIMARY KEY,
+    mtime_ns    INTEGER NOT NULL,
+    size        INTEGER NOT NULL,
+    duration    REAL    NOT NULL,
+    codec       TEXT,
+    sample_rate INTEGER,
+    channels    INTEGER,
+    probed_at   REAL    NOT NULL DEFAULT (strftime('%s', 'now'))
+);
+"""
+
+
+def run_ffprobe(path, timeout=PROBE_TIMEOUT):
+    """调用一次 ffprobe，返回首个音频流的 {'duration', 'codec', 'sample_rate', 'channels'}，失败返回 None"""
+    cmd = [
+        'ffprobe', '-v', 'quiet', '-print_format', 'json',
+        '-show_format', '-show_streams', '-select_streams', 'a:0', str(path)
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+        if result.returncode != 0:
+            return None
+        data = json.loads(result.stdout or "{}")
+    except (subprocess.SubprocessError, OSError, ValueError):
+        return None
+
+    streams = [stream for stream in data.get('streams', []) if stream.get('codec_type', 'audio') == 'audio']
+    if not streams:
+        return None
+    stream = streams[0]
+    try:
+        duration = float(data.get('format', {}).get('duration') or stream.get('duration') or 0)
+    except (TypeError, ValueError):
+        return None
+    if duration <= 0:
+        return None
+    return {
+        'duration': duration,
+        'codec': stream.get('codec_name', 'unknown'),
+        'sample_rate': int(stream.get('sample_rate') or 0),
+        'channels': int(stream.get('channels') or 0)
+    }
+
+
+class MediaMetadataCache:
+    """路径 + mtime + 大小 -> 媒体元数据（进程内字典 + 磁盘 SQLite 两级缓存）"""
+
+    def __init__(self, db_path=DEFAULT_CACHE_FILE):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._memory = {}
+        self._conn = None
+        self.hits = 0
+        self.parsed = 0
+        self.probes = 0
+        if db_path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+                self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("PRAGMA synchronous=NORMAL")
+                self._conn.executescript(SCHEMA)
+                self._conn.commit()
+            except sqlite3.Error:
+                # 缓存不可用（只读目录等）时退化为内存缓存，不影响处理流程
+                self._conn = None
+
+    def _lookup(self, key, mtime_ns, size):
+        cached = self._memory.get(key)
+        if cached and cached[0] == mtime_ns and cached[1] == size:
+            return cached[2]
+        if self._conn is None:
+            return None
+        row = self._conn.execute(
+            "SELECT duration, codec, sample_rate, channels FROM media WHERE path = ? AND mtime_ns = ? AND size = ?",
+            (key, mtime_ns, size)
+        ).fetchone()
+        if row is None:
+            return None
+        info = {'duration': row[0], 'codec': row[1], 'sample_rate': row[2], 'channels': row[3]}
+        self._memory[key] = (mtime_ns, size, info)
+        return info
+
+    def _store(self, key, mtime_ns, size, info):
+        self._memory[key] = (mtime_ns, size, info)
+        if self._conn is None:
+            return
+        try:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO media (path, mtime_ns, size, duration, codec, sample_rate, channels) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, mtime_ns, size, info['duration'], info['codec'], info['sample_rate'], info['channels'])
+            )
+            self._conn.commit()
+        except sqlite3.Error:
+            pass
+
+    def get(self, path):
+        """返回文件的元数据（复制的字典），文件不存在或探测失败时返回 None"""
+        key = os.path.abspath(str(path))
+        try:
+            stat = os.stat(key)
+        except OSError:
+            return None
+
+        with self._lock:
+            info = self._lookup(key, stat.st_mtime_ns, stat.st_size)
+            if info is not None:
+                self.hits += 1
+                return dict(info)
+
+        # 解析/探测不持锁，多个线程可并行处理不同文件
+        info = read_audio_info(key)
+        parsed = info is not None
+        if not parsed:
+            info = run_ffprobe(key)
+        with self._lock:
+            if parsed:
+                self.parsed += 1
+            else:
+                self.probes += 1
+            if info is not None:
+                self._store(key, stat.st_mtime_ns, stat.st_size, info)
+        return dict(info) if info else None
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "parsed": self.parsed, "probes": self.probes,
+                    "memory_entries": len(self._memory)}
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_default_cache = None
+_default_pid = None
+_default_lock = threading.Lock()
+
+
+def get_cache():
+    """进程内共享的默认缓存实例（位置可用环境变量 TT_MEDIA_CACHE 覆盖；fork 出的子进程各自重新打开连接）"""
+    global _default_cache, _default_pid
+    with _default_lock:
+        if _default_cache is None or _default_pid != os.getpid():
+            _default_cache = MediaMetadataCache(os.environ.get(CACHE_FILE_ENV, DEFAULT_CACHE_FILE))
+            _default_pid = os.getpid()
+        return _default_cache
+
+
+def probe_media(path):
+    """带缓存的元数据查询：{'duration', 'codec', 'sample_rate', 'channels'} 或 None"""
+    return get_cache().get(path)
+
+
+def get_duration(path):
+    """带缓存的时长查询（秒），失败返回 None"""
+    info = probe_media(path)
+    return info['duration'] if info else None
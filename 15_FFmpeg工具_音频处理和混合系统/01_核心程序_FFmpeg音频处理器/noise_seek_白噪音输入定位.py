@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+TT-Live-AI 白噪音输入定位
+白噪音片段用输入级定位（-ss/-t 放在 -i 之前）选取，替代 "[1]atrim=start=偏移:duration=时长"：
+- atrim 在滤镜中丢弃偏移之前的采样，ffmpeg 仍要从 0 秒解码到偏移处，2 小时白噪音末尾的偏移每个文件要白解码近 2 小时音频
+- 输入级定位由解封装器直接跳到偏移附近（WAV 按字节位置定位），再由精确定位（accurate_seek，默认开启）裁到准确的采样点
+偏移和时长仍按两位小数传入，与原 atrim 参数一致，选中的是同一段音频：
+PCM WAV 逐字节一致；MP3 等有帧间依赖的格式只有开头几十毫秒的解码器预热不同，其后逐字节一致。
+
+用法:
+    # 对比 atrim 与输入级定位选出的 PCM 是否一致
+    python3 noise_seek_白噪音输入定位.py verify --noise white_noise.wav -n 10
+    # 对比两种方式选取片段的解码耗时
+    python3 noise_seek_白噪音输入定位.py benchmark --noise white_noise.wav -n 10 --duration 30
+"""
+import argparse
+import random
+import struct
+import subprocess
+import time
+
+from media_metadata_cache_媒体元数据缓存 import get_duration, probe_media
+
+DECODER_WARMUP_SECONDS = 0.1   # 有损格式定位后允许的解码器预热差异
+
+
+def seek_input_args(noise_file, offset, duration):
+    """白噪音输入参数：从偏移处开始、只读取所需时长"""
+    return ['-ss', f'{offset:.2f}', '-t', f'{duration:.2f}', '-i', noise_file]
+
+
+def render_segment(noise_file, offset, duration, seek):
+    """把白噪音片段解码为原始 PCM（seek=True 为输入级定位，False 为 atrim），返回 (字节, 耗时秒)"""
+    if seek:
+        cmd = ['ffmpeg', '-v', 'error'] + seek_input_args(noise_file, offset, duration)
+    else:
+        cmd = ['ffmpeg', '-v', 'error', '-i', noise_file,
+               '-af', f'atrim=start={offset:.2f}:duration={duration:.2f}']
+    cmd += ['-f', 'f32le', '-acodec', 'pcm_f32le', 'pipe:1']
+    start = time.time()
+    result = subprocess.run(cmd, capture_output=True, timeout=600)
+    elapsed = time.time() - start
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.decode(errors='replace').strip())
+    return result.stdout, elapsed
+
+
+def sample_offsets(noise_duration, duration, count, seed=0):
+    """均匀覆盖整个白噪音文件（含末尾）的两位小数偏移"""
+    rng = random.Random(seed)
+    span = max(0.0, noise_duration - duration)
+    offsets = [round(span * (i + rng.random()) / count, 2) for i in range(count)]
+    return offsets + [round(span, 2)]
+
+
+def last_difference(first, second):
+    """两段等长 float32 PCM 最后一个不同采样的位置（采样序号，逐声道计），完全相同返回 -1"""
+    # "从第 k 个采样起之后完全相同" 对 k 单调，二分查找最小的 k
+    low, high = 0, len(first) // 4
+    while low < high:
+        middle = (low + high) // 2
+        if first[middle * 4:] == second[middle * 4:]:
+            high = middle
+        else:
+            low = middle + 1
+    return low - 1
+
+
+def verify(noise_file, count, duration):
+    info = probe_media(noise_file)
+    if not info:
+        print(f"❌ 无法获取白噪音信息: {noise_file}")
+        return False
+    warmup_samples = int(DECODER_WARMUP_SECONDS * info['sample_rate'] * info['channels'])
+    passed = True
+    for offset in sample_offsets(info['duration'], duration, count):
+        trimmed, _ = render_segment(noise_file, offset, duration, seek=False)
+        seeked, _ = render_segment(noise_file, offset, duration, seek=True)
+        if trimmed == seeked:
+            verdict = "逐字节一致"
+        elif len(trimmed) != len(seeked):
+            verdict = "长度不一致"
+            passed = False
+        else:
+            # 从末尾向前找最后一个不同的采样：只在开头的预热段内不同，说明选中的是同一段音频
+            last = last_difference(trimmed, seeked)
+            value, = struct.unpack('<f', trimmed[last * 4:last * 4 + 4])
+            ok = last < warmup_samples
+            passed = passed and ok
+            verdict = (f"前 {(last + 1) / info['channels'] / info['sample_rate'] * 1000:.0f} 毫秒解码器预热不同，其后一致"
+                       if ok else f"第 {last} 个采样仍不同（{value:.4f}）")
+        print(f"   偏移 {offset:>9.2f}s: atrim {len(trimmed)} 字节, 输入定位 {len(seeked)} 字节, {verdict}")
+    print(f"{'✅ 两种方式选取的是同一段音频' if passed else '❌ 存在不一致的片段'}")
+    return passed
+
+
+def benchmark(noise_file, count, duration):
+    noise_duration = get_duration(noise_file)
+    if not noise_duration:
+        print(f"❌ 无法获取白噪音时长: {noise_file}")
+        return None
+    offsets = sample_offsets(noise_duration, duration, count)
+    atrim_seconds = sum(render_segment(noise_file, offset, duration, seek=False)[1] for offset in offsets)
+    seek_seconds = sum(render_segment(noise_file, offset, duration, seek=True)[1] for offset in offsets)
+    print("=" * 60)
+    print(f"📏 白噪音 {noise_duration / 60:.1f} 分钟, 片段 {duration:.0f}秒, {len(offsets)} 个偏移（平均 {sum(offsets) / len(offsets) / 60:.1f} 分钟）")
+    print(f"   atrim:    {atrim_seconds / len(offsets) * 1000:.1f} 毫秒/片段")
+    print(f"   输入定位: {seek_seconds / len(offsets) * 1000:.1f} 毫秒/片段")
+    print(f"🚀 加速比: {atrim_seconds / seek_seconds:.1f}x")
+    print("=" * 60)
+    return atrim_seconds, seek_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TT-Live-AI 白噪音输入定位：与 atrim 对比片段一致性和解码耗时")
+    parser.add_argument("command", choices=["verify", "benchmark"])
+    parser.add_argument("--noise", required=True, help="白噪音文件")
+    parser.add_argument("-n", type=int, default=10, help="抽样偏移数（另加一个文件末尾的偏移）")
+    parser.add_argument("--duration", type=float, default=30.0, help="片段时长（秒）")
+    args = parser.parse_args()
+
+    if args.command == "verify":
+        return 0 if verify(args.noise, args.n, args.duration) else 1
+    return 0 if benchmark(args.noise, args.n, args.duration) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+TT-Live-AI NumPy 混音引擎
+替代 "ffmpeg atrim + amix" 的白噪音混合路径：
+- 白噪音按语音的采样率/声道只解码一次，保存为 float32 的内存映射 PCM 库
+  （16 位 PCM WAV 且采样率、声道一致时直接映射原文件的 data 块，不解码）
+- 语音按原始采样率/声道解码为 float32 PCM（与 amix 路径输出格式一致，EdgeTTS 为 24kHz 单声道），
+  随机偏移处的白噪音片段直接从内存映射中切片，不再每次从头解码到偏移位置
+- 在 NumPy 中完成音量与混合（与 amix normalize 的行为一致：两路都在时各乘 1/2，白噪音结束后语音单独输出）
+- 混合结果通过管道交给一个编码进程写出 M4A
+
+格式转换统一使用 aformat（浮点重混音矩阵），与 amix 滤镜图自动插入的转换一致；
+唯一的差异是 amix 路径先截取再重采样，白噪音片段首尾几十个采样点的重采样滤波边界不同。
+
+用法:
+    # 与 ffmpeg amix 路径对比 PCM 误差
+    python3 numpy_mix_engine_NumPy混音引擎.py verify --noise white_noise.wav --inputs 20_输出文件_处理完成的音频文件/xxx -n 5
+    # 每文件耗时基准测试
+    python3 numpy_mix_engine_NumPy混音引擎.py benchmark --noise white_noise.wav --inputs 20_输出文件_处理完成的音频文件/xxx -n 20
+"""
+import argparse
+import hashlib
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from audio_header_reader_音频头解析器 import read_wav_layout
+from media_metadata_cache_媒体元数据缓存 import probe_media
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+DEFAULT_BANK_DIR = str(PROJECT_ROOT / "19_日志文件_系统运行日志和错误记录" / "noise_bank")
+ENGINE_SAMPLE_RATE = 24000   # 无法获取语音格式时的默认值（EdgeTTS 输出格式）
+ENGINE_CHANNELS = 1
+DEFAULT_NOISE_VOLUME = 0.75
+DEFAULT_BITRATE = "128k"
+VERIFY_TOLERANCE = 1e-5     # 与 amix 路径 PCM 的最大绝对误差（满幅 1.0，不含首尾的重采样边界）
+VERIFY_EDGE_FRAMES = 64     # 首尾各跳过的帧数
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.m4a', '.aac', '.flac', '.ogg')
+
+
+def pcm_format_filter(sample_rate, channels):
+    """与 amix 滤镜图自动格式协商等价的转换（浮点，重混音矩阵不做防削波归一化）"""
+    layout = {1: 'mono', 2: 'stereo'}.get(channels, f'{channels}c')
+    return f'aformat=sample_fmts=flt:sample_rates={sample_rate}:channel_layouts={layout}'
+
+
+def decode_pcm(path, sample_rate=ENGINE_SAMPLE_RATE, channels=ENGINE_CHANNELS):
+    """用 ffmpeg 把音频解码为 float32 PCM，返回形状为 (帧数, 声道数) 的数组"""
+    cmd = [
+        'ffmpeg', '-v', 'error', '-i', str(path),
+        '-af', pcm_format_filter(sample_rate, channels), '-f', 'f32le', '-acodec', 'pcm_f32le', 'pipe:1'
+    ]
+    result = subprocess.run(cmd, capture_output=True, timeout=60)
+    if result.returncode != 0:
+        raise RuntimeError(f"解码失败 {path}: {result.stderr.decode(errors='replace').strip()}")
+    return np.frombuffer(result.stdout, dtype=np.float32).reshape(-1, channels)
+
+
+def encode_pcm(samples, output_file, sample_rate=ENGINE_SAMPLE_RATE, bitrate=DEFAULT_BITRATE):
+    """把 float32 PCM 通过管道交给一个编码进程写出 M4A（先写临时文件，成功后改名）"""
+    channels = samples.shape[1]
+    temp_output = f"{output_file}.{os.getpid()}.part"
+    cmd = [
+        'ffmpeg', '-y', '-v', 'error',
+        '-f', 'f32le', '-ar', str(sample_rate), '-ac', str(channels), '-i', 'pipe:0',
+        '-c:a', 'aac', '-b:a', bitrate, '-movflags', '+faststart', '-f', 'mp4', temp_output
+    ]
+    try:
+        result = subprocess.run(cmd, input=samples.tobytes(), capture_output=True, timeout=60)
+        if result.returncode != 0:
+            raise RuntimeError(f"编码失败 {output_file}: {result.stderr.decode(errors='replace').strip()}")
+        os.replace(temp_output, output_file)
+    finally:
+        if os.path.exists(temp_output):
+            os.remove(temp_output)
+
+
+class NoiseBank:
+    """解码一次、内存映射的白噪音 PCM 库（形状为 (帧数, 声道数)）"""
+
+    def __init__(self, noise_file, sample_rate=ENGINE_SAMPLE_RATE, channels=ENGINE_CHANNELS,
+                 bank_dir=DEFAULT_BANK_DIR):
+        self.noise_file = os.path.abspath(noise_file)
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.build_seconds = 0.0
+
+        layout = read_wav_layout(self.noise_file) if self.noise_file.lower().endswith('.wav') else None
+        if (layout and layout['codec'] == 'pcm_s16le' and layout['sample_rate'] == sample_rate
+                and layout['channels'] == channels):
+            # 原文件就是所需格式的 PCM，直接映射 data 块
+            self.bank_file = self.noise_file
+            self.scale = 1 / 32768.0
+            dtype, offset, frames = '<i2', layout['data_offset'], layout['data_size'] // (2 * channels)
+        else:
+            self.bank_file = self._build_bank(bank_dir)
+            self.scale = None
+            dtype, offset, frames = '<f4', 0, os.path.getsize(self.bank_file) // (4 * channels)
+        self.samples = np.memmap(self.bank_file, dtype=dtype, mode='r', offset=offset, shape=(frames, channels))
+
+    def _build_bank(self, bank_dir):
+        stat = os.stat(self.noise_file)
+        key = f"{self.noise_file}|{stat.st_mtime_ns}|{stat.st_size}|{self.sample_rate}|{self.channels}"
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]
+        bank_file = os.path.join(bank_dir, f"{Path(self.noise_file).stem}_{self.sample_rate}_{self.channels}ch_{digest}.f32")
+        if os.path.exists(bank_file):
+            return bank_file
+
+        os.makedirs(bank_dir, exist_ok=True)
+        temp_file = f"{bank_file}.{os.getpid()}.part"
+        start = time.time()
+        cmd = [
+            'ffmpeg', '-y', '-v', 'error', '-i', self.noise_file,
+            '-af', pcm_format_filter(self.sample_rate, self.channels),
+            '-f', 'f32le', '-acodec', 'pcm_f32le', temp_file
+        ]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+            raise RuntimeError(f"白噪音解码失败 {self.noise_file}: {result.stderr.strip()}")
+        os.replace(temp_file, bank_file)
+        self.build_seconds = time.time() - start
+        return bank_file
+
+    @property
+    def duration(self):
+        return len(self.samples) / self.sample_rate
+
+    def segment(self, offset_seconds, frames):
+        """从偏移处取最多 frames 帧，转为 float32（满幅 1.0）"""
+        start = min(max(0, int(round(offset_seconds * self.sample_rate))), len(self.samples))
+        segment = np.asarray(self.samples[start:start + frames], dtype=np.float32)
+        return segment * self.scale if self.scale else segment
+
+
+class NumpyMixEngine:
+    """语音 + 白噪音片段的 NumPy 混音，结果交给编码进程（线程安全，白噪音库按语音格式懒加载）"""
+
+    def __init__(self, noise_file, noise_volume=DEFAULT_NOISE_VOLUME, bitrate=DEFAULT_BITRATE,
+                 bank_dir=DEFAULT_BANK_DIR):
+        self.noise_file = noise_file
+        self.noise_volume = noise_volume
+        self.bitrate = bitrate
+        self.bank_dir = bank_dir
+        self._banks = {}
+        self._lock = threading.Lock()
+
+    def bank(self, sample_rate, channels):
+        with self._lock:
+            key = (sample_rate, channels)
+            if key not in self._banks:
+                self._banks[key] = NoiseBank(self.noise_file, sample_rate, channels, self.bank_dir)
+            return self._banks[key]
+
+    @staticmethod
+    def speech_format(input_file):
+        """语音的原始采样率和声道数（amix 路径的输出格式跟随第一路输入）"""
+        info = probe_media(input_file) or {}
+        return info.get('sample_rate') or ENGINE_SAMPLE_RATE, info.get('channels') or ENGINE_CHANNELS
+
+    def mix(self, speech, offset_seconds, bank):
+        """
+        与 "[noise]atrim,volume=v[n];[speech][n]amix=inputs=2:duration=first:dropout_transition=0" 等价：
+        两路都有信号的部分 (语音 + 白噪音×v) / 2，白噪音用完后语音单独输出
+        """
+        noise = bank.segment(offset_seconds, len(speech))
+        mixed = speech.copy()
+        overlap = len(noise)
+        mixed[:overlap] += noise * self.noise_volume
+        mixed[:overlap] *= 0.5
+        return mixed
+
+    def process(self, input_file, output_file, offset_seconds):
+        """解码语音、混合、编码输出；返回 {'duration', 'offset', 'size'}，失败抛出 RuntimeError"""
+        sample_rate, channels = self.speech_format(input_file)
+        speech = decode_pcm(input_file, sample_rate, channels)
+        if not len(speech):
+            raise RuntimeError(f"语音为空: {input_file}")
+        bank = self.bank(sample_rate, channels)
+        encode_pcm(self.mix(speech, offset_seconds, bank), output_file, sample_rate, self.bitrate)
+        return {
+            'duration': len(speech) / sample_rate,
+            'offset': offset_seconds,
+            'size': os.path.getsize(output_file)
+        }
+
+
+def amix_command(input_file, noise_file, offset, duration, noise_volume, output_args):
+    """atrim + amix 参考路径（用于对比）：与处理器的输入级定位选中同一段白噪音，且不受有损格式定位后解码器预热的影响"""
+    return [
+        'ffmpeg', '-y', '-v', 'error', '-i', str(input_file), '-i', str(noise_file),
+        '-filter_complex',
+        f'[1]atrim=start={offset:.2f}:duration={duration:.2f},volume={noise_volume}[noise];'
+        f'[0][noise]amix=inputs=2:duration=first:dropout_transition=0'
+    ] + output_args
+
+
+def collect_inputs(inputs, limit):
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, names in os.walk(item):
+                files.extend(os.path.join(root, name) for name in sorted(names) if name.lower().endswith(AUDIO_EXTENSIONS))
+        else:
+            files.append(item)
+    return sorted(files)[:limit]
+
+
+def pick_offset(bank, duration, index):
+    """固定的、按两位小数取整的偏移（amix 路径的 atrim 参数同样是两位小数）"""
+    span = max(0.0, bank.duration - duration)
+    return round(span * ((index * 0.618034) % 1.0), 2)
+
+
+def verify(engine, files):
+    """逐文件对比 NumPy 路径与 amix 路径混合后（编码前）的 PCM"""
+    worst = 0.0
+    for index, input_file in enumerate(files):
+        sample_rate, channels = engine.speech_format(input_file)
+        bank = engine.bank(sample_rate, channels)
+        speech = decode_pcm(input_file, sample_rate, channels)
+        duration = len(speech) / sample_rate
+        offset = pick_offset(bank, duration, index)
+        ours = engine.mix(speech, offset, bank)
+
+        cmd = amix_command(input_file, engine.noise_file, offset, duration, engine.noise_volume,
+                           ['-f', 'f32le', '-acodec', 'pcm_f32le', 'pipe:1'])
+        result = subprocess.run(cmd, capture_output=True, timeout=120)
+        if result.returncode != 0:
+            print(f"❌ amix 路径失败 {input_file}: {result.stderr.decode(errors='replace').strip()}")
+            return False
+        reference = np.frombuffer(result.stdout, dtype=np.float32).reshape(-1, channels)
+
+        frames = min(len(ours), len(reference))
+        diff = np.abs(ours[:frames] - reference[:frames])
+        body = diff[VERIFY_EDGE_FRAMES:frames - VERIFY_EDGE_FRAMES]
+        body_max = float(body.max()) if len(body) else 0.0
+        edge_max = float(diff.max()) if frames else 0.0
+        worst = max(worst, body_max)
+        print(f"   {os.path.basename(input_file)}: {sample_rate}Hz/{channels}ch, 帧数 {len(ours)}/{len(reference)}, "
+              f"最大误差 {body_max:.2e}（含首尾 {VERIFY_EDGE_FRAMES} 帧 {edge_max:.2e}）")
+        if len(ours) != len(reference):
+            worst = float('inf')
+
+    passed = worst <= VERIFY_TOLERANCE
+    print(f"{'✅' if passed else '❌'} 最大误差 {worst:.2e}（容差 {VERIFY_TOLERANCE:.0e}）")
+    return passed
+
+
+def benchmark(engine, files):
+    """逐文件对比 amix 路径与 NumPy 路径的单文件耗时（单线程，输出写入临时目录）"""
+    bench_dir = tempfile.mkdtemp(prefix='numpy_mix_bench_')
+    try:
+        jobs = []
+        for index, input_file in enumerate(files):
+            sample_rate, channels = engine.speech_format(input_file)
+            bank = engine.bank(sample_rate, channels)
+            duration = probe_media(input_file)['duration']
+            jobs.append((input_file, duration, pick_offset(bank, duration, index)))
+
+        start = time.time()
+        for index, (input_file, duration, offset) in enumerate(jobs):
+            output_file = os.path.join(bench_dir, f"amix_{index:05d}.m4a")
+            cmd = amix_command(input_file, engine.noise_file, offset, duration, engine.noise_volume,
+                               ['-c:a', 'aac', '-b:a', engine.bitrate, '-movflags', '+faststart', output_file])
+            subprocess.run(cmd, capture_output=True, timeout=120, check=True)
+        amix_seconds = time.time() - start
+
+        start = time.time()
+        for index, (input_file, _, offset) in enumerate(jobs):
+            engine.process(input_file, os.path.join(bench_dir, f"numpy_{index:05d}.m4a"), offset)
+        numpy_seconds = time.time() - start
+    finally:
+        shutil.rmtree(bench_dir, ignore_errors=True)
+
+    count = len(files)
+    build_seconds = sum(bank.build_seconds for bank in engine._banks.values())
+    noise_minutes = max(bank.duration for bank in engine._banks.values()) / 60
+    print("=" * 60)
+    print(f"📏 基准测试: {count} 个文件, 白噪音 {noise_minutes:.1f} 分钟（PCM 库构建 {build_seconds:.2f}秒，仅首次）")
+    print(f"   atrim + amix: {amix_seconds / count * 1000:.1f} 毫秒/文件")
+    print(f"   NumPy 引擎:   {numpy_seconds / count * 1000:.1f} 毫秒/文件")
+    print(f"🚀 加速比: {amix_seconds / numpy_seconds:.2f}x")
+    print("=" * 60)
+    return amix_seconds, numpy_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TT-Live-AI NumPy 混音引擎：与 amix 路径对比误差和耗时")
+    parser.add_argument("command", choices=["verify", "benchmark"])
+    parser.add_argument("--noise", required=True, help="白噪音文件")
+    parser.add_argument("--inputs", nargs="+", required=True, help="语音文件或目录")
+    parser.add_argument("-n", type=int, default=10, help="参与测试的文件数")
+    parser.add_argument("--volume", type=float, default=DEFAULT_NOISE_VOLUME, help="白噪音音量")
+    parser.add_argument("--bank-dir", default=DEFAULT_BANK_DIR, help="白噪音 PCM 库目录")
+    args = parser.parse_args()
+
+    files = collect_inputs(args.inputs, args.n)
+    if not files:
+        print("❌ 没有找到语音文件")
+        return 1
+    engine = NumpyMixEngine(args.noise, noise_volume=args.volume, bank_dir=args.bank_dir)
+    if args.command == "verify":
+        return 0 if verify(engine, files) else 1
+    benchmark(engine, files)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
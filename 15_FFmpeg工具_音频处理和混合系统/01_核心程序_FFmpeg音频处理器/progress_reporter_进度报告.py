@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+TT-Live-AI 批量处理进度报告
+FFmpeg 批量处理器共用的进度看板，替代每完成一个文件就 os.system('clear') 并重新汇总全部文件信息的做法：
+- 累计计数（成功/失败、总大小、总时长、FFmpeg 耗时、格式分布）每个文件 O(1) 更新
+- 终端（TTY）看板限频刷新（默认每秒最多 4 次），用 ANSI 转义清屏，不再启动 shell 子进程
+- 非 TTY（重定向到日志、nohup、systemd）每个成功文件打印一行（FFmpeg 耗时、输入定位免解码的白噪音秒数），
+  并每隔一段时间打印一行摘要，便于日志收集；终端看板的"最新处理"行显示同样的单文件数据
+- 进度文件：定期原子写入 JSON（临时文件 + 改名），供看板/监控读取
+
+环境变量:
+    TT_PROGRESS_FILE   进度文件路径，设置为空字符串则不写进度文件
+    TT_PROGRESS_MODE   tty（强制看板）或 log（强制单行摘要），默认按 stdout 是否为终端自动选择
+
+用法:
+    reporter = ProgressReporter("🚀 FFmpeg 高性能音频白噪音混合处理器", "high_performance")
+    reporter.start(len(audio_files))
+    reporter.record_success(file_info)   # 或 reporter.record_failure()
+    reporter.finish()
+"""
+import datetime
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+PROGRESS_DIR = PROJECT_ROOT / "19_日志文件_系统运行日志和错误记录"
+PROGRESS_FILE_ENV = "TT_PROGRESS_FILE"
+PROGRESS_MODE_ENV = "TT_PROGRESS_MODE"
+REFRESH_INTERVAL = 0.25      # 终端看板最短刷新间隔（秒）
+LOG_INTERVAL = 30.0          # 非 TTY 模式单行摘要间隔（秒）
+FILE_INTERVAL = 1.0          # 进度文件最短写入间隔（秒）
+CLEAR_SCREEN = "\033[H\033[2J"
+
+
+def default_progress_file(name):
+    """进度文件位置：环境变量 TT_PROGRESS_FILE 优先，否则为日志目录下的 progress_<name>.json"""
+    if PROGRESS_FILE_ENV in os.environ:
+        return os.environ[PROGRESS_FILE_ENV] or None
+    return str(PROGRESS_DIR / f"progress_{name}.json")
+
+
+def format_seconds(seconds):
+    return str(datetime.timedelta(seconds=int(seconds)))
+
+
+class ProgressReporter:
+    """线程安全的累计进度 + 限频渲染"""
+
+    def __init__(self, title, name, progress_file=None, interactive=None, extra_lines=None,
+                 refresh_interval=REFRESH_INTERVAL, log_interval=LOG_INTERVAL, file_interval=FILE_INTERVAL):
+        self.title = title
+        self.name = name
+        self.progress_file = progress_file if progress_file is not None else default_progress_file(name)
+        if interactive is None:
+            mode = os.environ.get(PROGRESS_MODE_ENV, "").lower()
+            interactive = mode == "tty" if mode in ("tty", "log") else sys.stdout.isatty()
+        self.interactive = interactive
+        self.extra_lines = extra_lines   # 可选回调，返回处理器特有的看板行（如待重试数）
+        self.render_interval = refresh_interval if interactive else log_interval
+        self.file_interval = file_interval
+        self._lock = threading.Lock()          # 保护计数
+        self._render_lock = threading.Lock()   # 同一时刻只有一个线程渲染/写文件，其他线程不等待
+        self.reset()
+
+    def reset(self, total=0):
+        with self._lock:
+            self.total = total
+            self.start_time = time.time()
+            self.processed = 0
+            self.failed = 0
+            self.total_size = 0
+            self.total_duration = 0.0
+            self.ffmpeg_time = 0.0
+            self.noise_skipped = 0.0
+            self.formats = {}
+            self.latest = None
+            self._last_render = 0.0
+            self._last_write = 0.0
+
+    def start(self, total):
+        self.reset(total)
+        self._write_file(self.snapshot())
+
+    def add_total(self, count=1):
+        """总数随新文件增长（目录监听模式）"""
+        with self._lock:
+            self.total += count
+
+    def record_skip(self):
+        """文件由其他进程处理，从本次总数中扣除，进度仍能到 100%"""
+        with self._lock:
+            self.total -= 1
+        self.update()
+
+    def record_success(self, file_info):
+        with self._lock:
+            self.processed += 1
+            self.total_size += file_info.get('size', 0)
+            self.total_duration += file_info.get('duration', 0) or 0
+            self.ffmpeg_time += file_info.get('processing_time', 0)
+            self.noise_skipped += file_info.get('noise_seek_skipped', 0)
+            fmt = file_info.get('format', '')
+            self.formats[fmt] = self.formats.get(fmt, 0) + 1
+            self.latest = (f"{file_info.get('filename', '')}{' (重试)' if file_info.get('is_retry') else ''} "
+                           f"(FFmpeg {file_info.get('processing_time', 0):.2f}秒, "
+                           f"免解码白噪音 {file_info.get('noise_seek_skipped', 0):.0f}秒)")
+            latest = self.latest
+        if not self.interactive:
+            print(f"✅ [{self.name}] {latest}", flush=True)
+        self.update()
+
+    def record_failure(self):
+        with self._lock:
+            self.failed += 1
+        self.update()
+
+    def snapshot(self, state="running"):
+        """进度文件内容，也供调用方做最终统计"""
+        with self._lock:
+            elapsed = time.time() - self.start_time
+            done = self.processed + self.failed
+            rate = done / elapsed if elapsed > 0 else 0.0
+            remaining = (self.total - done) / rate if rate > 0 else None
+            return {
+                'name': self.name,
+                'state': state,
+                'pid': os.getpid(),
+                'updated_at': datetime.datetime.now().isoformat(timespec='seconds'),
+                'total': self.total,
+                'processed': self.processed,
+                'failed': self.failed,
+                'percent': round(done / self.total * 100, 2) if self.total else 0.0,
+                'elapsed_seconds': round(elapsed, 1),
+                'eta_seconds': round(remaining, 1) if remaining is not None else None,
+                'files_per_second': round(rate, 3),
+                'output_bytes': self.total_size,
+                'audio_seconds': round(self.total_duration, 1),
+                'ffmpeg_seconds_per_file': round(self.ffmpeg_time / self.processed, 3) if self.processed else None,
+                'noise_seek_skipped_seconds': round(self.noise_skipped, 1),
+                'formats': dict(self.formats),
+                'latest': self.latest
+            }
+
+    def update(self, force=False):
+        """按间隔渲染和写进度文件；未到间隔或其他线程正在渲染时直接返回"""
+        now = time.time()
+        render_due = force or now - self._last_render >= self.render_interval
+        write_due = force or now - self._last_write >= self.file_interval
+        if not (render_due or write_due) or not self._render_lock.acquire(blocking=force):
+            return
+        try:
+            snapshot = self.snapshot()
+            if render_due:
+                self._last_render = now
+                self._render(snapshot)
+            if write_due:
+                self._last_write = now
+                self._write_file(snapshot)
+        finally:
+            self._render_lock.release()
+
+    def finish(self, state="finished"):
+        """最后一次完整渲染并把进度文件标记为结束，返回最终统计"""
+        with self._render_lock:
+            snapshot = self.snapshot(state)
+            self._render(snapshot)
+            self._write_file(snapshot)
+        return snapshot
+
+    def _render(self, snapshot):
+        if self.interactive:
+            self._render_panel(snapshot)
+        else:
+            self._render_line(snapshot)
+
+    def _render_line(self, s):
+        eta = format_seconds(s['eta_seconds']) if s['eta_seconds'] is not None else "计算中"
+        print(f"📊 [{self.name}] {s['processed'] + s['failed']}/{s['total']} ({s['percent']:.1f}%) "
+              f"✅ {s['processed']} ❌ {s['failed']} | {s['files_per_second']:.2f} 文件/秒 | "
+              f"已用 {format_seconds(s['elapsed_seconds'])} | 剩余 {eta}", flush=True)
+
+    def _render_panel(self, s):
+        done = s['processed'] + s['failed']
+        bar_length = 50
+        filled_length = int(bar_length * s['percent'] / 100)
+        bar = '█' * filled_length + '░' * (bar_length - filled_length)
+        lines = [
+            f"{self.title} - 实时处理看板",
+            "=" * 80,
+            f"📊 处理进度: [{bar}] {s['percent']:.1f}%",
+            f"   📁 文件: {done}/{s['total']}",
+            f"   ✅ 成功: {s['processed']} | ❌ 失败: {s['failed']}",
+        ]
+        if self.extra_lines:
+            lines.extend(f"   {line}" for line in self.extra_lines())
+        lines += [
+            "",
+            "⏱️ 时间统计:",
+            f"   🕐 已用时间: {format_seconds(s['elapsed_seconds'])}",
+            f"   ⏳ 剩余时间: {format_seconds(s['eta_seconds']) if s['eta_seconds'] is not None else '计算中...'}",
+        ]
+        if done:
+            lines.append(f"   📈 平均处理时间: {s['elapsed_seconds'] / done:.2f}秒/文件")
+        if s['processed']:
+            lines.append(f"   🎛️ FFmpeg耗时: {s['ffmpeg_seconds_per_file']:.2f}秒/文件")
+            lines.append(f"   ⏩ 输入定位免解码白噪音: {s['noise_seek_skipped_seconds'] / 3600:.2f}小时 "
+                         f"(平均 {s['noise_seek_skipped_seconds'] / s['processed']:.0f}秒/文件)")
+        lines += [
+            "",
+            "📁 文件统计:",
+            f"   💾 总大小: {s['output_bytes'] / 1024 / 1024:.2f} MB",
+            f"   📊 平均大小: {s['output_bytes'] / s['processed'] / 1024 if s['processed'] else 0:.2f} KB",
+        ]
+        if s['latest']:
+            lines.append(f"   🔄 最新处理: {s['latest']}")
+        if s['formats']:
+            lines += ["", "📋 格式分布:"]
+            for fmt, count in sorted(s['formats'].items()):
+                lines.append(f"   {fmt}: {count} 个 ({count / s['processed'] * 100:.1f}%)")
+        lines += ["", f"🚀 处理速度: {s['files_per_second']:.2f} 文件/秒", "=" * 80, "💡 提示: 按 Ctrl+C 可安全停止处理"]
+        # 一次写出整块看板，避免多线程输出交错
+        sys.stdout.write(CLEAR_SCREEN + "\n".join(lines) + "\n")
+        sys.stdout.flush()
+
+    def _write_file(self, snapshot):
+        if not self.progress_file:
+            return
+        temp_file = f"{self.progress_file}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.progress_file)), exist_ok=True)
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False, indent=2)
+            os.replace(temp_file, self.progress_file)
+        except OSError:
+            # 进度文件只是旁路信息，写不进去不影响处理
+            pass
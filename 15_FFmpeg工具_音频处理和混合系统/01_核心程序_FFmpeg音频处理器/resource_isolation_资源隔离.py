@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+TT-Live-AI FFmpeg 资源隔离
+FFmpeg 混音与 TTS 服务同机运行时，降低混音进程的调度优先级，避免抢占 Flask worker 的 CPU 和磁盘：
+- nice：CPU 调度优先级（默认 10），由所有 ffmpeg 子进程继承
+- ionice：I/O 调度类别和级别（默认 best-effort:7），同样由子进程继承
+- cgroup v2（可选）：把处理器进程移入指定的 cgroup，设置 cpu.weight / io.weight 和 cpu.max，
+  cpu.max 对处理器及其派生的全部 ffmpeg 子进程整体生效
+- 没有可用 cgroup 时，CPU 占比上限退化为限制同时运行的 ffmpeg 进程数（每个 ffmpeg 内部单线程）
+
+所有处理器启动时调用 apply_isolation(load_isolation_config())，配置来自环境变量：
+    TT_FFMPEG_NICE        nice 值，0 表示不调整（默认 10）
+    TT_FFMPEG_IONICE      idle | best-effort:N | none（默认 best-effort:7）
+    TT_FFMPEG_CGROUP      cgroup v2 目录（需要对该目录有写权限），为空则不使用 cgroup
+    TT_FFMPEG_CPU_WEIGHT  cgroup cpu.weight（1-10000，TTS 服务默认 100，设为 20 即只分到约 1/6）
+    TT_FFMPEG_IO_WEIGHT   cgroup io.weight（1-10000）
+    TT_FFMPEG_CPU_MAX     CPU 占比上限（占全部核心的百分比）
+
+cgroup 准备（一次性，需要 root）:
+    sudo mkdir /sys/fs/cgroup/tt-ffmpeg
+    echo "+cpu +io" | sudo tee /sys/fs/cgroup/cgroup.subtree_control
+    sudo chown -R $USER /sys/fs/cgroup/tt-ffmpeg
+    # 移入进程还需要对共同祖先的 cgroup.procs 有写权限，通常由 systemd Delegate=yes 提供
+
+基准测试（无负载 / 负载不隔离 / 负载隔离 三个阶段的延迟对比）:
+    python3 resource_isolation_资源隔离.py benchmark --seconds 20
+    python3 resource_isolation_资源隔离.py benchmark --url http://127.0.0.1:5001/health --nice 19 --ionice idle
+"""
+import argparse
+import ctypes
+import hashlib
+import json
+import math
+import os
+import platform
+import shutil
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+DEFAULT_NICE = 10
+DEFAULT_IONICE = "best-effort:7"
+
+IOPRIO_CLASSES = {"realtime": 1, "best-effort": 2, "idle": 3}
+IOPRIO_WHO_PROCESS = 1
+IOPRIO_CLASS_SHIFT = 13
+# ioprio_set 系统调用号（glibc 没有封装）
+IOPRIO_SET_SYSCALL = {"x86_64": 251, "i686": 289, "i386": 289, "aarch64": 30, "armv7l": 314, "ppc64le": 273}
+CPU_MAX_PERIOD_US = 100000
+
+
+class IsolationConfig:
+    """资源隔离配置；字段为 None 表示不调整对应项"""
+
+    def __init__(self, nice=DEFAULT_NICE, ionice=DEFAULT_IONICE, cgroup=None,
+                 cpu_weight=None, io_weight=None, cpu_max_percent=None):
+        self.nice = nice
+        self.ionice = ionice
+        self.cgroup = cgroup
+        self.cpu_weight = cpu_weight
+        self.io_weight = io_weight
+        self.cpu_max_percent = cpu_max_percent
+
+    def to_dict(self):
+        return dict(vars(self))
+
+
+def _env_int(name, default=None):
+    value = os.environ.get(name, "").strip()
+    return int(value) if value else default
+
+
+def load_isolation_config(**overrides):
+    """从环境变量读取配置，overrides 中不为 None 的项（命令行参数）优先"""
+    config = IsolationConfig(
+        nice=_env_int("TT_FFMPEG_NICE", DEFAULT_NICE),
+        ionice=os.environ.get("TT_FFMPEG_IONICE", DEFAULT_IONICE),
+        cgroup=os.environ.get("TT_FFMPEG_CGROUP") or None,
+        cpu_weight=_env_int("TT_FFMPEG_CPU_WEIGHT"),
+        io_weight=_env_int("TT_FFMPEG_IO_WEIGHT"),
+        cpu_max_percent=_env_int("TT_FFMPEG_CPU_MAX")
+    )
+    for key, value in overrides.items():
+        if value is not None:
+            setattr(config, key, value)
+    return config
+
+
+def add_isolation_arguments(parser):
+    """给处理器的 argparse 加上隔离相关参数（默认取环境变量）"""
+    group = parser.add_argument_group("资源隔离（与 TTS 服务同机运行时）")
+    group.add_argument("--nice", type=int, help=f"CPU 优先级 nice 值，0 为不调整（默认 {DEFAULT_NICE}）")
+    group.add_argument("--ionice", help=f"I/O 优先级: idle | best-effort:N | none（默认 {DEFAULT_IONICE}）")
+    group.add_argument("--cgroup", help="cgroup v2 目录，设置后写入 cpu.weight/io.weight/cpu.max 并移入该 cgroup")
+    group.add_argument("--cpu-weight", type=int, help="cgroup cpu.weight (1-10000)")
+    group.add_argument("--io-weight", type=int, help="cgroup io.weight (1-10000)")
+    group.add_argument("--cpu-max", dest="cpu_max_percent", type=int, metavar="PERCENT",
+                       help="所有 ffmpeg 子进程合计的 CPU 占比上限（占全部核心的百分比）")
+    return group
+
+
+def config_from_args(args):
+    return load_isolation_config(nice=args.nice, ionice=args.ionice, cgroup=args.cgroup,
+                                 cpu_weight=args.cpu_weight, io_weight=args.io_weight,
+                                 cpu_max_percent=args.cpu_max_percent)
+
+
+def parse_ionice(spec):
+    """'idle' / 'best-effort:7' / 'none' -> (类别, 级别) 或 None"""
+    if not spec or spec == "none":
+        return None
+    name, _, level = spec.partition(":")
+    if name not in IOPRIO_CLASSES:
+        raise ValueError(f"未知的 ionice 类别: {name}")
+    return IOPRIO_CLASSES[name], int(level) if level else (0 if name == "idle" else 4)
+
+
+def set_ionice(io_class, level, pid=0):
+    """设置进程 I/O 优先级：优先直接系统调用，不支持的架构退回 ionice 命令"""
+    number = IOPRIO_SET_SYSCALL.get(platform.machine())
+    if number is not None and sys.platform.startswith("linux"):
+        libc = ctypes.CDLL(None, use_errno=True)
+        if libc.syscall(number, IOPRIO_WHO_PROCESS, pid, (io_class << IOPRIO_CLASS_SHIFT) | level) == 0:
+            return True
+    if shutil.which("ionice"):
+        result = subprocess.run(["ionice", "-c", str(io_class), "-n", str(level), "-p", str(pid or os.getpid())],
+                                capture_output=True)
+        return result.returncode == 0
+    return False
+
+
+def current_cgroup():
+    """当前进程所在的 cgroup v2 目录，非 cgroup v2 系统返回 None"""
+    if not os.path.exists(os.path.join(CGROUP_ROOT, "cgroup.controllers")):
+        return None
+    try:
+        with open("/proc/self/cgroup") as f:
+            for line in f:
+                if line.startswith("0::"):
+                    return os.path.join(CGROUP_ROOT, line.strip()[3:].lstrip("/"))
+    except OSError:
+        pass
+    return None
+
+
+def _write(path, value):
+    with open(path, "w") as f:
+        f.write(value)
+
+
+def join_cgroup(config):
+    """按配置准备 cgroup 并把当前进程移入，返回应用的设置列表"""
+    if current_cgroup() is None:
+        raise OSError("系统未使用 cgroup v2")
+    target = config.cgroup
+    os.makedirs(target, exist_ok=True)
+    controllers = [name for name, needed in (("cpu", config.cpu_weight or config.cpu_max_percent),
+                                             ("io", config.io_weight)) if needed]
+    if controllers:
+        # 父目录未开启控制器时尝试开启（已开启或无权限时忽略，写入具体文件时再报错）
+        try:
+            _write(os.path.join(os.path.dirname(target), "cgroup.subtree_control"),
+                   " ".join(f"+{name}" for name in controllers))
+        except OSError:
+            pass
+    applied = []
+    if config.cpu_weight:
+        _write(os.path.join(target, "cpu.weight"), str(config.cpu_weight))
+        applied.append(f"cpu.weight={config.cpu_weight}")
+    if config.io_weight:
+        _write(os.path.join(target, "io.weight"), f"default {config.io_weight}")
+        applied.append(f"io.weight={config.io_weight}")
+    if config.cpu_max_percent:
+        quota = max(1000, int(CPU_MAX_PERIOD_US * (os.cpu_count() or 1) * config.cpu_max_percent / 100))
+        _write(os.path.join(target, "cpu.max"), f"{quota} {CPU_MAX_PERIOD_US}")
+        applied.append(f"cpu.max={quota}/{CPU_MAX_PERIOD_US}")
+    _write(os.path.join(target, "cgroup.procs"), str(os.getpid()))
+    applied.append(f"cgroup={target}")
+    return applied
+
+
+def max_ffmpeg_processes(config):
+    """cgroup 未生效时用进程数近似 CPU 占比上限（每个 ffmpeg 内部单线程），无上限返回 None"""
+    if not config.cpu_max_percent:
+        return None
+    return max(1, math.floor((os.cpu_count() or 1) * config.cpu_max_percent / 100))
+
+
+def apply_isolation(config, verbose=True):
+    """
+    对当前进程应用隔离设置（之后派生的 ffmpeg 子进程全部继承）
+    返回 {'applied': [...], 'failed': [...], 'cgroup': bool}；任何一项失败都不影响处理
+    """
+    applied, failed = [], []
+    if config.nice:
+        try:
+            os.nice(config.nice)
+            applied.append(f"nice={os.nice(0)}")
+        except OSError as e:
+            failed.append(f"nice: {e}")
+    try:
+        ionice = parse_ionice(config.ionice)
+        if ionice:
+            if set_ionice(*ionice):
+                applied.append(f"ionice={config.ionice}")
+            else:
+                failed.append("ionice: 系统不支持")
+    except (ValueError, OSError) as e:
+        failed.append(f"ionice: {e}")
+    in_cgroup = False
+    if config.cgroup:
+        try:
+            applied.extend(join_cgroup(config))
+            in_cgroup = True
+        except OSError as e:
+            failed.append(f"cgroup: {e}")
+    if not in_cgroup and config.cpu_max_percent:
+        applied.append(f"CPU 上限 {config.cpu_max_percent}% → 最多 {max_ffmpeg_processes(config)} 个 ffmpeg 进程")
+    if verbose:
+        if applied:
+            print(f"🛡️ 资源隔离: {', '.join(applied)}")
+        for item in failed:
+            print(f"⚠️ 资源隔离未生效 - {item}")
+    return {'applied': applied, 'failed': failed, 'cgroup': in_cgroup}
+
+
+# ---------------------------------------------------------------- 基准测试
+
+def ffmpeg_load_command(seconds):
+    """纯 CPU 的 ffmpeg 混音负载：两路合成噪声 amix 后编码 AAC，丢弃输出"""
+    return [
+        'ffmpeg', '-v', 'error', '-threads', '1', '-filter_complex_threads', '1',
+        '-f', 'lavfi', '-i', f'anoisesrc=d={seconds}:r=48000',
+        '-f', 'lavfi', '-i', f'sine=d={seconds}:r=48000',
+        '-filter_complex', 'amix=inputs=2', '-c:a', 'aac', '-b:a', '128k', '-f', 'null', '-'
+    ]
+
+
+def run_load(seconds, processes):
+    """
+    load 子命令：持续 seconds 秒保持 processes 个 ffmpeg 负载进程（由调用方决定是否先隔离）
+    收到 SIGTERM 时先结束并等待全部 ffmpeg 子进程再退出，避免负载残留到下一个测量阶段
+    """
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    deadline = time.time() + seconds
+    running = []
+    try:
+        while time.time() < deadline:
+            running = [proc for proc in running if proc.poll() is None]
+            while len(running) < processes:
+                running.append(subprocess.Popen(ffmpeg_load_command(60), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+            time.sleep(0.1)
+    finally:
+        for proc in running:
+            proc.kill()
+        for proc in running:
+            proc.wait()
+
+
+def probe_request(url, work_ms):
+    """一次模拟请求：有 url 时请求 TTS 服务，否则在本进程做固定量的 CPU 计算（模拟 Flask worker 处理请求）"""
+    start = time.perf_counter()
+    if url:
+        with urllib.request.urlopen(url, timeout=30) as response:
+            response.read()
+    else:
+        payload = b"x" * 4096
+        for _ in range(work_ms * 200):
+            payload = hashlib.sha256(payload).digest() * 128
+    return time.perf_counter() - start
+
+
+def measure_latency(url, seconds, rate, work_ms):
+    """以固定速率发出探测请求，返回延迟列表（毫秒）"""
+    latencies = []
+    interval = 1.0 / rate
+    next_at = time.perf_counter()
+    deadline = next_at + seconds
+    while next_at < deadline:
+        delay = next_at - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        latencies.append(probe_request(url, work_ms) * 1000)
+        next_at += interval
+    return latencies
+
+
+def latency_summary(values):
+    values = sorted(values)
+    if not values:
+        return {}
+
+    def pct(p):
+        return round(values[min(len(values) - 1, math.ceil(p / 100 * len(values)) - 1)], 2)
+
+    return {'count': len(values), 'mean_ms': round(sum(values) / len(values), 2),
+            'p50_ms': pct(50), 'p95_ms': pct(95), 'p99_ms': pct(99), 'max_ms': round(values[-1], 2)}
+
+
+def benchmark(args, config):
+    """三个阶段：无负载、ffmpeg 负载不隔离、ffmpeg 负载按配置隔离；探测请求本身不降优先级"""
+    processes = args.processes or (os.cpu_count() or 1) * 2
+    load_base = [sys.executable, os.path.abspath(__file__), "load", "--seconds", str(args.seconds + 5),
+                 "--processes", str(processes)]
+    isolated = load_base + ["--nice", str(config.nice or 0), "--ionice", config.ionice or "none"]
+    for flag, value in (("--cgroup", config.cgroup), ("--cpu-weight", config.cpu_weight),
+                        ("--io-weight", config.io_weight), ("--cpu-max", config.cpu_max_percent)):
+        if value:
+            isolated += [flag, str(value)]
+    phases = [("无负载", None), ("负载不隔离", load_base + ["--nice", "0", "--ionice", "none"]), ("负载隔离", isolated)]
+
+    report = {'processes': processes, 'isolation': config.to_dict(), 'url': args.url, 'phases': {}}
+    for name, command in phases:
+        load = subprocess.Popen(command) if command else None
+        try:
+            time.sleep(2 if load else 0)   # 等负载进程启动
+            latencies = measure_latency(args.url, args.seconds, args.rate, args.work_ms)
+        finally:
+            if load:
+                load.terminate()
+                load.wait()
+        report['phases'][name] = latency_summary(latencies)
+        summary = report['phases'][name]
+        print(f"   {name}: p50 {summary['p50_ms']}ms, p95 {summary['p95_ms']}ms, p99 {summary['p99_ms']}ms, "
+              f"max {summary['max_ms']}ms ({summary['count']} 次)")
+
+    baseline = report['phases']['负载不隔离']['p99_ms']
+    isolated_p99 = report['phases']['负载隔离']['p99_ms']
+    print("=" * 60)
+    print(f"📏 {processes} 个 ffmpeg 负载进程, 隔离设置: {config.to_dict()}")
+    if isolated_p99:
+        print(f"🚀 隔离后 p99 延迟: {baseline}ms → {isolated_p99}ms ({baseline / isolated_p99:.1f}x)")
+    print("=" * 60)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TT-Live-AI FFmpeg 资源隔离：对比 TTS 请求延迟")
+    parser.add_argument("command", choices=["benchmark", "load"])
+    parser.add_argument("--seconds", type=float, default=20.0, help="每个阶段的测量秒数")
+    parser.add_argument("--processes", type=int, help="ffmpeg 负载进程数（默认 CPU 核心数 × 2）")
+    parser.add_argument("--url", help="探测的 TTS 服务地址（如 http://127.0.0.1:5001/health），默认用本地 CPU 计算模拟请求")
+    parser.add_argument("--rate", type=float, default=20.0, help="每秒探测请求数")
+    parser.add_argument("--work-ms", type=int, default=5, help="模拟请求的计算量（约毫秒，空闲时）")
+    parser.add_argument("--output", help="结果写入 JSON 文件")
+    add_isolation_arguments(parser)
+    args = parser.parse_args()
+    config = config_from_args(args)
+
+    if args.command == "load":
+        apply_isolation(config, verbose=False)
+        run_load(args.seconds, args.processes or (os.cpu_count() or 1) * 2)
+        return 0
+    return 0 if benchmark(args, config) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
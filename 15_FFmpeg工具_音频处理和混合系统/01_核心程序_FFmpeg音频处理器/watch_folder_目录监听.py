@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+TT-Live-AI 目录监听
+监听 TTS 输出目录（含运行中新建的产品子目录），文件一写完就交给白噪音混合，不必等整轮 TTS 结束再全量扫描：
+- Linux 用 inotify（ctypes 调用 libc，无第三方依赖）：IN_MOVED_TO 对应 TTS 的 .part 临时文件原子改名，
+  IN_CLOSE_WRITE 对应直接写入的文件；新建子目录自动加监听并补扫目录内已有文件；事件队列溢出时全量补扫
+- 其他系统或 inotify 不可用时退回轮询：文件大小和修改时间连续两次不变且静置 settle 秒后才算写完
+- 以 . 开头的隐藏文件和 .part/.tmp 临时文件一律忽略
+
+用法:
+    watcher = open_watcher("20_输出文件_处理完成的音频文件", ('.mp3', '.wav'))
+    while True:
+        for path in watcher.poll(timeout=1.0):
+            process(path)
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.m4a', '.aac', '.flac', '.ogg')
+TEMP_SUFFIXES = ('.part', '.tmp')
+POLL_INTERVAL = 2.0      # 轮询模式扫描间隔（秒）
+SETTLE_SECONDS = 2.0     # 轮询模式下文件静置多久才算写完
+
+# <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = getattr(os, 'O_CLOEXEC', 0o2000000)
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+EVENT_HEADER = struct.Struct('iIII')
+
+
+def is_candidate(name, extensions):
+    return not name.startswith('.') and not name.endswith(TEMP_SUFFIXES) and name.lower().endswith(extensions)
+
+
+def walk_candidates(root, extensions):
+    for directory, _, files in os.walk(root):
+        for name in files:
+            if is_candidate(name, extensions):
+                yield os.path.join(directory, name)
+
+
+class InotifyWatcher:
+    """递归 inotify 监听，poll() 返回本次等到的已写完文件"""
+
+    def __init__(self, root, extensions=AUDIO_EXTENSIONS):
+        self.root = os.path.abspath(root)
+        self.extensions = extensions
+        self.mode = "inotify"
+        libc_name = ctypes.util.find_library('c') or 'libc.so.6'
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+        self._paths = {}     # wd -> 目录
+        self._backlog = []   # 新目录补扫、溢出补扫得到的文件
+        self._add_tree(self.root)
+
+    def _add_watch(self, directory):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            if error == 28:   # ENOSPC：超过 fs.inotify.max_user_watches
+                raise OSError(error, "inotify 监听数达到上限，请调大 fs.inotify.max_user_watches 或使用轮询模式")
+            return False      # 目录在加监听前被删除等情况
+        self._paths[wd] = directory
+        return True
+
+    def _add_tree(self, directory, report_existing=False):
+        """给目录及其子目录加监听；report_existing 时把已有文件放入补扫队列（监听建立前可能已写完）"""
+        for current, _, files in os.walk(directory):
+            self._add_watch(current)
+            if report_existing:
+                self._backlog.extend(os.path.join(current, name) for name in files if is_candidate(name, self.extensions))
+
+    def poll(self, timeout=1.0):
+        completed, self._backlog = self._backlog, []
+        ready, _, _ = select.select([self.fd], [], [], timeout if not completed else 0)
+        if not ready:
+            return completed
+        try:
+            data = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return completed
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            name = os.fsdecode(data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b'\0'))
+            offset += EVENT_HEADER.size + length
+            if mask & IN_Q_OVERFLOW:
+                # 事件丢失：重建监听并全量补扫，由调用方按输出是否存在去重
+                self._add_tree(self.root)
+                completed.extend(walk_candidates(self.root, self.extensions))
+                continue
+            directory = self._paths.get(wd)
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                del self._paths[wd]
+                continue
+            path = os.path.join(directory, name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self._add_tree(path, report_existing=True)
+            elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO) and is_candidate(name, self.extensions):
+                completed.append(path)
+        return completed
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class PollingWatcher:
+    """轮询监听：文件签名（大小, 修改时间）连续两次不变且静置 settle 秒后报告"""
+
+    def __init__(self, root, extensions=AUDIO_EXTENSIONS, interval=POLL_INTERVAL, settle=SETTLE_SECONDS):
+        self.root = os.path.abspath(root)
+        self.extensions = extensions
+        self.interval = interval
+        self.settle = settle
+        self.mode = "polling"
+        self._candidates = {}   # 尚未报告的文件 -> 上次看到的签名
+        self._reported = {path: self._signature(path) for path in walk_candidates(self.root, extensions)}
+        self._last_scan = time.time()
+
+    @staticmethod
+    def _signature(path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def poll(self, timeout=1.0):
+        wait = self._last_scan + self.interval - time.time()
+        if wait > 0:
+            time.sleep(min(wait, timeout))
+            if time.time() < self._last_scan + self.interval:
+                return []
+        self._last_scan = time.time()
+        completed = []
+        for path in walk_candidates(self.root, self.extensions):
+            signature = self._signature(path)
+            if signature is None or self._reported.get(path) == signature:
+                continue
+            settled = time.time() - signature[1] / 1e9 >= self.settle
+            if self._candidates.get(path) == signature and settled:
+                completed.append(path)
+                self._reported[path] = signature
+                del self._candidates[path]
+            else:
+                self._candidates[path] = signature
+        return completed
+
+    def close(self):
+        pass
+
+
+def open_watcher(root, extensions=AUDIO_EXTENSIONS, polling=False, interval=POLL_INTERVAL):
+    """优先 inotify，不可用（非 Linux、监听数上限等）时退回轮询"""
+    if not polling and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(root, extensions)
+        except (OSError, AttributeError) as e:
+            print(f"⚠️ inotify 不可用，改用轮询: {e}")
+    return PollingWatcher(root, extensions, interval)
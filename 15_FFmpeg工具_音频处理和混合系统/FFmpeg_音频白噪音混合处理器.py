@@ -6,6 +6,7 @@ FFmpeg 音频白噪音混合处理器
 """
 
 import os
+import sys
 import subprocess
 import random
 import time
@@ -13,6 +14,13 @@ import threading
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
+# 共用的媒体元数据缓存（ffprobe 结果按 路径+mtime+大小 持久化）、白噪音输入级定位与资源隔离
+sys.path.append(str(Path(__file__).resolve().parent / "01_核心程序_FFmpeg音频处理器"))
+from media_metadata_cache_媒体元数据缓存 import get_duration
+from noise_seek_白噪音输入定位 import seek_input_args
+from resource_isolation_资源隔离 import apply_isolation, load_isolation_config, max_ffmpeg_processes
+from adaptive_concurrency_自适应并发控制 import ffmpeg_output_thread_args, ffmpeg_thread_args
+
 class FFmpegAudioProcessor:
     def __init__(self):
         self.project_root = "/Volumes/M2/TT_Live_AI_TTS"
@@ -42,6 +50,9 @@ class FFmpegAudioProcessor:
         self.processed_count = 0
         self.error_count = 0
         
+        # 资源隔离的 CPU 占比上限（无 cgroup 时）换算出的 ffmpeg 进程数上限；设置后每个 ffmpeg 固定单线程
+        self.max_processes = None
+        
         print("🎵 FFmpeg 音频白噪音混合处理器 (M4A格式)")
         print("=" * 60)
         print("🔧 处理规则:")
@@ -67,21 +78,10 @@ class FFmpegAudioProcessor:
     
     def get_audio_duration(self, audio_file):
         """获取音频文件时长"""
-        try:
-            cmd = [
-                'ffprobe', '-v', 'quiet', '-show_entries', 'format=duration',
-                '-of', 'csv=p=0', audio_file
-            ]
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-            if result.returncode == 0:
-                duration = float(result.stdout.strip())
-                return duration
-            else:
-                print(f"⚠️ 无法获取音频时长: {audio_file}")
-                return None
-        except Exception as e:
-            print(f"❌ 获取音频时长失败: {e}")
-            return None
+        duration = get_duration(audio_file)
+        if duration is None:
+            print(f"⚠️ 无法获取音频时长: {audio_file}")
+        return duration
     
     def get_white_noise_duration(self):
         """获取白噪音文件时长"""
@@ -120,24 +120,29 @@ class FFmpegAudioProcessor:
             # 使用 amix 滤镜混合音频和白噪音
             cmd = [
                 'ffmpeg', '-y',  # 覆盖输出文件
+                *(ffmpeg_thread_args() if self.max_processes else []),
                 '-i', input_file,  # 输入音频
-                '-i', self.white_noise_file,  # 白噪音文件
+                *seek_input_args(self.white_noise_file, offset, audio_duration),  # 白噪音文件：输入级定位，只解码所需片段
                 '-filter_complex', 
-                f'[1]atrim=start={offset:.2f}:duration={audio_duration:.2f},volume={self.white_noise_volume}[noise];[0][noise]amix=inputs=2:duration=first:dropout_transition=0',
+                f'[1]volume={self.white_noise_volume}[noise];[0][noise]amix=inputs=2:duration=first:dropout_transition=0',
                 '-c:a', 'aac',  # M4A 格式编码
                 '-b:a', '128k',  # 比特率
+                *(ffmpeg_output_thread_args() if self.max_processes else []),
                 output_file
             ]
             
             # 执行 ffmpeg 命令
+            ffmpeg_start = time.time()
             result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+            processing_time = time.time() - ffmpeg_start
             
             if result.returncode == 0:
                 # 检查输出文件
                 if os.path.exists(output_file) and os.path.getsize(output_file) > 1000:
                     with self.lock:
                         self.processed_count += 1
-                        print(f"✅ 处理成功: {os.path.basename(output_file)} (偏移: {offset:.2f}s)")
+                        print(f"✅ 处理成功: {os.path.basename(output_file)} (偏移: {offset:.2f}s, 耗时: {processing_time:.2f}s, "
+                              f"输入定位免解码白噪音 {offset:.0f}s)")
                     return True
                 else:
                     with self.lock:
@@ -202,6 +207,9 @@ class FFmpegAudioProcessor:
             return False
         
         print(f"📁 找到 {len(audio_files)} 个音频文件")
+        if self.max_processes and max_workers > self.max_processes:
+            max_workers = self.max_processes
+            print(f"🛡️ CPU 占比上限: 并行数限制为 {max_workers}")
         print(f"🚀 启动 {max_workers} 个并行处理线程")
         
         # 使用线程池并行处理
@@ -257,7 +265,13 @@ class FFmpegAudioProcessor:
 
 def main():
     """主函数"""
+    # 降低自身优先级（TT_FFMPEG_NICE / TT_FFMPEG_IONICE 等环境变量），ffmpeg 子进程继承
+    isolation_config = load_isolation_config()
+    isolation = apply_isolation(isolation_config)
+    
     processor = FFmpegAudioProcessor()
+    if not isolation['cgroup']:
+        processor.max_processes = max_ffmpeg_processes(isolation_config)
     
     # 检查 ffmpeg 是否可用
     try:
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+TT-Live-AI 自适应节奏控制器
+用服务反馈（单条延迟、错误率）驱动批次大小和提交间隔，替代固定的 BATCH_DELAY / FILE_DELAY：
+- 健康时：批次大小线性增加，提交间隔减半直至为0
+- 出错时（本批错误率超过阈值，或平滑错误率超过阈值且仍在上升）：批次大小减半，提交间隔加倍（至少 backoff_floor 秒）
+- 恢复中（本批无异常但平滑错误率仍高于阈值）：不再增大批次，提交间隔逐步缩短
+- 变慢时：批次大小小幅收缩，提交间隔增加
+每次决策都写入日志，可选写入 JSONL 文件便于事后调参。
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptivePacer:
+    """AIMD 风格的批次大小与提交节奏控制"""
+
+    def __init__(self, name, initial_batch_size=50, min_batch_size=10, max_batch_size=200,
+                 batch_step=10, initial_delay=0.0, max_delay=60.0, backoff_floor=1.0,
+                 error_threshold=0.05, slow_factor=1.5, max_request_seconds=None,
+                 ewma_alpha=0.3, log_path=None, log=None):
+        self.name = name
+        self._log = log or logger.info  # 使用 print 输出的脚本可传入 log=print
+        self.batch_size = initial_batch_size
+        self.min_batch_size = min_batch_size
+        self.max_batch_size = max_batch_size
+        self.batch_step = batch_step
+        self.delay = initial_delay
+        self.max_delay = max_delay
+        self.backoff_floor = backoff_floor
+        self.error_threshold = error_threshold
+        self.slow_factor = slow_factor
+        self.max_request_seconds = max_request_seconds  # 单次请求耗时上限（通常取请求超时的一部分）
+        self.ewma_alpha = ewma_alpha
+        self.log_path = log_path
+
+        self.latency_ewma = None      # 单条脚本的平滑延迟
+        self.baseline_latency = None  # 观测到的最佳单条延迟
+        self.error_ewma = 0.0
+        self.decisions = deque(maxlen=1000)
+        self.total_items = 0
+        self.total_failures = 0
+        self.total_wait_seconds = 0.0
+
+    def record(self, items, duration, failures=0):
+        """记录一次提交的结果并调整节奏，返回本次决策"""
+        if items <= 0:
+            return None
+
+        per_item = duration / items
+        error_rate = failures / items
+        self.total_items += items
+        self.total_failures += failures
+
+        if self.latency_ewma is None:
+            self.latency_ewma = per_item
+        else:
+            self.latency_ewma = self.ewma_alpha * per_item + (1 - self.ewma_alpha) * self.latency_ewma
+        previous_error_ewma = self.error_ewma
+        self.error_ewma = self.ewma_alpha * error_rate + (1 - self.ewma_alpha) * self.error_ewma
+        if failures == 0 and (self.baseline_latency is None or self.latency_ewma < self.baseline_latency):
+            self.baseline_latency = self.latency_ewma
+
+        old_batch, old_delay = self.batch_size, self.delay
+        too_long = self.max_request_seconds and duration > self.max_request_seconds
+
+        error_high = self.error_ewma > self.error_threshold
+        # 平滑错误率只在上升时触发退避；一次失败后的健康批次只阻止加速，不再重复退避
+        if error_rate > self.error_threshold or (error_high and self.error_ewma > previous_error_ewma):
+            reason = "错误率过高，退避"
+            self.batch_size = max(self.min_batch_size, self.batch_size // 2)
+            self.delay = min(self.max_delay, max(self.delay * 2, self.backoff_floor))
+        elif too_long:
+            reason = "单次请求耗时接近超时，缩小批次"
+            self.batch_size = max(self.min_batch_size, int(self.batch_size * 0.7))
+        elif self.baseline_latency and self.latency_ewma > self.baseline_latency * self.slow_factor:
+            reason = "响应变慢，放缓"
+            self.batch_size = max(self.min_batch_size, int(self.batch_size * 0.8))
+            self.delay = min(self.max_delay, self.delay + self.backoff_floor)
+        elif error_high:
+            reason = "错误率回落中，保持批次"
+            self.delay = self.delay / 2 if self.delay >= 0.1 else 0.0
+        else:
+            reason = "健康，加速"
+            self.batch_size = min(self.max_batch_size, self.batch_size + self.batch_step)
+            self.delay = self.delay / 2 if self.delay >= 0.1 else 0.0
+
+        decision = {
+            "timestamp": datetime.now().isoformat(),
+            "pacer": self.name,
+            "reason": reason,
+            "items": items,
+            "failures": failures,
+            "duration_seconds": round(duration, 3),
+            "per_item_seconds": round(per_item, 3),
+            "latency_ewma": round(self.latency_ewma, 3),
+            "baseline_latency": round(self.baseline_latency, 3) if self.baseline_latency else None,
+            "error_ewma": round(self.error_ewma, 4),
+            "batch_size": [old_batch, self.batch_size],
+            "delay_seconds": [round(old_delay, 2), round(self.delay, 2)]
+        }
+        self.decisions.append(decision)
+        self._log_decision(decision)
+        return decision
+
+    def _log_decision(self, decision):
+        # 节奏无变化时只写 JSONL，避免逐条处理的脚本刷屏
+        changed = (decision['batch_size'][0] != decision['batch_size'][1]
+                   or decision['delay_seconds'][0] != decision['delay_seconds'][1])
+        if changed:
+            self._log(
+                f"🎛️ 节奏[{self.name}] {decision['reason']}: 批次 {decision['batch_size'][0]}->{decision['batch_size'][1]}, "
+                f"间隔 {decision['delay_seconds'][0]}s->{decision['delay_seconds'][1]}s, "
+                f"单条 {decision['per_item_seconds']}s (平滑 {decision['latency_ewma']}s, 基线 {decision['baseline_latency']}s), "
+                f"错误率 {decision['error_ewma']:.1%}"
+            )
+        if self.log_path:
+            try:
+                log_dir = os.path.dirname(self.log_path)
+                if log_dir:
+                    os.makedirs(log_dir, exist_ok=True)
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(decision, ensure_ascii=False) + "\n")
+            except OSError as e:
+                logger.warning(f"⚠️ 写入节奏日志失败: {e}")
+
+    def wait(self):
+        """按当前间隔暂停（间隔为0时立即返回）"""
+        if self.delay > 0:
+            self._log(f"⏳ 自适应暂停 {self.delay:.1f} 秒...")
+            time.sleep(self.delay)
+            self.total_wait_seconds += self.delay
+
+    async def async_wait(self):
+        if self.delay > 0:
+            self._log(f"⏳ 自适应暂停 {self.delay:.1f} 秒...")
+            await asyncio.sleep(self.delay)
+            self.total_wait_seconds += self.delay
+
+    def summary(self):
+        return {
+            "name": self.name,
+            "final_batch_size": self.batch_size,
+            "final_delay_seconds": round(self.delay, 2),
+            "latency_ewma": round(self.latency_ewma, 3) if self.latency_ewma else None,
+            "baseline_latency": round(self.baseline_latency, 3) if self.baseline_latency else None,
+            "total_items": self.total_items,
+            "total_failures": self.total_failures,
+            "total_wait_seconds": round(self.total_wait_seconds, 1),
+            "decisions": len(self.decisions)
+        }
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+TT-Live-AI 一致性哈希路由（带负载上限）
+把同一产品/语音的请求固定路由到同一个TTS实例，让实例上的语音状态和连接保持预热：
+- 每个实例在哈希环上放置 vnodes 个虚拟节点，增删实例只会迁移约 1/N 的键
+- 负载上限：实例在途请求数不超过 ceil(load_factor × (总在途 + 1) / 实例数)，
+  超限时沿哈希环顺延到下一个实例（溢出），避免热门产品压垮单个实例
+- 重试时可排除已失败的实例，同样沿环顺延，保证重试也是确定性的
+"""
+import bisect
+import hashlib
+import math
+import threading
+from contextlib import contextmanager
+
+DEFAULT_VNODES = 100
+DEFAULT_LOAD_FACTOR = 1.25
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+
+class ConsistentHashRouter:
+    """一致性哈希 + 负载上限的实例选择（线程安全）"""
+
+    def __init__(self, nodes=(), vnodes=DEFAULT_VNODES, load_factor=DEFAULT_LOAD_FACTOR):
+        self.vnodes = vnodes
+        self.load_factor = load_factor
+        self._lock = threading.Lock()
+        self._ring = []      # 排好序的 (哈希值, 实例)
+        self._keys = []      # 与 _ring 对应的哈希值，供 bisect 使用
+        self.loads = {}      # 实例 -> 在途请求数
+        self.routed = {}     # 实例 -> 累计分配次数
+        self.spills = 0      # 因负载上限或排除而未落在首选实例的次数
+        for node in nodes:
+            self.add_node(node)
+
+    @property
+    def nodes(self):
+        return list(self.loads)
+
+    def add_node(self, node):
+        with self._lock:
+            if node in self.loads:
+                return
+            for i in range(self.vnodes):
+                bisect.insort(self._ring, (_hash(f"{node}#{i}"), node))
+            self._keys = [point for point, _ in self._ring]
+            self.loads[node] = 0
+            self.routed.setdefault(node, 0)
+
+    def remove_node(self, node):
+        with self._lock:
+            if node not in self.loads:
+                return
+            self._ring = [(point, owner) for point, owner in self._ring if owner != node]
+            self._keys = [point for point, _ in self._ring]
+            del self.loads[node]
+
+    def preference(self, key):
+        """从 key 的哈希位置顺时针依次经过的不同实例（首个即首选实例）"""
+        if not self._ring:
+            return []
+        start = bisect.bisect(self._keys, _hash(key))
+        ordered = []
+        for offset in range(len(self._ring)):
+            node = self._ring[(start + offset) % len(self._ring)][1]
+            if node not in ordered:
+                ordered.append(node)
+                if len(ordered) == len(self.loads):
+                    break
+        return ordered
+
+    def lookup(self, key):
+        """不计负载的首选实例"""
+        with self._lock:
+            ordered = self.preference(key)
+        return ordered[0] if ordered else None
+
+    def _capacity(self):
+        total = sum(self.loads.values())
+        return max(1, math.ceil(self.load_factor * (total + 1) / len(self.loads)))
+
+    def acquire(self, key, exclude=()):
+        """
+        为 key 选出实例并计入一个在途请求；调用方完成后必须 release。
+        exclude 中的实例（如本次重试之前失败过的）被跳过；全部被排除时退回首选实例。
+        """
+        with self._lock:
+            ordered = self.preference(key)
+            if not ordered:
+                raise ValueError("没有可用的TTS实例")
+            capacity = self._capacity()
+            candidates = [node for node in ordered if node not in exclude] or ordered
+            chosen = next((node for node in candidates if self.loads[node] < capacity), candidates[0])
+            if chosen != ordered[0]:
+                self.spills += 1
+            self.loads[chosen] += 1
+            self.routed[chosen] = self.routed.get(chosen, 0) + 1
+            return chosen
+
+    def release(self, node):
+        with self._lock:
+            if self.loads.get(node, 0) > 0:
+                self.loads[node] -= 1
+
+    @contextmanager
+    def route(self, key, exclude=()):
+        node = self.acquire(key, exclude)
+        try:
+            yield node
+        finally:
+            self.release(node)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "nodes": len(self.loads),
+                "in_flight": dict(self.loads),
+                "routed": dict(self.routed),
+                "spills": self.spills
+            }
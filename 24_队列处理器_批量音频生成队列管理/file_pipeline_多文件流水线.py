@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+TT-Live-AI 多文件流水线
+让队列处理器不再逐个文件串行处理：
+- 后台线程提前解析后续 xlsx（预取深度可配置），解析不再占用生成时间
+- 多个文件的批次在全局并发预算内同时在途，由 ProductScheduler 按产品权重/优先级分配
+- 运行中可通过入队请求文件追加产品（如紧急产品），在下一个批次边界生效
+- 每个文件有独立的 AdaptivePacer：变慢或出错的文件只会缩小自己的批次、拉长自己的间隔，
+  连续整批失败时放弃该文件（剩余脚本留待下次运行），不会阻塞其他文件
+"""
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from product_scheduler_产品调度器 import ProductScheduler, EnqueueSpool, parse_priority, PRIORITY_NORMAL, PRIORITY_URGENT
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_INFLIGHT = 4        # 全局同时在途的批次数
+DEFAULT_PER_FILE_INFLIGHT = 2   # 单个文件同时在途的批次数上限
+DEFAULT_PREFETCH = 2            # 提前解析的文件数
+MAX_CONSECUTIVE_FAILURES = 5    # 连续整批失败达到该次数后放弃该文件
+STATUS_INTERVAL = 30            # 队列状态（深度/预计完成时间）输出间隔（秒）
+
+
+class FileJob:
+    """一个已解析的文件及其在流水线中的进度"""
+
+    def __init__(self, file_path, file_name, product_name, scripts, total_scripts=None, error=None):
+        self.file_path = file_path
+        self.file_name = file_name
+        self.product_name = product_name
+        self.scripts = scripts or []
+        self.total_scripts = total_scripts if total_scripts is not None else len(self.scripts)
+        self.error = error
+
+        self.pacer = None
+        self.weight = None
+        self.priority = None
+        self.virtual_time = 0.0
+        self.cursor = 0
+        self.inflight = 0
+        self.inflight_scripts = 0
+        self.batch_num = 0
+        self.successful = 0
+        self.failed = 0
+        self.consecutive_failures = 0
+        self.next_submit_at = 0.0
+        self.abandoned = False
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def remaining(self):
+        return len(self.scripts) - self.cursor
+
+    @property
+    def queued(self):
+        """还可以发出的脚本数（被放弃的文件不再发）"""
+        return 0 if self.abandoned else self.remaining
+
+    @property
+    def done(self):
+        return self.inflight == 0 and (self.abandoned or self.remaining == 0)
+
+    @property
+    def duration(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def next_batch(self):
+        batch = self.scripts[self.cursor:self.cursor + self.pacer.batch_size]
+        self.cursor += len(batch)
+        self.batch_num += 1
+        self.inflight += 1
+        self.inflight_scripts += len(batch)
+        if self.started_at is None:
+            self.started_at = time.time()
+        return self.batch_num, batch
+
+
+class FilePipeline:
+    """
+    预取解析 + 跨文件并发提交
+
+    load_file(file_path) -> FileJob                               在预取线程中执行（解析、登记台账等）
+    create_pacer(job) -> AdaptivePacer                            每个文件一个节奏控制器
+    submit_batch(job, batch_num, scripts) -> (successful, failed) 在工作线程中执行
+    on_file_done(job)                                             在调度线程中执行，用于汇总
+    schedule: {文件名: {"weight": 2, "priority": "high"}}         产品权重/优先级（未列出的为默认）
+    spool_path: 入队请求文件（JSON Lines），运行中追加的产品从这里读取
+    status_path: 队列状态 JSON（每个产品的队列深度与预计完成时间）
+    """
+
+    def __init__(self, load_file, submit_batch, create_pacer, on_file_done=None,
+                 max_inflight=DEFAULT_MAX_INFLIGHT, per_file_inflight=DEFAULT_PER_FILE_INFLIGHT,
+                 prefetch=DEFAULT_PREFETCH, schedule=None, spool_path=None, status_path=None):
+        self.load_file = load_file
+        self.submit_batch = submit_batch
+        self.create_pacer = create_pacer
+        self.on_file_done = on_file_done
+        self.max_inflight = max(1, max_inflight)
+        self.per_file_inflight = max(1, per_file_inflight)
+        self.prefetch = max(1, prefetch)
+        self.schedule = schedule or {}
+        self.status_path = status_path
+
+        self.jobs = []
+        self.scheduler = ProductScheduler()
+        self.spool = EnqueueSpool(spool_path) if spool_path else None
+        self._parsed = queue.Queue(maxsize=self.prefetch)
+        self._loader_finished = threading.Event()
+        self._overrides = {}
+        self._known_paths = set()
+        self._pending_loads = 0
+        self._pending_lock = threading.Lock()
+        self._started_at = None
+        self._completed_scripts = 0
+        self._last_status_at = 0.0
+
+    def _schedule_for(self, file_path):
+        config = dict(self.schedule.get(os.path.basename(file_path), {}))
+        config.update(self._overrides.get(os.path.abspath(file_path), {}))
+        return config
+
+    def _load(self, file_path):
+        try:
+            job = self.load_file(file_path)
+        except Exception as e:
+            logger.error(f"❌ 预取解析失败: {file_path} - {e}")
+            job = None
+        if job is None:
+            job = FileJob(file_path, os.path.basename(file_path), None, [], error="解析失败")
+        self._parsed.put(job)
+
+    def _loader(self, file_paths):
+        """后台预取：高优先级文件先解析，队列满时阻塞（限制内存占用）"""
+        try:
+            ordered = sorted(file_paths, key=lambda path: parse_priority(self._schedule_for(path).get("priority")))
+            for file_path in ordered:
+                self._load(file_path)
+        finally:
+            self._loader_finished.set()
+
+    def enqueue(self, file_path, priority=None, weight=None):
+        """运行中追加一个产品（紧急产品在下一个批次边界即被调度）"""
+        override = {}
+        if priority is not None:
+            override["priority"] = priority
+        if weight is not None:
+            override["weight"] = weight
+        key = os.path.abspath(file_path)
+        self._overrides[key] = override
+
+        # 已在本次运行中的文件只调整调度参数，不重复加载
+        loaded = [job for job in self.jobs if os.path.abspath(job.file_path) == key]
+        for job in loaded:
+            if job.pacer and not job.done:
+                if priority is not None:
+                    job.priority = parse_priority(priority)
+                if weight is not None:
+                    job.weight = max(float(weight), 0.01)
+                logger.info(f"📨 调整产品调度: {job.file_name} (优先级 {priority or '不变'}, 权重 {job.weight:g})")
+                return
+        if key in self._known_paths and not loaded:
+            logger.info(f"📨 产品 {os.path.basename(file_path)} 尚在预取队列中，加载后按新参数调度")
+            return
+        self._known_paths.add(key)
+
+        with self._pending_lock:
+            self._pending_loads += 1
+
+        def load():
+            try:
+                self._load(file_path)
+            finally:
+                with self._pending_lock:
+                    self._pending_loads -= 1
+
+        logger.info(f"📨 追加产品: {os.path.basename(file_path)} (优先级 {priority or '默认'})")
+        threading.Thread(target=load, daemon=True).start()
+
+    def _poll_spool(self):
+        if not self.spool:
+            return
+        for request in self.spool.poll():
+            file_path = request.get("file")
+            if not file_path or not os.path.exists(file_path):
+                logger.warning(f"⚠️ 入队请求的文件不存在: {file_path}")
+                continue
+            self.enqueue(file_path, request.get("priority"), request.get("weight"))
+
+    def _drain_parsed(self, block):
+        """把预取完成的文件加入活动列表"""
+        while True:
+            try:
+                job = self._parsed.get(timeout=0.5) if block else self._parsed.get_nowait()
+            except queue.Empty:
+                return
+            block = False
+            self.jobs.append(job)
+            if job.error or not job.scripts:
+                self._finish(job)
+            else:
+                job.pacer = self.create_pacer(job)
+                config = self._schedule_for(job.file_path)
+                self.scheduler.add(job, config.get("weight"), config.get("priority", PRIORITY_NORMAL))
+                logger.info(f"📥 文件已就绪: {job.file_name}（待处理 {len(job.scripts)} 条）")
+
+    def _finish(self, job):
+        if job.finished_at is None:
+            job.finished_at = time.time()
+        if self.on_file_done:
+            self.on_file_done(job)
+
+    def _pick_job(self, now):
+        """由调度器按优先级与加权公平挑选下一个可提交的文件"""
+        if any(job.priority == PRIORITY_URGENT and job.queued > 0 for job in self.scheduler.entries):
+            # 紧急产品独占空出来的并发槽位（不受单文件上限约束），其他产品等它发完
+            return self.scheduler.pick(
+                lambda job: job.priority == PRIORITY_URGENT and job.next_submit_at <= now
+            )
+        return self.scheduler.pick(
+            lambda job: job.inflight < self.per_file_inflight and job.next_submit_at <= now
+        )
+
+    def status(self):
+        """各产品的队列深度与预计完成时间（按本次运行的实测吞吐量估算）"""
+        elapsed = time.time() - self._started_at if self._started_at else 0.0
+        throughput = self._completed_scripts / elapsed if elapsed > 0 else 0.0
+        return self.scheduler.snapshot(throughput)
+
+    def _report_status(self, force=False):
+        now = time.time()
+        if not force and now - self._last_status_at < STATUS_INTERVAL:
+            return
+        self._last_status_at = now
+        status = self.status()
+        logger.info(f"📊 队列深度 {status['queue_depth']} 条，吞吐 {status['throughput_scripts_per_second']} 条/秒")
+        for product in status["products"]:
+            if product["queued_scripts"] or product["inflight_scripts"]:
+                logger.info(f"  - [{product['priority']}] {product['product']}: 排队 {product['queued_scripts']}, "
+                            f"在途 {product['inflight_scripts']}, 预计完成 {product['estimated_completion'] or '未知'}")
+        if self.status_path:
+            try:
+                status_dir = os.path.dirname(self.status_path)
+                if status_dir:
+                    os.makedirs(status_dir, exist_ok=True)
+                with open(self.status_path, "w", encoding="utf-8") as f:
+                    json.dump(status, f, ensure_ascii=False, indent=2)
+            except OSError as e:
+                logger.warning(f"⚠️ 写入队列状态失败: {e}")
+
+    def _run_batch(self, job, batch_num, scripts):
+        start = time.time()
+        try:
+            successful, failed = self.submit_batch(job, batch_num, scripts)
+        except Exception as e:
+            logger.error(f"❌ {job.file_name} 批次 {batch_num} 异常: {e}")
+            successful, failed = 0, len(scripts)
+        return successful, failed, time.time() - start
+
+    def _complete(self, job, scripts, successful, failed, elapsed):
+        job.inflight -= 1
+        job.inflight_scripts -= len(scripts)
+        self._completed_scripts += len(scripts)
+        job.successful += successful
+        job.failed += failed
+        job.pacer.record(len(scripts), elapsed, failed)
+        job.next_submit_at = time.time() + job.pacer.delay
+
+        if scripts and successful == 0:
+            job.consecutive_failures += 1
+            if job.consecutive_failures >= MAX_CONSECUTIVE_FAILURES and not job.abandoned:
+                job.abandoned = True
+                logger.error(f"🛑 文件 {job.file_name} 连续 {job.consecutive_failures} 批失败，"
+                             f"放弃剩余 {job.remaining} 条，其他文件继续")
+        else:
+            job.consecutive_failures = 0
+
+        if job.done:
+            self._finish(job)
+
+    def run(self, file_paths):
+        """处理全部文件，返回 FileJob 列表（按就绪顺序）"""
+        file_paths = list(file_paths)
+        self._known_paths.update(os.path.abspath(path) for path in file_paths)
+        loader = threading.Thread(target=self._loader, args=(file_paths,), daemon=True)
+        loader.start()
+        logger.info(f"🚚 流水线启动: 全局并发 {self.max_inflight} 批, 单文件 {self.per_file_inflight} 批, 预取 {self.prefetch} 个文件")
+
+        self._started_at = time.time()
+        futures = {}
+        with ThreadPoolExecutor(max_workers=self.max_inflight, thread_name_prefix="pipeline") as executor:
+            while True:
+                self._poll_spool()
+                with self._pending_lock:
+                    loads_pending = self._pending_loads > 0
+                loader_done = self._loader_finished.is_set() and not loads_pending and self._parsed.empty()
+                # 没有任何在途或未完成的文件时，阻塞等待下一个解析结果
+                idle = not futures and all(job.done for job in self.jobs)
+                self._drain_parsed(block=idle and not loader_done)
+
+                now = time.time()
+                while len(futures) < self.max_inflight:
+                    job = self._pick_job(now)
+                    if job is None:
+                        break
+                    batch_num, scripts = job.next_batch()
+                    self.scheduler.on_dispatch(job, len(scripts))
+                    logger.info(f"📦 提交 {job.file_name} 批次 {batch_num}（{len(scripts)} 条，剩余 {job.remaining} 条，在途 {len(futures) + 1}）")
+                    futures[executor.submit(self._run_batch, job, batch_num, scripts)] = (job, scripts)
+
+                if not futures:
+                    waiting = [job for job in self.jobs if not job.done]
+                    if loader_done and not waiting:
+                        break
+                    if waiting:
+                        # 剩余文件都在等待各自的节奏间隔
+                        wake_at = min(job.next_submit_at for job in waiting)
+                        time.sleep(min(max(wake_at - time.time(), 0.05), 1.0))
+                    continue
+
+                done, _ = wait(futures, timeout=0.5, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job, scripts = futures.pop(future)
+                    successful, failed, elapsed = future.result()
+                    self._complete(job, scripts, successful, failed, elapsed)
+                self._report_status()
+
+        self._report_status(force=True)
+        loader.join()
+        return self.jobs
@@ -5,6 +5,7 @@ TT-Live-AI 完整队列处理器
 """
 import os
 import glob
+import argparse
 import requests
 import pandas as pd
 import time
@@ -12,6 +13,11 @@ import logging
 from datetime import datetime
 import json
 
+from adaptive_pacer_自适应节奏控制器 import AdaptivePacer
+from file_pipeline_多文件流水线 import FilePipeline, FileJob, DEFAULT_MAX_INFLIGHT, DEFAULT_PREFETCH
+from product_scheduler_产品调度器 import EnqueueSpool, PRIORITY_NAMES
+from work_list_工作清单 import load_work_list
+
 # 配置日志
 logging.basicConfig(
     level=logging.INFO,
@@ -27,9 +33,17 @@ logger = logging.getLogger(__name__)
 TTS_SERVICE_URL = "http://127.0.0.1:5001"
 INPUTS_DIR = "inputs"
 OUTPUTS_DIR = "outputs"
-BATCH_SIZE = 50  # 每批处理的脚本数量
-BATCH_DELAY = 3  # 批次间延迟（秒）
-FILE_DELAY = 10  # 文件间延迟（秒）
+BATCH_SIZE = 50  # 初始批次大小（运行中由自适应节奏控制器调整）
+MIN_BATCH_SIZE = 10
+MAX_BATCH_SIZE = 200
+REQUEST_TIMEOUT = 300  # 单批请求超时（秒）
+PACING_LOG = "logs/full_queue_pacing.jsonl"  # 节奏决策日志，用于调参
+QUEUE_SPOOL = "logs/full_queue_enqueue.jsonl"  # 运行中追加产品的请求文件（--enqueue 写入）
+QUEUE_STATUS = "logs/full_queue_status.json"  # 各产品队列深度与预计完成时间
+
+# 流水线模式下各产品的调度权重与优先级（未列出的产品: 权重1, normal）
+# 例: "全产品_合并版_3200_v9.xlsx": {"weight": 2, "priority": "high"}
+PRODUCT_SCHEDULE = {}
 
 # 为每个文件定义固定的voice
 FILE_VOICE_MAPPING = {
@@ -50,8 +64,23 @@ class FullQueueProcessor:
         self.failed_files = []
         self.total_audios_generated = 0
         self.total_audios_failed = 0
+        self.pacer = self.create_pacer("full_queue")
         self.start_time = None
+        self.queue_status = None
+        self.work_indices = None  # 工作清单：{文件名: 需要（重新）生成的脚本序号}
+        self.work_files = None
         
+    def create_pacer(self, name):
+        """创建自适应节奏控制器（流水线模式下每个文件一个）"""
+        return AdaptivePacer(
+            name,
+            initial_batch_size=BATCH_SIZE,
+            min_batch_size=MIN_BATCH_SIZE,
+            max_batch_size=MAX_BATCH_SIZE,
+            max_request_seconds=REQUEST_TIMEOUT * 0.6,
+            log_path=PACING_LOG
+        )
+    
     def check_tts_service(self):
         """检查TTS服务状态"""
         try:
@@ -66,8 +95,16 @@ class FullQueueProcessor:
             logger.error(f"❌ 无法连接到TTS服务: {e}")
             return False
     
+    def use_work_list(self, path):
+        """只处理工作清单（规划器输出）中列出的文件和脚本"""
+        self.work_indices, self.work_files = load_work_list(path)
+        total = sum(len(indices) for indices in self.work_indices.values())
+        logger.info(f"🗺️ 使用工作清单 {path}: {len(self.work_files)} 个文件, {total} 条脚本")
+    
     def scan_input_files(self):
         """扫描inputs文件夹中的xlsx文件"""
+        if self.work_files is not None:
+            return list(self.work_files)
         xlsx_files = glob.glob(os.path.join(INPUTS_DIR, "*.xlsx"))
         logger.info(f"📁 发现 {len(xlsx_files)} 个xlsx文件:")
         for file in xlsx_files:
@@ -114,6 +151,7 @@ class FullQueueProcessor:
                 continue  # 跳过空内容
             
             script = {
+                "script_index": index + 1,  # 工作表行号，作为输出文件序号（批次间不冲突）
                 "english_script": english_script,
                 "emotion": "Friendly",  # 默认情绪
                 "voice": fixed_voice  # 使用文件固定的voice
@@ -155,76 +193,85 @@ class FullQueueProcessor:
             
             scripts.append(script)
         
+        if self.work_indices is not None:
+            work_indices = self.work_indices.get(file_name, set())
+            scripts = [script for script in scripts if script["script_index"] in work_indices]
+            logger.info(f"🗺️ 按工作清单筛选: {len(scripts)} 条")
+        
         logger.info(f"✅ 准备了 {len(scripts)} 条脚本数据")
         return scripts
     
-    def generate_audio_batch(self, scripts, product_name, batch_size=BATCH_SIZE):
-        """批量生成音频"""
+    def send_batch(self, batch_scripts, product_name, batch_num):
+        """向TTS服务提交一批脚本，返回 (成功数, 失败数)"""
+        request_data = {
+            "product_name": f"{product_name}_Batch{batch_num}",
+            "scripts": batch_scripts,
+            "emotion": "Friendly",
+            "voice": batch_scripts[0]["voice"] if batch_scripts else "en-US-JennyNeural"
+        }
+        
+        try:
+            logger.info(f"📡 发送 {product_name} 第 {batch_num} 批请求到TTS服务...")
+            logger.info(f"🎤 使用语音: {request_data['voice']}")
+            
+            response = requests.post(f"{TTS_SERVICE_URL}/generate", json=request_data, timeout=REQUEST_TIMEOUT)
+            
+            if response.status_code != 200:
+                logger.error(f"❌ {product_name} 第 {batch_num} 批请求失败: {response.status_code}")
+                logger.error(f"响应内容: {response.text}")
+                return 0, len(batch_scripts)
+            
+            result = response.json()
+        except requests.exceptions.RequestException as e:
+            logger.error(f"❌ {product_name} 第 {batch_num} 批请求异常: {e}")
+            return 0, len(batch_scripts)
+        
+        batch_successful = result["summary"]["successful"]
+        batch_failed = result["summary"]["failed"]
+        logger.info(f"✅ {product_name} 第 {batch_num} 批完成: 成功 {batch_successful}, 失败 {batch_failed}")
+        logger.info(f"📁 音频目录: {result['audio_directory']}")
+        return batch_successful, batch_failed
+    
+    def generate_audio_batch(self, scripts, product_name):
+        """批量生成音频（批次大小与批次间隔由自适应节奏控制器决定）"""
         total_scripts = len(scripts)
         successful = 0
         failed = 0
         
-        logger.info(f"🚀 开始生成 {total_scripts} 条音频，批量大小: {batch_size}")
+        logger.info(f"🚀 开始生成 {total_scripts} 条音频，初始批量大小: {self.pacer.batch_size}")
         
-        for i in range(0, total_scripts, batch_size):
-            batch_scripts = scripts[i:i+batch_size]
-            batch_num = i // batch_size + 1
-            total_batches = (total_scripts + batch_size - 1) // batch_size
+        i = 0
+        batch_num = 0
+        while i < total_scripts:
+            batch_scripts = scripts[i:i+self.pacer.batch_size]
+            batch_num += 1
+            batch_start_time = time.time()
             
-            logger.info(f"📦 处理第 {batch_num}/{total_batches} 批，包含 {len(batch_scripts)} 条脚本")
+            logger.info(f"📦 处理第 {batch_num} 批，包含 {len(batch_scripts)} 条脚本（剩余 {total_scripts - i} 条）")
             
-            # 准备请求数据
-            request_data = {
-                "product_name": f"{product_name}_Batch{batch_num}",
-                "scripts": batch_scripts,
-                "emotion": "Friendly",
-                "voice": batch_scripts[0]["voice"] if batch_scripts else "en-US-JennyNeural"
-            }
+            batch_successful, batch_failed = self.send_batch(batch_scripts, product_name, batch_num)
+            successful += batch_successful
+            failed += batch_failed
             
-            try:
-                # 发送请求
-                logger.info(f"📡 发送第 {batch_num} 批请求到TTS服务...")
-                logger.info(f"🎤 使用语音: {request_data['voice']}")
-                
-                response = requests.post(f"{TTS_SERVICE_URL}/generate", json=request_data, timeout=300)
+            if batch_successful:
+                # 显示进度
+                progress = ((i + len(batch_scripts)) / total_scripts) * 100
+                logger.info(f"📊 总进度: {progress:.1f}% ({successful + failed}/{total_scripts})")
                 
-                if response.status_code == 200:
-                    result = response.json()
-                    batch_successful = result["summary"]["successful"]
-                    batch_failed = result["summary"]["failed"]
-                    
-                    successful += batch_successful
-                    failed += batch_failed
-                    
-                    logger.info(f"✅ 第 {batch_num} 批完成: 成功 {batch_successful}, 失败 {batch_failed}")
-                    logger.info(f"📁 音频目录: {result['audio_directory']}")
-                    
-                    # 显示进度
-                    progress = ((i + len(batch_scripts)) / total_scripts) * 100
-                    logger.info(f"📊 总进度: {progress:.1f}% ({successful + failed}/{total_scripts})")
-                    
-                    # 显示预计剩余时间
-                    if self.start_time:
-                        elapsed_time = time.time() - self.start_time
-                        if successful + failed > 0:
-                            avg_time_per_audio = elapsed_time / (successful + failed)
-                            remaining_audios = total_scripts - (successful + failed)
-                            estimated_remaining = remaining_audios * avg_time_per_audio
-                            logger.info(f"⏱️ 预计剩余时间: {estimated_remaining/60:.1f} 分钟")
-                    
-                else:
-                    logger.error(f"❌ 第 {batch_num} 批请求失败: {response.status_code}")
-                    logger.error(f"响应内容: {response.text}")
-                    failed += len(batch_scripts)
-                    
-            except requests.exceptions.RequestException as e:
-                logger.error(f"❌ 第 {batch_num} 批请求异常: {e}")
-                failed += len(batch_scripts)
+                # 显示预计剩余时间
+                if self.start_time:
+                    elapsed_time = time.time() - self.start_time
+                    if successful + failed > 0:
+                        avg_time_per_audio = elapsed_time / (successful + failed)
+                        remaining_audios = total_scripts - (successful + failed)
+                        estimated_remaining = remaining_audios * avg_time_per_audio
+                        logger.info(f"⏱️ 预计剩余时间: {estimated_remaining/60:.1f} 分钟")
             
-            # 批次间暂停，避免过载
-            if i + batch_size < total_scripts:
-                logger.info(f"⏳ 批次间暂停 {BATCH_DELAY} 秒...")
-                time.sleep(BATCH_DELAY)
+            # 根据本批耗时和失败数调整节奏，并按需暂停
+            self.pacer.record(len(batch_scripts), time.time() - batch_start_time, batch_failed)
+            i += len(batch_scripts)
+            if i < total_scripts:
+                self.pacer.wait()
         
         return successful, failed
     
@@ -302,10 +349,9 @@ class FullQueueProcessor:
             if self.process_single_file(file_path):
                 success_count += 1
             
-            # 文件间暂停
+            # 文件间沿用自适应节奏（服务健康时不额外等待）
             if i < len(xlsx_files) - 1:  # 不是最后一个文件
-                logger.info(f"⏳ 文件间暂停 {FILE_DELAY} 秒...")
-                time.sleep(FILE_DELAY)
+                self.pacer.wait()
         
         end_time = time.time()
         total_duration = end_time - self.start_time
@@ -315,6 +361,81 @@ class FullQueueProcessor:
         
         return success_count == len(xlsx_files)
     
+    def load_file_job(self, file_path):
+        """流水线预取：读取并解析一个文件（在后台线程执行）"""
+        file_name = os.path.basename(file_path)
+        df = self.read_excel_file(file_path)
+        if df is None:
+            return FileJob(file_path, file_name, None, [], error="读取失败")
+        
+        scripts = self.prepare_scripts_data(df, file_name)
+        if not scripts:
+            return FileJob(file_path, file_name, None, [], error="没有可用的脚本数据")
+        return FileJob(file_path, file_name, os.path.splitext(file_name)[0], scripts)
+    
+    def on_pipeline_file_done(self, job):
+        """流水线中某个文件结束（成功、失败或被放弃）时汇总"""
+        if job.error:
+            logger.error(f"❌ 文件处理失败: {job.file_name} - {job.error}")
+            self.failed_files.append(job.file_name)
+            return
+        
+        # 被放弃的文件剩余脚本计为失败
+        failed = job.failed + (job.remaining if job.abandoned else 0)
+        self.total_audios_generated += job.successful
+        self.total_audios_failed += failed
+        
+        logger.info(f"✅ 文件处理完成: {job.file_name}")
+        logger.info(f"  - 成功生成: {job.successful} 个音频文件")
+        logger.info(f"  - 生成失败: {failed} 个")
+        logger.info(f"  - 耗时: {job.duration/60:.1f} 分钟")
+        
+        if job.abandoned:
+            self.failed_files.append(job.file_name)
+        self.processed_files.append({
+            "file": job.file_name,
+            "successful": job.successful,
+            "failed": failed,
+            "duration": job.duration,
+            "pacing": job.pacer.summary(),
+            "voice": job.scripts[0]["voice"] if job.scripts else "unknown"
+        })
+    
+    def process_all_files_pipelined(self, max_inflight=DEFAULT_MAX_INFLIGHT, prefetch=DEFAULT_PREFETCH):
+        """流水线模式：后台预取解析，多个文件的批次在全局并发预算内同时提交"""
+        logger.info("🎵 开始流水线处理inputs文件夹中的xlsx文件")
+        logger.info("=" * 80)
+        
+        if not self.check_tts_service():
+            logger.error("❌ TTS服务不可用，无法继续处理")
+            return False
+        
+        xlsx_files = self.scan_input_files()
+        if not xlsx_files:
+            logger.info("📁 inputs文件夹中没有xlsx文件")
+            return False
+        
+        self.start_time = time.time()
+        pipeline = FilePipeline(
+            load_file=self.load_file_job,
+            submit_batch=lambda job, batch_num, scripts: self.send_batch(scripts, job.product_name, batch_num),
+            create_pacer=lambda job: self.create_pacer(f"full_queue:{job.product_name}"),
+            on_file_done=self.on_pipeline_file_done,
+            max_inflight=max_inflight,
+            prefetch=prefetch,
+            schedule=PRODUCT_SCHEDULE,
+            spool_path=QUEUE_SPOOL,
+            status_path=QUEUE_STATUS
+        )
+        pipeline.run(xlsx_files)
+        self.queue_status = pipeline.status()
+        
+        total_duration = time.time() - self.start_time
+        success_count = len(xlsx_files) - len(self.failed_files)
+        self.generate_final_report(total_duration, success_count, len(xlsx_files))
+        
+        return success_count == len(xlsx_files)
+    
     def generate_final_report(self, total_duration, success_count, total_files):
         """生成最终处理报告"""
         logger.info("=" * 80)
@@ -347,7 +468,9 @@ class FullQueueProcessor:
             "failed_files": self.failed_files,
             "total_audios_generated": self.total_audios_generated,
             "total_audios_failed": self.total_audios_failed,
-            "voice_mapping": FILE_VOICE_MAPPING
+            "voice_mapping": FILE_VOICE_MAPPING,
+            "pacing": self.pacer.summary(),
+            "queue_status": self.queue_status
         }
         
         report_file = f"logs/full_queue_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
@@ -366,8 +489,28 @@ class FullQueueProcessor:
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="TT-Live-AI 完整队列处理器")
+    parser.add_argument("--pipeline", action="store_true", help="流水线模式：预取解析并跨文件并发提交批次")
+    parser.add_argument("--max-inflight", type=int, default=DEFAULT_MAX_INFLIGHT, help="流水线模式下全局同时在途的批次数")
+    parser.add_argument("--prefetch", type=int, default=DEFAULT_PREFETCH, help="流水线模式下提前解析的文件数")
+    parser.add_argument("--work-list", help="只处理规划器生成的工作清单中的脚本")
+    parser.add_argument("--enqueue", metavar="XLSX", help="向正在运行的流水线追加一个产品后退出")
+    parser.add_argument("--priority", choices=list(PRIORITY_NAMES), default="urgent", help="--enqueue 的优先级")
+    parser.add_argument("--weight", type=float, help="--enqueue 的调度权重")
+    args = parser.parse_args()
+    
+    if args.enqueue:
+        request = EnqueueSpool(QUEUE_SPOOL).append(args.enqueue, args.priority, args.weight)
+        logger.info(f"📨 已提交入队请求: {request['file']} (优先级 {args.priority})，将在下一个批次边界生效")
+        return
+    
     processor = FullQueueProcessor()
-    success = processor.process_all_files()
+    if args.work_list:
+        processor.use_work_list(args.work_list)
+    if args.pipeline:
+        success = processor.process_all_files_pipelined(args.max_inflight, args.prefetch)
+    else:
+        success = processor.process_all_files()
     
     if success:
         logger.info("✅ 所有文件处理成功！")
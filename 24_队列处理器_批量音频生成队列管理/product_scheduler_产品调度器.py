@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+TT-Live-AI 产品调度器
+在批次粒度上按产品做加权公平排队（WFQ）+ 严格优先级：
+- 每个产品（工作簿）有权重和优先级；高优先级产品有批次可发时总是先发
+- 同一优先级内按虚拟时间排序：每发出 n 条脚本，该产品虚拟时间增加 n / 权重
+- 新加入的产品从当前系统虚拟时间起步，不会因为来得晚而"补课"霸占队列
+- 紧急产品在下一个批次边界即被选中（已在途的批次不受影响）
+同时按当前吞吐量估算每个产品的剩余队列深度和预计完成时间。
+"""
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+# 优先级：数值越小越先调度
+PRIORITY_URGENT = 0
+PRIORITY_HIGH = 1
+PRIORITY_NORMAL = 2
+PRIORITY_LOW = 3
+
+PRIORITY_NAMES = {
+    "urgent": PRIORITY_URGENT,
+    "high": PRIORITY_HIGH,
+    "normal": PRIORITY_NORMAL,
+    "low": PRIORITY_LOW
+}
+
+DEFAULT_WEIGHT = 1.0
+
+
+def parse_priority(value):
+    """接受 'urgent' / 'high' / 'normal' / 'low' 或整数"""
+    if value is None:
+        return PRIORITY_NORMAL
+    if isinstance(value, int):
+        return value
+    return PRIORITY_NAMES.get(str(value).lower(), PRIORITY_NORMAL)
+
+
+def priority_name(priority):
+    for name, value in PRIORITY_NAMES.items():
+        if value == priority:
+            return name
+    return str(priority)
+
+
+class ProductScheduler:
+    """加权公平 + 优先级的批次调度"""
+
+    def __init__(self):
+        self.entries = []
+        self.virtual_time = 0.0
+
+    def add(self, entry, weight=DEFAULT_WEIGHT, priority=PRIORITY_NORMAL):
+        """entry 需提供 queued（待发脚本数）/ inflight_scripts（在途脚本数）属性，如 FileJob"""
+        entry.weight = max(float(weight or DEFAULT_WEIGHT), 0.01)
+        entry.priority = parse_priority(priority)
+        entry.virtual_time = self.virtual_time
+        self.entries.append(entry)
+        logger.info(f"🗂️ 调度: 加入 {getattr(entry, 'product_name', entry)} "
+                    f"(权重 {entry.weight:g}, 优先级 {priority_name(entry.priority)})")
+
+    def pick(self, eligible):
+        """从满足 eligible(entry) 的产品中选出下一个要发批次的产品"""
+        candidates = [entry for entry in self.entries if entry.queued > 0 and eligible(entry)]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda entry: (entry.priority, entry.virtual_time))
+
+    def on_dispatch(self, entry, script_count):
+        entry.virtual_time += script_count / entry.weight
+        backlogged = [other.virtual_time for other in self.entries if other.queued > 0]
+        self.virtual_time = min(backlogged) if backlogged else entry.virtual_time
+
+    def estimate_completion(self, throughput):
+        """
+        按流体 GPS 模型估算每个产品的完成时间（秒）：
+        优先级之间严格先后，同一优先级内按权重分享吞吐量。
+        """
+        estimates = {}
+        if throughput <= 0:
+            return estimates
+
+        elapsed = 0.0
+        for priority in sorted({entry.priority for entry in self.entries}):
+            backlog = {}
+            for entry in self.entries:
+                if entry.priority != priority:
+                    continue
+                depth = entry.queued + entry.inflight_scripts
+                if depth > 0:
+                    backlog[id(entry)] = [entry, float(depth)]
+                else:
+                    estimates[id(entry)] = 0.0
+
+            while backlog:
+                total_weight = sum(entry.weight for entry, _ in backlog.values())
+                # 下一个排空的产品决定本阶段长度
+                step = min(depth / entry.weight for entry, depth in backlog.values())
+                elapsed += step * total_weight / throughput
+                for key in list(backlog):
+                    entry, depth = backlog[key]
+                    depth -= step * entry.weight
+                    if depth <= 1e-6:
+                        estimates[key] = elapsed
+                        del backlog[key]
+                    else:
+                        backlog[key][1] = depth
+        return estimates
+
+    def snapshot(self, throughput):
+        """各产品的队列深度与预计完成时间"""
+        now = datetime.now()
+        estimates = self.estimate_completion(throughput)
+        products = []
+        for entry in sorted(self.entries, key=lambda e: (e.priority, e.virtual_time)):
+            eta_seconds = estimates.get(id(entry))
+            products.append({
+                "product": getattr(entry, "product_name", None),
+                "priority": priority_name(entry.priority),
+                "weight": entry.weight,
+                "queued_scripts": entry.queued,
+                "inflight_scripts": entry.inflight_scripts,
+                "eta_seconds": round(eta_seconds, 1) if eta_seconds is not None else None,
+                "estimated_completion": (now + timedelta(seconds=eta_seconds)).isoformat(timespec="seconds")
+                if eta_seconds is not None else None
+            })
+        return {
+            "timestamp": now.isoformat(timespec="seconds"),
+            "throughput_scripts_per_second": round(throughput, 3),
+            "queue_depth": sum(p["queued_scripts"] + p["inflight_scripts"] for p in products),
+            "products": products
+        }
+
+
+class EnqueueSpool:
+    """
+    运行中追加产品的请求文件（JSON Lines）：
+        {"file": "...xlsx", "priority": "urgent", "weight": 2}
+    队列处理器运行时轮询新增行；另一个终端可用 --enqueue 写入。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        # 只处理本次运行开始之后的请求
+        self._offset = os.path.getsize(path) if os.path.exists(path) else 0
+
+    def append(self, file_path, priority="urgent", weight=None):
+        spool_dir = os.path.dirname(self.path)
+        if spool_dir:
+            os.makedirs(spool_dir, exist_ok=True)
+        request = {
+            "file": os.path.abspath(file_path),
+            "priority": priority,
+            "weight": weight,
+            "requested_at": datetime.now().isoformat()
+        }
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(request, ensure_ascii=False) + "\n")
+        return request
+
+    def poll(self):
+        """返回自上次轮询以来新增的请求"""
+        with self._lock:
+            if not os.path.exists(self.path):
+                return []
+            with open(self.path, "rb") as f:
+                f.seek(self._offset)
+                data = f.read()
+            # 只消费完整的行，半行留到下次
+            complete, newline, _ = data.rpartition(b"\n")
+            if not newline:
+                return []
+            self._offset += len(complete) + 1
+
+        requests = []
+        for line in complete.decode("utf-8").split("\n"):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                requests.append(json.loads(line))
+            except json.JSONDecodeError:
+                logger.warning(f"⚠️ 忽略无法解析的入队请求: {line[:100]}")
+        return requests
@@ -12,6 +12,8 @@ import logging
 from datetime import datetime
 import json
 
+from adaptive_pacer_自适应节奏控制器 import AdaptivePacer
+
 # 配置日志
 logging.basicConfig(
     level=logging.INFO,
@@ -27,8 +29,11 @@ logger = logging.getLogger(__name__)
 TTS_SERVICE_URL = "http://127.0.0.1:5001"
 INPUTS_DIR = "inputs"
 OUTPUTS_DIR = "outputs"
-BATCH_SIZE = 50  # 每批处理的脚本数量
-BATCH_DELAY = 3  # 批次间延迟（秒）
+BATCH_SIZE = 50  # 初始批次大小（运行中由自适应节奏控制器调整）
+MIN_BATCH_SIZE = 10
+MAX_BATCH_SIZE = 200
+REQUEST_TIMEOUT = 300  # 单批请求超时（秒）
+PACING_LOG = "logs/queue_pacing.jsonl"  # 节奏决策日志，用于调参
 
 class QueueProcessor:
     def __init__(self):
@@ -36,6 +41,14 @@ class QueueProcessor:
         self.failed_files = []
         self.total_audios_generated = 0
         self.total_audios_failed = 0
+        self.pacer = AdaptivePacer(
+            "queue",
+            initial_batch_size=BATCH_SIZE,
+            min_batch_size=MIN_BATCH_SIZE,
+            max_batch_size=MAX_BATCH_SIZE,
+            max_request_seconds=REQUEST_TIMEOUT * 0.6,
+            log_path=PACING_LOG
+        )
         
     def check_tts_service(self):
         """检查TTS服务状态"""
@@ -141,20 +154,23 @@ class QueueProcessor:
         logger.info(f"✅ 准备了 {len(scripts)} 条脚本数据")
         return scripts
     
-    def generate_audio_batch(self, scripts, product_name, batch_size=BATCH_SIZE):
-        """批量生成音频"""
+    def generate_audio_batch(self, scripts, product_name):
+        """批量生成音频（批次大小与批次间隔由自适应节奏控制器决定）"""
         total_scripts = len(scripts)
         successful = 0
         failed = 0
         
-        logger.info(f"🚀 开始生成 {total_scripts} 条音频，批量大小: {batch_size}")
+        logger.info(f"🚀 开始生成 {total_scripts} 条音频，初始批量大小: {self.pacer.batch_size}")
         
-        for i in range(0, total_scripts, batch_size):
-            batch_scripts = scripts[i:i+batch_size]
-            batch_num = i // batch_size + 1
-            total_batches = (total_scripts + batch_size - 1) // batch_size
+        i = 0
+        batch_num = 0
+        while i < total_scripts:
+            batch_scripts = scripts[i:i+self.pacer.batch_size]
+            batch_num += 1
+            batch_failed = len(batch_scripts)
+            batch_start_time = time.time()
             
-            logger.info(f"📦 处理第 {batch_num}/{total_batches} 批，包含 {len(batch_scripts)} 条脚本")
+            logger.info(f"📦 处理第 {batch_num} 批，包含 {len(batch_scripts)} 条脚本（剩余 {total_scripts - i} 条）")
             
             # 准备请求数据
             request_data = {
@@ -167,7 +183,7 @@ class QueueProcessor:
             try:
                 # 发送请求
                 logger.info(f"📡 发送第 {batch_num} 批请求到TTS服务...")
-                response = requests.post(f"{TTS_SERVICE_URL}/generate", json=request_data, timeout=300)
+                response = requests.post(f"{TTS_SERVICE_URL}/generate", json=request_data, timeout=REQUEST_TIMEOUT)
                 
                 if response.status_code == 200:
                     result = response.json()
@@ -193,10 +209,11 @@ class QueueProcessor:
                 logger.error(f"❌ 第 {batch_num} 批请求异常: {e}")
                 failed += len(batch_scripts)
             
-            # 批次间暂停，避免过载
-            if i + batch_size < total_scripts:
-                logger.info(f"⏳ 批次间暂停 {BATCH_DELAY} 秒...")
-                time.sleep(BATCH_DELAY)
+            # 根据本批耗时和失败数调整节奏，并按需暂停
+            self.pacer.record(len(batch_scripts), time.time() - batch_start_time, batch_failed)
+            i += len(batch_scripts)
+            if i < total_scripts:
+                self.pacer.wait()
         
         return successful, failed
     
@@ -266,10 +283,9 @@ class QueueProcessor:
         for file_path in xlsx_files:
             self.process_single_file(file_path)
             
-            # 文件间暂停
+            # 文件间沿用自适应节奏（服务健康时不额外等待）
             if file_path != xlsx_files[-1]:  # 不是最后一个文件
-                logger.info("⏳ 文件间暂停 5 秒...")
-                time.sleep(5)
+                self.pacer.wait()
         
         end_time = time.time()
         total_duration = end_time - start_time
@@ -305,7 +321,8 @@ class QueueProcessor:
             "processed_files": self.processed_files,
             "failed_files": self.failed_files,
             "total_audios_generated": self.total_audios_generated,
-            "total_audios_failed": self.total_audios_failed
+            "total_audios_failed": self.total_audios_failed,
+            "pacing": self.pacer.summary()
         }
         
         report_file = f"logs/queue_processing_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
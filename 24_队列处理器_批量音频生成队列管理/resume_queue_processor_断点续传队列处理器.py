@@ -2,16 +2,25 @@
 """
 TT-Live-AI 断点续传队列处理器
 支持断点续传，避免重复生成已有文件，从上次停止的地方继续
+进度按单条脚本记录在 SQLite 台账中（见 script_ledger_脚本级进度台账.py）
+--coordinated 协调模式：多台机器（或同一机器上的多个进程）共享一个台账，按批次领取租约分工
 """
 import os
 import glob
+import argparse
 import requests
 import pandas as pd
 import time
 import logging
 from datetime import datetime
 import json
-import pickle
+
+from adaptive_pacer_自适应节奏控制器 import AdaptivePacer
+from file_pipeline_多文件流水线 import FilePipeline, FileJob, DEFAULT_MAX_INFLIGHT, DEFAULT_PREFETCH
+from product_scheduler_产品调度器 import EnqueueSpool, PRIORITY_NAMES
+from script_source_脚本数据源 import FILE_VOICE_MAPPING, INPUTS_DIR, prepare_scripts_data
+from script_ledger_脚本级进度台账 import ScriptLedger, LeaseHeartbeat, default_worker_id
+from work_list_工作清单 import load_work_list
 
 # 配置日志
 logging.basicConfig(
@@ -26,74 +35,53 @@ logger = logging.getLogger(__name__)
 
 # 配置
 TTS_SERVICE_URL = "http://127.0.0.1:5001"
-INPUTS_DIR = "18_批量输入_批量文件输入目录"
 OUTPUTS_DIR = "outputs"
-BATCH_SIZE = 80  # 每批处理的脚本数量 (平衡性能和稳定性)
-BATCH_DELAY = 2  # 批次间延迟（秒）(给API恢复时间)
-FILE_DELAY = 5   # 文件间延迟（秒）(给系统缓冲时间)
-PROGRESS_FILE = "19_日志文件_系统运行日志和错误记录/processing_progress.pkl"  # 进度保存文件
+BATCH_SIZE = 80  # 初始批次大小（运行中由自适应节奏控制器调整）
+MIN_BATCH_SIZE = 10
+MAX_BATCH_SIZE = 200
+REQUEST_TIMEOUT = 300  # 单批请求超时（秒）
+PACING_LOG = "19_日志文件_系统运行日志和错误记录/resume_queue_pacing.jsonl"  # 节奏决策日志，用于调参
+LEDGER_FILE = "19_日志文件_系统运行日志和错误记录/script_ledger.db"  # 脚本级进度台账
+MAX_SCRIPT_ATTEMPTS = 5  # 单条脚本累计尝试上限，超过后不再自动重试
+QUEUE_SPOOL = "19_日志文件_系统运行日志和错误记录/resume_queue_enqueue.jsonl"  # 运行中追加产品的请求文件（--enqueue 写入）
+QUEUE_STATUS = "19_日志文件_系统运行日志和错误记录/resume_queue_status.json"  # 各产品队列深度与预计完成时间
+LEASE_SECONDS = REQUEST_TIMEOUT * 2  # 协调模式下批次租约时长，心跳每 1/3 时长续租一次
+LEASE_IDLE_POLL = 30  # 其他 worker 仍持有租约时，等待其完成或过期的轮询间隔（秒）
 
-# 为每个文件定义固定的voice
-FILE_VOICE_MAPPING = {
-    "全产品_合并版_3200_v9.xlsx": "en-US-JennyNeural",
-    "全产品_合并版_3200_v8.xlsx": "en-US-AriaNeural", 
-    "全产品_合并版_3200_v7.xlsx": "en-US-MichelleNeural",
-    "全产品_合并版_3200_v6.xlsx": "en-US-BrandonNeural",
-    "全产品_合并版_3200_v5.xlsx": "en-US-AvaNeural",
-    "全产品_合并版_3200_v4.xlsx": "en-US-NancyNeural",
-    "全产品_合并版_3200_v3.xlsx": "en-US-KaiNeural",
-    "全产品_合并版_3200_v2.xlsx": "en-US-SerenaNeural",
-    "全产品_合并版_3200.xlsx": "en-US-EmmaNeural"
-}
+# 流水线模式下各产品的调度权重与优先级（未列出的产品: 权重1, normal）
+# 例: "全产品_合并版_3200_v9.xlsx": {"weight": 2, "priority": "high"}
+PRODUCT_SCHEDULE = {}
 
 class ResumeQueueProcessor:
-    def __init__(self):
+    def __init__(self, ledger_path=LEDGER_FILE, coordinated=False):
         self.processed_files = []
         self.failed_files = []
         self.total_audios_generated = 0
         self.total_audios_failed = 0
         self.start_time = None
-        self.progress = self.load_progress()
-        
-    def load_progress(self):
-        """加载处理进度"""
-        if os.path.exists(PROGRESS_FILE):
-            try:
-                with open(PROGRESS_FILE, 'rb') as f:
-                    progress = pickle.load(f)
-                logger.info(f"📂 加载处理进度: {progress}")
-                return progress
-            except Exception as e:
-                logger.warning(f"⚠️ 加载进度失败: {e}")
-        
-        return {
-            "current_file_index": 0,
-            "current_batch_index": 0,
-            "completed_files": [],
-            "completed_batches": {},
-            "total_generated": 0,
-            "total_failed": 0
-        }
+        self.queue_status = None
+        self.work_indices = None  # 工作清单：{文件名: 需要（重新）生成的脚本序号}
+        self.work_files = None
+        self.worker_id = None  # 协调模式下的 worker 标识
+        # 协调模式的台账可能位于网络共享存储上，不使用 WAL
+        self.ledger = ScriptLedger(ledger_path, shared=coordinated)
+        self.pacer = self.create_pacer("resume_queue")
+        
+        # 协调模式下中断遗留的记录由租约过期回收，不在启动时一次性重置（会抢走其他 worker 的工作）
+        recovered = 0 if coordinated else self.ledger.recover_interrupted()
+        if recovered:
+            logger.info(f"🔄 恢复上次中断的 {recovered} 条脚本为待处理")
     
-    def save_progress(self):
-        """保存处理进度"""
-        try:
-            progress_data = {
-                "current_file_index": self.progress["current_file_index"],
-                "current_batch_index": self.progress["current_batch_index"],
-                "completed_files": self.progress["completed_files"],
-                "completed_batches": self.progress["completed_batches"],
-                "total_generated": self.total_audios_generated,
-                "total_failed": self.total_audios_failed,
-                "last_update": datetime.now().isoformat()
-            }
-            
-            with open(PROGRESS_FILE, 'wb') as f:
-                pickle.dump(progress_data, f)
-            
-            logger.info(f"💾 进度已保存: 文件 {self.progress['current_file_index']+1}, 批次 {self.progress['current_batch_index']+1}")
-        except Exception as e:
-            logger.error(f"❌ 保存进度失败: {e}")
+    def create_pacer(self, name):
+        """创建自适应节奏控制器（流水线模式下每个文件一个）"""
+        return AdaptivePacer(
+            name,
+            initial_batch_size=BATCH_SIZE,
+            min_batch_size=MIN_BATCH_SIZE,
+            max_batch_size=MAX_BATCH_SIZE,
+            max_request_seconds=REQUEST_TIMEOUT * 0.6,
+            log_path=PACING_LOG
+        )
     
     def check_tts_service(self):
         """检查TTS服务状态"""
@@ -109,14 +97,26 @@ class ResumeQueueProcessor:
             logger.error(f"❌ 无法连接到TTS服务: {e}")
             return False
     
+    def use_work_list(self, path):
+        """只处理工作清单（规划器输出）中列出的文件和脚本"""
+        self.work_indices, self.work_files = load_work_list(path)
+        total = sum(len(indices) for indices in self.work_indices.values())
+        logger.info(f"🗺️ 使用工作清单 {path}: {len(self.work_files)} 个文件, {total} 条脚本")
+    
     def scan_input_files(self):
         """扫描inputs文件夹中的xlsx文件"""
+        if self.work_files is not None:
+            return list(self.work_files)
         xlsx_files = glob.glob(os.path.join(INPUTS_DIR, "*.xlsx"))
         logger.info(f"📁 发现 {len(xlsx_files)} 个xlsx文件:")
         for i, file in enumerate(xlsx_files):
             file_name = os.path.basename(file)
             voice = FILE_VOICE_MAPPING.get(file_name, "en-US-JennyNeural")
-            status = "✅ 已完成" if file_name in self.progress["completed_files"] else "⏳ 待处理"
+            counts = self.ledger.file_summary(file_name).get(file_name)
+            if counts:
+                status = f"✅ 已完成 {counts.get('done', 0)}/{counts['total']}"
+            else:
+                status = "⏳ 待处理"
             logger.info(f"  {i+1}. {file_name} -> {voice} ({status})")
         return xlsx_files
     
@@ -130,90 +130,17 @@ class ResumeQueueProcessor:
             logger.error(f"❌ 读取失败: {os.path.basename(file_path)} - {e}")
             return None
     
-    def prepare_scripts_data(self, df, file_name):
-        """准备脚本数据"""
-        scripts = []
-        
-        # 检查必要的列 - 支持多种字段名
-        english_script_col = None
-        for col in ['英文', 'english_script', 'English', 'english']:
-            if col in df.columns:
-                english_script_col = col
-                break
-        
-        if not english_script_col:
-            logger.error(f"❌ 未找到英文脚本列，可用列: {list(df.columns)}")
-            return []
-        
-        logger.info(f"✅ 使用英文脚本列: {english_script_col}")
-        
-        # 获取文件固定的voice
-        fixed_voice = FILE_VOICE_MAPPING.get(file_name, "en-US-JennyNeural")
-        logger.info(f"🎤 文件 {file_name} 使用固定语音: {fixed_voice}")
-        
-        for index, row in df.iterrows():
-            # 获取英文脚本内容
-            english_script = str(row[english_script_col]).strip()
-            if not english_script or english_script.lower() in ['nan', 'none', '']:
-                continue  # 跳过空内容
-            
-            script = {
-                "english_script": english_script,
-                "emotion": "Friendly",  # 默认情绪
-                "voice": fixed_voice  # 使用文件固定的voice
-            }
-            
-            # 获取情绪参数
-            if "情绪类型" in df.columns and pd.notna(row["情绪类型"]):
-                emotion_map = {
-                    "紧迫型": "Urgent",
-                    "兴奋型": "Excited", 
-                    "友好型": "Friendly",
-                    "自信型": "Confident",
-                    "平静型": "Calm"
-                }
-                emotion_type = str(row["情绪类型"]).strip()
-                script["emotion"] = emotion_map.get(emotion_type, "Friendly")
-            
-            # 获取语音参数
-            if "rate" in df.columns and pd.notna(row["rate"]):
-                script["rate"] = float(row["rate"])
-            if "pitch" in df.columns and pd.notna(row["pitch"]):
-                script["pitch"] = float(row["pitch"])
-            if "volume" in df.columns and pd.notna(row["volume"]):
-                script["volume"] = float(row["volume"])
-            
-            # 获取产品信息
-            if "产品" in df.columns and pd.notna(row["产品"]):
-                script["product"] = str(row["产品"]).strip()
-            if "类目" in df.columns and pd.notna(row["类目"]):
-                script["category"] = str(row["类目"]).strip()
-            
-            # 获取中文翻译
-            if "中文" in df.columns and pd.notna(row["中文"]):
-                script["chinese_translation"] = str(row["中文"]).strip()
-            
-            # 获取CTA信息
-            if "CTA" in df.columns and pd.notna(row["CTA"]):
-                script["cta"] = str(row["CTA"]).strip()
-            
-            scripts.append(script)
-        
-        logger.info(f"✅ 准备了 {len(scripts)} 条脚本数据")
-        return scripts
-    
-    def check_batch_completion(self, product_name, batch_num):
-        """检查批次是否已完成"""
-        # 使用统一的文件夹名称（不包含Batch信息）
-        unified_dir = f"20_输出文件_处理完成的音频文件/{product_name}_{self.get_voice_name(product_name)}"
-        
-        if not os.path.exists(unified_dir):
-            return False
-        
-        # 检查是否有足够的音频文件（基于批次号计算）
-        mp3_files = glob.glob(os.path.join(unified_dir, "*.mp3"))
-        expected_files = batch_num * BATCH_SIZE
-        return len(mp3_files) >= expected_files
+    def select_pending_scripts(self, file_name, product_name, scripts):
+        """登记脚本并返回待处理脚本；使用工作清单时先把清单中的脚本重新置为待处理"""
+        self.ledger.register_scripts(file_name, product_name, scripts[0]["voice"], scripts)
+        work_indices = self.work_indices.get(file_name, set()) if self.work_indices is not None else None
+        if work_indices:
+            self.ledger.requeue(file_name, work_indices)
+        
+        pending = set(self.ledger.pending_indices(file_name, max_attempts=MAX_SCRIPT_ATTEMPTS))
+        if work_indices is not None:
+            pending &= work_indices
+        return [script for script in scripts if script["script_index"] in pending]
     
     def get_voice_name(self, product_name):
         """获取语音名称"""
@@ -221,18 +148,16 @@ class ResumeQueueProcessor:
         voice = FILE_VOICE_MAPPING.get(file_name, "en-US-JennyNeural")
         return voice.replace("en-US-", "").replace("Neural", "")
     
-    def generate_audio_batch(self, scripts, product_name, batch_num, batch_size=BATCH_SIZE):
-        """批量生成音频"""
-        total_scripts = len(scripts)
-        successful = 0
-        failed = 0
-        
-        # 检查批次是否已完成
-        if self.check_batch_completion(product_name, batch_num):
-            logger.info(f"⏭️ 批次 {batch_num} 已完成，跳过")
-            return BATCH_SIZE, 0
+    def generate_audio_batch(self, scripts, file_name, product_name, batch_num, total_pending, leased=False):
+        """
+        批量生成音频，并将每条脚本的结果写入台账（total_pending 为本批之后仍待处理的脚本数）。
+        leased=True 表示脚本已通过租约置为 in_progress（协调模式）。
+        """
+        script_indices = [script["script_index"] for script in scripts]
+        if not leased:
+            self.ledger.mark_in_progress(file_name, script_indices)
         
-        logger.info(f"🚀 开始生成批次 {batch_num}，包含 {batch_size} 条脚本")
+        logger.info(f"🚀 开始生成批次 {batch_num}，包含 {len(scripts)} 条脚本")
         
         # 准备请求数据
         request_data = {
@@ -247,52 +172,57 @@ class ResumeQueueProcessor:
             logger.info(f"📡 发送批次 {batch_num} 请求到TTS服务...")
             logger.info(f"🎤 使用语音: {request_data['voice']}")
             
-            response = requests.post(f"{TTS_SERVICE_URL}/generate", json=request_data, timeout=300)
+            response = requests.post(f"{TTS_SERVICE_URL}/generate", json=request_data, timeout=REQUEST_TIMEOUT)
             
-            if response.status_code == 200:
-                result = response.json()
-                batch_successful = result["summary"]["successful"]
-                batch_failed = result["summary"]["failed"]
-                
-                successful += batch_successful
-                failed += batch_failed
-                
-                logger.info(f"✅ 批次 {batch_num} 完成: 成功 {batch_successful}, 失败 {batch_failed}")
-                logger.info(f"📁 音频目录: {result['audio_directory']}")
-                
-                # 显示进度
-                progress = ((batch_num - 1) * batch_size + batch_successful) / total_scripts * 100
-                logger.info(f"📊 文件进度: {progress:.1f}% ({batch_successful}/{total_scripts})")
-                
-                # 显示预计剩余时间
-                if self.start_time:
-                    elapsed_time = time.time() - self.start_time
-                    if self.total_audios_generated + batch_successful > 0:
-                        avg_time_per_audio = elapsed_time / (self.total_audios_generated + batch_successful)
-                        remaining_audios = total_scripts - (batch_num * batch_size)
-                        estimated_remaining = remaining_audios * avg_time_per_audio
-                        logger.info(f"⏱️ 预计剩余时间: {estimated_remaining/60:.1f} 分钟")
-                
-            else:
+            if response.status_code != 200:
                 logger.error(f"❌ 批次 {batch_num} 请求失败: {response.status_code}")
                 logger.error(f"响应内容: {response.text}")
-                failed += batch_size
-                
+                self.ledger.mark_failed(file_name, script_indices, f"HTTP {response.status_code}")
+                return 0, len(scripts)
+            
+            result = response.json()
         except requests.exceptions.RequestException as e:
             logger.error(f"❌ 批次 {batch_num} 请求异常: {e}")
-            failed += batch_size
+            self.ledger.mark_failed(file_name, script_indices, e)
+            return 0, len(scripts)
+        
+        successful, failed = self.record_batch_results(file_name, script_indices, result)
+        
+        logger.info(f"✅ 批次 {batch_num} 完成: 成功 {successful}, 失败 {failed}")
+        logger.info(f"📁 音频目录: {result['audio_directory']}")
+        
+        # 显示预计剩余时间
+        if self.start_time and self.total_audios_generated + successful > 0:
+            elapsed_time = time.time() - self.start_time
+            avg_time_per_audio = elapsed_time / (self.total_audios_generated + successful)
+            remaining_audios = max(total_pending, 0)
+            estimated_remaining = remaining_audios * avg_time_per_audio
+            logger.info(f"⏱️ 本文件预计剩余时间: {estimated_remaining/60:.1f} 分钟")
+        
+        return successful, failed
+    
+    def record_batch_results(self, file_name, script_indices, result):
+        """按服务返回的逐条结果更新台账"""
+        successful = 0
+        failed = 0
+        per_script = {item.get("script_index"): item for item in result.get("results", [])}
+        
+        for script_index in script_indices:
+            item = per_script.get(script_index)
+            if item and item.get("success") and item.get("file_size"):
+                self.ledger.mark_done(file_name, script_index, item.get("file_path"), item.get("file_size"))
+                successful += 1
+            else:
+                error = item.get("error") if item else "服务未返回该脚本的结果"
+                self.ledger.mark_failed(file_name, [script_index], error or "0字节或未知错误")
+                failed += 1
         
         return successful, failed
     
     def process_single_file(self, file_path, file_index):
-        """处理单个xlsx文件"""
+        """处理单个xlsx文件，只提交台账中尚未完成的脚本"""
         file_name = os.path.basename(file_path)
-        logger.info(f"🔄 开始处理文件 {file_index+1}/9: {file_name}")
-        
-        # 检查文件是否已完成
-        if file_name in self.progress["completed_files"]:
-            logger.info(f"⏭️ 文件 {file_name} 已完成，跳过")
-            return True
+        logger.info(f"🔄 开始处理文件 {file_index+1}: {file_name}")
         
         # 读取Excel文件
         df = self.read_excel_file(file_path)
@@ -301,7 +231,7 @@ class ResumeQueueProcessor:
             return False
         
         # 准备脚本数据
-        scripts = self.prepare_scripts_data(df, file_name)
+        scripts = prepare_scripts_data(df, file_name)
         if not scripts:
             logger.error(f"❌ 没有可用的脚本数据: {file_name}")
             self.failed_files.append(file_name)
@@ -310,67 +240,52 @@ class ResumeQueueProcessor:
         # 生成产品名称（去掉扩展名）
         product_name = os.path.splitext(file_name)[0]
         
-        # 计算总批次数
-        total_batches = (len(scripts) + BATCH_SIZE - 1) // BATCH_SIZE
+        # 登记脚本并查询剩余工作
+        pending_scripts = self.select_pending_scripts(file_name, product_name, scripts)
         
-        # 从上次停止的批次开始
-        start_batch = self.progress["current_batch_index"] if file_index == self.progress["current_file_index"] else 0
+        if not pending_scripts:
+            logger.info(f"⏭️ 文件 {file_name} 已全部完成，跳过")
+            return True
         
-        logger.info(f"📊 文件 {file_name}: {len(scripts)} 条脚本，{total_batches} 个批次")
-        logger.info(f"🔄 从批次 {start_batch + 1} 开始处理")
+        logger.info(f"📊 文件 {file_name}: 共 {len(scripts)} 条脚本，剩余 {len(pending_scripts)} 条")
         
         # 开始生成音频
         file_start_time = time.time()
         file_successful = 0
         file_failed = 0
         
-        for batch_num in range(start_batch + 1, total_batches + 1):
-            batch_start = (batch_num - 1) * BATCH_SIZE
-            batch_end = min(batch_start + BATCH_SIZE, len(scripts))
-            batch_scripts = scripts[batch_start:batch_end]
+        batch_start = 0
+        batch_num = 0
+        while batch_start < len(pending_scripts):
+            batch_scripts = pending_scripts[batch_start:batch_start + self.pacer.batch_size]
+            batch_start += len(batch_scripts)
+            batch_num += 1
             
-            logger.info(f"📦 处理批次 {batch_num}/{total_batches}，脚本 {batch_start+1}-{batch_end}")
+            logger.info(f"📦 处理批次 {batch_num}（{len(batch_scripts)} 条），脚本序号 {batch_scripts[0]['script_index']}-{batch_scripts[-1]['script_index']}")
             
-            successful, failed = self.generate_audio_batch(batch_scripts, product_name, batch_num)
+            batch_start_time = time.time()
+            successful, failed = self.generate_audio_batch(
+                batch_scripts, file_name, product_name, batch_num, len(pending_scripts) - batch_start
+            )
+            self.pacer.record(len(batch_scripts), time.time() - batch_start_time, failed)
             
             file_successful += successful
             file_failed += failed
             self.total_audios_generated += successful
             self.total_audios_failed += failed
             
-            # 更新进度
-            self.progress["current_file_index"] = file_index
-            self.progress["current_batch_index"] = batch_num - 1
-            
-            # 标记批次完成
-            if successful > 0:
-                batch_key = f"{file_name}_batch_{batch_num}"
-                self.progress["completed_batches"][batch_key] = {
-                    "successful": successful,
-                    "failed": failed,
-                    "timestamp": datetime.now().isoformat()
-                }
-            
-            # 保存进度
-            self.save_progress()
-            
-            # 批次间暂停
-            if batch_num < total_batches:
-                logger.info(f"⏳ 批次间暂停 {BATCH_DELAY} 秒...")
-                time.sleep(BATCH_DELAY)
+            # 批次间按自适应节奏暂停
+            if batch_start < len(pending_scripts):
+                self.pacer.wait()
         
         file_end_time = time.time()
         file_duration = file_end_time - file_start_time
         
-        # 标记文件完成
-        if file_successful > 0:
-            self.progress["completed_files"].append(file_name)
-            self.progress["current_file_index"] = file_index + 1
-            self.progress["current_batch_index"] = 0
-        
+        counts = self.ledger.file_summary(file_name).get(file_name, {})
         logger.info(f"✅ 文件处理完成: {file_name}")
         logger.info(f"  - 成功生成: {file_successful} 个音频文件")
         logger.info(f"  - 生成失败: {file_failed} 个")
+        logger.info(f"  - 台账进度: {counts.get('done', 0)}/{counts.get('total', 0)}")
         logger.info(f"  - 耗时: {file_duration/60:.1f} 分钟")
         
         self.processed_files.append({
@@ -402,27 +317,18 @@ class ResumeQueueProcessor:
         # 记录开始时间
         self.start_time = time.time()
         
-        # 从上次停止的文件开始处理
-        start_file_index = self.progress["current_file_index"]
-        logger.info(f"🔄 从文件 {start_file_index + 1} 开始处理")
-        
-        # 处理每个文件
+        # 处理每个文件（已完成的脚本由台账跳过）
         success_count = 0
         for i, file_path in enumerate(xlsx_files):
-            if i < start_file_index:
-                logger.info(f"⏭️ 跳过已完成文件 {i+1}: {os.path.basename(file_path)}")
-                continue
-            
             file_name = os.path.basename(file_path)
             logger.info(f"📁 处理文件 {i+1}/{len(xlsx_files)}: {file_name}")
             
             if self.process_single_file(file_path, i):
                 success_count += 1
             
-            # 文件间暂停
+            # 文件间沿用自适应节奏（服务健康时不额外等待）
             if i < len(xlsx_files) - 1:  # 不是最后一个文件
-                logger.info(f"⏳ 文件间暂停 {FILE_DELAY} 秒...")
-                time.sleep(FILE_DELAY)
+                self.pacer.wait()
         
         end_time = time.time()
         total_duration = end_time - self.start_time
@@ -432,6 +338,187 @@ class ResumeQueueProcessor:
         
         return success_count == len(xlsx_files)
     
+    def load_file_job(self, file_path):
+        """流水线预取：解析文件、登记台账并取出待处理脚本（在后台线程执行）"""
+        file_name = os.path.basename(file_path)
+        df = self.read_excel_file(file_path)
+        if df is None:
+            return FileJob(file_path, file_name, None, [], error="读取失败")
+        
+        scripts = prepare_scripts_data(df, file_name)
+        if not scripts:
+            return FileJob(file_path, file_name, None, [], error="没有可用的脚本数据")
+        
+        product_name = os.path.splitext(file_name)[0]
+        pending_scripts = self.select_pending_scripts(file_name, product_name, scripts)
+        logger.info(f"📊 文件 {file_name}: 共 {len(scripts)} 条脚本，剩余 {len(pending_scripts)} 条")
+        return FileJob(file_path, file_name, product_name, pending_scripts, total_scripts=len(scripts))
+    
+    def on_pipeline_file_done(self, job):
+        """流水线中某个文件结束（完成、失败或被放弃）时汇总"""
+        if job.error:
+            logger.error(f"❌ 文件处理失败: {job.file_name} - {job.error}")
+            self.failed_files.append(job.file_name)
+            return
+        if not job.scripts:
+            logger.info(f"⏭️ 文件 {job.file_name} 已全部完成，跳过")
+            return
+        
+        self.total_audios_generated += job.successful
+        self.total_audios_failed += job.failed
+        
+        counts = self.ledger.file_summary(job.file_name).get(job.file_name, {})
+        logger.info(f"✅ 文件处理完成: {job.file_name}")
+        logger.info(f"  - 成功生成: {job.successful} 个音频文件")
+        logger.info(f"  - 生成失败: {job.failed} 个")
+        if job.abandoned:
+            logger.info(f"  - 未提交: {job.remaining} 个（已留在台账中，下次运行继续）")
+            self.failed_files.append(job.file_name)
+        logger.info(f"  - 台账进度: {counts.get('done', 0)}/{counts.get('total', 0)}")
+        logger.info(f"  - 耗时: {job.duration/60:.1f} 分钟")
+        
+        self.processed_files.append({
+            "file": job.file_name,
+            "successful": job.successful,
+            "failed": job.failed,
+            "duration": job.duration,
+            "pacing": job.pacer.summary(),
+            "voice": job.scripts[0]["voice"]
+        })
+    
+    def process_all_files_pipelined(self, max_inflight=DEFAULT_MAX_INFLIGHT, prefetch=DEFAULT_PREFETCH):
+        """流水线模式：后台预取解析，多个文件的待处理批次在全局并发预算内同时提交"""
+        logger.info("🎵 开始断点续传流水线处理inputs文件夹中的xlsx文件")
+        logger.info("=" * 80)
+        
+        if not self.check_tts_service():
+            logger.error("❌ TTS服务不可用，无法继续处理")
+            return False
+        
+        xlsx_files = self.scan_input_files()
+        if not xlsx_files:
+            logger.info("📁 inputs文件夹中没有xlsx文件")
+            return False
+        
+        self.start_time = time.time()
+        pipeline = FilePipeline(
+            load_file=self.load_file_job,
+            submit_batch=lambda job, batch_num, scripts: self.generate_audio_batch(
+                scripts, job.file_name, job.product_name, batch_num, job.remaining
+            ),
+            create_pacer=lambda job: self.create_pacer(f"resume_queue:{job.product_name}"),
+            on_file_done=self.on_pipeline_file_done,
+            max_inflight=max_inflight,
+            prefetch=prefetch,
+            schedule=PRODUCT_SCHEDULE,
+            spool_path=QUEUE_SPOOL,
+            status_path=QUEUE_STATUS
+        )
+        pipeline.run(xlsx_files)
+        self.queue_status = pipeline.status()
+        
+        total_duration = time.time() - self.start_time
+        success_count = len(xlsx_files) - len(self.failed_files)
+        self.generate_final_report(total_duration, success_count, len(xlsx_files))
+        
+        return success_count == len(xlsx_files)
+    
+    def process_all_files_coordinated(self, worker_id=None, lease_seconds=LEASE_SECONDS):
+        """
+        协调模式：所有 worker 读取同一批输入文件并登记到共享台账，
+        然后循环领取批次租约 → 调用本机TTS服务 → 写回结果（完成或失败即释放租约）。
+        心跳线程在请求期间续租；worker 崩溃后其租约过期，由其他 worker 回收重做。
+        """
+        self.worker_id = worker_id or default_worker_id()
+        logger.info(f"🤝 协调模式启动: worker {self.worker_id}，台账 {self.ledger.db_path}，租约 {lease_seconds} 秒")
+        logger.info("=" * 80)
+        
+        if not self.check_tts_service():
+            logger.error("❌ TTS服务不可用，无法继续处理")
+            return False
+        
+        xlsx_files = self.scan_input_files()
+        if not xlsx_files:
+            logger.info("📁 inputs文件夹中没有xlsx文件")
+            return False
+        
+        # 解析并登记所有文件（登记是幂等的，多个 worker 同时登记不会重置已完成的脚本）
+        scripts_by_file = {}
+        for file_path in xlsx_files:
+            file_name = os.path.basename(file_path)
+            df = self.read_excel_file(file_path)
+            scripts = prepare_scripts_data(df, file_name) if df is not None else []
+            if not scripts:
+                logger.error(f"❌ 没有可用的脚本数据: {file_name}")
+                self.failed_files.append(file_name)
+                continue
+            product_name = os.path.splitext(file_name)[0]
+            self.ledger.register_scripts(file_name, product_name, scripts[0]["voice"], scripts)
+            scripts_by_file[file_name] = {script["script_index"]: script for script in scripts}
+        file_names = list(scripts_by_file)
+        
+        self.start_time = time.time()
+        stats = {}
+        batch_num = 0
+        heartbeat = LeaseHeartbeat(self.ledger, self.worker_id, lease_seconds).start()
+        try:
+            while True:
+                lease = self.ledger.lease_batch(
+                    self.worker_id, self.pacer.batch_size, lease_seconds, MAX_SCRIPT_ATTEMPTS, file_names
+                )
+                if lease is None:
+                    active = self.ledger.active_leases(file_names)
+                    if active == 0:
+                        break
+                    # 剩余工作都在其他 worker 手里：等它们完成，或租约过期后回收
+                    logger.info(f"⏳ 暂无可领取的脚本，其他 worker 仍持有 {active} 条租约，{LEASE_IDLE_POLL} 秒后重试")
+                    time.sleep(LEASE_IDLE_POLL)
+                    continue
+                
+                if lease["reclaimed"]:
+                    logger.warning(f"♻️ 回收了 {lease['reclaimed']} 条过期租约")
+                file_name = lease["file_name"]
+                scripts = [scripts_by_file[file_name][index] for index in lease["script_indices"]]
+                batch_num += 1
+                logger.info(f"📦 领取批次 {batch_num}: {file_name} 序号 {scripts[0]['script_index']}-{scripts[-1]['script_index']}"
+                            f"（{len(scripts)} 条）")
+                
+                batch_start_time = time.time()
+                successful, failed = self.generate_audio_batch(
+                    scripts, file_name, os.path.splitext(file_name)[0], batch_num,
+                    len(self.ledger.pending_indices(file_name, max_attempts=MAX_SCRIPT_ATTEMPTS)), leased=True
+                )
+                self.pacer.record(len(scripts), time.time() - batch_start_time, failed)
+                
+                file_stats = stats.setdefault(file_name, {"successful": 0, "failed": 0, "started": batch_start_time})
+                file_stats["successful"] += successful
+                file_stats["failed"] += failed
+                self.total_audios_generated += successful
+                self.total_audios_failed += failed
+                
+                self.pacer.wait()
+        finally:
+            heartbeat.stop()
+            released = self.ledger.release_leases(self.worker_id)
+            if released:
+                logger.info(f"↩️ 归还未完成的租约 {released} 条")
+        
+        for file_name, file_stats in stats.items():
+            voice = next(iter(scripts_by_file[file_name].values()))["voice"]
+            self.processed_files.append({
+                "file": file_name,
+                "successful": file_stats["successful"],
+                "failed": file_stats["failed"],
+                "duration": time.time() - file_stats["started"],
+                "voice": voice
+            })
+        
+        total_duration = time.time() - self.start_time
+        success_count = len(xlsx_files) - len(self.failed_files)
+        self.generate_final_report(total_duration, success_count, len(xlsx_files))
+        
+        return success_count == len(xlsx_files)
+    
     def generate_final_report(self, total_duration, success_count, total_files):
         """生成最终处理报告"""
         logger.info("=" * 80)
@@ -442,6 +529,7 @@ class ResumeQueueProcessor:
         logger.info(f"  - 失败文件数: {total_files - success_count}")
         logger.info(f"  - 总音频生成: {self.total_audios_generated}")
         logger.info(f"  - 总音频失败: {self.total_audios_failed}")
+        logger.info(f"  - 台账剩余脚本: {self.ledger.remaining_count()}")
         logger.info(f"  - 总耗时: {total_duration/3600:.1f} 小时")
         
         if self.processed_files:
@@ -465,10 +553,17 @@ class ResumeQueueProcessor:
             "total_audios_generated": self.total_audios_generated,
             "total_audios_failed": self.total_audios_failed,
             "voice_mapping": FILE_VOICE_MAPPING,
-            "progress": self.progress
+            "ledger_summary": self.ledger.file_summary(),
+            "remaining_scripts": self.ledger.remaining_count(),
+            "pacing": self.pacer.summary(),
+            "queue_status": self.queue_status,
+            "worker_id": self.worker_id,
+            "workers": self.ledger.worker_summary() if self.worker_id else None
         }
         
-        report_file = f"19_日志文件_系统运行日志和错误记录/resume_queue_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        # 协调模式下多个 worker 可能同时写报告，文件名带上 worker 标识
+        worker_suffix = f"_{self.worker_id.replace(':', '_')}" if self.worker_id else ""
+        report_file = f"19_日志文件_系统运行日志和错误记录/resume_queue_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}{worker_suffix}.json"
         with open(report_file, 'w', encoding='utf-8') as f:
             json.dump(report_data, f, ensure_ascii=False, indent=2)
         
@@ -484,8 +579,37 @@ class ResumeQueueProcessor:
 
 def main():
     """主函数"""
-    processor = ResumeQueueProcessor()
-    success = processor.process_all_files()
+    parser = argparse.ArgumentParser(description="TT-Live-AI 断点续传队列处理器")
+    parser.add_argument("--pipeline", action="store_true", help="流水线模式：预取解析并跨文件并发提交批次")
+    parser.add_argument("--max-inflight", type=int, default=DEFAULT_MAX_INFLIGHT, help="流水线模式下全局同时在途的批次数")
+    parser.add_argument("--prefetch", type=int, default=DEFAULT_PREFETCH, help="流水线模式下提前解析的文件数")
+    parser.add_argument("--work-list", help="只处理规划器生成的工作清单中的脚本")
+    parser.add_argument("--enqueue", metavar="XLSX", help="向正在运行的流水线追加一个产品后退出")
+    parser.add_argument("--priority", choices=list(PRIORITY_NAMES), default="urgent", help="--enqueue 的优先级")
+    parser.add_argument("--weight", type=float, help="--enqueue 的调度权重")
+    parser.add_argument("--coordinated", action="store_true", help="协调模式：多个 worker 共享台账，按批次领取租约")
+    parser.add_argument("--ledger", default=LEDGER_FILE, help="台账路径（协调模式下指向所有机器都能访问的共享位置）")
+    parser.add_argument("--worker-id", help="协调模式下的 worker 标识（默认 主机名:进程号）")
+    parser.add_argument("--lease-seconds", type=float, default=LEASE_SECONDS, help="协调模式下的批次租约时长")
+    args = parser.parse_args()
+    
+    if args.coordinated and (args.pipeline or args.work_list):
+        parser.error("--coordinated 不能与 --pipeline / --work-list 同时使用（工作清单请先在单机模式下运行）")
+    
+    if args.enqueue:
+        request = EnqueueSpool(QUEUE_SPOOL).append(args.enqueue, args.priority, args.weight)
+        logger.info(f"📨 已提交入队请求: {request['file']} (优先级 {args.priority})，将在下一个批次边界生效")
+        return
+    
+    processor = ResumeQueueProcessor(args.ledger, coordinated=args.coordinated)
+    if args.work_list:
+        processor.use_work_list(args.work_list)
+    if args.coordinated:
+        success = processor.process_all_files_coordinated(args.worker_id, args.lease_seconds)
+    elif args.pipeline:
+        success = processor.process_all_files_pipelined(args.max_inflight, args.prefetch)
+    else:
+        success = processor.process_all_files()
     
     if success:
         logger.info("✅ 所有文件处理成功！")
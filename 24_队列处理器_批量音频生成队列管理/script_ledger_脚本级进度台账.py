@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+TT-Live-AI 脚本级进度台账
+基于 SQLite (WAL) 记录每条脚本的生成状态，替代 processing_progress.pkl：
+- 每条脚本一行：状态、尝试次数、输出路径、文件大小、音频时长
+- 断点续传精确到单条脚本，"还剩多少"由一次索引查询得出，无需扫描输出目录
+- 输入脚本文本变化时自动重新排队
+- 协调模式：多台机器共享同一台账，按批次领取带过期时间的租约，心跳续租，过期租约自动回收
+"""
+import hashlib
+import os
+import socket
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+# 脚本状态
+STATUS_PENDING = "pending"
+STATUS_IN_PROGRESS = "in_progress"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+DEFAULT_LEDGER_PATH = "19_日志文件_系统运行日志和错误记录/script_ledger.db"
+EDGE_TTS_MP3_BITRATE = 48000  # EdgeTTS 默认输出 48kbps CBR MP3，用于由文件大小估算时长
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scripts (
+    file_name        TEXT    NOT NULL,
+    script_index     INTEGER NOT NULL,
+    product_name     TEXT    NOT NULL,
+    voice            TEXT,
+    text_hash        TEXT    NOT NULL,
+    chars            INTEGER NOT NULL DEFAULT 0,
+    status           TEXT    NOT NULL DEFAULT 'pending',
+    attempts         INTEGER NOT NULL DEFAULT 0,
+    output_path      TEXT,
+    file_size        INTEGER,
+    duration_seconds REAL,
+    last_error       TEXT,
+    updated_at       TEXT    NOT NULL,
+    PRIMARY KEY (file_name, script_index)
+);
+CREATE INDEX IF NOT EXISTS idx_scripts_file_status ON scripts (file_name, status, script_index);
+"""
+
+# 协调模式新增的列（旧台账打开时自动补齐）
+LEASE_COLUMNS = {
+    "worker_id": "TEXT",        # 最近领取该脚本的 worker
+    "lease_expires": "REAL"     # 租约到期时间（epoch 秒），完成或失败后清空
+}
+LEASE_INDEX = "CREATE INDEX IF NOT EXISTS idx_scripts_lease ON scripts (status, lease_expires)"
+
+
+def text_hash(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def default_worker_id():
+    """主机名:进程号，同一台机器上的多个 worker 也互不冲突"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def estimate_mp3_duration(file_size):
+    """按 EdgeTTS 的固定码率由文件大小估算时长（秒）"""
+    if not file_size:
+        return 0.0
+    return round(file_size * 8 / EDGE_TTS_MP3_BITRATE, 3)
+
+
+class ScriptLedger:
+    """脚本级进度台账（线程安全，多进程可共享同一数据库文件）"""
+
+    def __init__(self, db_path=DEFAULT_LEDGER_PATH, shared=False):
+        """
+        shared=True 用于多台机器通过网络文件系统共享台账：
+        WAL 依赖本机共享内存，跨机器不可用，改用回滚日志并完整同步
+        """
+        self.db_path = db_path
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=60 if shared else 30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        if shared:
+            self._conn.execute("PRAGMA journal_mode=DELETE")
+            self._conn.execute("PRAGMA synchronous=FULL")
+        else:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._ensure_lease_columns()
+        self._conn.commit()
+    
+    def _ensure_lease_columns(self):
+        existing = {row["name"] for row in self._conn.execute("PRAGMA table_info(scripts)")}
+        for column, column_type in LEASE_COLUMNS.items():
+            if column not in existing:
+                self._conn.execute(f"ALTER TABLE scripts ADD COLUMN {column} {column_type}")
+        self._conn.execute(LEASE_INDEX)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _now(self):
+        return datetime.now().isoformat()
+
+    def register_scripts(self, file_name, product_name, voice, scripts):
+        """登记一个文件的全部脚本；新脚本或文本已变化的脚本置为 pending"""
+        now = self._now()
+        rows = [
+            (file_name, script["script_index"], product_name, voice,
+             text_hash(script["english_script"]), len(script["english_script"]), now)
+            for script in scripts
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                """
+                INSERT INTO scripts (file_name, script_index, product_name, voice, text_hash, chars, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (file_name, script_index) DO UPDATE SET
+                    product_name = excluded.product_name,
+                    voice = excluded.voice,
+                    chars = excluded.chars,
+                    status = CASE WHEN scripts.text_hash != excluded.text_hash OR scripts.voice IS NOT excluded.voice
+                                  THEN 'pending' ELSE scripts.status END,
+                    attempts = CASE WHEN scripts.text_hash != excluded.text_hash OR scripts.voice IS NOT excluded.voice
+                                    THEN 0 ELSE scripts.attempts END,
+                    text_hash = excluded.text_hash,
+                    updated_at = CASE WHEN scripts.text_hash != excluded.text_hash OR scripts.voice IS NOT excluded.voice
+                                      THEN excluded.updated_at ELSE scripts.updated_at END
+                """,
+                rows
+            )
+
+    def recover_interrupted(self):
+        """上次运行中断时遗留的 in_progress 记录重新置为 pending（协调模式下仍在租约期内的不动）"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE scripts SET status = ?, updated_at = ? "
+                "WHERE status = ? AND (lease_expires IS NULL OR lease_expires < ?)",
+                (STATUS_PENDING, self._now(), STATUS_IN_PROGRESS, time.time())
+            )
+            return cursor.rowcount
+
+    def requeue(self, file_name, script_indices):
+        """把指定脚本重新置为待处理并清零尝试次数（如规划器发现输出缺失、0字节或过期）"""
+        now = self._now()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE scripts SET status = ?, attempts = 0, updated_at = ? "
+                "WHERE file_name = ? AND script_index = ?",
+                [(STATUS_PENDING, now, file_name, index) for index in script_indices]
+            )
+
+    def pending_indices(self, file_name, max_attempts=None):
+        """返回该文件尚未完成的脚本序号（一次索引查询）"""
+        sql = "SELECT script_index FROM scripts WHERE file_name = ? AND status IN (?, ?)"
+        params = [file_name, STATUS_PENDING, STATUS_FAILED]
+        if max_attempts:
+            sql += " AND attempts < ?"
+            params.append(max_attempts)
+        sql += " ORDER BY script_index"
+        with self._lock:
+            return [row[0] for row in self._conn.execute(sql, params)]
+
+    def mark_in_progress(self, file_name, script_indices):
+        now = self._now()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE scripts SET status = ?, attempts = attempts + 1, updated_at = ? "
+                "WHERE file_name = ? AND script_index = ?",
+                [(STATUS_IN_PROGRESS, now, file_name, index) for index in script_indices]
+            )
+
+    def mark_done(self, file_name, script_index, output_path, file_size, duration_seconds=None):
+        if duration_seconds is None:
+            duration_seconds = estimate_mp3_duration(file_size)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE scripts SET status = ?, output_path = ?, file_size = ?, duration_seconds = ?, "
+                "last_error = NULL, lease_expires = NULL, updated_at = ? WHERE file_name = ? AND script_index = ?",
+                (STATUS_DONE, output_path, file_size, duration_seconds, self._now(), file_name, script_index)
+            )
+
+    def mark_failed(self, file_name, script_indices, error):
+        """标记失败；已完成的脚本不受影响（租约过期后被回收的 worker 迟到的失败结果不会覆盖他人的完成记录）"""
+        now = self._now()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE scripts SET status = ?, last_error = ?, lease_expires = NULL, updated_at = ? "
+                "WHERE file_name = ? AND script_index = ? AND status != ?",
+                [(STATUS_FAILED, str(error)[:500], now, file_name, index, STATUS_DONE) for index in script_indices]
+            )
+    
+    def lease_batch(self, worker_id, batch_size, lease_seconds, max_attempts=None, file_names=None):
+        """
+        原子地领取一批待处理脚本（同一文件内按序号），返回
+        {"file_name", "script_indices", "expires_at", "reclaimed"}，没有可领取的脚本时返回 None。
+        领取前先回收已过期的租约：过期的 in_progress 记录置为 failed，按正常重试规则再次领取。
+        """
+        now = time.time()
+        eligible = "status IN (?, ?)"
+        params = [STATUS_PENDING, STATUS_FAILED]
+        if max_attempts:
+            eligible += " AND attempts < ?"
+            params.append(max_attempts)
+        if file_names is not None:
+            if not file_names:
+                return None
+            eligible += f" AND file_name IN ({', '.join('?' * len(file_names))})"
+            params.extend(file_names)
+        
+        with self._lock:
+            # BEGIN IMMEDIATE 先拿写锁，多个进程/机器同时领取时互斥
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                reclaimed = self._conn.execute(
+                    "UPDATE scripts SET status = ?, last_error = ?, lease_expires = NULL, updated_at = ? "
+                    "WHERE status = ? AND (lease_expires IS NULL OR lease_expires < ?)",
+                    (STATUS_FAILED, "租约过期，已回收", self._now(), STATUS_IN_PROGRESS, now)
+                ).rowcount
+                
+                row = self._conn.execute(
+                    f"SELECT file_name FROM scripts WHERE {eligible} ORDER BY file_name, script_index LIMIT 1",
+                    params
+                ).fetchone()
+                if row is None:
+                    self._conn.commit()
+                    return None
+                
+                file_name = row[0]
+                indices = [r[0] for r in self._conn.execute(
+                    f"SELECT script_index FROM scripts WHERE {eligible} AND file_name = ? "
+                    "ORDER BY script_index LIMIT ?",
+                    params + [file_name, batch_size]
+                )]
+                expires_at = now + lease_seconds
+                updated_at = self._now()
+                self._conn.executemany(
+                    "UPDATE scripts SET status = ?, attempts = attempts + 1, worker_id = ?, lease_expires = ?, "
+                    "updated_at = ? WHERE file_name = ? AND script_index = ?",
+                    [(STATUS_IN_PROGRESS, worker_id, expires_at, updated_at, file_name, index) for index in indices]
+                )
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+        
+        return {"file_name": file_name, "script_indices": indices, "expires_at": expires_at, "reclaimed": reclaimed}
+    
+    def renew_leases(self, worker_id, lease_seconds):
+        """心跳：延长该 worker 仍持有的所有租约，返回续租的脚本数"""
+        with self._lock, self._conn:
+            return self._conn.execute(
+                "UPDATE scripts SET lease_expires = ? WHERE worker_id = ? AND status = ? AND lease_expires IS NOT NULL",
+                (time.time() + lease_seconds, worker_id, STATUS_IN_PROGRESS)
+            ).rowcount
+    
+    def release_leases(self, worker_id):
+        """worker 正常退出时归还未完成的租约（尝试次数退回），其他 worker 可立即领取"""
+        with self._lock, self._conn:
+            return self._conn.execute(
+                "UPDATE scripts SET status = ?, attempts = MAX(attempts - 1, 0), lease_expires = NULL, updated_at = ? "
+                "WHERE worker_id = ? AND status = ?",
+                (STATUS_PENDING, self._now(), worker_id, STATUS_IN_PROGRESS)
+            ).rowcount
+    
+    def active_leases(self, file_names=None):
+        """其他 worker 仍持有且未过期的租约数（为0且没有可领取的脚本时本轮工作结束）"""
+        sql = "SELECT COUNT(*) FROM scripts WHERE status = ? AND lease_expires >= ?"
+        params = [STATUS_IN_PROGRESS, time.time()]
+        if file_names is not None:
+            if not file_names:
+                return 0
+            sql += f" AND file_name IN ({', '.join('?' * len(file_names))})"
+            params.extend(file_names)
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()[0]
+    
+    def worker_summary(self):
+        """按 worker 统计完成数与当前持有的租约：{worker_id: {"done": n, "in_progress": n}}"""
+        summary = {}
+        with self._lock:
+            for worker_id, status, count in self._conn.execute(
+                "SELECT worker_id, status, COUNT(*) FROM scripts WHERE worker_id IS NOT NULL "
+                "AND status IN (?, ?) GROUP BY worker_id, status",
+                (STATUS_DONE, STATUS_IN_PROGRESS)
+            ):
+                summary.setdefault(worker_id, {"done": 0, "in_progress": 0})[status] = count
+        return summary
+
+    def file_summary(self, file_name=None):
+        """按文件统计各状态数量：{file_name: {status: count, ...}}"""
+        sql = "SELECT file_name, status, COUNT(*), COALESCE(SUM(chars), 0) FROM scripts"
+        params = []
+        if file_name:
+            sql += " WHERE file_name = ?"
+            params.append(file_name)
+        sql += " GROUP BY file_name, status"
+        summary = {}
+        with self._lock:
+            for name, status, count, chars in self._conn.execute(sql, params):
+                entry = summary.setdefault(name, {"total": 0, "remaining_chars": 0})
+                entry[status] = count
+                entry["total"] += count
+                if status != STATUS_DONE:
+                    entry["remaining_chars"] += chars
+        return summary
+
+    def remaining_count(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM scripts WHERE status != ?", (STATUS_DONE,)
+            ).fetchone()[0]
+
+
+class LeaseHeartbeat:
+    """后台线程按租约时长的 1/3 定期续租，主线程阻塞在请求上时租约也不会过期"""
+
+    def __init__(self, ledger, worker_id, lease_seconds, interval=None):
+        self.ledger = ledger
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.interval = interval or max(1.0, lease_seconds / 3)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"lease-heartbeat-{worker_id}", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.ledger.renew_leases(self.worker_id, self.lease_seconds)
+            except sqlite3.Error:
+                # 共享台账暂时被锁或不可达时下一次心跳再试；租约时长应远大于心跳间隔
+                continue
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=self.interval)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+TT-Live-AI 脚本数据源
+输入工作簿 -> 脚本列表，以及每个工作簿固定使用的语音
+队列处理器与工作量规划器共用；导入时不配置日志、不创建文件
+"""
+import logging
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+INPUTS_DIR = "18_批量输入_批量文件输入目录"
+
+# 为每个文件定义固定的voice
+FILE_VOICE_MAPPING = {
+    "全产品_合并版_3200_v9.xlsx": "en-US-JennyNeural",
+    "全产品_合并版_3200_v8.xlsx": "en-US-AriaNeural", 
+    "全产品_合并版_3200_v7.xlsx": "en-US-MichelleNeural",
+    "全产品_合并版_3200_v6.xlsx": "en-US-BrandonNeural",
+    "全产品_合并版_3200_v5.xlsx": "en-US-AvaNeural",
+    "全产品_合并版_3200_v4.xlsx": "en-US-NancyNeural",
+    "全产品_合并版_3200_v3.xlsx": "en-US-KaiNeural",
+    "全产品_合并版_3200_v2.xlsx": "en-US-SerenaNeural",
+    "全产品_合并版_3200.xlsx": "en-US-EmmaNeural"
+}
+
+
+def prepare_scripts_data(df, file_name):
+    """准备脚本数据"""
+    scripts = []
+    
+    # 检查必要的列 - 支持多种字段名
+    english_script_col = None
+    for col in ['英文', 'english_script', 'English', 'english']:
+        if col in df.columns:
+            english_script_col = col
+            break
+    
+    if not english_script_col:
+        logger.error(f"❌ 未找到英文脚本列，可用列: {list(df.columns)}")
+        return []
+    
+    logger.info(f"✅ 使用英文脚本列: {english_script_col}")
+    
+    # 获取文件固定的voice
+    fixed_voice = FILE_VOICE_MAPPING.get(file_name, "en-US-JennyNeural")
+    logger.info(f"🎤 文件 {file_name} 使用固定语音: {fixed_voice}")
+    
+    for index, row in df.iterrows():
+        # 获取英文脚本内容
+        english_script = str(row[english_script_col]).strip()
+        if not english_script or english_script.lower() in ['nan', 'none', '']:
+            continue  # 跳过空内容
+        
+        script = {
+            "script_index": index + 1,  # 工作表行号，作为台账主键和输出文件序号
+            "english_script": english_script,
+            "emotion": "Friendly",  # 默认情绪
+            "voice": fixed_voice  # 使用文件固定的voice
+        }
+        
+        # 获取情绪参数
+        if "情绪类型" in df.columns and pd.notna(row["情绪类型"]):
+            emotion_map = {
+                "紧迫型": "Urgent",
+                "兴奋型": "Excited", 
+                "友好型": "Friendly",
+                "自信型": "Confident",
+                "平静型": "Calm"
+            }
+            emotion_type = str(row["情绪类型"]).strip()
+            script["emotion"] = emotion_map.get(emotion_type, "Friendly")
+        
+        # 获取语音参数
+        if "rate" in df.columns and pd.notna(row["rate"]):
+            script["rate"] = float(row["rate"])
+        if "pitch" in df.columns and pd.notna(row["pitch"]):
+            script["pitch"] = float(row["pitch"])
+        if "volume" in df.columns and pd.notna(row["volume"]):
+            script["volume"] = float(row["volume"])
+        
+        # 获取产品信息
+        if "产品" in df.columns and pd.notna(row["产品"]):
+            script["product"] = str(row["产品"]).strip()
+        if "类目" in df.columns and pd.notna(row["类目"]):
+            script["category"] = str(row["类目"]).strip()
+        
+        # 获取中文翻译
+        if "中文" in df.columns and pd.notna(row["中文"]):
+            script["chinese_translation"] = str(row["中文"]).strip()
+        
+        # 获取CTA信息
+        if "CTA" in df.columns and pd.notna(row["CTA"]):
+            script["cta"] = str(row["CTA"]).strip()
+        
+        scripts.append(script)
+    
+    logger.info(f"✅ 准备了 {len(scripts)} 条脚本数据")
+    return scripts
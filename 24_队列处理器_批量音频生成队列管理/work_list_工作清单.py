@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+TT-Live-AI 工作清单
+规划器（work_planner_工作量规划器.py）输出、队列处理器 --work-list 读取的 JSON 格式：
+{
+  "generated_at": "...",
+  "products": [
+    {"file": "/abs/path/全产品_合并版_3200_v9.xlsx", "file_name": "...", "voice": "...",
+     "script_indices": [3, 17, ...], "missing": 1, "zero_byte": 1, "stale": 0, "chars": 412}
+  ],
+  ...
+}
+script_indices 为工作表行号（与台账、输出文件名 tts_{序号:04d} 一致）。
+"""
+import json
+import os
+
+
+def write_work_list(path, work_list):
+    work_dir = os.path.dirname(path)
+    if work_dir:
+        os.makedirs(work_dir, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(work_list, f, ensure_ascii=False, indent=2)
+
+
+def load_work_list(path):
+    """读取工作清单，返回 {文件名: set(脚本序号)}（只含有待办脚本的文件）和按清单顺序的文件路径"""
+    with open(path, "r", encoding="utf-8") as f:
+        work_list = json.load(f)
+
+    indices_by_file = {}
+    file_paths = []
+    for product in work_list.get("products", []):
+        indices = set(product.get("script_indices") or [])
+        if not indices:
+            continue
+        indices_by_file[product["file_name"]] = indices
+        file_paths.append(product["file"])
+    return indices_by_file, file_paths
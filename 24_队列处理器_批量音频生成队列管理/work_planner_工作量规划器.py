@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+TT-Live-AI 工作量规划器（只读演练）
+在启动大规模合成前回答"还剩多少、要多久"：
+- 读取输入工作簿和已有输出目录，按产品统计缺失、0字节、过期（情绪或文本已变化）的音频
+- 统计需要合成的总字符数
+- 按脚本台账中最近一段连续运行的实测吞吐量估算墙钟时间
+- 输出工作清单（见 work_list_工作清单.py），队列处理器可用 --work-list 直接消费
+
+不会调用TTS服务，也不会修改台账。
+
+用法:
+    python3 24_队列处理器_批量音频生成队列管理/work_planner_工作量规划器.py --output work_list.json
+"""
+import argparse
+import glob
+import os
+import re
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from script_ledger_脚本级进度台账 import DEFAULT_LEDGER_PATH, STATUS_DONE, text_hash
+from script_source_脚本数据源 import FILE_VOICE_MAPPING, INPUTS_DIR, prepare_scripts_data
+from work_list_工作清单 import write_work_list
+
+OUTPUT_ROOT = "20_输出文件_处理完成的音频文件"
+DEFAULT_WORK_LIST = "19_日志文件_系统运行日志和错误记录/work_list_{timestamp}.json"
+THROUGHPUT_WINDOW = 2000      # 用最近多少条完成记录估算吞吐量
+THROUGHPUT_MAX_GAP = 600      # 完成记录之间超过该间隔（秒）视为不同的运行，不计入同一窗口
+
+# tts_{序号:04d}_{情绪}_{语音名}_dyn.mp3
+CLIP_PATTERN = re.compile(r"^tts_(\d+)_([A-Za-z]+)_.*\.mp3$")
+
+
+def product_output_dir(product_name, voice):
+    """与TTS服务 process_scripts_batch 的输出目录规则一致"""
+    voice_name = voice.replace("en-US-", "").replace("Neural", "")
+    return os.path.join(OUTPUT_ROOT, f"{product_name}_{voice_name}")
+
+
+def scan_clips(output_dir):
+    """一次扫描输出目录：{序号: [(情绪, 文件大小), ...]}"""
+    clips = {}
+    if not os.path.isdir(output_dir):
+        return clips
+    with os.scandir(output_dir) as entries:
+        for entry in entries:
+            match = CLIP_PATTERN.match(entry.name)
+            if not match or not entry.is_file():
+                continue
+            clips.setdefault(int(match.group(1)), []).append((match.group(2), entry.stat().st_size))
+    return clips
+
+
+def open_ledger_readonly(path):
+    if not os.path.exists(path):
+        return None
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def ledger_hashes(conn, file_name):
+    """台账中已完成脚本的文本哈希：{序号: text_hash}"""
+    if conn is None:
+        return {}
+    rows = conn.execute(
+        "SELECT script_index, text_hash FROM scripts WHERE file_name = ? AND status = ?",
+        (file_name, STATUS_DONE)
+    )
+    return {row["script_index"]: row["text_hash"] for row in rows}
+
+
+def measured_throughput(conn):
+    """
+    由台账最近完成记录的时间戳估算吞吐量（条/秒、字符/秒）。
+    从最新一条往回取，遇到超过 THROUGHPUT_MAX_GAP 的空档即停止，避免把停机时间算进去。
+    """
+    if conn is None:
+        return None
+    rows = conn.execute(
+        "SELECT updated_at, chars FROM scripts WHERE status = ? ORDER BY updated_at DESC LIMIT ?",
+        (STATUS_DONE, THROUGHPUT_WINDOW)
+    ).fetchall()
+
+    window = []
+    previous = None
+    for row in rows:
+        timestamp = datetime.fromisoformat(row["updated_at"]).timestamp()
+        if previous is not None and previous - timestamp > THROUGHPUT_MAX_GAP:
+            break
+        window.append((timestamp, row["chars"]))
+        previous = timestamp
+
+    if len(window) < 2:
+        return None
+    span = window[0][0] - window[-1][0]
+    if span <= 0:
+        return None
+    # 最早一条只作为窗口起点
+    scripts = len(window) - 1
+    chars = sum(chars for _, chars in window[:-1])
+    return {
+        "source": "ledger",
+        "window_scripts": scripts,
+        "window_seconds": round(span, 1),
+        "scripts_per_second": round(scripts / span, 4),
+        "chars_per_second": round(chars / span, 2)
+    }
+
+
+def plan_file(file_path, conn):
+    """规划单个工作簿的剩余工作"""
+    file_name = os.path.basename(file_path)
+    product_name = os.path.splitext(file_name)[0]
+    voice = FILE_VOICE_MAPPING.get(file_name, "en-US-JennyNeural")
+
+    df = pd.read_excel(file_path)
+    scripts = prepare_scripts_data(df, file_name)
+
+    output_dir = product_output_dir(product_name, voice)
+    clips = scan_clips(output_dir)
+    hashes = ledger_hashes(conn, file_name)
+
+    work = {"missing": [], "zero_byte": [], "stale": []}
+    chars = 0
+    for script in scripts:
+        index = script["script_index"]
+        existing = clips.get(index, [])
+        matching = [size for emotion, size in existing if emotion == script["emotion"]]
+
+        if not existing:
+            reason = "missing"
+        elif matching and max(matching) == 0:
+            reason = "zero_byte"
+        elif not matching:
+            reason = "stale"  # 只有其他情绪的旧文件
+        elif index in hashes and hashes[index] != text_hash(script["english_script"]):
+            reason = "stale"  # 生成后脚本文本已修改
+        else:
+            continue
+        work[reason].append(index)
+        chars += len(script["english_script"])
+
+    indices = sorted(work["missing"] + work["zero_byte"] + work["stale"])
+    return {
+        "file": os.path.abspath(file_path),
+        "file_name": file_name,
+        "product_name": product_name,
+        "voice": voice,
+        "output_dir": output_dir,
+        "total_scripts": len(scripts),
+        "done": len(scripts) - len(indices),
+        "missing": len(work["missing"]),
+        "zero_byte": len(work["zero_byte"]),
+        "stale": len(work["stale"]),
+        "chars": chars,
+        "script_indices": indices
+    }
+
+
+def format_duration(seconds):
+    if seconds is None:
+        return "未知"
+    hours, rest = divmod(int(seconds), 3600)
+    return f"{hours}小时{rest // 60}分" if hours else f"{rest // 60}分{rest % 60}秒"
+
+
+def print_plan(plan):
+    print("=" * 80)
+    print("🗺️  工作量规划（只读演练）")
+    print("=" * 80)
+    print(f"{'产品':<32}{'总数':>7}{'已完成':>8}{'缺失':>7}{'0字节':>7}{'过期':>7}{'字符':>10}  预计")
+    for product in plan["products"]:
+        print(f"{product['product_name']:<32}{product['total_scripts']:>7}{product['done']:>8}"
+              f"{product['missing']:>7}{product['zero_byte']:>7}{product['stale']:>7}{product['chars']:>10}"
+              f"  {format_duration(product.get('eta_seconds'))}")
+    for error in plan["errors"]:
+        print(f"❌ {error['file_name']}: {error['error']}")
+
+    summary = plan["summary"]
+    throughput = plan["throughput"]
+    print("-" * 80)
+    print(f"📊 待合成 {summary['scripts']} 条 / {summary['chars']} 字符"
+          f"（缺失 {summary['missing']}, 0字节 {summary['zero_byte']}, 过期 {summary['stale']}）")
+    if throughput:
+        print(f"🚀 实测吞吐: {throughput['scripts_per_second']} 条/秒, {throughput['chars_per_second']} 字符/秒"
+              f"（来源: {throughput['source']}）")
+    else:
+        print("🚀 实测吞吐: 无数据（台账中没有连续的完成记录，可用 --chars-per-second 指定）")
+    print(f"⏱️  预计墙钟时间: {format_duration(summary['eta_seconds'])}")
+    print("=" * 80)
+
+
+def build_plan(file_paths, ledger_path, chars_per_second=None):
+    conn = open_ledger_readonly(ledger_path)
+    try:
+        throughput = measured_throughput(conn)
+        if chars_per_second:
+            throughput = {"source": "manual", "scripts_per_second": None, "chars_per_second": chars_per_second}
+
+        products = []
+        errors = []
+        for file_path in file_paths:
+            try:
+                products.append(plan_file(file_path, conn))
+            except Exception as e:
+                errors.append({"file_name": os.path.basename(file_path), "error": str(e)})
+    finally:
+        if conn is not None:
+            conn.close()
+
+    rate = throughput["chars_per_second"] if throughput else None
+    for product in products:
+        product["eta_seconds"] = round(product["chars"] / rate, 1) if rate else None
+
+    total_chars = sum(product["chars"] for product in products)
+    return {
+        "generated_at": datetime.now().isoformat(),
+        "inputs": [os.path.abspath(path) for path in file_paths],
+        "throughput": throughput,
+        "summary": {
+            "products": len(products),
+            "scripts": sum(len(product["script_indices"]) for product in products),
+            "missing": sum(product["missing"] for product in products),
+            "zero_byte": sum(product["zero_byte"] for product in products),
+            "stale": sum(product["stale"] for product in products),
+            "chars": total_chars,
+            "eta_seconds": round(total_chars / rate, 1) if rate else None
+        },
+        "products": products,
+        "errors": errors
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TT-Live-AI 工作量规划器（只读演练，输出工作清单）")
+    parser.add_argument("--inputs", default=INPUTS_DIR, help="输入工作簿目录")
+    parser.add_argument("--ledger", default=DEFAULT_LEDGER_PATH, help="脚本台账（用于过期判断和吞吐量估算）")
+    parser.add_argument("--chars-per-second", type=float, help="手动指定吞吐量（覆盖台账实测值）")
+    parser.add_argument("--output", help="工作清单输出路径（默认写入日志目录）")
+    args = parser.parse_args()
+
+    file_paths = sorted(glob.glob(os.path.join(args.inputs, "*.xlsx")))
+    if not file_paths:
+        print(f"📁 {args.inputs} 中没有xlsx文件")
+        sys.exit(1)
+
+    start = time.time()
+    plan = build_plan(file_paths, args.ledger, args.chars_per_second)
+    print_plan(plan)
+
+    output = args.output or DEFAULT_WORK_LIST.format(timestamp=datetime.now().strftime("%Y%m%d_%H%M%S"))
+    write_work_list(output, plan)
+    print(f"📄 工作清单已保存: {output}（规划耗时 {time.time() - start:.1f}s）")
+    print(f"💡 执行: python3 24_队列处理器_批量音频生成队列管理/resume_queue_processor_断点续传队列处理器.py --work-list {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TTS服务集群守护进程（替代 start_cluster.sh）
+- 按 CPU 和可用内存决定实例数（或 --workers 指定），从 BASE_PORT 起连续分配端口
+- 启动后轮询 /health，全部就绪才算启动完成
+- 进程退出或连续健康检查失败（卡死）时按指数退避重启
+- 每个实例的输出经管道写入按大小轮转的日志
+- 集群状态持续写入 CLUSTER_STATUS_FILE，multi_api_processor.py 据此发现端点
+
+用法:
+    python3 27_高级优化_多API并行策略/cluster_supervisor.py start [--workers N]
+    python3 27_高级优化_多API并行策略/cluster_supervisor.py status [--wait 60]
+    python3 27_高级优化_多API并行策略/cluster_supervisor.py stop
+"""
+
+import argparse
+import json
+import logging
+import logging.handlers
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+from typing import Dict, Optional
+
+import psutil
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOG_DIR = os.path.join(PROJECT_ROOT, "19_日志文件_系统运行日志和错误记录")
+SERVICE_SCRIPT = os.path.join(PROJECT_ROOT, "02_TTS服务_语音合成系统", "run_tts_TTS语音合成服务.py")
+CLUSTER_STATUS_FILE = os.path.join(LOG_DIR, "cluster_status.json")
+SUPERVISOR_PID_FILE = os.path.join(LOG_DIR, "cluster_supervisor.pid")
+
+BASE_PORT = 5001
+MAX_WORKERS = 8
+MEMORY_PER_WORKER_MB = 500     # 单实例（含 Flask 调试重载子进程）的内存预算
+WORKER_CONCURRENCY = 20        # 写入状态文件，供 multi_api_processor.py 设置每个端点的并发上限
+
+READY_TIMEOUT = 60             # 启动后等待 /health 就绪的最长时间（秒）
+CHECK_INTERVAL = 5             # 健康检查间隔（秒）
+HEALTH_TIMEOUT = 5             # 单次 /health 请求超时（秒）
+HUNG_THRESHOLD = 3             # 连续多少次健康检查失败视为卡死
+STOP_TIMEOUT = 10              # SIGTERM 后等待退出的时间，超时则 SIGKILL
+BACKOFF_INITIAL = 1            # 重启退避（秒），每次连续重启翻倍
+BACKOFF_MAX = 60
+STABLE_SECONDS = 120           # 稳定运行超过该时间后重置退避
+
+LOG_MAX_BYTES = 20 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+
+# 实例状态
+STATE_STARTING = "starting"
+STATE_READY = "ready"
+STATE_DRAINING = "draining"
+STATE_UNHEALTHY = "unhealthy"
+STATE_BACKOFF = "backoff"
+STATE_STOPPED = "stopped"
+
+os.makedirs(LOG_DIR, exist_ok=True)
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler(os.path.join(LOG_DIR, 'cluster_supervisor.log')),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+
+def plan_worker_count(requested: Optional[int] = None) -> Dict:
+    """按 CPU 核心数和可用内存决定实例数（requested 指定时直接使用）"""
+    cpu_count = multiprocessing.cpu_count()
+    available_mb = psutil.virtual_memory().available / (1024 * 1024)
+    by_memory = int(available_mb // MEMORY_PER_WORKER_MB)
+    workers = requested or max(1, min(cpu_count, by_memory, MAX_WORKERS))
+    return {
+        "workers": workers,
+        "cpu_count": cpu_count,
+        "available_memory_mb": int(available_mb),
+        "memory_limited_workers": by_memory,
+        "requested": requested
+    }
+
+
+def check_health(port: int) -> Optional[str]:
+    """返回 'healthy' / 'draining'，无响应或异常时返回 None"""
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=HEALTH_TIMEOUT) as response:
+            return json.loads(response.read().decode("utf-8")).get("status", "healthy")
+    except urllib.error.HTTPError as e:
+        # 排空模式下服务返回 503，进程本身是健康的
+        return "draining" if e.code == 503 else None
+    except (OSError, ValueError):
+        return None
+
+
+class Worker:
+    """一个TTS服务实例：进程、日志管道和重启状态"""
+
+    def __init__(self, port: int):
+        self.port = port
+        self.process: Optional[subprocess.Popen] = None
+        self.state = STATE_STOPPED
+        self.started_at = 0.0
+        self.ready_at = None
+        self.restarts = 0
+        self.backoff = BACKOFF_INITIAL
+        self.restart_at = 0.0
+        self.health_failures = 0
+        self.last_exit_code = None
+        self.last_health_at = None
+        self.log_path = os.path.join(LOG_DIR, f"tts_service_{port}.log")
+        self._log_thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self.process.pid if self.process else None
+
+    def start(self):
+        self.process = subprocess.Popen(
+            [sys.executable, SERVICE_SCRIPT, "--port", str(self.port)],
+            cwd=PROJECT_ROOT,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            stdin=subprocess.DEVNULL,
+            start_new_session=True  # 独立进程组，停止时连同调试重载子进程一起结束
+        )
+        self.state = STATE_STARTING
+        self.started_at = time.time()
+        self.ready_at = None
+        self.health_failures = 0
+        self._log_thread = threading.Thread(target=self._pump_logs, args=(self.process,), daemon=True)
+        self._log_thread.start()
+        logger.info(f"📡 启动TTS服务实例 :{self.port} (pid {self.process.pid})")
+
+    def _pump_logs(self, process: subprocess.Popen):
+        """把实例输出写入按大小轮转的日志（直接重定向到文件无法安全轮转）"""
+        handler = logging.handlers.RotatingFileHandler(
+            self.log_path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        try:
+            for line in iter(process.stdout.readline, b""):
+                record = logging.makeLogRecord({"msg": line.decode("utf-8", "replace").rstrip("\n")})
+                handler.emit(record)
+        finally:
+            handler.close()
+            process.stdout.close()
+
+    def stop(self):
+        if not self.process or self.process.poll() is not None:
+            self.state = STATE_STOPPED
+            return
+        try:
+            os.killpg(self.process.pid, signal.SIGTERM)
+            self.process.wait(timeout=STOP_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            logger.warning(f"⚠️ 实例 :{self.port} 未在 {STOP_TIMEOUT} 秒内退出，强制结束")
+            os.killpg(self.process.pid, signal.SIGKILL)
+            self.process.wait()
+        except ProcessLookupError:
+            pass
+        self.last_exit_code = self.process.returncode
+        self.state = STATE_STOPPED
+
+    def schedule_restart(self, reason: str):
+        """记录失败原因并按退避时间安排重启"""
+        if self.ready_at and time.time() - self.ready_at >= STABLE_SECONDS:
+            self.backoff = BACKOFF_INITIAL
+        self.restart_at = time.time() + self.backoff
+        logger.warning(f"🔁 实例 :{self.port} {reason}，{self.backoff} 秒后重启")
+        self.backoff = min(BACKOFF_MAX, self.backoff * 2)
+        self.state = STATE_BACKOFF
+
+    def snapshot(self) -> Dict:
+        now = time.time()
+        return {
+            "port": self.port,
+            "url": self.url,
+            "pid": self.pid,
+            "state": self.state,
+            "concurrency": WORKER_CONCURRENCY,
+            "restarts": self.restarts,
+            "uptime_seconds": round(now - self.started_at, 1) if self.state in (STATE_READY, STATE_DRAINING) else 0,
+            "health_failures": self.health_failures,
+            "last_exit_code": self.last_exit_code,
+            "last_health_at": datetime.fromtimestamp(self.last_health_at).isoformat(timespec="seconds")
+            if self.last_health_at else None,
+            "log": self.log_path
+        }
+
+
+class ClusterSupervisor:
+    """启动、监控并按需重启一组TTS服务实例"""
+
+    def __init__(self, worker_count: int, base_port: int = BASE_PORT):
+        self.workers = [Worker(base_port + i) for i in range(worker_count)]
+        self.started_at = time.time()
+        self._stopping = threading.Event()
+
+    def start_all(self):
+        for worker in self.workers:
+            worker.start()
+
+    def wait_ready(self, timeout: float = READY_TIMEOUT) -> bool:
+        """等待所有实例 /health 就绪"""
+        deadline = time.time() + timeout
+        while time.time() < deadline and not self._stopping.is_set():
+            self.check_all()
+            if all(worker.state == STATE_READY for worker in self.workers):
+                return True
+            time.sleep(1)
+        return all(worker.state == STATE_READY for worker in self.workers)
+
+    def check_worker(self, worker: Worker):
+        now = time.time()
+
+        if worker.state == STATE_BACKOFF:
+            if now >= worker.restart_at:
+                worker.restarts += 1
+                worker.start()
+            return
+
+        exit_code = worker.process.poll() if worker.process else None
+        if exit_code is not None:
+            worker.last_exit_code = exit_code
+            worker.schedule_restart(f"已退出 (退出码 {exit_code})")
+            return
+
+        status = check_health(worker.port)
+        if status is not None:
+            if worker.state != STATE_READY and status == "healthy":
+                worker.ready_at = now
+                logger.info(f"✅ 实例 :{worker.port} 就绪 ({now - worker.started_at:.1f}s)")
+            worker.state = STATE_READY if status == "healthy" else STATE_DRAINING
+            worker.health_failures = 0
+            worker.last_health_at = now
+            return
+
+        if worker.state == STATE_STARTING:
+            if now - worker.started_at > READY_TIMEOUT:
+                worker.stop()
+                worker.schedule_restart(f"{READY_TIMEOUT} 秒内未就绪")
+            return
+
+        worker.health_failures += 1
+        worker.state = STATE_UNHEALTHY
+        if worker.health_failures >= HUNG_THRESHOLD:
+            worker.stop()
+            worker.schedule_restart(f"连续 {worker.health_failures} 次健康检查失败，判定卡死")
+
+    def check_all(self):
+        for worker in self.workers:
+            self.check_worker(worker)
+        self.write_status()
+
+    def snapshot(self) -> Dict:
+        workers = [worker.snapshot() for worker in self.workers]
+        return {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "supervisor_pid": os.getpid(),
+            "started_at": datetime.fromtimestamp(self.started_at).isoformat(timespec="seconds"),
+            "workers": workers,
+            "summary": {
+                "total": len(workers),
+                "ready": sum(1 for w in workers if w["state"] == STATE_READY),
+                "restarts": sum(w["restarts"] for w in workers),
+                "total_concurrency": sum(w["concurrency"] for w in workers if w["state"] == STATE_READY)
+            }
+        }
+
+    def write_status(self):
+        temp_path = CLUSTER_STATUS_FILE + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, CLUSTER_STATUS_FILE)
+
+    def run(self):
+        """前台运行直到收到 SIGTERM / SIGINT"""
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, lambda *_: self._stopping.set())
+        with open(SUPERVISOR_PID_FILE, "w") as f:
+            f.write(str(os.getpid()))
+
+        try:
+            self.start_all()
+            if self.wait_ready():
+                logger.info(f"🎉 TTS服务集群启动完成: {len(self.workers)} 个实例")
+            else:
+                not_ready = [w.port for w in self.workers if w.state != STATE_READY]
+                logger.warning(f"⚠️ {READY_TIMEOUT} 秒内未全部就绪: {not_ready}，继续监控")
+
+            while not self._stopping.wait(CHECK_INTERVAL):
+                self.check_all()
+        finally:
+            logger.info("🛑 停止TTS服务集群...")
+            for worker in self.workers:
+                worker.stop()
+            self.write_status()
+            if os.path.exists(SUPERVISOR_PID_FILE):
+                os.remove(SUPERVISOR_PID_FILE)
+            logger.info("✅ 所有实例已停止")
+
+
+def load_cluster_status() -> Optional[Dict]:
+    if not os.path.exists(CLUSTER_STATUS_FILE):
+        return None
+    with open(CLUSTER_STATUS_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def supervisor_running(status: Optional[Dict]) -> bool:
+    return bool(status) and psutil.pid_exists(status.get("supervisor_pid", 0)) and os.path.exists(SUPERVISOR_PID_FILE)
+
+
+def print_status(status: Optional[Dict]):
+    if not status:
+        print("📭 没有集群状态（守护进程未启动）")
+        return
+    running = supervisor_running(status)
+    summary = status["summary"]
+    print("=" * 72)
+    print(f"📊 TTS服务集群 {'运行中' if running else '已停止'} (守护进程 pid {status['supervisor_pid']}, 更新于 {status['timestamp']})")
+    print(f"   就绪 {summary['ready']}/{summary['total']}，累计重启 {summary['restarts']} 次，总并发 {summary['total_concurrency']}")
+    print("-" * 72)
+    print(f"{'端口':<8}{'状态':<12}{'pid':>8}{'重启':>6}{'运行时长':>10}  日志")
+    for worker in status["workers"]:
+        print(f"{worker['port']:<8}{worker['state']:<12}{str(worker['pid'] or '-'):>8}{worker['restarts']:>6}"
+              f"{worker['uptime_seconds']:>9.0f}s  {worker['log']}")
+    print("=" * 72)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TTS服务集群守护进程")
+    subparsers = parser.add_subparsers(dest="command")
+
+    start_parser = subparsers.add_parser("start", help="启动并在前台监控集群")
+    start_parser.add_argument("--workers", type=int, help="实例数（默认按 CPU 和可用内存自动决定）")
+    start_parser.add_argument("--base-port", type=int, default=BASE_PORT, help="起始端口")
+
+    status_parser = subparsers.add_parser("status", help="查看集群状态")
+    status_parser.add_argument("--wait", type=float, default=0, help="等待全部实例就绪的最长秒数")
+
+    subparsers.add_parser("stop", help="停止守护进程及其所有实例")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        deadline = time.time() + args.wait
+        status = load_cluster_status()
+        while args.wait and time.time() < deadline:
+            status = load_cluster_status()
+            if supervisor_running(status) and status["summary"]["ready"] == status["summary"]["total"]:
+                break
+            time.sleep(1)
+        print_status(status)
+        ready = supervisor_running(status) and status["summary"]["ready"] == status["summary"]["total"]
+        sys.exit(0 if ready else 1)
+
+    if args.command == "stop":
+        status = load_cluster_status()
+        if not supervisor_running(status):
+            print("📭 守护进程未运行")
+            return
+        os.kill(status["supervisor_pid"], signal.SIGTERM)
+        print(f"🛑 已通知守护进程 {status['supervisor_pid']} 停止")
+        return
+
+    if args.command != "start":
+        parser.print_help()
+        return
+
+    if supervisor_running(load_cluster_status()):
+        logger.error("❌ 集群守护进程已在运行，请先执行 stop")
+        sys.exit(1)
+
+    plan = plan_worker_count(args.workers)
+    logger.info(f"🚀 启动TTS服务集群: {plan['workers']} 个实例 (CPU {plan['cpu_count']} 核, "
+                f"可用内存 {plan['available_memory_mb']}MB, 内存允许 {plan['memory_limited_workers']} 个)")
+    ClusterSupervisor(plan["workers"], args.base_port).run()
+
+
+if __name__ == "__main__":
+    main()
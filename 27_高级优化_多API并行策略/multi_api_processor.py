@@ -10,11 +10,12 @@ import aiohttp
 import json
 import time
 import logging
-from concurrent.futures import ThreadPoolExecutor
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import pandas as pd
 import os
 import glob
+import argparse
+from collections import deque
 
 # 配置日志
 logging.basicConfig(
@@ -27,10 +28,203 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# HTTP 超时（秒）：连接超时短，读超时覆盖一整批合成
+CONNECT_TIMEOUT = 10
+READ_TIMEOUT = 300
+
+# 负载均衡参数
+EWMA_ALPHA = 0.3               # 单条脚本延迟的平滑系数
+FAILURE_LATENCY_PENALTY = 2.0  # 失败时把该端点的平滑延迟放大的倍数
+MAX_COOLDOWN_SECONDS = 60      # 连续失败后的最长摘除时间
+
+# 共享工作队列参数
+WORK_BATCH_SIZE = 5            # 每个工作协程一次从队列拉取的脚本数
+MAX_SCRIPT_ATTEMPTS = 3        # 单条脚本最多尝试次数（失败的脚本单独重新入队）
+
+# 请求对冲参数（默认关闭，--hedge 开启）
+HEDGE_PERCENTILE = 0.95        # 请求耗时超过该分位数时向另一端点发送副本
+HEDGE_MIN_SAMPLES = 20         # 样本不足时不对冲
+HEDGE_WINDOW = 200             # 用最近多少次成功请求计算分位数
+HEDGE_BUDGET_RATIO = 0.05      # 对冲请求数上限：主请求数的 5%
+HEDGE_BUDGET_BURST = 2         # 运行初期额外允许的对冲次数
+HEDGE_POLL_INTERVAL = 0.5      # 其他端点满载时重新检查空闲槽位的最短间隔（秒）
+
+# 集群守护进程（cluster_supervisor.py）写出的状态文件，存在时据此发现端点
+CLUSTER_STATUS_FILE = "19_日志文件_系统运行日志和错误记录/cluster_status.json"
+
+
+class EndpointState:
+    """单个API端点的并发上限、在途请求数和延迟统计"""
+    
+    def __init__(self, url: str, concurrency: int):
+        self.url = url
+        self.concurrency = concurrency
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.outstanding = 0           # 在途请求数（获得并发槽位后才计入）
+        self.ewma_latency = None       # 平滑后的单条脚本耗时（秒）
+        self.consecutive_failures = 0
+        self.down_until = 0.0
+        self.requests = 0
+        self.failures = 0
+    
+    @property
+    def available(self) -> bool:
+        return not self.semaphore.locked()
+    
+    @property
+    def cooling_down(self) -> bool:
+        return time.time() < self.down_until
+    
+    def expected_wait(self, default_latency: float) -> float:
+        """最少在途请求 × 平滑延迟：预计新请求完成所需的相对时间"""
+        latency = self.ewma_latency if self.ewma_latency is not None else default_latency
+        return (self.outstanding + 1) * latency
+    
+    def record_latency(self, per_script_seconds: float):
+        if self.ewma_latency is None:
+            self.ewma_latency = per_script_seconds
+        else:
+            self.ewma_latency = EWMA_ALPHA * per_script_seconds + (1 - EWMA_ALPHA) * self.ewma_latency
+    
+    def record_success(self, per_script_seconds: float):
+        self.record_latency(per_script_seconds)
+        self.consecutive_failures = 0
+        self.down_until = 0.0
+    
+    def record_failure(self, default_latency: float):
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.ewma_latency = (self.ewma_latency or default_latency) * FAILURE_LATENCY_PENALTY
+        cooldown = min(MAX_COOLDOWN_SECONDS, 2 ** self.consecutive_failures)
+        self.down_until = time.time() + cooldown
+        logger.warning(f"🧊 API {self.url} 连续失败 {self.consecutive_failures} 次，{cooldown} 秒内降低优先级")
+    
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "concurrency": self.concurrency,
+            "outstanding": self.outstanding,
+            "ewma_latency": round(self.ewma_latency, 3) if self.ewma_latency is not None else None,
+            "requests": self.requests,
+            "failures": self.failures
+        }
+
+
+class EndpointBalancer:
+    """
+    按端点强制并发上限，在有空闲槽位的端点中选"在途请求 × 平滑延迟"最小者；
+    失败的端点延迟被放大并进入冷却，慢或宕机的端点自动少分流量。
+    """
+    
+    def __init__(self, api_concurrency: Dict[str, int]):
+        self.endpoints = {url: EndpointState(url, limit) for url, limit in api_concurrency.items()}
+        self._released = asyncio.Condition()
+    
+    def _default_latency(self) -> float:
+        known = [e.ewma_latency for e in self.endpoints.values() if e.ewma_latency is not None]
+        return min(known) if known else 1.0
+    
+    def _choose(self, exclude: Optional[str] = None) -> Optional[EndpointState]:
+        default_latency = self._default_latency()
+        endpoints = [e for e in self.endpoints.values() if e.url != exclude]
+        healthy = [e for e in endpoints if not e.cooling_down]
+        if healthy:
+            # 健康端点都满载时宁可排队，也不把请求压到冷却中的端点上
+            candidates = [e for e in healthy if e.available]
+        else:
+            # 全部端点都在冷却：每个端点最多放行一个探活请求
+            candidates = [e for e in endpoints if e.outstanding == 0]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda e: e.expected_wait(default_latency))
+    
+    async def _occupy(self, endpoint: EndpointState) -> EndpointState:
+        await endpoint.semaphore.acquire()  # 已确认有空位，不会阻塞
+        endpoint.outstanding += 1
+        endpoint.requests += 1
+        return endpoint
+    
+    async def acquire(self) -> EndpointState:
+        """等待并占用一个端点的并发槽位"""
+        async with self._released:
+            while True:
+                endpoint = self._choose()
+                if endpoint is not None:
+                    return await self._occupy(endpoint)
+                await self._released.wait()
+    
+    async def try_acquire(self, exclude: Optional[str] = None) -> Optional[EndpointState]:
+        """不等待：立即占用 exclude 以外的空闲端点，没有则返回 None（用于对冲）"""
+        async with self._released:
+            endpoint = self._choose(exclude)
+            return await self._occupy(endpoint) if endpoint is not None else None
+    
+    async def release(self, endpoint: EndpointState, script_count: int, elapsed: float, success: Optional[bool]):
+        """success 为 None 表示请求被主动取消（对冲落败），只记录耗时，不计为失败"""
+        per_script = elapsed / max(script_count, 1)
+        if success:
+            endpoint.record_success(per_script)
+        elif success is None:
+            endpoint.record_latency(per_script)
+        else:
+            endpoint.record_failure(self._default_latency())
+        endpoint.outstanding -= 1
+        endpoint.semaphore.release()
+        async with self._released:
+            self._released.notify_all()
+    
+    def snapshot(self) -> List[Dict[str, Any]]:
+        return [endpoint.snapshot() for endpoint in self.endpoints.values()]
+
+
+class RequestHedger:
+    """
+    请求对冲：请求耗时超过近期 p95 仍未返回时，向另一个端点发送相同脚本，先成功者胜出，落败者取消。
+    对冲总数受预算限制，避免在整体变慢时把负载翻倍。
+    """
+    
+    def __init__(self, percentile: float = HEDGE_PERCENTILE, budget_ratio: float = HEDGE_BUDGET_RATIO):
+        self.percentile = percentile
+        self.budget_ratio = budget_ratio
+        self.latencies = deque(maxlen=HEDGE_WINDOW)
+        self.primary_requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0           # 副本先成功返回
+        self.primary_wins = 0         # 已发副本，但主请求先成功返回
+        self.skipped_budget = 0
+        self.skipped_capacity = 0     # 超过阈值时其他端点满载（之后仍会等待空闲槽位）
+    
+    def observe(self, elapsed: float):
+        self.latencies.append(elapsed)
+    
+    def threshold(self) -> Optional[float]:
+        """近期成功请求耗时的分位数，样本不足时返回 None（不对冲）"""
+        if len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * self.percentile))]
+    
+    def within_budget(self) -> bool:
+        return self.hedges < self.primary_requests * self.budget_ratio + HEDGE_BUDGET_BURST
+    
+    def snapshot(self) -> Dict[str, Any]:
+        threshold = self.threshold()
+        return {
+            "primary_requests": self.primary_requests,
+            "hedges": self.hedges,
+            "hedge_rate": round(self.hedges / self.primary_requests, 4) if self.primary_requests else 0.0,
+            "hedge_wins": self.hedge_wins,
+            "primary_wins": self.primary_wins,
+            "skipped_budget": self.skipped_budget,
+            "skipped_capacity": self.skipped_capacity,
+            "threshold_seconds": round(threshold, 3) if threshold is not None else None
+        }
+
+
 class MultiAPITTSProcessor:
     """多API并行TTS处理器"""
     
-    def __init__(self):
+    def __init__(self, hedge: bool = False, hedge_budget: float = HEDGE_BUDGET_RATIO):
         # 多个TTS API端点
         self.api_endpoints = [
             "http://127.0.0.1:5001",  # 本地EdgeTTS
@@ -45,6 +239,8 @@ class MultiAPITTSProcessor:
             "http://127.0.0.1:5003": 20,
         }
         
+        self.load_cluster_endpoints()
+        
         # 总并发数
         self.total_concurrency = sum(self.api_concurrency.values())
         
@@ -61,85 +257,221 @@ class MultiAPITTSProcessor:
             "全产品_合并版_3200_v6.xlsx": "en-US-BrandonNeural",
         }
         
-        # API负载均衡
-        self.api_load_balancer = {}
-        for endpoint in self.api_endpoints:
-            self.api_load_balancer[endpoint] = 0
-    
-    async def get_available_api(self) -> str:
-        """获取负载最低的API端点"""
-        min_load = min(self.api_load_balancer.values())
-        for endpoint, load in self.api_load_balancer.items():
-            if load == min_load:
-                return endpoint
-        return self.api_endpoints[0]
-    
-    async def send_to_api(self, session: aiohttp.ClientSession, api_url: str, 
-                         scripts: List[Dict], voice: str) -> Dict:
-        """发送脚本到指定API"""
+        # 负载均衡器与共享会话在事件循环内创建（见 run_with_session）
+        self.balancer = None
+        self.session = None
+        
+        # 请求对冲（可选）
+        self.hedge = hedge
+        self.hedge_budget = hedge_budget
+        self.hedger = None
+    
+    def load_cluster_endpoints(self):
+        """集群由 cluster_supervisor.py 管理时，按其状态文件中的实例替换默认端点"""
+        if not os.path.exists(CLUSTER_STATUS_FILE):
+            return
+        try:
+            with open(CLUSTER_STATUS_FILE, "r", encoding="utf-8") as f:
+                status = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ 读取集群状态失败，使用默认端点: {e}")
+            return
+        
+        workers = [w for w in status.get("workers", []) if w.get("state") != "stopped"]
+        if not workers:
+            return
+        self.api_endpoints = [w["url"] for w in workers]
+        self.api_concurrency = {w["url"]: w.get("concurrency", 20) for w in workers}
+        logger.info(f"🔗 从集群状态发现 {len(workers)} 个端点: {', '.join(self.api_endpoints)}")
+    
+    async def run_with_session(self, coro_factory):
+        """在一个长连接会话内运行：所有批次共享连接池和超时设置"""
+        self.balancer = EndpointBalancer(self.api_concurrency)
+        self.hedger = RequestHedger(budget_ratio=self.hedge_budget) if self.hedge else None
+        timeout = aiohttp.ClientTimeout(total=None, connect=CONNECT_TIMEOUT, sock_read=READ_TIMEOUT)
+        connector = aiohttp.TCPConnector(limit=self.total_concurrency, limit_per_host=max(self.api_concurrency.values()))
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+            self.session = session
+            try:
+                return await coro_factory()
+            finally:
+                self.session = None
+                logger.info(f"📊 端点统计: {json.dumps(self.balancer.snapshot(), ensure_ascii=False)}")
+                if self.hedger:
+                    logger.info(f"🪞 对冲统计: {json.dumps(self.hedger.snapshot(), ensure_ascii=False)}")
+    
+    async def send_to_api(self, scripts: List[Dict], voice: str, product_name: Optional[str] = None) -> Dict:
+        """占用一个端点的并发槽位并发送脚本（端点由负载均衡器在发送时选定）"""
+        endpoint = await self.balancer.acquire()
+        return await self.post_to_endpoint(endpoint, scripts, voice, product_name)
+    
+    async def post_to_endpoint(self, endpoint: EndpointState, scripts: List[Dict], voice: str,
+                               product_name: Optional[str] = None) -> Dict:
+        """向已占用槽位的端点发送脚本，结束（含被取消）时释放槽位"""
+        api_url = endpoint.url
+        start = time.time()
+        success = False
         try:
-            # 更新负载
-            self.api_load_balancer[api_url] += len(scripts)
-            
             payload = {
                 "scripts": scripts,
-                "product_name": f"batch_{int(time.time())}",
+                "product_name": product_name or f"batch_{int(time.time())}",
                 "voice": voice,
                 "emotion": "Friendly"
             }
             
-            async with session.post(f"{api_url}/generate", json=payload) as response:
+            async with self.session.post(f"{api_url}/generate", json=payload) as response:
                 if response.status == 200:
                     result = await response.json()
+                    success = True
                     logger.info(f"✅ API {api_url} 成功处理 {len(scripts)} 个脚本")
-                    return result
+                    return {"success": True, "api_url": api_url, **result}
                 else:
                     logger.error(f"❌ API {api_url} 返回错误: {response.status}")
                     return {"success": False, "error": f"HTTP {response.status}"}
                     
+        except asyncio.CancelledError:
+            success = None  # 对冲落败被取消，不计为端点失败
+            raise
         except Exception as e:
-            logger.error(f"❌ API {api_url} 请求异常: {str(e)}")
+            logger.error(f"❌ API {api_url} 请求异常: {type(e).__name__} {str(e)}")
             return {"success": False, "error": str(e)}
         finally:
-            # 减少负载
-            self.api_load_balancer[api_url] -= len(scripts)
+            elapsed = time.time() - start
+            if success and self.hedger:
+                self.hedger.observe(elapsed)
+            await self.balancer.release(endpoint, len(scripts), elapsed, success)
+    
+    async def send_hedged(self, scripts: List[Dict], voice: str, product_name: Optional[str] = None) -> Dict:
+        """
+        发送主请求；超过近期 p95 仍未返回且预算允许时，向另一个空闲端点发送副本，
+        取先成功的结果并取消另一个。服务端以临时文件+原子替换写出音频，重复生成不会留下残缺文件。
+        """
+        hedger = self.hedger
+        endpoint = await self.balancer.acquire()
+        hedger.primary_requests += 1
+        primary = asyncio.create_task(self.post_to_endpoint(endpoint, scripts, voice, product_name))
+        
+        threshold = hedger.threshold()
+        if threshold is None:
+            return await primary
+        done, _ = await asyncio.wait({primary}, timeout=threshold)
+        if done:
+            return primary.result()
+        
+        # 其他端点都满载时不抢占，等主请求返回或有槽位空出（通常在文件末尾工作协程陆续空闲时）
+        hedge_endpoint = None
+        waited_for_capacity = False
+        while hedge_endpoint is None:
+            if not hedger.within_budget():
+                hedger.skipped_budget += 1
+                return await primary
+            hedge_endpoint = await self.balancer.try_acquire(exclude=endpoint.url)
+            if hedge_endpoint is None:
+                if not waited_for_capacity:
+                    hedger.skipped_capacity += 1
+                    waited_for_capacity = True
+                done, _ = await asyncio.wait({primary}, timeout=max(threshold / 2, HEDGE_POLL_INTERVAL))
+                if done:
+                    return primary.result()
+        
+        hedger.hedges += 1
+        logger.info(f"🪞 请求超过 p95 ({threshold:.1f}s)，对冲: {endpoint.url} -> {hedge_endpoint.url}")
+        hedge = asyncio.create_task(self.post_to_endpoint(hedge_endpoint, scripts, voice, product_name))
+        
+        pending = {primary, hedge}
+        result = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    result = task.result()
+                    if result.get("success"):
+                        if task is hedge:
+                            hedger.hedge_wins += 1
+                        else:
+                            hedger.primary_wins += 1
+                        return result
+            return result  # 两者都失败：返回后完成者的错误
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
     
-    async def process_scripts_parallel(self, all_scripts: List[Dict], voice: str) -> List[Dict]:
-        """并行处理所有脚本"""
+    async def process_scripts_parallel(self, all_scripts: List[Dict], voice: str, product_name: Optional[str] = None) -> Dict:
+        """
+        共享工作队列并行处理所有脚本：
+        每个并发槽位对应一个工作协程，空闲时从队列拉取一小批脚本发往负载均衡器选定的端点；
+        失败的脚本按单条重新入队，快的端点自然多拉、慢的端点少拉，直到队列清空。
+        """
         logger.info(f"🚀 开始并行处理 {len(all_scripts)} 个脚本")
         
-        # 将脚本分组，每组发送到不同API (最大性能配置)
-        batch_size = 100  # 每批100个脚本
-        batches = [all_scripts[i:i + batch_size] for i in range(0, len(all_scripts), batch_size)]
+        queue = asyncio.Queue()
+        for script in all_scripts:
+            queue.put_nowait(script)
         
-        results = []
+        worker_count = max(1, min(self.total_concurrency, len(all_scripts)))
+        attempts = {}
+        results = {}
+        stats = {"remaining": len(all_scripts), "batches": 0, "requeued": 0}
         
-        async with aiohttp.ClientSession() as session:
-            # 创建任务列表
-            tasks = []
-            
-            for batch in batches:
-                api_url = await self.get_available_api()
-                task = self.send_to_api(session, api_url, batch, voice)
-                tasks.append(task)
-            
-            # 并行执行所有任务
-            logger.info(f"📡 并行发送 {len(tasks)} 个批次到多个API")
-            batch_results = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            # 处理结果
-            for i, result in enumerate(batch_results):
-                if isinstance(result, Exception):
-                    logger.error(f"❌ 批次 {i} 处理异常: {str(result)}")
-                elif result.get("success"):
-                    results.append(result)
-                else:
-                    logger.error(f"❌ 批次 {i} 处理失败: {result.get('error', 'Unknown error')}")
+        def finish(script: Dict, result: Dict):
+            results[script["script_index"]] = result
+            stats["remaining"] -= 1
+            if stats["remaining"] == 0:
+                # 所有脚本都有了最终结果，唤醒等待中的工作协程退出
+                for _ in range(worker_count):
+                    queue.put_nowait(None)
         
-        logger.info(f"✅ 并行处理完成，成功: {len(results)} 个批次")
-        return results
+        async def worker():
+            while True:
+                script = await queue.get()
+                if script is None:
+                    return
+                batch = [script]
+                while len(batch) < WORK_BATCH_SIZE and not queue.empty():
+                    batch.append(queue.get_nowait())
+                
+                stats["batches"] += 1
+                send = self.send_hedged if self.hedger else self.send_to_api
+                # 服务端按 product_name 命名每个请求的 Excel；加上批次首条序号避免并发请求写同一个文件
+                # （服务端生成音频目录时会去掉 _Batch 后缀，音频仍在同一产品目录）
+                request_name = f"{product_name}_Batch{batch[0]['script_index']}" if product_name else None
+                response = await send(batch, voice, request_name)
+                items = {}
+                if response.get("success"):
+                    items = {item.get("script_index"): item for item in response.get("results", [])}
+                
+                for script in batch:
+                    index = script["script_index"]
+                    item = items.get(index) or {"success": False, "error": response.get("error", "结果缺失")}
+                    if item.get("success"):
+                        finish(script, {**item, "api_url": response.get("api_url")})
+                        continue
+                    attempts[index] = attempts.get(index, 1) + 1
+                    if attempts[index] <= MAX_SCRIPT_ATTEMPTS:
+                        stats["requeued"] += 1
+                        queue.put_nowait(script)
+                    else:
+                        logger.error(f"❌ 脚本 {index} 重试 {MAX_SCRIPT_ATTEMPTS} 次仍失败: {item.get('error')}")
+                        finish(script, item)
+        
+        if all_scripts:
+            logger.info(f"📡 {worker_count} 个工作协程从共享队列拉取（每次最多 {WORK_BATCH_SIZE} 条）")
+            await asyncio.gather(*[worker() for _ in range(worker_count)])
+        
+        successful = sum(1 for item in results.values() if item.get("success"))
+        logger.info(f"✅ 并行处理完成，成功: {successful}/{len(all_scripts)}，"
+                    f"请求批次: {stats['batches']}，单条重新入队: {stats['requeued']}")
+        return {
+            "successful": successful,
+            "failed": len(all_scripts) - successful,
+            "batches": stats["batches"],
+            "requeued": stats["requeued"],
+            "results": [results[index] for index in sorted(results)]
+        }
     
-    def process_excel_file(self, file_path: str) -> Dict:
+    async def process_excel_file(self, file_path: str) -> Dict:
         """处理单个Excel文件"""
         logger.info(f"📁 开始处理文件: {file_path}")
         
@@ -153,10 +485,12 @@ class MultiAPITTSProcessor:
         logger.info(f"🎤 使用语音: {voice}")
         
         # 准备脚本数据
+        product_name = os.path.splitext(file_name)[0]
         scripts = []
-        for _, row in df.iterrows():
+        for index, (_, row) in enumerate(df.iterrows()):
             script_data = {
-                "script": str(row.get("英文", "")),
+                "script_index": index + 1,  # 输出文件序号，重新入队时用于对应结果
+                "english_script": str(row.get("英文", "")),  # 服务端按 english_script 读取文本
                 "emotion": str(row.get("情绪类型", "Friendly")),
                 "voice": voice,
                 "rate": row.get("rate", 1.0),
@@ -167,52 +501,57 @@ class MultiAPITTSProcessor:
         
         # 并行处理
         start_time = time.time()
-        results = asyncio.run(self.process_scripts_parallel(scripts, voice))
+        outcome = await self.process_scripts_parallel(scripts, voice, product_name)
         end_time = time.time()
         
-        # 统计结果
-        total_processed = sum(len(result.get("sample_audios", [])) for result in results)
+        total_processed = outcome["successful"]
         
         logger.info(f"✅ 文件处理完成: {file_name}")
         logger.info(f"   - 总脚本: {len(scripts)}")
         logger.info(f"   - 成功生成: {total_processed}")
+        logger.info(f"   - 单条重新入队: {outcome['requeued']}")
         logger.info(f"   - 耗时: {(end_time - start_time)/60:.1f} 分钟")
         
         return {
             "file_name": file_name,
             "total_scripts": len(scripts),
             "successful": total_processed,
+            "failed": outcome["failed"],
+            "requeued": outcome["requeued"],
             "duration": end_time - start_time,
-            "results": results
+            "results": outcome["results"]
         }
     
-    def process_all_files(self, input_dir: str = "18_批量输入_批量文件输入目录"):
-        """处理所有Excel文件"""
-        logger.info("🎵 开始多API并行处理")
-        logger.info("=" * 80)
-        
-        # 查找所有Excel文件
-        excel_files = glob.glob(os.path.join(input_dir, "*.xlsx"))
-        logger.info(f"📁 发现 {len(excel_files)} 个Excel文件")
-        
-        total_start_time = time.time()
+    async def process_files(self, excel_files: List[str]) -> List[Dict]:
+        """在同一个事件循环和会话中依次处理文件"""
         all_results = []
-        
         for i, file_path in enumerate(excel_files, 1):
             logger.info(f"📁 处理文件 {i}/{len(excel_files)}: {os.path.basename(file_path)}")
             
             try:
-                result = self.process_excel_file(file_path)
+                result = await self.process_excel_file(file_path)
                 all_results.append(result)
                 
                 # 文件间延迟
                 if i < len(excel_files):
                     logger.info("⏳ 文件间暂停 2 秒...")
-                    time.sleep(2)
+                    await asyncio.sleep(2)
                     
             except Exception as e:
                 logger.error(f"❌ 文件处理失败: {str(e)}")
+        return all_results
+    
+    def process_all_files(self, input_dir: str = "18_批量输入_批量文件输入目录"):
+        """处理所有Excel文件"""
+        logger.info("🎵 开始多API并行处理")
+        logger.info("=" * 80)
+        
+        # 查找所有Excel文件
+        excel_files = glob.glob(os.path.join(input_dir, "*.xlsx"))
+        logger.info(f"📁 发现 {len(excel_files)} 个Excel文件")
         
+        total_start_time = time.time()
+        all_results = asyncio.run(self.run_with_session(lambda: self.process_files(excel_files)))
         total_end_time = time.time()
         
         # 最终统计
@@ -231,5 +570,11 @@ class MultiAPITTSProcessor:
         logger.info(f"   - 平均速度: {total_successful/(total_duration/60):.1f} 个/分钟")
 
 if __name__ == "__main__":
-    processor = MultiAPITTSProcessor()
-    processor.process_all_files()
+    parser = argparse.ArgumentParser(description="多API并行TTS处理器")
+    parser.add_argument("--input-dir", default="18_批量输入_批量文件输入目录", help="输入Excel目录")
+    parser.add_argument("--hedge", action="store_true", help="开启请求对冲：超过近期p95耗时时向另一端点发送副本")
+    parser.add_argument("--hedge-budget", type=float, default=HEDGE_BUDGET_RATIO, help="对冲请求数占主请求数的上限比例")
+    args = parser.parse_args()
+    
+    processor = MultiAPITTSProcessor(hedge=args.hedge, hedge_budget=args.hedge_budget)
+    processor.process_all_files(args.input_dir)
@@ -19,6 +19,10 @@ from multiprocessing import cpu_count
 import click
 from tqdm import tqdm
 
+# 共用的媒体元数据缓存：输入文件和背景/事件素材的 ffprobe 结果按 路径+mtime+大小 持久化
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent / "15_FFmpeg工具_音频处理和混合系统" / "01_核心程序_FFmpeg音频处理器"))
+from media_metadata_cache_媒体元数据缓存 import probe_media, get_cache
+
 # 设置日志
 def setup_logging(log_dir: Path) -> logging.Logger:
     """设置日志系统"""
@@ -174,44 +178,12 @@ def detect_ffmpeg_features() -> Dict[str, bool]:
     return features
 
 def get_audio_info(file_path: Path) -> Dict[str, Any]:
-    """获取音频文件信息"""
-    try:
-        cmd = [
-            'ffprobe', '-v', 'quiet', '-print_format', 'json',
-            '-show_format', '-show_streams', str(file_path)
-        ]
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-        
-        if result.returncode != 0:
-            logger.error(f"获取音频信息失败: {file_path}")
-            return {}
-        
-        data = json.loads(result.stdout)
-        
-        # 查找音频流
-        audio_stream = None
-        for stream in data.get('streams', []):
-            if stream.get('codec_type') == 'audio':
-                audio_stream = stream
-                break
-        
-        if not audio_stream:
-            logger.error(f"未找到音频流: {file_path}")
-            return {}
-        
-        duration = float(data.get('format', {}).get('duration', 0))
-        sample_rate = int(audio_stream.get('sample_rate', 0))
-        channels = int(audio_stream.get('channels', 0))
-        
-        return {
-            'duration': duration,
-            'sample_rate': sample_rate,
-            'channels': channels,
-            'codec': audio_stream.get('codec_name', 'unknown')
-        }
-    except Exception as e:
-        logger.error(f"解析音频信息失败 {file_path}: {e}")
+    """获取音频文件信息（经媒体元数据缓存；未命中时优先解析音频头，无法识别才调用 ffprobe）"""
+    info = probe_media(file_path)
+    if not info:
+        logger.error(f"获取音频信息失败: {file_path}")
         return {}
+    return info
 
 def collect_inputs(input_dir: Path, preview: Optional[int] = None) -> List[Path]:
     """收集输入文件"""
@@ -732,6 +704,9 @@ def main(input_dir, output_dir, ambience_dir, events_dir, threads, preview,
     logger.info(f"处理失败: {failed_count}")
     logger.info(f"跳过文件: {skipped_count}")
     logger.info(f"总耗时: {total_time:.1f} 秒")
+    cache_stats = get_cache().stats()
+    logger.info(f"元数据缓存: 命中 {cache_stats['hits']} 次, 头解析 {cache_stats['parsed']} 次, "
+                f"ffprobe 探测 {cache_stats['probes']} 次")
     
     # 保存结果JSON
     results_file = Path('audio_pipeline/logs') / f"results_{int(time.time())}.json"
@@ -9,7 +9,12 @@ import pandas as pd
 import asyncio
 import edge_tts
 import time
+import sys
 from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "24_队列处理器_批量音频生成队列管理"))
+from adaptive_pacer_自适应节奏控制器 import AdaptivePacer
 
 class SingleFileProcessor:
     def __init__(self):
@@ -23,6 +28,9 @@ class SingleFileProcessor:
         
         self.input_dir = self.config['路径配置']['输入目录']['默认路径']
         self.output_dir = self.config['路径配置']['输出目录']['完整路径']
+        # 行间/文件间节奏由服务反馈驱动，替代固定 sleep
+        self.pacer = AdaptivePacer("single_file", initial_batch_size=1, min_batch_size=1,
+                                   max_batch_size=1, batch_step=0, log=print)
         
         print(f"🎵 EdgeTTS 单个文件处理器启动")
         print(f"📁 输入目录: {self.input_dir}")
@@ -123,13 +131,16 @@ class SingleFileProcessor:
                 output_file = os.path.join(self.output_dir, f"{file_base}_{voice.split('-')[-1]}_direct", output_filename)
                 
                 # 生成音频
+                row_start = time.time()
                 if await self.generate_audio_direct(text, voice, emotion, output_file):
                     success_count += 1
+                    self.pacer.record(1, time.time() - row_start)
                 else:
                     error_count += 1
+                    self.pacer.record(1, time.time() - row_start, failures=1)
                 
-                # 延迟避免速率限制
-                await asyncio.sleep(2)
+                # 自适应间隔：健康时立即继续，出错或变慢时退避
+                await self.pacer.async_wait()
                 
                 # 进度显示
                 if (index + 1) % 5 == 0:
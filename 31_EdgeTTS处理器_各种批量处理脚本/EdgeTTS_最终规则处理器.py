@@ -9,7 +9,12 @@ import pandas as pd
 import asyncio
 import edge_tts
 import time
+import sys
 from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "24_队列处理器_批量音频生成队列管理"))
+from adaptive_pacer_自适应节奏控制器 import AdaptivePacer
 
 class FinalRuleProcessor:
     def __init__(self):
@@ -23,6 +28,9 @@ class FinalRuleProcessor:
         
         self.input_dir = self.config['路径配置']['输入目录']['默认路径']
         self.output_dir = self.config['路径配置']['输出目录']['完整路径']
+        # 行间/文件间节奏由服务反馈驱动，替代固定 sleep
+        self.pacer = AdaptivePacer("final_rule", initial_batch_size=1, min_batch_size=1,
+                                   max_batch_size=1, batch_step=0, log=print)
         
         print(f"🎵 EdgeTTS 最终规则处理器")
         print(f"📁 输入目录: {self.input_dir}")
@@ -141,13 +149,16 @@ class FinalRuleProcessor:
                 output_file = os.path.join(self.output_dir, output_filename)
                 
                 # 生成音频（使用统一的 voice）
+                row_start = time.time()
                 if await self.generate_audio_from_english_field(english_field_content, file_voice, output_file):
                     success_count += 1
+                    self.pacer.record(1, time.time() - row_start)
                 else:
                     error_count += 1
+                    self.pacer.record(1, time.time() - row_start, failures=1)
                 
-                # 延迟避免速率限制
-                await asyncio.sleep(3)
+                # 自适应间隔：健康时立即继续，出错或变慢时退避
+                await self.pacer.async_wait()
             
             print(f"\n✅ 文件处理完成: {success_count} 成功, {error_count} 失败")
             return success_count > 0
@@ -184,11 +195,9 @@ class FinalRuleProcessor:
             if await self.process_excel_file(file_path, max_rows=len(df)):
                 total_success += 1
             
-            # 文件间延迟
+            # 文件间节奏
             if i < total_files:
-                delay = 5
-                print(f"⏳ 文件间延迟 {delay}秒...")
-                await asyncio.sleep(delay)
+                await self.pacer.async_wait()
         
         print(f"\n🎉 所有文件处理完成!")
         print(f"📊 统计: {total_success}/{total_files} 文件成功处理")
@@ -10,7 +10,12 @@ import pandas as pd
 import asyncio
 import edge_tts
 import time
+import sys
 from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "24_队列处理器_批量音频生成队列管理"))
+from adaptive_pacer_自适应节奏控制器 import AdaptivePacer
 
 class CorrectBatchProcessor:
     def __init__(self):
@@ -24,6 +29,9 @@ class CorrectBatchProcessor:
         
         self.input_dir = self.config['路径配置']['输入目录']['默认路径']
         self.output_dir = self.config['路径配置']['输出目录']['完整路径']
+        # 行间/文件间节奏由服务反馈驱动，替代固定 sleep
+        self.pacer = AdaptivePacer("correct_batch", initial_batch_size=1, min_batch_size=1,
+                                   max_batch_size=1, batch_step=0, log=print)
         
         print(f"🎵 EdgeTTS 正确批量处理器启动")
         print(f"📁 输入目录: {self.input_dir}")
@@ -155,13 +163,16 @@ class CorrectBatchProcessor:
                 output_file = os.path.join(self.output_dir, f"{file_base}_{voice.split('-')[-1]}_clean", output_filename)
                 
                 # 生成音频
+                row_start = time.time()
                 if await self.generate_audio_direct(text, voice, emotion, output_file):
                     success_count += 1
+                    self.pacer.record(1, time.time() - row_start)
                 else:
                     error_count += 1
+                    self.pacer.record(1, time.time() - row_start, failures=1)
                 
-                # 延迟避免速率限制
-                await asyncio.sleep(3)
+                # 自适应间隔：健康时立即继续，出错或变慢时退避
+                await self.pacer.async_wait()
                 
                 # 进度显示
                 if (index + 1) % 10 == 0:
@@ -199,11 +210,9 @@ class CorrectBatchProcessor:
             if await self.process_excel_file(file_path, max_rows=50):
                 total_success += 1
             
-            # 文件间延迟
+            # 文件间节奏
             if i < total_files:
-                delay = 10
-                print(f"⏳ 文件间延迟 {delay}秒...")
-                await asyncio.sleep(delay)
+                await self.pacer.async_wait()
         
         print(f"\n🎉 批量处理完成!")
         print(f"📊 统计: {total_success}/{total_files} 文件成功处理")
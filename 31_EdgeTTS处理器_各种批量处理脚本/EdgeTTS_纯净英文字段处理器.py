@@ -10,7 +10,12 @@ import asyncio
 import edge_tts
 import re
 import time
+import sys
 from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "24_队列处理器_批量音频生成队列管理"))
+from adaptive_pacer_自适应节奏控制器 import AdaptivePacer
 
 class PureEnglishProcessor:
     def __init__(self):
@@ -24,6 +29,9 @@ class PureEnglishProcessor:
         
         self.input_dir = self.config['路径配置']['输入目录']['默认路径']
         self.output_dir = self.config['路径配置']['输出目录']['完整路径']
+        # 行间/文件间节奏由服务反馈驱动，替代固定 sleep
+        self.pacer = AdaptivePacer("pure_english", initial_batch_size=1, min_batch_size=1,
+                                   max_batch_size=1, batch_step=0, log=print)
         
         print(f"🎵 EdgeTTS 纯净英文字段处理器")
         print(f"📁 输入目录: {self.input_dir}")
@@ -151,13 +159,16 @@ class PureEnglishProcessor:
                 output_file = os.path.join(self.output_dir, f"{file_base}_PureEnglish", output_filename)
                 
                 # 生成纯净英文音频
+                row_start = time.time()
                 if await self.generate_pure_english_audio(english_text, voice, output_file):
                     success_count += 1
+                    self.pacer.record(1, time.time() - row_start)
                 else:
                     error_count += 1
+                    self.pacer.record(1, time.time() - row_start, failures=1)
                 
-                # 延迟避免速率限制
-                await asyncio.sleep(2)
+                # 自适应间隔：健康时立即继续，出错或变慢时退避
+                await self.pacer.async_wait()
                 
                 # 进度显示
                 if (index + 1) % 5 == 0:
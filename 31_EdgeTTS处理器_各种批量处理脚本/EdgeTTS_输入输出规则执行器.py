@@ -14,6 +14,11 @@ import threading
 from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import queue
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "24_队列处理器_批量音频生成队列管理"))
+from adaptive_pacer_自适应节奏控制器 import AdaptivePacer
 
 class EdgeTTSRuleExecutor:
     def __init__(self):
@@ -27,6 +32,9 @@ class EdgeTTSRuleExecutor:
         
         self.input_dir = self.config['路径配置']['输入目录']['默认路径']
         self.output_dir = self.config['路径配置']['输出目录']['完整路径']
+        # 行间节奏由服务反馈驱动，替代固定 sleep
+        self.pacer = AdaptivePacer("io_rule", initial_batch_size=1, min_batch_size=1,
+                                   max_batch_size=1, batch_step=0, log=print)
         
         # 多API配置
         self.api_services = self.config['API配置']['多API服务']['服务列表']
@@ -213,6 +221,9 @@ class EdgeTTSRuleExecutor:
         """工作线程 - 每个API一个独立线程"""
         thread_id = threading.current_thread().ident
         print(f"🧵 工作线程 {thread_id} 启动，使用API: {api_url}")
+        # 每个API独立节奏，互不拖累
+        pacer = AdaptivePacer(f"worker_{thread_id}", initial_batch_size=1, min_batch_size=1,
+                              max_batch_size=1, batch_step=0, log=print)
         
         while True:
             try:
@@ -224,7 +235,9 @@ class EdgeTTSRuleExecutor:
                 english_content, voice, output_file = task
                 
                 # 使用隔离的API环境处理
+                task_start = time.time()
                 success = self.generate_audio_via_api(english_content, voice, output_file, api_url)
+                pacer.record(1, time.time() - task_start, 0 if success else 1)
                 
                 if success:
                     print(f"✅ 线程{thread_id}: {os.path.basename(output_file)} 生成成功")
@@ -234,8 +247,8 @@ class EdgeTTSRuleExecutor:
                 # 标记任务完成
                 task_queue.task_done()
                 
-                # 线程间延迟避免API冲突
-                time.sleep(2)
+                # 自适应间隔：健康时立即取下一个任务，出错或变慢时退避
+                pacer.wait()
                 
             except queue.Empty:
                 continue
@@ -300,15 +313,18 @@ class EdgeTTSRuleExecutor:
                 print(f"英文字段内容: {english_field_content[:50]}...")
                 
                 # 使用专用API生成音频
+                row_start = time.time()
                 if self.generate_audio_via_api(english_field_content, default_voice, output_file, api_url):
                     success_count += 1
+                    self.pacer.record(1, time.time() - row_start)
                     print(f"✅ 第 {index+1} 行处理成功")
                 else:
                     error_count += 1
+                    self.pacer.record(1, time.time() - row_start, failures=1)
                     print(f"❌ 第 {index+1} 行处理失败")
                 
-                # 行间延迟避免API过载
-                time.sleep(2)
+                # 自适应间隔：健康时立即继续，出错或变慢时退避
+                self.pacer.wait()
             
             print(f"\n✅ 文件处理完成: {success_count} 成功, {error_count} 失败")
             print(f"📁 输出文件夹: {file_output_dir}")
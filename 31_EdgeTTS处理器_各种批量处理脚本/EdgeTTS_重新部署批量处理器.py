@@ -9,7 +9,12 @@ import pandas as pd
 import requests
 import time
 import random
+import sys
 from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "24_队列处理器_批量音频生成队列管理"))
+from consistent_hash_一致性哈希路由 import ConsistentHashRouter
 
 class RedeployedBatchProcessor:
     def __init__(self):
@@ -24,6 +29,7 @@ class RedeployedBatchProcessor:
         self.input_dir = self.config['路径配置']['输入目录']['默认路径']
         self.output_dir = self.config['路径配置']['输出目录']['完整路径']
         self.tts_urls = [service['URL'] for service in self.config['API配置']['多API服务']['服务列表']]
+        self.router = ConsistentHashRouter(self.tts_urls)
         
         # 重新部署后的延迟配置
         self.base_delay = 3.0  # 基础延迟（秒）
@@ -83,8 +89,9 @@ class RedeployedBatchProcessor:
         else:
             return emotions['Friendly']  # 默认配置
     
-    def generate_audio_with_retry(self, text, voice, emotion, output_file, max_retries=3):
+    def generate_audio_with_retry(self, text, voice, emotion, output_file, max_retries=3, route_key=None):
         """带重试机制的音频生成 - 重新部署模式"""
+        failed_urls = set()
         for attempt in range(max_retries):
             try:
                 # 重新部署后的延迟
@@ -97,8 +104,7 @@ class RedeployedBatchProcessor:
                     delay = self.current_delay + random.uniform(0, 1)
                     time.sleep(delay)
                 
-                # 随机选择 API 服务
-                api_url = random.choice(self.tts_urls)
+                api_url = None  # 发送时按一致性哈希选定
                 
                 # 获取情绪配置
                 emotion_config = self.get_emotion_config(emotion)
@@ -116,12 +122,15 @@ class RedeployedBatchProcessor:
                     }]
                 }
                 
-                # 发送请求
-                response = requests.post(
-                    f'{api_url}/generate',
-                    json=data,
-                    timeout=90
-                )
+                # 发送请求：同一产品+语音固定路由到同一实例，实例过载时顺延；重试时避开已失败的实例
+                with self.router.route(route_key or voice, exclude=failed_urls) as api_url:
+                    response = requests.post(
+                        f'{api_url}/generate',
+                        json=data,
+                        timeout=90
+                    )
+                if response.status_code != 200 or len(response.content) < 1000:
+                    failed_urls.add(api_url)
                 
                 if response.status_code == 200:
                     # 检查响应内容长度
@@ -151,6 +160,8 @@ class RedeployedBatchProcessor:
                         
             except Exception as e:
                 print(f"❌ 生成失败 (尝试 {attempt + 1}/{max_retries}): {e}")
+                if api_url:
+                    failed_urls.add(api_url)
                 if attempt < max_retries - 1:
                     self.current_delay = min(self.current_delay + self.delay_increment, self.max_delay)
                     continue
@@ -196,7 +207,7 @@ class RedeployedBatchProcessor:
                 output_file = os.path.join(self.output_dir, f"{file_base}_{voice.split('-')[-1]}", output_filename)
                 
                 # 生成音频
-                if self.generate_audio_with_retry(text, voice, emotion, output_file):
+                if self.generate_audio_with_retry(text, voice, emotion, output_file, route_key=f"{file_base}|{voice}"):
                     success_count += 1
                 else:
                     error_count += 1
@@ -226,6 +237,7 @@ class RedeployedBatchProcessor:
             return False
         
         self.tts_urls = available_services
+        self.router = ConsistentHashRouter(self.tts_urls)
         print(f"🎯 使用 {len(self.tts_urls)} 个 TTS 服务")
         
         # 获取所有 Excel 文件
@@ -257,6 +269,7 @@ class RedeployedBatchProcessor:
         print(f"📊 统计: {total_success}/{total_files} 文件成功处理")
         print(f"✅ 成功: {self.success_count} 个音频")
         print(f"❌ 失败: {self.error_count} 个音频")
+        print(f"🧭 实例分配: {self.router.snapshot()['routed']} (溢出 {self.router.spills} 次)")
         
         return total_success > 0
 
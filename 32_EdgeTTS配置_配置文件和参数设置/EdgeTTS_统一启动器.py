@@ -28,6 +28,10 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 import glob
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "24_队列处理器_批量音频生成队列管理"))
+from consistent_hash_一致性哈希路由 import ConsistentHashRouter
 
 class EdgeTTSUnifiedManager:
     """EdgeTTS 统一管理器 - 仅在TT_Live_AI_TTS项目内操作"""
@@ -50,8 +54,6 @@ class EdgeTTSUnifiedManager:
         
         # 线程锁
         self.lock = threading.Lock()
-        self.url_lock = threading.Lock()
-        self.current_url_index = 0
         
     def load_config(self) -> Dict:
         """加载配置文件"""
@@ -121,16 +123,12 @@ class EdgeTTSUnifiedManager:
             self.tts_urls = [self.config["API配置"]["单API模式"]["URL"]]
             self.max_workers = 8
         
+        # 同一产品+语音固定路由到同一实例（一致性哈希，实例过载时顺延）
+        self.router = ConsistentHashRouter(self.tts_urls)
+        
         print(f"🌐 API服务数量: {len(self.tts_urls)}")
         print(f"🧵 最大线程数: {self.max_workers}")
     
-    def get_next_tts_url(self) -> str:
-        """获取下一个可用的 TTS URL（轮询策略）"""
-        with self.url_lock:
-            url = self.tts_urls[self.current_url_index]
-            self.current_url_index = (self.current_url_index + 1) % len(self.tts_urls)
-            return url
-    
     def check_tts_services(self) -> bool:
         """检查所有 TTS 服务状态"""
         available_services = []
@@ -149,6 +147,7 @@ class EdgeTTSUnifiedManager:
         
         if available_services:
             self.tts_urls = available_services
+            self.router = ConsistentHashRouter(self.tts_urls)
             print(f"🎯 可用服务数量: {len(available_services)}")
             return True
         else:
@@ -188,8 +187,8 @@ class EdgeTTSUnifiedManager:
             "voice": config.get("voice", "en-US-JennyNeural")
         }
     
-    def generate_audio(self, text: str, emotion: str, output_file: str) -> bool:
-        """生成单个音频文件"""
+    def generate_audio(self, text: str, emotion: str, output_file: str, product_name: Optional[str] = None) -> bool:
+        """生成单个音频文件（product_name 用于实例亲和路由）"""
         try:
             config = self.get_emotion_config(emotion)
             
@@ -206,11 +205,10 @@ class EdgeTTSUnifiedManager:
                 }]
             }
             
-            # 使用轮询策略选择 TTS URL
-            tts_url = self.get_next_tts_url()
-            
-            # 发送请求
-            response = requests.post(f"{tts_url}/generate", json=data, timeout=60)
+            # 按产品+语音一致性哈希选择 TTS URL，让实例上的语音状态和连接保持预热
+            route_key = f"{product_name}|{config['voice']}" if product_name else config["voice"]
+            with self.router.route(route_key) as tts_url:
+                response = requests.post(f"{tts_url}/generate", json=data, timeout=60)
             
             if response.status_code == 200:
                 content_length = len(response.content)
@@ -272,7 +270,8 @@ class EdgeTTSUnifiedManager:
                     'emotion': emotion,
                     'output_file': output_file,
                     'index': index,
-                    'total_count': len(df)
+                    'total_count': len(df),
+                    'product_name': filename.split('.')[0]
                 })
             
             print(f"📝 记录数量: {len(batch_data)} 条")
@@ -321,6 +320,7 @@ class EdgeTTSUnifiedManager:
             
             print(f"\n🎉 文件处理完成!")
             print(f"✅ 成功: {success_count}/{len(batch_data)} 个音频文件")
+            print(f"🧭 实例分配: {self.router.snapshot()['routed']} (溢出 {self.router.spills} 次)")
             print(f"⏰ 用时: {str(total_time).split('.')[0]}")
             print(f"📊 平均速度: {len(batch_data)/total_time.total_seconds():.1f} 条/秒")
             
@@ -341,7 +341,7 @@ class EdgeTTSUnifiedManager:
             index = item['index']
             total_count = item['total_count']
             
-            if self.generate_audio(text, emotion, output_file):
+            if self.generate_audio(text, emotion, output_file, item.get('product_name')):
                 success_count += 1
                 with self.lock:
                     print(f"[{index+1:04d}/{total_count}] ✅ {emotion:12s}")
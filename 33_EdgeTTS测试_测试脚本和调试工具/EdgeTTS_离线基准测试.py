@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+EdgeTTS 离线端到端基准测试
+启动本地模拟上游（EdgeTTS_离线模拟上游.py），在进程内加载真实的
+run_tts_TTS语音合成服务.py 并走完整的 /generate 路径，输出：
+- 脚本吞吐量 (scripts/sec)
+- 单条脚本与单次请求的 p50/p95/p99 延迟
+- 每条脚本的CPU耗时（仅统计服务进程，模拟上游运行在独立子进程）
+
+用法示例:
+    python3 EdgeTTS_离线基准测试.py --requests 20 --batch-size 50 --parallel 2 \\
+        --latency-ms 300 --error-rate 0.01 --output bench.json
+未识别的参数会原样转发给模拟上游。
+"""
+import argparse
+import importlib.util
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+SERVICE_PATH = PROJECT_ROOT / "02_TTS服务_语音合成系统" / "run_tts_TTS语音合成服务.py"
+UPSTREAM_PATH = Path(__file__).resolve().parent / "EdgeTTS_离线模拟上游.py"
+
+SAMPLE_SENTENCES = [
+    "Hey everyone, welcome back to the live room!",
+    "This serum is honestly the one thing I reach for every single morning.",
+    "Look at how smooth the texture is when I blend it in.",
+    "We only have a few sets left at this price, so grab yours now.",
+    "If you have sensitive skin, this one is super gentle.",
+    "Tap the little cart below and it's yours in seconds.",
+    "I've been using it for three weeks and the difference is real.",
+    "Drop a heart if you want me to show the before and after again."
+]
+EMOTIONS = ["Friendly", "Excited", "Confident", "Calm", "Urgent", "Playful"]
+
+
+def percentile(sorted_values, pct):
+    """最近秩法百分位数（输入须已排序）"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def latency_summary(values):
+    ordered = sorted(values)
+    return {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2) if ordered else 0.0,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 2),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 2),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2) if ordered else 0.0
+    }
+
+
+def find_free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def fetch_json(url, timeout=2):
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return json.loads(response.read().decode("utf-8"))
+
+
+def start_upstream(port, upstream_args):
+    """以子进程启动模拟上游并等待就绪"""
+    cmd = [sys.executable, str(UPSTREAM_PATH), "--port", str(port)] + upstream_args
+    process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    deadline = time.time() + 15
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"模拟上游启动失败: {process.stderr.read().decode(errors='replace')}")
+        try:
+            fetch_json(f"http://127.0.0.1:{port}/stats")
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("等待模拟上游就绪超时")
+
+
+def load_service(upstream_port):
+    """以独立模块名加载TTS服务，并将EdgeTTS上游指向模拟服务"""
+    os.environ["EDGE_TTS_WSS_URL"] = f"ws://127.0.0.1:{upstream_port}/edge/v1?TrustedClientToken=offline"
+    spec = importlib.util.spec_from_file_location("tts_service_under_bench", SERVICE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def build_scripts(rng, count, target_chars):
+    scripts = []
+    for _ in range(count):
+        text = ""
+        while len(text) < target_chars:
+            text = f"{text} {rng.choice(SAMPLE_SENTENCES)}".strip()
+        scripts.append({"english_script": text, "emotion": rng.choice(EMOTIONS)})
+    return scripts
+
+
+class ServiceBenchmark:
+    """在进程内驱动真实 /generate 路径并收集延迟"""
+
+    def __init__(self, service, args):
+        self.service = service
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.script_latencies = []
+        self.request_latencies = []
+        self.request_errors = 0
+        self.successful_scripts = 0
+        self.failed_scripts = 0
+        self.lock = threading.Lock()
+        self._instrument_generate()
+
+    def _instrument_generate(self):
+        """包装 generate_single_audio 以记录单条脚本延迟"""
+        original = self.service.generate_single_audio
+
+        async def timed_generate_single_audio(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await original(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                with self.lock:
+                    self.script_latencies.append(elapsed)
+
+        self.service.generate_single_audio = timed_generate_single_audio
+
+    def run_request(self, request_index, record=True):
+        payload = {
+            "product_name": f"Bench_{request_index:04d}",
+            "scripts": build_scripts(self.rng, self.args.batch_size, self.args.script_chars),
+            "voice": "en-US-JennyNeural"
+        }
+        client = self.service.app.test_client()
+        start = time.perf_counter()
+        response = client.post("/generate", json=payload)
+        elapsed = time.perf_counter() - start
+        if not record:
+            return
+
+        with self.lock:
+            self.request_latencies.append(elapsed)
+            if response.status_code != 200:
+                self.request_errors += 1
+                self.failed_scripts += self.args.batch_size
+                return
+            summary = response.get_json().get("summary", {})
+            self.successful_scripts += summary.get("successful", 0)
+            self.failed_scripts += summary.get("failed", 0)
+
+    def run(self):
+        for i in range(self.args.warmup_requests):
+            self.run_request(-1 - i, record=False)
+        with self.lock:
+            self.script_latencies.clear()
+
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.args.parallel) as executor:
+            list(executor.map(self.run_request, range(self.args.requests)))
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+
+        total_scripts = self.successful_scripts + self.failed_scripts
+        return {
+            "wall_seconds": round(wall, 3),
+            "total_scripts": total_scripts,
+            "successful_scripts": self.successful_scripts,
+            "failed_scripts": self.failed_scripts,
+            "request_errors": self.request_errors,
+            "scripts_per_second": round(self.successful_scripts / wall, 3) if wall > 0 else 0.0,
+            "cpu_seconds": round(cpu, 3),
+            "cpu_ms_per_script": round(cpu / total_scripts * 1000, 3) if total_scripts else 0.0,
+            "script_latency": latency_summary(self.script_latencies),
+            "request_latency": latency_summary(self.request_latencies)
+        }
+
+
+def print_report(report):
+    result = report["result"]
+    print("\n" + "=" * 60)
+    print("📊 EdgeTTS 离线基准测试结果")
+    print("=" * 60)
+    print(f"⏱️  总耗时: {result['wall_seconds']}s")
+    print(f"✅ 成功脚本: {result['successful_scripts']} / {result['total_scripts']}")
+    print(f"🚀 吞吐量: {result['scripts_per_second']} scripts/sec")
+    print(f"🧠 CPU: {result['cpu_ms_per_script']} ms/script (共 {result['cpu_seconds']}s)")
+    for label, key in (("单条脚本延迟", "script_latency"), ("单次请求延迟", "request_latency")):
+        stats = result[key]
+        print(f"📈 {label}: p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms p99={stats['p99_ms']}ms max={stats['max_ms']}ms")
+    upstream = report.get("upstream", {})
+    print(f"🧪 模拟上游: 合成 {upstream.get('syntheses', 0)} 次, 拒绝 {upstream.get('rejected', 0)}, "
+          f"错误 {upstream.get('errors', 0)}, 卡顿 {upstream.get('stalls', 0)}")
+    print("=" * 60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EdgeTTS 离线端到端基准测试（未识别参数转发给模拟上游）")
+    parser.add_argument("--requests", type=int, default=10, help="计入统计的 /generate 请求数")
+    parser.add_argument("--batch-size", type=int, default=50, help="每个请求的脚本数")
+    parser.add_argument("--parallel", type=int, default=1, help="同时进行的 /generate 请求数")
+    parser.add_argument("--warmup-requests", type=int, default=1, help="不计入统计的预热请求数")
+    parser.add_argument("--script-chars", type=int, default=180, help="每条脚本的目标字符数")
+    parser.add_argument("--max-concurrent", type=int, default=0, help="覆盖服务的 MAX_CONCURRENT（0 表示保持默认）")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workdir", help="服务输出目录（默认使用临时目录并在结束后删除）")
+    parser.add_argument("--output", help="将结果写入 JSON 文件")
+    args, upstream_args = parser.parse_known_args()
+
+    output_path = Path(args.output).resolve() if args.output else None
+    workdir = Path(args.workdir).resolve() if args.workdir else Path(tempfile.mkdtemp(prefix="tts_bench_"))
+    workdir.mkdir(parents=True, exist_ok=True)
+
+    port = find_free_port()
+    print(f"🧪 启动模拟上游: 端口 {port}, 参数 {' '.join(upstream_args) or '(默认)'}")
+    upstream = start_upstream(port, upstream_args)
+    original_cwd = os.getcwd()
+    try:
+        os.chdir(workdir)
+        service = load_service(port)
+        if args.max_concurrent:
+            service.runtime_state.set_max_concurrent(args.max_concurrent)
+
+        print(f"🚀 开始基准测试: {args.requests} 请求 × {args.batch_size} 脚本, 并行 {args.parallel}")
+        result = ServiceBenchmark(service, args).run()
+        report = {
+            "timestamp": datetime.now().isoformat(),
+            "config": {
+                **{k: v for k, v in vars(args).items() if k not in ("workdir", "output")},
+                "service_max_concurrent": service.runtime_state.max_concurrent,
+                "upstream_args": upstream_args
+            },
+            "result": result,
+            "upstream": fetch_json(f"http://127.0.0.1:{port}/stats")
+        }
+    finally:
+        os.chdir(original_cwd)
+        upstream.terminate()
+        upstream.wait(timeout=10)
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(report)
+    if output_path:
+        output_path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"💾 结果已保存: {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+EdgeTTS 离线模拟上游
+模拟 edge_tts 使用的 WebSocket 语音合成接口，用于离线基准测试和压测：
+- 可配置延迟分布（fixed / uniform / lognormal）及按字符计的合成耗时
+- 故障注入：握手拒绝(503)、中途断开、长时间卡顿
+- 可配置音频负载大小（输出合法的静音 MP3 帧）
+
+TTS服务通过环境变量 EDGE_TTS_WSS_URL 指向本模拟服务：
+    EDGE_TTS_WSS_URL="ws://127.0.0.1:8765/edge/v1?TrustedClientToken=offline"
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import random
+import re
+import time
+import uuid
+from dataclasses import dataclass, asdict
+
+from aiohttp import web, WSMsgType
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# MPEG-2 Layer III, 48kbps, 24kHz, 单声道 —— 与 EdgeTTS 默认输出格式一致
+# (audio-24khz-48kbitrate-mono-mp3)，每帧 144 字节 / 576 采样 = 24ms
+MP3_FRAME_HEADER = bytes([0xFF, 0xF3, 0x64, 0xC4])
+MP3_FRAME_BYTES = 144
+MP3_FRAME_MS = 24
+SILENT_MP3_FRAME = MP3_FRAME_HEADER + bytes(MP3_FRAME_BYTES - len(MP3_FRAME_HEADER))
+
+
+@dataclass
+class FakeUpstreamConfig:
+    """模拟上游配置"""
+    latency_dist: str = "lognormal"   # fixed / uniform / lognormal
+    latency_ms: float = 400.0          # fixed: 固定值; lognormal: 中位数; uniform: 下限
+    latency_max_ms: float = 1200.0     # uniform 上限
+    latency_sigma: float = 0.5         # lognormal 形状参数
+    ms_per_char: float = 2.0           # 按文本长度追加的合成耗时
+    reject_rate: float = 0.0           # 握手阶段返回 503 的概率
+    error_rate: float = 0.0            # 发送音频前断开连接的概率
+    stall_rate: float = 0.0            # 额外卡顿的概率
+    stall_ms: float = 15000.0          # 卡顿时长
+    audio_ms_per_char: float = 65.0    # 每字符对应的音频时长（约15字符/秒）
+    payload_bytes: int = 0             # >0 时使用固定负载大小，忽略 audio_ms_per_char
+    chunk_bytes: int = 4096            # 每个二进制消息的音频字节数
+    seed: int = 0                      # 随机种子，0 表示不固定
+
+
+class FakeEdgeTTSUpstream:
+    """EdgeTTS WebSocket 协议的最小实现"""
+
+    def __init__(self, config: FakeUpstreamConfig):
+        self.config = config
+        self.random = random.Random(config.seed or None)
+        self.started_at = time.time()
+        self.stats = {
+            "connections": 0,
+            "syntheses": 0,
+            "rejected": 0,
+            "errors": 0,
+            "stalls": 0,
+            "audio_bytes": 0,
+            "characters": 0
+        }
+
+    def sample_latency_ms(self, text_length):
+        """按配置的分布采样一次合成延迟"""
+        cfg = self.config
+        if cfg.latency_dist == "fixed":
+            base = cfg.latency_ms
+        elif cfg.latency_dist == "uniform":
+            base = self.random.uniform(cfg.latency_ms, cfg.latency_max_ms)
+        else:
+            base = self.random.lognormvariate(math.log(max(cfg.latency_ms, 1.0)), cfg.latency_sigma)
+        return base + cfg.ms_per_char * text_length
+
+    def build_audio(self, text_length):
+        """生成静音 MP3 帧作为音频负载"""
+        if self.config.payload_bytes > 0:
+            frames = max(1, math.ceil(self.config.payload_bytes / MP3_FRAME_BYTES))
+        else:
+            frames = max(1, math.ceil(text_length * self.config.audio_ms_per_char / MP3_FRAME_MS))
+        return SILENT_MP3_FRAME * frames
+
+    @staticmethod
+    def parse_text_message(message):
+        """拆分 'Header:Value\\r\\n...\\r\\n\\r\\nbody' 格式的文本消息"""
+        head, _, body = message.partition("\r\n\r\n")
+        headers = {}
+        for line in head.split("\r\n"):
+            key, _, value = line.partition(":")
+            headers[key.strip()] = value.strip()
+        return headers, body
+
+    @staticmethod
+    def ssml_text_length(ssml):
+        """去掉 SSML 标签后的文本长度"""
+        return len(re.sub(r"<[^>]+>", "", ssml).strip())
+
+    @staticmethod
+    def text_message(request_id, path, body):
+        return (
+            f"X-RequestId:{request_id}\r\n"
+            f"Content-Type:application/json; charset=utf-8\r\n"
+            f"Path:{path}\r\n\r\n{json.dumps(body)}"
+        )
+
+    @staticmethod
+    def audio_message(request_id, chunk):
+        header = (
+            f"X-RequestId:{request_id}\r\n"
+            f"Content-Type:audio/mpeg\r\n"
+            f"X-StreamId:{uuid.uuid4().hex}\r\n"
+            f"Path:audio\r\n"
+        ).encode()
+        return len(header).to_bytes(2, "big") + header + chunk
+
+    async def handle_websocket(self, request):
+        self.stats["connections"] += 1
+        if self.random.random() < self.config.reject_rate:
+            self.stats["rejected"] += 1
+            return web.Response(status=503, text="injected rejection")
+
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+
+        async for message in ws:
+            if message.type != WSMsgType.TEXT:
+                continue
+            headers, body = self.parse_text_message(message.data)
+            if headers.get("Path") != "ssml":
+                continue  # speech.config 等无需响应
+            keep_open = await self.synthesize(ws, headers.get("X-RequestId", uuid.uuid4().hex), body)
+            if not keep_open:
+                break
+        return ws
+
+    async def synthesize(self, ws, request_id, ssml):
+        """响应一次 ssml 请求；返回 False 表示已注入断线"""
+        cfg = self.config
+        text_length = self.ssml_text_length(ssml)
+        self.stats["syntheses"] += 1
+        self.stats["characters"] += text_length
+
+        await ws.send_str(self.text_message(request_id, "turn.start", {"context": {"serviceTag": "offline"}}))
+
+        delay_ms = self.sample_latency_ms(text_length)
+        if self.random.random() < cfg.stall_rate:
+            self.stats["stalls"] += 1
+            delay_ms += cfg.stall_ms
+        await asyncio.sleep(delay_ms / 1000)
+
+        if self.random.random() < cfg.error_rate:
+            self.stats["errors"] += 1
+            await ws.close(code=1011, message=b"injected failure")
+            return False
+
+        audio = self.build_audio(text_length)
+        for offset in range(0, len(audio), cfg.chunk_bytes):
+            await ws.send_bytes(self.audio_message(request_id, audio[offset:offset + cfg.chunk_bytes]))
+        self.stats["audio_bytes"] += len(audio)
+
+        await ws.send_str(self.text_message(request_id, "turn.end", {}))
+        return True
+
+    async def handle_stats(self, request):
+        return web.json_response({
+            "uptime_seconds": round(time.time() - self.started_at, 3),
+            "config": asdict(self.config),
+            **self.stats
+        })
+
+    def create_app(self):
+        app = web.Application()
+        app.router.add_get("/edge/v1", self.handle_websocket)
+        app.router.add_get("/stats", self.handle_stats)
+        return app
+
+
+def build_arg_parser():
+    defaults = FakeUpstreamConfig()
+    parser = argparse.ArgumentParser(description="EdgeTTS 离线模拟上游")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-dist", choices=["fixed", "uniform", "lognormal"], default=defaults.latency_dist)
+    parser.add_argument("--latency-ms", type=float, default=defaults.latency_ms)
+    parser.add_argument("--latency-max-ms", type=float, default=defaults.latency_max_ms)
+    parser.add_argument("--latency-sigma", type=float, default=defaults.latency_sigma)
+    parser.add_argument("--ms-per-char", type=float, default=defaults.ms_per_char)
+    parser.add_argument("--reject-rate", type=float, default=defaults.reject_rate)
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate)
+    parser.add_argument("--stall-rate", type=float, default=defaults.stall_rate)
+    parser.add_argument("--stall-ms", type=float, default=defaults.stall_ms)
+    parser.add_argument("--audio-ms-per-char", type=float, default=defaults.audio_ms_per_char)
+    parser.add_argument("--payload-bytes", type=int, default=defaults.payload_bytes)
+    parser.add_argument("--chunk-bytes", type=int, default=defaults.chunk_bytes)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    return parser
+
+
+def config_from_args(args):
+    return FakeUpstreamConfig(
+        latency_dist=args.latency_dist,
+        latency_ms=args.latency_ms,
+        latency_max_ms=args.latency_max_ms,
+        latency_sigma=args.latency_sigma,
+        ms_per_char=args.ms_per_char,
+        reject_rate=args.reject_rate,
+        error_rate=args.error_rate,
+        stall_rate=args.stall_rate,
+        stall_ms=args.stall_ms,
+        audio_ms_per_char=args.audio_ms_per_char,
+        payload_bytes=args.payload_bytes,
+        chunk_bytes=args.chunk_bytes,
+        seed=args.seed
+    )
+
+
+def main():
+    args = build_arg_parser().parse_args()
+    upstream = FakeEdgeTTSUpstream(config_from_args(args))
+    logger.info(f"🧪 EdgeTTS 离线模拟上游启动: ws://{args.host}:{args.port}/edge/v1")
+    logger.info(f"💡 TTS服务配置: EDGE_TTS_WSS_URL=\"ws://{args.host}:{args.port}/edge/v1?TrustedClientToken=offline\"")
+    logger.info(f"📊 统计接口: http://{args.host}:{args.port}/stats")
+    web.run_app(upstream.create_app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
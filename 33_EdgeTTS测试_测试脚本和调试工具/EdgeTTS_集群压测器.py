@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+EdgeTTS 集群压测器
+对 5001-5003 等多个TTS服务实例的 /generate 接口施加负载：
+- 两种负载模型：固定到达率（开环, --rate）或固定并发（闭环, --concurrency）
+- 批次大小混合（--batch-mix "1:0.5,5:0.3,20:0.2"）
+- 预热阶段与稳态阶段分开统计，只有稳态阶段计入结果
+- 修正协调遗漏(coordinated omission)的延迟直方图：
+  开环模式以"计划发送时间"为起点计时；闭环模式按期望间隔补录缺失样本
+- 按实例拆分统计，结果写入 JSON 便于跨次对比
+
+既可压测真实服务，也可配合离线模拟上游使用（--launch-offline-cluster 会自动启动
+EdgeTTS_离线模拟上游.py 及指向它的本地服务实例）。
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+import urllib.request
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import urlparse
+
+import aiohttp
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+SERVICE_PATH = PROJECT_ROOT / "02_TTS服务_语音合成系统" / "run_tts_TTS语音合成服务.py"
+UPSTREAM_PATH = Path(__file__).resolve().parent / "EdgeTTS_离线模拟上游.py"
+
+DEFAULT_ENDPOINTS = [
+    "http://127.0.0.1:5001",
+    "http://127.0.0.1:5002",
+    "http://127.0.0.1:5003"
+]
+
+SAMPLE_SENTENCES = [
+    "Hey everyone, welcome back to the live room!",
+    "This serum is honestly the one thing I reach for every single morning.",
+    "We only have a few sets left at this price, so grab yours now.",
+    "Tap the little cart below and it's yours in seconds.",
+    "I've been using it for three weeks and the difference is real."
+]
+
+REPORT_PERCENTILES = [50, 90, 95, 99, 99.9]
+
+
+class LatencyHistogram:
+    """对数分桶延迟直方图（相对精度约1%，可合并）"""
+
+    PRECISION = 1.01
+    MIN_VALUE_US = 1
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.max_us = 0
+        self.total_us = 0
+
+    def _index(self, value_us):
+        return int(math.log(max(value_us, self.MIN_VALUE_US)) / math.log(self.PRECISION))
+
+    def _bucket_value(self, index):
+        return self.PRECISION ** (index + 1)
+
+    def record(self, value_seconds, count=1):
+        value_us = max(int(value_seconds * 1_000_000), self.MIN_VALUE_US)
+        index = self._index(value_us)
+        self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += count
+        self.total_us += value_us * count
+        self.max_us = max(self.max_us, value_us)
+
+    def record_corrected(self, value_seconds, expected_interval_seconds):
+        """闭环修正：延迟超过期望间隔时，补录本应发出却被阻塞的请求样本"""
+        self.record(value_seconds)
+        if expected_interval_seconds <= 0:
+            return
+        missing = value_seconds - expected_interval_seconds
+        while missing >= expected_interval_seconds:
+            self.record(missing)
+            missing -= expected_interval_seconds
+
+    def merge(self, other):
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += other.count
+        self.total_us += other.total_us
+        self.max_us = max(self.max_us, other.max_us)
+
+    def percentile_ms(self, pct):
+        if not self.count:
+            return 0.0
+        target = math.ceil(pct / 100 * self.count)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= target:
+                return round(min(self._bucket_value(index), self.max_us) / 1000, 2)
+        return round(self.max_us / 1000, 2)
+
+    def summary(self):
+        result = {
+            "count": self.count,
+            "mean_ms": round(self.total_us / self.count / 1000, 2) if self.count else 0.0,
+            "max_ms": round(self.max_us / 1000, 2)
+        }
+        for pct in REPORT_PERCENTILES:
+            result[f"p{pct:g}_ms"] = self.percentile_ms(pct)
+        return result
+
+
+class EndpointStats:
+    """单个实例在稳态阶段的统计"""
+
+    def __init__(self):
+        self.latency = LatencyHistogram()            # 修正协调遗漏后的延迟
+        self.service_time = LatencyHistogram()       # 未修正的纯服务时间
+        self.requests = 0
+        self.errors = 0
+        self.scripts_ok = 0
+        self.scripts_failed = 0
+        self.status_codes = {}
+
+    def merge(self, other):
+        self.latency.merge(other.latency)
+        self.service_time.merge(other.service_time)
+        self.requests += other.requests
+        self.errors += other.errors
+        self.scripts_ok += other.scripts_ok
+        self.scripts_failed += other.scripts_failed
+        for code, count in other.status_codes.items():
+            self.status_codes[code] = self.status_codes.get(code, 0) + count
+
+    def to_dict(self, duration):
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "error_rate": round(self.errors / self.requests, 4) if self.requests else 0.0,
+            "requests_per_second": round(self.requests / duration, 3) if duration else 0.0,
+            "scripts_ok": self.scripts_ok,
+            "scripts_failed": self.scripts_failed,
+            "scripts_per_second": round(self.scripts_ok / duration, 3) if duration else 0.0,
+            "status_codes": self.status_codes,
+            "latency": self.latency.summary(),
+            "service_time": self.service_time.summary()
+        }
+
+
+def parse_batch_mix(spec):
+    """解析 "1:0.5,5:0.3,20:0.2" 形式的批次大小权重"""
+    sizes, weights = [], []
+    for part in spec.split(","):
+        size, _, weight = part.partition(":")
+        sizes.append(int(size))
+        weights.append(float(weight or 1))
+    return sizes, weights
+
+
+class ClusterLoadTester:
+    """开环/闭环负载生成器"""
+
+    def __init__(self, args):
+        self.args = args
+        self.endpoints = [url.rstrip("/") for url in args.endpoints]
+        self.batch_sizes, self.batch_weights = parse_batch_mix(args.batch_mix)
+        self.rng = random.Random(args.seed)
+        self.stats = {url: EndpointStats() for url in self.endpoints}
+        self.next_endpoint = 0
+        self.request_counter = 0
+        self.steady_start = None
+        self.steady_end = None
+        self.max_inflight = asyncio.Semaphore(args.max_inflight)
+
+    def pick_endpoint(self):
+        url = self.endpoints[self.next_endpoint % len(self.endpoints)]
+        self.next_endpoint += 1
+        return url
+
+    def build_payload(self):
+        self.request_counter += 1
+        batch_size = self.rng.choices(self.batch_sizes, weights=self.batch_weights)[0]
+        scripts = [
+            {"english_script": " ".join(self.rng.sample(SAMPLE_SENTENCES, 2)), "emotion": "Friendly"}
+            for _ in range(batch_size)
+        ]
+        return batch_size, {
+            "product_name": f"LoadTest_{self.request_counter:06d}",
+            "voice": "en-US-JennyNeural",
+            "scripts": scripts
+        }
+
+    def in_steady_state(self, timestamp):
+        return self.steady_start <= timestamp < self.steady_end
+
+    async def send(self, session, intended_start, expected_interval=0.0):
+        """发送一次请求；intended_start 为计划发送时间（开环修正的计时起点）"""
+        url = self.pick_endpoint()
+        batch_size, payload = self.build_payload()
+        async with self.max_inflight:
+            actual_start = time.perf_counter()
+            status, ok_scripts, failed_scripts = "error", 0, batch_size
+            try:
+                async with session.post(f"{url}/generate", json=payload) as response:
+                    status = str(response.status)
+                    if response.status == 200:
+                        summary = (await response.json()).get("summary", {})
+                        ok_scripts = summary.get("successful", 0)
+                        failed_scripts = summary.get("failed", 0)
+                    else:
+                        await response.read()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                status = type(e).__name__
+            finished = time.perf_counter()
+
+        if not self.in_steady_state(intended_start):
+            return
+
+        stats = self.stats[url]
+        stats.requests += 1
+        stats.status_codes[status] = stats.status_codes.get(status, 0) + 1
+        if status != "200":
+            stats.errors += 1
+        stats.scripts_ok += ok_scripts
+        stats.scripts_failed += failed_scripts
+        stats.service_time.record(finished - actual_start)
+        if expected_interval:
+            stats.latency.record_corrected(finished - intended_start, expected_interval)
+        else:
+            stats.latency.record(finished - intended_start)
+
+    async def run_open_loop(self, session, end_time):
+        """固定到达率：按计划时间发出请求，不等待前一个请求完成"""
+        interval = 1.0 / self.args.rate
+        tasks = []
+        next_send = time.perf_counter()
+        while next_send < end_time:
+            delay = next_send - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(self.send(session, next_send)))
+            next_send += interval
+        await asyncio.gather(*tasks)
+
+    async def run_closed_loop(self, session, end_time):
+        """固定并发：每个虚拟用户完成一次请求后立即发下一次"""
+        expected_interval = self.args.expected_interval_ms / 1000 if self.args.expected_interval_ms else 0.0
+
+        async def virtual_user():
+            while time.perf_counter() < end_time:
+                await self.send(session, time.perf_counter(), expected_interval)
+
+        await asyncio.gather(*(virtual_user() for _ in range(self.args.concurrency)))
+
+    async def run(self):
+        timeout = aiohttp.ClientTimeout(total=self.args.request_timeout, sock_connect=10)
+        connector = aiohttp.TCPConnector(limit=0)
+        start = time.perf_counter()
+        self.steady_start = start + self.args.warmup
+        self.steady_end = self.steady_start + self.args.duration
+        print(f"🔥 预热 {self.args.warmup}s，随后稳态 {self.args.duration}s")
+
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+            if self.args.rate:
+                await self.run_open_loop(session, self.steady_end)
+            else:
+                await self.run_closed_loop(session, self.steady_end)
+
+        return self.build_report()
+
+    def build_report(self):
+        duration = self.args.duration
+        overall = EndpointStats()
+        for stats in self.stats.values():
+            overall.merge(stats)
+        return {
+            "timestamp": datetime.now().isoformat(),
+            "config": {
+                "mode": "open_loop" if self.args.rate else "closed_loop",
+                "endpoints": self.endpoints,
+                "rate": self.args.rate,
+                "concurrency": self.args.concurrency,
+                "batch_mix": self.args.batch_mix,
+                "warmup_seconds": self.args.warmup,
+                "steady_seconds": duration,
+                "expected_interval_ms": self.args.expected_interval_ms,
+                "seed": self.args.seed
+            },
+            "overall": overall.to_dict(duration),
+            "endpoints": {url: stats.to_dict(duration) for url, stats in self.stats.items()}
+        }
+
+
+def launch_offline_cluster(endpoints, upstream_args):
+    """启动离线模拟上游及指向它的本地服务实例，返回子进程列表"""
+    upstream_port = 8765
+    processes = [subprocess.Popen(
+        [sys.executable, str(UPSTREAM_PATH), "--port", str(upstream_port)] + upstream_args,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )]
+    env = dict(os.environ, EDGE_TTS_WSS_URL=f"ws://127.0.0.1:{upstream_port}/edge/v1?TrustedClientToken=offline")
+    for url in endpoints:
+        port = urlparse(url).port
+        processes.append(subprocess.Popen(
+            [sys.executable, str(SERVICE_PATH), "--port", str(port)],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        ))
+
+    deadline = time.time() + 60
+    pending = list(endpoints)
+    while pending and time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"{pending[0].rstrip('/')}/health", timeout=2)
+            print(f"✅ 实例就绪: {pending.pop(0)}")
+        except OSError:
+            time.sleep(0.5)
+    if pending:
+        stop_processes(processes)
+        raise RuntimeError(f"本地实例启动超时: {pending}")
+    return processes
+
+
+def stop_processes(processes):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def print_report(report):
+    print("\n" + "=" * 70)
+    print(f"📊 压测结果 ({report['config']['mode']})")
+    print("=" * 70)
+    rows = [("总计", report["overall"])] + list(report["endpoints"].items())
+    for name, data in rows:
+        latency = data["latency"]
+        print(f"{name}: {data['requests']} 请求, 错误率 {data['error_rate']*100:.2f}%, "
+              f"{data['scripts_per_second']} scripts/s")
+        print(f"  └─ 延迟 p50={latency['p50_ms']}ms p95={latency['p95_ms']}ms "
+              f"p99={latency['p99_ms']}ms p99.9={latency['p99.9_ms']}ms max={latency['max_ms']}ms")
+    print("=" * 70)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EdgeTTS 集群压测器（未识别参数转发给离线模拟上游）")
+    parser.add_argument("--endpoints", nargs="+", default=DEFAULT_ENDPOINTS, help="服务实例根地址")
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument("--rate", type=float, default=0.0, help="开环模式：每秒到达的请求数")
+    load.add_argument("--concurrency", type=int, default=3, help="闭环模式：并发虚拟用户数")
+    parser.add_argument("--batch-mix", default="1:0.5,5:0.3,20:0.2", help="批次大小:权重，逗号分隔")
+    parser.add_argument("--warmup", type=float, default=30.0, help="预热秒数（不计入统计）")
+    parser.add_argument("--duration", type=float, default=120.0, help="稳态秒数")
+    parser.add_argument("--expected-interval-ms", type=float, default=0.0,
+                        help="闭环模式的期望请求间隔，用于修正协调遗漏（0 表示不修正）")
+    parser.add_argument("--max-inflight", type=int, default=1000, help="客户端最大在途请求数")
+    parser.add_argument("--request-timeout", type=float, default=600.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--launch-offline-cluster", action="store_true",
+                        help="自动启动离线模拟上游及本地服务实例")
+    parser.add_argument("--output", help="结果JSON路径（默认 loadtest_<时间戳>.json）")
+    args, upstream_args = parser.parse_known_args()
+    if args.rate:
+        args.concurrency = 0
+
+    processes = launch_offline_cluster(args.endpoints, upstream_args) if args.launch_offline_cluster else []
+    try:
+        report = asyncio.run(ClusterLoadTester(args).run())
+    finally:
+        stop_processes(processes)
+
+    print_report(report)
+    output = Path(args.output or f"loadtest_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"💾 结果已保存: {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,13 +6,21 @@ FFmpeg 多线程音频白噪音混合处理器
 """
 
 import os
+import sys
 import subprocess
 import random
 import time
 import threading
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-import datetime
+
+# 共用的媒体元数据缓存（ffprobe 结果按 路径+mtime+大小 持久化）、白噪音输入级定位、进度报告与资源隔离
+sys.path.append(str(Path(__file__).resolve().parent / "15_FFmpeg工具_音频处理和混合系统" / "01_核心程序_FFmpeg音频处理器"))
+from media_metadata_cache_媒体元数据缓存 import get_duration
+from noise_seek_白噪音输入定位 import seek_input_args
+from progress_reporter_进度报告 import ProgressReporter
+from resource_isolation_资源隔离 import apply_isolation, load_isolation_config, max_ffmpeg_processes
+from adaptive_concurrency_自适应并发控制 import ffmpeg_output_thread_args, ffmpeg_thread_args
 
 class FFmpegMultiThreadProcessor:
     def __init__(self):
@@ -44,7 +52,11 @@ class FFmpegMultiThreadProcessor:
         self.error_count = 0
         self.total_files = 0
         self.start_time = None
+        
+        # 资源隔离的 CPU 占比上限（无 cgroup 时）换算出的 ffmpeg 进程数上限；设置后每个 ffmpeg 固定单线程
+        self.max_processes = None
         self.processed_files_info = []
+        self.reporter = ProgressReporter("🎵 FFmpeg 多线程音频白噪音混合处理器", "multi_thread")
         
         print("🎵 FFmpeg 多线程音频白噪音混合处理器")
         print("=" * 60)
@@ -72,21 +84,10 @@ class FFmpegMultiThreadProcessor:
     
     def get_audio_duration(self, audio_file):
         """获取音频文件时长"""
-        try:
-            cmd = [
-                'ffprobe', '-v', 'quiet', '-show_entries', 'format=duration',
-                '-of', 'csv=p=0', audio_file
-            ]
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-            if result.returncode == 0:
-                duration = float(result.stdout.strip())
-                return duration
-            else:
-                print(f"⚠️ 无法获取音频时长: {audio_file}")
-                return None
-        except Exception as e:
-            print(f"❌ 获取音频时长失败: {e}")
-            return None
+        duration = get_duration(audio_file)
+        if duration is None:
+            print(f"⚠️ 无法获取音频时长: {audio_file}")
+        return duration
     
     def get_white_noise_duration(self):
         """获取白噪音文件时长"""
@@ -125,17 +126,21 @@ class FFmpegMultiThreadProcessor:
             # 使用 amix 滤镜混合音频和白噪音
             cmd = [
                 'ffmpeg', '-y',  # 覆盖输出文件
+                *(ffmpeg_thread_args() if self.max_processes else []),
                 '-i', input_file,  # 输入音频
-                '-i', self.white_noise_file,  # 白噪音文件
+                *seek_input_args(self.white_noise_file, offset, audio_duration),  # 白噪音文件：输入级定位，只解码所需片段
                 '-filter_complex', 
-                f'[1]atrim=start={offset:.2f}:duration={audio_duration:.2f},volume={self.white_noise_volume}[noise];[0][noise]amix=inputs=2:duration=first:dropout_transition=0',
+                f'[1]volume={self.white_noise_volume}[noise];[0][noise]amix=inputs=2:duration=first:dropout_transition=0',
                 '-c:a', 'aac',  # M4A 格式编码
                 '-b:a', '128k',  # 比特率
+                *(ffmpeg_output_thread_args() if self.max_processes else []),
                 output_file
             ]
             
             # 执行 ffmpeg 命令
+            ffmpeg_start = time.time()
             result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+            processing_time = time.time() - ffmpeg_start
             
             if result.returncode == 0:
                 # 检查输出文件
@@ -146,119 +151,43 @@ class FFmpegMultiThreadProcessor:
                         'size': file_size,
                         'offset': offset,
                         'duration': audio_duration,
-                        'format': os.path.splitext(output_file)[1]
+                        'format': os.path.splitext(output_file)[1],
+                        'processing_time': processing_time,
+                        'noise_seek_skipped': offset
                     }
                     
                     with self.lock:
                         self.processed_count += 1
                         self.processed_files_info.append(file_info)
-                        self.print_progress()
+                    self.reporter.record_success(file_info)
                     return True
                 else:
                     with self.lock:
                         self.error_count += 1
                         print(f"⚠️ 输出文件异常: {os.path.basename(output_file)}")
+                    self.reporter.record_failure()
                     return False
             else:
                 with self.lock:
                     self.error_count += 1
                     print(f"❌ FFmpeg 处理失败: {os.path.basename(input_file)}")
                     print(f"   错误信息: {result.stderr}")
+                self.reporter.record_failure()
                 return False
                 
         except subprocess.TimeoutExpired:
             with self.lock:
                 self.error_count += 1
                 print(f"⏰ 处理超时: {os.path.basename(input_file)}")
+            self.reporter.record_failure()
             return False
         except Exception as e:
             with self.lock:
                 self.error_count += 1
                 print(f"❌ 处理异常: {os.path.basename(input_file)} - {e}")
+            self.reporter.record_failure()
             return False
     
-    def print_progress(self):
-        """打印可视化更新看板"""
-        if self.total_files == 0:
-            return
-            
-        current_time = time.time()
-        elapsed_time = current_time - self.start_time if self.start_time else 0
-        
-        # 计算进度百分比
-        progress_percent = (self.processed_count + self.error_count) / self.total_files * 100
-        
-        # 计算剩余时间
-        if self.processed_count > 0 and elapsed_time > 0:
-            avg_time_per_file = elapsed_time / (self.processed_count + self.error_count)
-            remaining_files = self.total_files - (self.processed_count + self.error_count)
-            estimated_remaining_time = remaining_files * avg_time_per_file
-            remaining_time_str = str(datetime.timedelta(seconds=int(estimated_remaining_time)))
-        else:
-            remaining_time_str = "计算中..."
-        
-        # 计算文件大小统计
-        total_size = sum(info['size'] for info in self.processed_files_info)
-        avg_size = total_size / len(self.processed_files_info) if self.processed_files_info else 0
-        
-        # 格式统计
-        format_stats = {}
-        for info in self.processed_files_info:
-            fmt = info['format']
-            format_stats[fmt] = format_stats.get(fmt, 0) + 1
-        
-        # 创建进度条
-        bar_length = 50
-        filled_length = int(bar_length * progress_percent / 100)
-        bar = '█' * filled_length + '░' * (bar_length - filled_length)
-        
-        # 清屏并显示看板
-        os.system('clear' if os.name == 'posix' else 'cls')
-        
-        print("🎵 FFmpeg 多线程音频白噪音混合处理器 - 实时处理看板")
-        print("=" * 80)
-        
-        # 进度条
-        print(f"📊 处理进度: [{bar}] {progress_percent:.1f}%")
-        print(f"   📁 文件: {self.processed_count + self.error_count}/{self.total_files}")
-        print(f"   ✅ 成功: {self.processed_count} | ❌ 失败: {self.error_count}")
-        print()
-        
-        # 时间信息
-        elapsed_str = str(datetime.timedelta(seconds=int(elapsed_time)))
-        print(f"⏱️ 时间统计:")
-        print(f"   🕐 已用时间: {elapsed_str}")
-        print(f"   ⏳ 剩余时间: {remaining_time_str}")
-        if self.processed_count > 0 and elapsed_time > 0:
-            avg_time = elapsed_time / (self.processed_count + self.error_count)
-            print(f"   📈 平均处理时间: {avg_time:.2f}秒/文件")
-        print()
-        
-        # 文件统计
-        print(f"📁 文件统计:")
-        print(f"   💾 总大小: {total_size/1024/1024:.2f} MB")
-        print(f"   📊 平均大小: {avg_size/1024:.2f} KB")
-        if self.processed_files_info:
-            latest_file = self.processed_files_info[-1]
-            print(f"   🔄 最新处理: {latest_file['filename']}")
-        print()
-        
-        # 格式分布
-        if format_stats:
-            print(f"📋 格式分布:")
-            for fmt, count in sorted(format_stats.items()):
-                percentage = count / len(self.processed_files_info) * 100
-                print(f"   {fmt}: {count} 个 ({percentage:.1f}%)")
-            print()
-        
-        # 处理速度
-        if elapsed_time > 0:
-            files_per_second = (self.processed_count + self.error_count) / elapsed_time
-            print(f"🚀 处理速度: {files_per_second:.2f} 文件/秒")
-        
-        print("=" * 80)
-        print("💡 提示: 按 Ctrl+C 可安全停止处理")
-    
     def scan_audio_files(self):
         """扫描输入目录中的所有音频文件，跳过已处理的文件"""
         audio_files = []
@@ -329,8 +258,12 @@ class FFmpegMultiThreadProcessor:
         
         self.total_files = len(audio_files)
         self.start_time = time.time()
+        self.reporter.start(self.total_files)
         
         print(f"📁 找到 {self.total_files} 个需要处理的音频文件")
+        if self.max_processes and max_workers > self.max_processes:
+            max_workers = self.max_processes
+            print(f"🛡️ CPU 占比上限: 并行数限制为 {max_workers}")
         print(f"🚀 启动 {max_workers} 个并行处理线程 (最大性能模式)")
         
         # 使用线程池并行处理
@@ -354,6 +287,7 @@ class FFmpegMultiThreadProcessor:
                 except Exception as e:
                     print(f"❌ 处理异常: {os.path.basename(input_file)} - {e}")
         
+        self.reporter.finish()
         print(f"\n🎉 所有文件处理完成!")
         print(f"📊 统计: 成功 {self.processed_count} 个, 失败 {self.error_count} 个")
         
@@ -441,7 +375,13 @@ class FFmpegMultiThreadProcessor:
 
 def main():
     """主函数"""
+    # 降低自身优先级（TT_FFMPEG_NICE / TT_FFMPEG_IONICE 等环境变量），ffmpeg 子进程继承
+    isolation_config = load_isolation_config()
+    isolation = apply_isolation(isolation_config)
+    
     processor = FFmpegMultiThreadProcessor()
+    if not isolation['cgroup']:
+        processor.max_processes = max_ffmpeg_processes(isolation_config)
     
     # 检查 ffmpeg 是否可用
     try:
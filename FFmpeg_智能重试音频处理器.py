@@ -2,19 +2,39 @@
 # -*- coding: utf-8 -*-
 """
 FFmpeg 智能重试音频处理器
-支持失败文件标记和重试机制
+支持失败文件标记和重试机制：失败按类型追加到 JSONL 日志，重试只取可重试类型并按类型调整策略
+
+用法:
+    python3 FFmpeg_智能重试音频处理器.py                      # 处理全部文件，结束后自动重试可重试的失败
+    python3 FFmpeg_智能重试音频处理器.py --retry              # 只重试日志中的可重试失败（可与主批次同时运行）
+    python3 FFmpeg_智能重试音频处理器.py --retry --classes timeout,out_of_disk
 """
 
 import os
+import sys
+import argparse
 import subprocess
 import random
 import time
 import threading
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-import datetime
 import multiprocessing
-import json
+
+# 共用的媒体元数据缓存（ffprobe 结果按 路径+mtime+大小 持久化）、白噪音输入级定位、进度报告、失败日志与资源隔离
+sys.path.append(str(Path(__file__).resolve().parent / "15_FFmpeg工具_音频处理和混合系统" / "01_核心程序_FFmpeg音频处理器"))
+from media_metadata_cache_媒体元数据缓存 import get_duration, run_ffprobe
+from noise_seek_白噪音输入定位 import seek_input_args
+from progress_reporter_进度报告 import ProgressReporter
+from failure_journal_失败日志 import (
+    CORRUPT_INPUT, ENCODER_ERROR, FAILURE_LABELS, MISSING_INPUT, RETRY_STRATEGIES, RETRYABLE_CLASSES,
+    TIMEOUT, FailureJournal, claim_output, classify_failure, free_space_mb
+)
+from resource_isolation_资源隔离 import (
+    add_isolation_arguments, apply_isolation, config_from_args, max_ffmpeg_processes
+)
+
+FFMPEG_TIMEOUT = 45   # 单文件 ffmpeg 超时（秒），重试时按失败类型的 timeout_factor 放大
 
 class FFmpegSmartRetryProcessor:
     def __init__(self):
@@ -25,9 +45,10 @@ class FFmpegSmartRetryProcessor:
         self.input_dir = "20_输出文件_处理完成的音频文件"
         self.output_dir = "20.2_ffpmeg输出文件_M4A格式音频文件"
         
-        # 失败文件记录
+        # 失败文件记录：只追加的 JSONL 日志（旧的 failed_files.json 首次运行时导入）
         self.failed_files_log = "ffpmeg_输入输出规则/05_处理日志/failed_files.json"
-        self.failed_files = []
+        self.failure_journal = FailureJournal("ffpmeg_输入输出规则/05_处理日志/failed_files.jsonl")
+        self.failed_files = {}  # 输入文件 -> 未解决的失败（由日志折叠得到）
         
         # 白噪音文件路径
         self.white_noise_paths = [
@@ -50,7 +71,8 @@ class FFmpegSmartRetryProcessor:
         self.error_count = 0
         self.total_files = 0
         self.start_time = None
-        self.processed_files_info = []
+        self.reporter = ProgressReporter("🔄 FFmpeg 智能重试音频处理器", "smart_retry",
+                                         extra_lines=lambda: [f"🔄 待重试: {len(self.failed_files)} 个"])
         
         # 性能优化设置
         self.cached_noise_duration = None
@@ -60,7 +82,7 @@ class FFmpegSmartRetryProcessor:
         print("🔧 智能特性:")
         print("   ✅ 失败文件自动标记")
         print("   ✅ 智能重试机制")
-        print("   ✅ 失败原因记录")
+        print("   ✅ 失败原因分类记录")
         print("   ✅ 处理状态持久化")
         print("   ✅ 高性能并行处理")
         print(f"   ✅ 白噪音文件: {self.white_noise_file}")
@@ -78,50 +100,28 @@ class FFmpegSmartRetryProcessor:
         return None
     
     def load_failed_files(self):
-        """加载失败文件记录"""
-        if os.path.exists(self.failed_files_log):
-            try:
-                with open(self.failed_files_log, 'r', encoding='utf-8') as f:
-                    self.failed_files = json.load(f)
-                print(f"📋 加载了 {len(self.failed_files)} 个失败文件记录")
-            except Exception as e:
-                print(f"⚠️ 加载失败文件记录失败: {e}")
-                self.failed_files = []
-        else:
-            self.failed_files = []
+        """从失败日志折叠出未解决的失败文件"""
+        imported = self.failure_journal.import_legacy(self.failed_files_log)
+        if imported:
+            print(f"📥 已把 {imported} 条旧失败记录导入失败日志")
+        self.failed_files = {entry['input_file']: entry for entry in self.failure_journal.unresolved()}
+        if self.failed_files:
+            print(f"📋 加载了 {len(self.failed_files)} 个失败文件记录")
+            self.print_failure_summary()
     
-    def save_failed_files(self):
-        """保存失败文件记录"""
-        try:
-            os.makedirs(os.path.dirname(self.failed_files_log), exist_ok=True)
-            with open(self.failed_files_log, 'w', encoding='utf-8') as f:
-                json.dump(self.failed_files, f, ensure_ascii=False, indent=2)
-            print(f"💾 已保存 {len(self.failed_files)} 个失败文件记录")
-        except Exception as e:
-            print(f"❌ 保存失败文件记录失败: {e}")
+    def print_failure_summary(self):
+        """按失败类型打印未解决的失败数"""
+        for failure_class, count in sorted(self.failure_journal.summary().items()):
+            retry_mark = "可重试" if RETRY_STRATEGIES[failure_class]['retry'] else "不重试"
+            print(f"   {FAILURE_LABELS[failure_class]} ({failure_class}): {count} 个 [{retry_mark}]")
     
-    def add_failed_file(self, input_file, output_file, error_reason):
-        """添加失败文件记录"""
-        failed_info = {
-            'input_file': input_file,
-            'output_file': output_file,
-            'error_reason': error_reason,
-            'timestamp': datetime.datetime.now().isoformat(),
-            'retry_count': 0
-        }
-        
-        # 检查是否已存在
-        existing = False
-        for failed in self.failed_files:
-            if failed['input_file'] == input_file:
-                failed['retry_count'] += 1
-                failed['last_error'] = error_reason
-                failed['last_timestamp'] = datetime.datetime.now().isoformat()
-                existing = True
-                break
-        
-        if not existing:
-            self.failed_files.append(failed_info)
+    def add_failed_file(self, input_file, output_file, failure_class, error_reason):
+        """记录一次失败：追加到失败日志并计入统计"""
+        entry = self.failure_journal.record_failure(input_file, output_file, failure_class, error_reason)
+        with self.lock:
+            self.error_count += 1
+            self.failed_files[input_file] = entry
+        self.reporter.record_failure()
     
     def get_optimal_thread_count(self):
         """获取最优线程数"""
@@ -135,19 +135,7 @@ class FFmpegSmartRetryProcessor:
     
     def get_audio_duration_fast(self, audio_file):
         """快速获取音频文件时长"""
-        try:
-            cmd = [
-                'ffprobe', '-v', 'quiet', '-show_entries', 'format=duration',
-                '-of', 'csv=p=0', '-select_streams', 'a:0', audio_file
-            ]
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=15)
-            if result.returncode == 0:
-                duration = float(result.stdout.strip())
-                return duration
-            else:
-                return None
-        except Exception:
-            return None
+        return get_duration(audio_file)
     
     def get_white_noise_duration_cached(self):
         """缓存白噪音文件时长"""
@@ -163,21 +151,48 @@ class FFmpegSmartRetryProcessor:
         max_offset = noise_duration - audio_duration
         return random.uniform(0, max_offset)
     
-    def process_single_audio_with_retry(self, input_file, output_file, is_retry=False):
-        """带重试机制的单文件处理"""
+    def process_single_audio_with_retry(self, input_file, output_file, is_retry=False, timeout=FFMPEG_TIMEOUT, reprobe=False):
+        """
+        带重试机制的单文件处理
+        输出文件加 .lock 独占，主批次与单独运行的重试命令不会同时处理同一个文件
+        """
+        with claim_output(output_file) as claimed:
+            if not claimed:
+                print(f"⏭️ 其他进程正在处理: {os.path.basename(output_file)}")
+                self.reporter.record_skip()
+                return False
+            if is_retry and os.path.exists(output_file) and os.path.getsize(output_file) > 1000:
+                # 重试排队期间已由其他进程完成
+                self.resolve_failed_file(input_file, output_file)
+                self.reporter.record_skip()
+                return True
+            return self.process_claimed_audio(input_file, output_file, is_retry, timeout, reprobe)
+    
+    def resolve_failed_file(self, input_file, output_file):
+        with self.lock:
+            was_failed = self.failed_files.pop(input_file, None) is not None
+        if was_failed:
+            self.failure_journal.record_resolved(input_file, output_file)
+    
+    def process_claimed_audio(self, input_file, output_file, is_retry, timeout, reprobe):
+        """已独占输出文件后的处理：先写临时文件，成功后改名"""
+        temp_output = f"{output_file}.{os.getpid()}.part"
         try:
-            # 快速获取音频时长
-            audio_duration = self.get_audio_duration_fast(input_file)
+            # 获取音频时长（输入损坏的重试绕过缓存重新 ffprobe）
+            if reprobe:
+                info = run_ffprobe(input_file)
+                audio_duration = info['duration'] if info else None
+            else:
+                audio_duration = self.get_audio_duration_fast(input_file)
             if not audio_duration:
-                error_reason = "无法获取音频时长"
-                self.add_failed_file(input_file, output_file, error_reason)
+                failure_class = MISSING_INPUT if not os.path.exists(input_file) else CORRUPT_INPUT
+                self.add_failed_file(input_file, output_file, failure_class, "无法获取音频时长")
                 return False
             
             # 使用缓存的白噪音时长
             noise_duration = self.get_white_noise_duration_cached()
             if not noise_duration:
-                error_reason = "无法获取白噪音时长"
-                self.add_failed_file(input_file, output_file, error_reason)
+                self.add_failed_file(input_file, output_file, ENCODER_ERROR, "无法获取白噪音时长")
                 return False
             
             # 生成随机偏移
@@ -186,24 +201,27 @@ class FFmpegSmartRetryProcessor:
             # 确保输出目录存在
             os.makedirs(os.path.dirname(output_file), exist_ok=True)
             
-            # 优化的FFmpeg命令
+            # 优化的FFmpeg命令（-v error 保留错误信息用于失败分类）
             cmd = [
-                'ffmpeg', '-y', '-v', 'quiet',
+                'ffmpeg', '-y', '-v', 'error',
                 '-i', input_file,
-                '-i', self.white_noise_file,
+                *seek_input_args(self.white_noise_file, offset, audio_duration),  # 输入级定位，只解码所需片段
                 '-filter_complex', 
-                f'[1]atrim=start={offset:.2f}:duration={audio_duration:.2f},volume={self.white_noise_volume}[noise];[0][noise]amix=inputs=2:duration=first:dropout_transition=0',
+                f'[1]volume={self.white_noise_volume}[noise];[0][noise]amix=inputs=2:duration=first:dropout_transition=0',
                 '-c:a', 'aac', '-b:a', '128k',
                 '-movflags', '+faststart',
-                output_file
+                '-f', 'mp4', temp_output
             ]
             
             # 执行FFmpeg命令
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=45)
+            ffmpeg_start = time.time()
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+            processing_time = time.time() - ffmpeg_start
             
             if result.returncode == 0:
                 # 快速检查输出文件
-                if os.path.exists(output_file) and os.path.getsize(output_file) > 1000:
+                if os.path.exists(temp_output) and os.path.getsize(temp_output) > 1000:
+                    os.replace(temp_output, output_file)
                     file_size = os.path.getsize(output_file)
                     file_info = {
                         'filename': os.path.basename(output_file),
@@ -211,114 +229,40 @@ class FFmpegSmartRetryProcessor:
                         'offset': offset,
                         'duration': audio_duration,
                         'format': os.path.splitext(output_file)[1],
+                        'processing_time': processing_time,
+                        'noise_seek_skipped': offset,
                         'is_retry': is_retry
                     }
                     
                     with self.lock:
                         self.processed_count += 1
-                        self.processed_files_info.append(file_info)
-                        
-                        # 如果这是重试成功的文件，从失败列表中移除
-                        if is_retry:
-                            self.failed_files = [f for f in self.failed_files if f['input_file'] != input_file]
-                        
-                        self.print_progress()
+                    # 之前失败过的文件追加一条恢复记录
+                    self.resolve_failed_file(input_file, output_file)
+                    self.reporter.record_success(file_info)
                     return True
                 else:
-                    error_reason = "输出文件异常"
-                    self.add_failed_file(input_file, output_file, error_reason)
+                    self.add_failed_file(input_file, output_file, ENCODER_ERROR, "输出文件异常")
                     return False
             else:
-                error_reason = f"FFmpeg处理失败: {result.stderr[:100]}"
-                self.add_failed_file(input_file, output_file, error_reason)
+                stderr = result.stderr.strip()
+                error_reason = f"FFmpeg处理失败: {stderr.splitlines()[-1][:200] if stderr else result.returncode}"
+                self.add_failed_file(input_file, output_file, classify_failure(input_file, stderr), error_reason)
                 return False
                 
         except subprocess.TimeoutExpired:
-            error_reason = "处理超时"
-            self.add_failed_file(input_file, output_file, error_reason)
+            self.add_failed_file(input_file, output_file, TIMEOUT, f"处理超时 ({timeout:.0f}秒)")
+            return False
+        except OSError as e:
+            self.add_failed_file(input_file, output_file, classify_failure(input_file, exception=e), f"处理异常: {str(e)[:100]}")
             return False
         except Exception as e:
-            error_reason = f"处理异常: {str(e)[:100]}"
-            self.add_failed_file(input_file, output_file, error_reason)
+            self.add_failed_file(input_file, output_file, ENCODER_ERROR, f"处理异常: {str(e)[:100]}")
             return False
+        finally:
+            if os.path.exists(temp_output):
+                os.remove(temp_output)
     
-    def print_progress(self):
-        """打印进度看板"""
-        if self.total_files == 0:
-            return
-            
-        current_time = time.time()
-        elapsed_time = current_time - self.start_time if self.start_time else 0
-        
-        # 计算进度百分比
-        progress_percent = (self.processed_count + self.error_count) / self.total_files * 100
-        
-        # 计算剩余时间
-        if self.processed_count > 0 and elapsed_time > 0:
-            avg_time_per_file = elapsed_time / (self.processed_count + self.error_count)
-            remaining_files = self.total_files - (self.processed_count + self.error_count)
-            estimated_remaining_time = remaining_files * avg_time_per_file
-            remaining_time_str = str(datetime.timedelta(seconds=int(estimated_remaining_time)))
-        else:
-            remaining_time_str = "计算中..."
-        
-        # 计算文件大小统计
-        total_size = sum(info['size'] for info in self.processed_files_info)
-        avg_size = total_size / len(self.processed_files_info) if self.processed_files_info else 0
-        
-        # 创建进度条
-        bar_length = 50
-        filled_length = int(bar_length * progress_percent / 100)
-        bar = '█' * filled_length + '░' * (bar_length - filled_length)
-        
-        # 清屏并显示看板
-        os.system('clear' if os.name == 'posix' else 'cls')
-        
-        print("🔄 FFmpeg 智能重试音频处理器 - 实时处理看板")
-        print("=" * 80)
-        
-        # 进度条
-        print(f"📊 处理进度: [{bar}] {progress_percent:.1f}%")
-        print(f"   📁 文件: {self.processed_count + self.error_count}/{self.total_files}")
-        print(f"   ✅ 成功: {self.processed_count} | ❌ 失败: {self.error_count}")
-        print(f"   🔄 待重试: {len(self.failed_files)} 个")
-        print()
-        
-        # 时间信息
-        elapsed_str = str(datetime.timedelta(seconds=int(elapsed_time)))
-        print(f"⏱️ 时间统计:")
-        print(f"   🕐 已用时间: {elapsed_str}")
-        print(f"   ⏳ 剩余时间: {remaining_time_str}")
-        if self.processed_count > 0 and elapsed_time > 0:
-            avg_time = elapsed_time / (self.processed_count + self.error_count)
-            print(f"   📈 平均处理时间: {avg_time:.2f}秒/文件")
-        print()
-        
-        # 文件统计
-        print(f"📁 文件统计:")
-        print(f"   💾 总大小: {total_size/1024/1024:.2f} MB")
-        print(f"   📊 平均大小: {avg_size/1024:.2f} KB")
-        if self.processed_files_info:
-            latest_file = self.processed_files_info[-1]
-            retry_mark = " (重试)" if latest_file.get('is_retry', False) else ""
-            print(f"   🔄 最新处理: {latest_file['filename']}{retry_mark}")
-        print()
-        
-        # 性能统计
-        if elapsed_time > 0:
-            files_per_second = (self.processed_count + self.error_count) / elapsed_time
-            print(f"🚀 处理速度: {files_per_second:.2f} 文件/秒")
-            
-            # 预估完成时间
-            if files_per_second > 0:
-                remaining_seconds = (self.total_files - self.processed_count - self.error_count) / files_per_second
-                eta_str = str(datetime.timedelta(seconds=int(remaining_seconds)))
-                print(f"⏰ 预计完成时间: {eta_str}")
-        
-        print("=" * 80)
-        print("💡 提示: 按 Ctrl+C 可安全停止处理")
-    
-    def scan_audio_files(self, include_failed=False):
+    def scan_audio_files(self):
         """扫描音频文件"""
         audio_files = []
         skipped_count = 0
@@ -351,45 +295,16 @@ class FFmpegSmartRetryProcessor:
                     
                     audio_files.append((input_file, output_file))
         
-        # 如果需要包含失败文件
-        if include_failed:
-            for failed in self.failed_files:
-                input_file = failed['input_file']
-                output_file = failed['output_file']
-                if os.path.exists(input_file):
-                    audio_files.append((input_file, output_file))
-        
         if skipped_count > 0:
             print(f"⏭️ 跳过已处理文件: {skipped_count} 个")
         
         return audio_files
     
-    def process_all_audio_files(self, max_workers=None, retry_failed=False):
-        """处理所有音频文件"""
-        if not self.white_noise_file:
-            print("❌ 白噪音文件不可用，无法处理")
-            return False
-        
-        # 加载失败文件记录
-        self.load_failed_files()
-        
-        # 扫描音频文件
-        audio_files = self.scan_audio_files(include_failed=retry_failed)
-        if not audio_files:
-            print("❌ 没有找到需要处理的音频文件")
-            return False
-        
-        # 自动计算最优线程数
-        if max_workers is None:
-            max_workers = self.get_optimal_thread_count()
-        
-        self.total_files = len(audio_files)
+    def run_jobs(self, jobs, max_workers):
+        """并行处理 (输入, 输出, 是否重试, 超时, 是否重新探测) 列表"""
+        self.total_files = len(jobs)
         self.start_time = time.time()
-        
-        if retry_failed:
-            print(f"🔄 重试模式: 处理 {self.total_files} 个文件 (包含 {len(self.failed_files)} 个失败文件)")
-        else:
-            print(f"📁 找到 {self.total_files} 个需要处理的音频文件")
+        self.reporter.start(self.total_files)
         
         print(f"🚀 启动 {max_workers} 个并行处理线程")
         
@@ -397,11 +312,9 @@ class FFmpegSmartRetryProcessor:
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
             # 提交所有任务
             future_to_file = {}
-            for input_file, output_file in audio_files:
-                # 检查是否是失败文件
-                is_retry = any(f['input_file'] == input_file for f in self.failed_files)
-                future = executor.submit(self.process_single_audio_with_retry, input_file, output_file, is_retry)
-                future_to_file[future] = (input_file, output_file)
+            for job in jobs:
+                future = executor.submit(self.process_single_audio_with_retry, *job)
+                future_to_file[future] = job[:2]
             
             # 等待所有任务完成
             print(f"\n⏳ 等待所有 {self.total_files} 个文件处理完成...")
@@ -410,30 +323,114 @@ class FFmpegSmartRetryProcessor:
                 input_file, output_file = future_to_file[future]
                 
                 try:
-                    result = future.result()
+                    future.result()
                 except Exception as e:
                     print(f"❌ 处理异常: {os.path.basename(input_file)} - {e}")
         
-        # 保存失败文件记录
-        self.save_failed_files()
+        self.reporter.finish()
+    
+    def process_all_audio_files(self, max_workers=None):
+        """处理所有音频文件"""
+        if not self.white_noise_file:
+            print("❌ 白噪音文件不可用，无法处理")
+            return False
+        
+        # 加载失败文件记录
+        self.load_failed_files()
+        
+        # 扫描音频文件
+        audio_files = self.scan_audio_files()
+        if not audio_files:
+            print("❌ 没有找到需要处理的音频文件")
+            return False
+        
+        # 自动计算最优线程数
+        if max_workers is None:
+            max_workers = self.get_optimal_thread_count()
+        
+        print(f"📁 找到 {len(audio_files)} 个需要处理的音频文件")
+        jobs = [(input_file, output_file, input_file in self.failed_files, FFMPEG_TIMEOUT, False)
+                for input_file, output_file in audio_files]
+        self.run_jobs(jobs, max_workers)
         
         print(f"\n🎉 所有文件处理完成!")
         print(f"📊 统计: 成功 {self.processed_count} 个, 失败 {self.error_count} 个")
         print(f"🔄 失败文件: {len(self.failed_files)} 个已记录")
+        self.print_failure_summary()
         
         return self.processed_count > 0
     
-    def retry_failed_files(self):
-        """重试失败的文件"""
-        if not self.failed_files:
-            print("✅ 没有失败文件需要重试")
+    def retry_failed_files(self, classes=None, max_workers=None):
+        """
+        只重试失败日志中可重试类型的文件，按类型调整策略：
+        超时放大超时时间，输入损坏绕过缓存重新探测，磁盘已满在剩余空间足够前跳过，输入缺失不重试
+        """
+        if not self.white_noise_file:
+            print("❌ 白噪音文件不可用，无法重试")
+            return False
+        
+        self.load_failed_files()
+        classes = classes or RETRYABLE_CLASSES
+        pending = self.failure_journal.pending(classes)
+        if not pending:
+            if self.failed_files:
+                print(f"⏭️ 剩余 {len(self.failed_files)} 个失败已达到重试上限或不在重试类型中")
+            else:
+                print("✅ 没有失败文件需要重试")
+            return True
+        
+        jobs = []
+        for entry in pending:
+            strategy = RETRY_STRATEGIES[entry['class']]
+            input_file, output_file = entry['input_file'], entry['output_file']
+            if not os.path.exists(input_file):
+                self.failure_journal.record_skipped(input_file, output_file, MISSING_INPUT, "重试时输入文件已不存在")
+                continue
+            if 'min_free_mb' in strategy:
+                free_mb = free_space_mb(output_file)
+                if free_mb < strategy['min_free_mb']:
+                    print(f"💾 剩余空间 {free_mb:.0f}MB 不足 {strategy['min_free_mb']}MB，本轮跳过: {os.path.basename(input_file)}")
+                    continue
+            jobs.append((input_file, output_file, True, FFMPEG_TIMEOUT * strategy['timeout_factor'], strategy['reprobe']))
+        
+        exhausted = sum(1 for entry in self.failed_files.values() if entry['class'] in classes) - len(pending)
+        print(f"🔄 开始重试 {len(jobs)} 个失败文件 (类型: {', '.join(classes)})")
+        if exhausted:
+            print(f"⏭️ 已达到重试上限: {exhausted} 个")
+        if not jobs:
             return True
         
-        print(f"🔄 开始重试 {len(self.failed_files)} 个失败文件...")
-        return self.process_all_audio_files(retry_failed=True)
+        # 重试可以与主批次同时运行，使用单独的进度文件
+        self.reporter = ProgressReporter("🔄 FFmpeg 智能重试音频处理器 (重试)", "smart_retry_retry",
+                                         extra_lines=lambda: [f"🔄 待重试: {len(self.failed_files)} 个"])
+        self.run_jobs(jobs, max_workers or self.get_optimal_thread_count())
+        
+        print(f"\n📊 重试统计: 剩余未解决 {len(self.failed_files)} 个")
+        self.print_failure_summary()
+        return not any(entry['class'] in classes for entry in self.failed_files.values())
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="FFmpeg 智能重试音频处理器")
+    parser.add_argument("--retry", action="store_true", help="只重试失败日志中的可重试失败（可与主批次同时运行）")
+    parser.add_argument("--classes", help=f"逗号分隔的重试类型（默认 {','.join(RETRYABLE_CLASSES)}）")
+    parser.add_argument("--workers", type=int, help="并行线程数（默认自动计算）")
+    add_isolation_arguments(parser)
+    args = parser.parse_args()
+    
+    classes = None
+    if args.classes:
+        classes = [name.strip() for name in args.classes.split(',') if name.strip()]
+        unknown = [name for name in classes if name not in RETRY_STRATEGIES]
+        if unknown:
+            parser.error(f"未知的失败类型: {', '.join(unknown)}（可选: {', '.join(RETRY_STRATEGIES)}）")
+    
+    # 降低自身优先级后再启动 ffmpeg，子进程全部继承；没有 cgroup 时 CPU 占比上限换算为并行数上限
+    isolation_config = config_from_args(args)
+    process_cap = None if apply_isolation(isolation_config)['cgroup'] else max_ffmpeg_processes(isolation_config)
+    if process_cap:
+        args.workers = min(args.workers or process_cap, process_cap)
+    
     processor = FFmpegSmartRetryProcessor()
     
     # 检查 ffmpeg 是否可用
@@ -445,21 +442,25 @@ def main():
         print("请安装 FFmpeg: brew install ffmpeg")
         return False
     
+    if args.retry:
+        print("\n🔄 开始重试失败文件...")
+        return processor.retry_failed_files(classes, args.workers)
+    
     # 开始处理
     print("\n🚀 开始智能处理...")
-    success = processor.process_all_audio_files()
+    success = processor.process_all_audio_files(args.workers)
     
     if success:
         print("\n🎉 智能处理完成!")
         
-        # 如果有失败文件，询问是否重试
+        # 如果有失败文件，自动重试可重试的类型
         if processor.failed_files:
             print(f"\n🔄 发现 {len(processor.failed_files)} 个失败文件")
-            print("💡 失败文件已记录，可以稍后重试")
+            print("💡 失败文件已记录，可以稍后用 --retry 重试")
             
             # 自动重试失败文件
             print("\n🔄 自动开始重试失败文件...")
-            retry_success = processor.retry_failed_files()
+            retry_success = processor.retry_failed_files(classes, args.workers)
             
             if retry_success:
                 print("✅ 重试完成!")
@@ -6,17 +6,40 @@ FFmpeg 高性能音频白噪音混合处理器
 """
 
 import os
+import sys
+import argparse
 import subprocess
 import random
 import time
 import threading
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-import datetime
 import multiprocessing
 import tempfile
 import shutil
 
+# 共用的媒体元数据缓存（ffprobe 结果按 路径+mtime+大小 持久化）、白噪音输入级定位、自适应并发控制、进度报告、目录监听与资源隔离
+sys.path.append(str(Path(__file__).resolve().parent / "15_FFmpeg工具_音频处理和混合系统" / "01_核心程序_FFmpeg音频处理器"))
+from media_metadata_cache_媒体元数据缓存 import get_duration
+from noise_seek_白噪音输入定位 import seek_input_args
+from adaptive_concurrency_自适应并发控制 import (
+    FFMPEG_THREADS, AdaptiveConcurrency, calibrated_worker_count,
+    ffmpeg_output_thread_args, ffmpeg_thread_args
+)
+from progress_reporter_进度报告 import ProgressReporter
+from watch_folder_目录监听 import AUDIO_EXTENSIONS, open_watcher
+from resource_isolation_资源隔离 import (
+    add_isolation_arguments, apply_isolation, config_from_args, max_ffmpeg_processes
+)
+
+# 批量模式：一次 ffmpeg 调用处理多对 输入→输出，摊薄进程启动和滤镜图初始化开销
+# 实测（ffmpeg 7.0.2，32 个 20 秒文件，2 线程）批量 16 / 4 / 2 相对逐文件为 0.85x / 0.99x / 1.05x，
+# 且批量会把并行的 ffmpeg 进程数降到 ceil(N / 批量大小)，因此默认逐文件，需要时用 --batch-size 开启
+DEFAULT_BATCH_SIZE = 1
+BENCHMARK_BATCH_SIZE = 16        # --benchmark 未指定 --batch-size 时对比的批量大小
+BATCH_TIMEOUT_BASE = 15          # 批量调用超时 = 基础 + 每个文件的份额（秒）
+BATCH_TIMEOUT_PER_FILE = 10
+
 class FFmpegHighPerformanceProcessor:
     def __init__(self):
         self.project_root = "/Volumes/M2/TT_Live_AI_TTS"
@@ -47,20 +70,24 @@ class FFmpegHighPerformanceProcessor:
         self.error_count = 0
         self.total_files = 0
         self.start_time = None
-        self.processed_files_info = []
+        self.reporter = ProgressReporter("🚀 FFmpeg 高性能音频白噪音混合处理器", "high_performance")
         
         # 性能优化设置
         self.temp_dir = None
         self.cached_noise_duration = None
+        self.mix_engine = None  # 启用 NumPy 混音引擎后为 NumpyMixEngine
+        self.ffmpeg_threads = FFMPEG_THREADS  # 每个 ffmpeg 进程内部线程数，并发由进程数决定
+        self.max_processes = None             # 资源隔离的 CPU 占比上限换算出的 ffmpeg 进程数上限（无 cgroup 时）
         
         print("🚀 FFmpeg 高性能音频白噪音混合处理器")
         print("=" * 60)
         print("🔧 优化特性:")
-        print("   ✅ 智能线程数计算")
+        print("   ✅ 自适应并发控制")
         print("   ✅ 内存优化处理")
         print("   ✅ 减少I/O操作")
         print("   ✅ 缓存优化")
         print("   ✅ 批量处理模式")
+        print("   ✅ 限频进度看板")
         print(f"   ✅ 白噪音文件: {self.white_noise_file}")
         print("=" * 60)
     
@@ -76,12 +103,14 @@ class FFmpegHighPerformanceProcessor:
         return None
     
     def get_optimal_thread_count(self):
-        """获取最优线程数 - 高性能版本"""
+        """获取最优线程数 - 按CPU核心数和可用内存校准（每个 ffmpeg 进程内部线程数固定）"""
         cpu_count = multiprocessing.cpu_count()
         
-        # 高性能模式：使用更多线程，但考虑内存限制
-        # 对于I/O密集型任务，可以使用更多线程
-        optimal_threads = min(cpu_count * 4, 64)  # 增加到4倍核心数
+        # 每个线程驱动一个 ffmpeg 进程，进程内部已固定线程数，按核心数跑满即可
+        # 旧的 "核心数 × 4" 在 ffmpeg 自带多线程时会严重超额订阅
+        optimal_threads = calibrated_worker_count(self.ffmpeg_threads)
+        if self.max_processes:
+            optimal_threads = min(optimal_threads, self.max_processes)
         
         print(f"💻 检测到 {cpu_count} 个CPU核心")
         print(f"🎯 高性能模式使用 {optimal_threads} 个线程")
@@ -89,21 +118,8 @@ class FFmpegHighPerformanceProcessor:
         return optimal_threads
     
     def get_audio_duration_fast(self, audio_file):
-        """快速获取音频文件时长 - 优化版本"""
-        try:
-            # 使用更快的ffprobe命令
-            cmd = [
-                'ffprobe', '-v', 'quiet', '-show_entries', 'format=duration',
-                '-of', 'csv=p=0', '-select_streams', 'a:0', audio_file
-            ]
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=15)
-            if result.returncode == 0:
-                duration = float(result.stdout.strip())
-                return duration
-            else:
-                return None
-        except Exception:
-            return None
+        """快速获取音频文件时长 - 持久化元数据缓存，未变化的文件不再调用 ffprobe"""
+        return get_duration(audio_file)
     
     def get_white_noise_duration_cached(self):
         """缓存白噪音文件时长"""
@@ -125,11 +141,13 @@ class FFmpegHighPerformanceProcessor:
             # 快速获取音频时长
             audio_duration = self.get_audio_duration_fast(input_file)
             if not audio_duration:
+                self.record_failure()
                 return False
             
             # 使用缓存的白噪音时长
             noise_duration = self.get_white_noise_duration_cached()
             if not noise_duration:
+                self.record_failure()
                 return False
             
             # 生成随机偏移
@@ -141,126 +159,165 @@ class FFmpegHighPerformanceProcessor:
             # 优化的FFmpeg命令 - 减少不必要的参数
             cmd = [
                 'ffmpeg', '-y', '-v', 'quiet',  # 静默模式
+                *ffmpeg_thread_args(self.ffmpeg_threads),
                 '-i', input_file,
-                '-i', self.white_noise_file,
-                '-filter_complex', 
-                f'[1]atrim=start={offset:.2f}:duration={audio_duration:.2f},volume={self.white_noise_volume}[noise];[0][noise]amix=inputs=2:duration=first:dropout_transition=0',
+                *seek_input_args(self.white_noise_file, offset, audio_duration),
+                '-filter_complex', self.build_mix_filter(0, 1),
+                *ffmpeg_output_thread_args(self.ffmpeg_threads),
                 '-c:a', 'aac', '-b:a', '128k',
                 '-movflags', '+faststart',  # 优化M4A文件
                 output_file
             ]
             
             # 执行FFmpeg命令 - 减少超时时间
+            ffmpeg_start = time.time()
             result = subprocess.run(cmd, capture_output=True, text=True, timeout=45)
+            processing_time = time.time() - ffmpeg_start
             
             if result.returncode == 0:
                 # 快速检查输出文件
-                if os.path.exists(output_file) and os.path.getsize(output_file) > 1000:
-                    file_size = os.path.getsize(output_file)
-                    file_info = {
-                        'filename': os.path.basename(output_file),
-                        'size': file_size,
-                        'offset': offset,
-                        'duration': audio_duration,
-                        'format': os.path.splitext(output_file)[1]
-                    }
-                    
-                    with self.lock:
-                        self.processed_count += 1
-                        self.processed_files_info.append(file_info)
-                        self.print_progress()
-                    return True
-                else:
-                    with self.lock:
-                        self.error_count += 1
-                    return False
+                return self.record_output(output_file, offset, audio_duration, processing_time)
             else:
-                with self.lock:
-                    self.error_count += 1
+                self.record_failure()
                 return False
                 
         except subprocess.TimeoutExpired:
-            with self.lock:
-                self.error_count += 1
+            self.record_failure()
             return False
         except Exception:
-            with self.lock:
-                self.error_count += 1
+            self.record_failure()
             return False
     
-    def print_progress(self):
-        """优化的进度显示"""
-        if self.total_files == 0:
-            return
-            
-        current_time = time.time()
-        elapsed_time = current_time - self.start_time if self.start_time else 0
-        
-        # 计算进度百分比
-        progress_percent = (self.processed_count + self.error_count) / self.total_files * 100
-        
-        # 计算剩余时间
-        if self.processed_count > 0 and elapsed_time > 0:
-            avg_time_per_file = elapsed_time / (self.processed_count + self.error_count)
-            remaining_files = self.total_files - (self.processed_count + self.error_count)
-            estimated_remaining_time = remaining_files * avg_time_per_file
-            remaining_time_str = str(datetime.timedelta(seconds=int(estimated_remaining_time)))
-        else:
-            remaining_time_str = "计算中..."
-        
-        # 计算文件大小统计
-        total_size = sum(info['size'] for info in self.processed_files_info)
-        avg_size = total_size / len(self.processed_files_info) if self.processed_files_info else 0
-        
-        # 创建进度条
-        bar_length = 50
-        filled_length = int(bar_length * progress_percent / 100)
-        bar = '█' * filled_length + '░' * (bar_length - filled_length)
-        
-        # 清屏并显示看板
-        os.system('clear' if os.name == 'posix' else 'cls')
-        
-        print("🚀 FFmpeg 高性能音频白噪音混合处理器 - 实时处理看板")
-        print("=" * 80)
-        
-        # 进度条
-        print(f"📊 处理进度: [{bar}] {progress_percent:.1f}%")
-        print(f"   📁 文件: {self.processed_count + self.error_count}/{self.total_files}")
-        print(f"   ✅ 成功: {self.processed_count} | ❌ 失败: {self.error_count}")
-        print()
-        
-        # 时间信息
-        elapsed_str = str(datetime.timedelta(seconds=int(elapsed_time)))
-        print(f"⏱️ 时间统计:")
-        print(f"   🕐 已用时间: {elapsed_str}")
-        print(f"   ⏳ 剩余时间: {remaining_time_str}")
-        if self.processed_count > 0 and elapsed_time > 0:
-            avg_time = elapsed_time / (self.processed_count + self.error_count)
-            print(f"   📈 平均处理时间: {avg_time:.2f}秒/文件")
-        print()
-        
-        # 文件统计
-        print(f"📁 文件统计:")
-        print(f"   💾 总大小: {total_size/1024/1024:.2f} MB")
-        print(f"   📊 平均大小: {avg_size/1024:.2f} KB")
-        if self.processed_files_info:
-            latest_file = self.processed_files_info[-1]
-            print(f"   🔄 最新处理: {latest_file['filename']}")
-        print()
-        
-        # 性能统计
-        if elapsed_time > 0:
-            files_per_second = (self.processed_count + self.error_count) / elapsed_time
-            print(f"🚀 处理速度: {files_per_second:.2f} 文件/秒")
+    def enable_numpy_engine(self):
+        """改用 NumPy 混音引擎：白噪音解码一次并内存映射，每个文件只需解码语音和一个编码进程"""
+        from numpy_mix_engine_NumPy混音引擎 import NumpyMixEngine
+        self.mix_engine = NumpyMixEngine(self.white_noise_file, noise_volume=self.white_noise_volume)
+    
+    def process_single_audio_numpy(self, input_file, output_file):
+        """NumPy 引擎的单文件处理（白噪音偏移规则与 FFmpeg 路径相同）"""
+        try:
+            audio_duration = self.get_audio_duration_fast(input_file)
+            noise_duration = self.get_white_noise_duration_cached()
+            if not audio_duration or not noise_duration:
+                self.record_failure()
+                return False
             
-            # 预估完成时间
-            if files_per_second > 0:
-                remaining_seconds = (self.total_files - self.processed_count - self.error_count) / files_per_second
-                eta_str = str(datetime.timedelta(seconds=int(remaining_seconds)))
-                print(f"⏰ 预计完成时间: {eta_str}")
-        
-        print("=" * 80)
-        print("💡 提示: 按 Ctrl+C 可安全停止处理")
+            offset = round(self.generate_random_offset(noise_duration, audio_duration), 2)
+            os.makedirs(os.path.dirname(output_file), exist_ok=True)
+            mix_start = time.time()
+            self.mix_engine.process(input_file, output_file, offset)
+            return self.record_output(output_file, offset, audio_duration, time.time() - mix_start)
+        except Exception:
+            self.record_failure()
+            return False
+    
+    def build_mix_filter(self, audio_index, noise_index, label=None):
+        """主音频 + 白噪音片段（已由 seek_input_args 在输入端截取）混合滤镜；label 不为空时给输出加标签（批量模式多路输出）"""
+        suffix = f'[{label}]' if label else ''
+        noise = f'noise{label}' if label else 'noise'
+        return (
+            f'[{noise_index}]volume={self.white_noise_volume}[{noise}];'
+            f'[{audio_index}][{noise}]amix=inputs=2:duration=first:dropout_transition=0{suffix}'
+        )
+    
+    def record_output(self, output_file, offset, audio_duration, processing_time=0.0):
+        """检查输出文件并计入统计，返回是否成功（processing_time 为 ffmpeg 耗时，批量模式按文件数均摊）"""
+        if os.path.exists(output_file) and os.path.getsize(output_file) > 1000:
+            file_info = {
+                'filename': os.path.basename(output_file),
+                'size': os.path.getsize(output_file),
+                'offset': offset,
+                'duration': audio_duration,
+                'format': os.path.splitext(output_file)[1],
+                'processing_time': processing_time,
+                'noise_seek_skipped': offset
+            }
+            with self.lock:
+                self.processed_count += 1
+            self.reporter.record_success(file_info)
+            return True
+        self.record_failure()
+        return False
+    
+    def record_failure(self):
+        with self.lock:
+            self.error_count += 1
+        self.reporter.record_failure()
+    
+    def build_batch_command(self, jobs):
+        """
+        一次 ffmpeg 调用处理多对 输入→输出
+        jobs: [(输入文件, 临时输出文件, 白噪音偏移, 音频时长), ...]
+        每对占用两个输入（主音频、从偏移处定位的白噪音），各自一条滤镜链和一个输出
+        """
+        cmd = ['ffmpeg', '-y', '-v', 'error', *ffmpeg_thread_args(self.ffmpeg_threads)]
+        filters = []
+        for i, (input_file, _, offset, audio_duration) in enumerate(jobs):
+            cmd.extend(['-i', input_file, *seek_input_args(self.white_noise_file, offset, audio_duration)])
+            filters.append(self.build_mix_filter(2 * i, 2 * i + 1, label=f'out{i}'))
+        cmd.extend(['-filter_complex', ';'.join(filters)])
+        for i, (_, temp_output, _, _) in enumerate(jobs):
+            cmd.extend([
+                '-map', f'[out{i}]',
+                *ffmpeg_output_thread_args(self.ffmpeg_threads),
+                '-c:a', 'aac', '-b:a', '128k',
+                '-movflags', '+faststart',
+                '-f', 'mp4', temp_output
+            ])
+        return cmd
+    
+    def process_batch_optimized(self, pairs):
+        """
+        批量处理多对 输入→输出（一个 ffmpeg 进程）
+        - 时长获取失败的文件单独计为失败，不进入批次
+        - 先写临时文件，成功后逐个改名，中断不会留下被跳过的半成品
+        - ffmpeg 整体失败或超时时，该批次退回逐文件处理，失败精确归属到具体文件
+        """
+        noise_duration = self.get_white_noise_duration_cached()
+        if not noise_duration:
+            for _ in pairs:
+                self.record_failure()
+            return 0
+        
+        jobs = []
+        for input_file, output_file in pairs:
+            audio_duration = self.get_audio_duration_fast(input_file)
+            if not audio_duration:
+                self.record_failure()
+                continue
+            os.makedirs(os.path.dirname(output_file), exist_ok=True)
+            temp_output = f"{output_file}.{os.getpid()}.part"
+            offset = self.generate_random_offset(noise_duration, audio_duration)
+            jobs.append((input_file, temp_output, offset, audio_duration, output_file))
+        if not jobs:
+            return 0
+        
+        cmd = self.build_batch_command([job[:4] for job in jobs])
+        timeout = BATCH_TIMEOUT_BASE + BATCH_TIMEOUT_PER_FILE * len(jobs)
+        ffmpeg_start = time.time()
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+            batch_ok = result.returncode == 0
+        except subprocess.TimeoutExpired:
+            batch_ok = False
+        processing_time = (time.time() - ffmpeg_start) / len(jobs)
+        
+        if not batch_ok:
+            for job in jobs:
+                if os.path.exists(job[1]):
+                    os.remove(job[1])
+            print(f"⚠️ 批量调用失败，{len(jobs)} 个文件改为逐个处理")
+            return sum(1 for job in jobs if self.process_single_audio_optimized(job[0], job[4]))
+        
+        succeeded = 0
+        for input_file, temp_output, offset, audio_duration, output_file in jobs:
+            if os.path.exists(temp_output) and os.path.getsize(temp_output) > 1000:
+                os.replace(temp_output, output_file)
+            elif os.path.exists(temp_output):
+                os.remove(temp_output)
+            if self.record_output(output_file, offset, audio_duration, processing_time):
+                succeeded += 1
+        return succeeded
     
     def scan_audio_files(self):
         """扫描音频文件 - 优化版本"""
@@ -271,22 +328,14 @@ class FFmpegHighPerformanceProcessor:
             print(f"❌ 输入目录不存在: {self.input_dir}")
             return audio_files
         
-        # 支持的音频格式
-        audio_extensions = ['.mp3', '.wav', '.m4a', '.aac', '.flac', '.ogg']
-        
         print("🔍 扫描音频文件...")
         
         # 递归扫描所有音频文件
         for root, dirs, files in os.walk(self.input_dir):
             for file in files:
-                if any(file.lower().endswith(ext) for ext in audio_extensions):
+                if file.lower().endswith(AUDIO_EXTENSIONS):
                     input_file = os.path.join(root, file)
-                    
-                    # 计算相对路径
-                    rel_path = os.path.relpath(input_file, self.input_dir)
-                    # 将扩展名改为 .m4a
-                    rel_path = os.path.splitext(rel_path)[0] + '.m4a'
-                    output_file = os.path.join(self.output_dir, rel_path)
+                    output_file = self.output_path_for(input_file)
                     
                     # 检查输出文件是否已存在
                     if os.path.exists(output_file) and os.path.getsize(output_file) > 1000:
@@ -300,55 +349,252 @@ class FFmpegHighPerformanceProcessor:
         
         return audio_files
     
-    def process_all_audio_files(self, max_workers=None):
-        """高性能处理所有音频文件"""
+    def output_path_for(self, input_file):
+        """输入文件对应的输出路径：保持相对目录结构，扩展名改为 .m4a"""
+        rel_path = os.path.relpath(input_file, self.input_dir)
+        return os.path.join(self.output_dir, os.path.splitext(rel_path)[0] + '.m4a')
+    
+    def needs_processing(self, input_file, output_file):
+        """输出不存在、过小或比输入旧（输入被重新合成）时需要处理"""
+        try:
+            output_stat = os.stat(output_file)
+            return output_stat.st_size <= 1000 or output_stat.st_mtime < os.path.getmtime(input_file)
+        except OSError:
+            return True
+    
+    def watch_and_process(self, max_workers=None, polling=False, idle_exit=None):
+        """
+        守护模式：监听输入目录，TTS 每写完一个文件立即混音，与合成并行
+        先建立监听再处理积压，监听建立前已存在的文件由积压扫描覆盖，期间写完的文件由监听覆盖
+        idle_exit 秒内没有新文件且没有进行中的任务时退出；为空时一直运行到 Ctrl+C
+        """
         if not self.white_noise_file:
             print("❌ 白噪音文件不可用，无法处理")
             return False
         
-        # 扫描音频文件
-        audio_files = self.scan_audio_files()
-        if not audio_files:
-            print("❌ 没有找到需要处理的音频文件")
-            return False
+        os.makedirs(self.input_dir, exist_ok=True)
+        watcher = open_watcher(self.input_dir, AUDIO_EXTENSIONS, polling=polling)
+        backlog = self.scan_audio_files()
         
-        # 自动计算最优线程数
+        limiter = None
         if max_workers is None:
-            max_workers = self.get_optimal_thread_count()
+            limiter = AdaptiveConcurrency(initial=self.get_optimal_thread_count(), max_workers=self.max_processes)
+        process_one = self.process_single_audio_numpy if self.mix_engine is not None else self.process_single_audio_optimized
         
-        self.total_files = len(audio_files)
+        self.total_files = 0
         self.start_time = time.time()
+        self.reporter.start(0)
+        in_flight = set()   # 进行中的输出文件，同一文件的重复事件不会重复提交
         
-        print(f"📁 找到 {self.total_files} 个需要处理的音频文件")
-        print(f"🚀 启动 {max_workers} 个并行处理线程 (高性能模式)")
+        print(f"👀 监听目录: {self.input_dir} ({watcher.mode} 模式)")
+        print(f"📦 积压文件: {len(backlog)} 个")
+        if idle_exit:
+            print(f"⏱️ 空闲 {idle_exit:.0f} 秒后自动退出")
+        else:
+            print("💡 按 Ctrl+C 停止监听（进行中的文件会处理完）")
         
-        # 使用线程池并行处理
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        with ThreadPoolExecutor(max_workers=limiter.max_workers if limiter is not None else max_workers) as executor:
+            def submit(input_file, output_file):
+                with self.lock:
+                    if output_file in in_flight:
+                        return
+                    in_flight.add(output_file)
+                    self.total_files += 1
+                self.reporter.add_total()
+                if limiter is not None:
+                    future = executor.submit(limiter.run, process_one, input_file, output_file)
+                else:
+                    future = executor.submit(process_one, input_file, output_file)
+                future.add_done_callback(lambda _: self.discard_in_flight(in_flight, output_file))
+            
+            for input_file, output_file in backlog:
+                submit(input_file, output_file)
+            
+            last_activity = time.time()
+            try:
+                while True:
+                    for input_file in watcher.poll(timeout=1.0):
+                        output_file = self.output_path_for(input_file)
+                        if self.needs_processing(input_file, output_file):
+                            submit(input_file, output_file)
+                            last_activity = time.time()
+                    if in_flight:
+                        last_activity = time.time()
+                    elif idle_exit and time.time() - last_activity >= idle_exit:
+                        print(f"\n💤 {idle_exit:.0f} 秒没有新文件，停止监听")
+                        break
+            except KeyboardInterrupt:
+                print("\n🛑 收到停止信号，等待进行中的文件处理完成...")
+            finally:
+                watcher.close()
+        
+        self.reporter.finish()
+        print(f"📊 统计: 成功 {self.processed_count} 个, 失败 {self.error_count} 个")
+        return self.error_count == 0
+    
+    def discard_in_flight(self, in_flight, output_file):
+        with self.lock:
+            in_flight.discard(output_file)
+    
+    def run_pool(self, audio_files, max_workers, batch_size, limiter=None):
+        """
+        用线程池处理 (输入, 输出) 列表，逐文件或按批次提交
+        limiter 不为空时线程池按其上限开线程，同时运行的 ffmpeg 进程数由 limiter 动态决定
+        """
+        pool_size = limiter.max_workers if limiter is not None else max_workers
+        with ThreadPoolExecutor(max_workers=pool_size) as executor:
+            def submit_task(func, *args):
+                if limiter is None:
+                    return executor.submit(func, *args)
+                return executor.submit(limiter.run, func, *args)
+            
             # 提交所有任务
             future_to_file = {}
-            for input_file, output_file in audio_files:
-                future = executor.submit(self.process_single_audio_optimized, input_file, output_file)
-                future_to_file[future] = (input_file, output_file)
+            if self.mix_engine is not None:
+                for input_file, output_file in audio_files:
+                    future = submit_task(self.process_single_audio_numpy, input_file, output_file)
+                    future_to_file[future] = (input_file, output_file)
+            elif batch_size > 1:
+                for start in range(0, len(audio_files), batch_size):
+                    batch = audio_files[start:start + batch_size]
+                    future = submit_task(self.process_batch_optimized, batch)
+                    future_to_file[future] = batch[0]
+            else:
+                for input_file, output_file in audio_files:
+                    future = submit_task(self.process_single_audio_optimized, input_file, output_file)
+                    future_to_file[future] = (input_file, output_file)
             
             # 等待所有任务完成
-            print(f"\n⏳ 等待所有 {self.total_files} 个文件处理完成...")
+            print(f"\n⏳ 等待所有 {len(audio_files)} 个文件处理完成...")
             
             for future in as_completed(future_to_file):
                 input_file, output_file = future_to_file[future]
                 
                 try:
-                    result = future.result()
+                    future.result()
                 except Exception as e:
                     print(f"❌ 处理异常: {os.path.basename(input_file)} - {e}")
+    
+    def benchmark_batch_mode(self, sample_size=50, max_workers=None, batch_size=BENCHMARK_BATCH_SIZE):
+        """
+        基准测试：取前 sample_size 个待处理文件，分别以逐文件和批量模式输出到临时目录，对比耗时
+        两轮之前先预热时长缓存，只比较 FFmpeg 处理本身
+        """
+        if not self.white_noise_file:
+            print("❌ 白噪音文件不可用，无法测试")
+            return None
+        sample = [input_file for input_file, _ in self.scan_audio_files()[:sample_size]]
+        if not sample:
+            print("❌ 没有找到可用于测试的音频文件")
+            return None
+        if max_workers is None:
+            max_workers = self.get_optimal_thread_count()
+        
+        self.get_white_noise_duration_cached()
+        for input_file in sample:
+            self.get_audio_duration_fast(input_file)
+        
+        timings = {}
+        for mode, mode_batch_size in (('逐文件', 1), ('批量', batch_size)):
+            bench_dir = tempfile.mkdtemp(prefix='ffmpeg_bench_')
+            try:
+                pairs = [(input_file, os.path.join(bench_dir, f"{i:05d}.m4a")) for i, input_file in enumerate(sample)]
+                self.processed_count = 0
+                self.error_count = 0
+                self.total_files = len(pairs)
+                self.start_time = time.time()
+                self.reporter.start(self.total_files)
+                self.run_pool(pairs, max_workers, mode_batch_size)
+                self.reporter.finish()
+                timings[mode] = (time.time() - self.start_time, self.processed_count, self.error_count)
+            finally:
+                shutil.rmtree(bench_dir, ignore_errors=True)
+        
+        print("=" * 60)
+        print(f"📏 基准测试: {len(sample)} 个文件, {max_workers} 线程, 批量大小 {batch_size}")
+        for mode, (elapsed, ok, failed) in timings.items():
+            print(f"   {mode}: {elapsed:.2f}秒 ({len(sample) / elapsed:.2f} 文件/秒), 成功 {ok}, 失败 {failed}")
+        speedup = timings['逐文件'][0] / timings['批量'][0] if timings['批量'][0] else 0
+        print(f"🚀 批量模式加速比: {speedup:.2f}x")
+        print("=" * 60)
+        return timings
+    
+    def process_all_audio_files(self, max_workers=None, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        高性能处理所有音频文件（batch_size > 1 时每个 ffmpeg 进程处理一批文件）
+        max_workers 为空时使用自适应并发：从校准值起步，按吞吐、CPU、iowait 和可用内存增减 ffmpeg 进程数
+        """
+        if not self.white_noise_file:
+            print("❌ 白噪音文件不可用，无法处理")
+            return False
+        
+        # 扫描音频文件
+        audio_files = self.scan_audio_files()
+        if not audio_files:
+            print("❌ 没有找到需要处理的音频文件")
+            return False
+        
+        # 未指定线程数时自适应调整并发
+        limiter = None
+        if max_workers is None:
+            limiter = AdaptiveConcurrency(initial=self.get_optimal_thread_count(), max_workers=self.max_processes)
+        
+        self.total_files = len(audio_files)
+        self.start_time = time.time()
+        self.reporter.start(self.total_files)
+        
+        print(f"📁 找到 {self.total_files} 个需要处理的音频文件")
+        if limiter is not None:
+            print(f"🚀 自适应并发: 起始 {limiter.limit} 个 FFmpeg 进程, 上限 {limiter.max_workers} (高性能模式)")
+        else:
+            print(f"🚀 启动 {max_workers} 个并行处理线程 (高性能模式)")
+        print(f"🧵 每个 FFmpeg 进程内部线程数: {self.ffmpeg_threads}")
+        if self.mix_engine is not None:
+            print("🧮 NumPy 混音引擎: 白噪音内存映射，逐文件解码语音并管道编码")
+        elif batch_size > 1:
+            print(f"📦 批量模式: 每个 FFmpeg 进程处理 {batch_size} 个文件")
+        
+        self.run_pool(audio_files, max_workers, batch_size, limiter)
+        self.reporter.finish()
         
         print(f"\n🎉 所有文件处理完成!")
         print(f"📊 统计: 成功 {self.processed_count} 个, 失败 {self.error_count} 个")
+        if limiter is not None:
+            stats = limiter.snapshot()
+            print(f"🎚️ 并发: 起始 {stats['initial']}, 峰值 {stats['peak']}, 结束 {stats['limit']}, 调整 {stats['adjustments']} 次")
         
         return self.processed_count > 0
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="FFmpeg 高性能音频白噪音混合处理器")
+    parser.add_argument("--workers", type=int, help="固定并行线程数（默认按吞吐和系统负载自适应调整）")
+    parser.add_argument("--ffmpeg-threads", type=int, default=FFMPEG_THREADS,
+                        help=f"每个 FFmpeg 进程的内部线程数（默认 {FFMPEG_THREADS}）")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"每个 FFmpeg 进程处理的文件数，1 为逐文件模式（默认 {DEFAULT_BATCH_SIZE}）")
+    parser.add_argument("--engine", choices=["ffmpeg", "numpy"], default="ffmpeg",
+                        help="混音引擎：ffmpeg（白噪音输入级 -ss/-t 定位 + amix）或 numpy（内存映射白噪音库，需要 numpy）")
+    parser.add_argument("--watch", action="store_true",
+                        help="守护模式：监听输入目录，TTS 每写完一个文件立即混音（inotify，不可用时轮询）")
+    parser.add_argument("--poll", action="store_true", help="守护模式强制使用轮询（网络盘等不支持 inotify 的目录）")
+    parser.add_argument("--idle-exit", type=float, metavar="SECONDS",
+                        help="守护模式下空闲多少秒后自动退出（默认一直运行）")
+    parser.add_argument("--benchmark", type=int, metavar="N",
+                        help="对前 N 个待处理文件对比逐文件与批量模式的耗时（输出写入临时目录，不影响正式输出）")
+    add_isolation_arguments(parser)
+    args = parser.parse_args()
+    
+    # 降低自身优先级后再启动 ffmpeg，子进程全部继承，不抢占同机 TTS 服务
+    isolation_config = config_from_args(args)
+    isolation = apply_isolation(isolation_config)
+    
     processor = FFmpegHighPerformanceProcessor()
+    processor.ffmpeg_threads = max(1, args.ffmpeg_threads)
+    if not isolation['cgroup']:
+        processor.max_processes = max_ffmpeg_processes(isolation_config)
+        if args.workers and processor.max_processes:
+            args.workers = min(args.workers, processor.max_processes)
     
     # 检查 ffmpeg 是否可用
     try:
@@ -359,9 +605,24 @@ def main():
         print("请安装 FFmpeg: brew install ffmpeg")
         return False
     
+    if args.benchmark:
+        # NumPy 引擎的单文件耗时对比见 numpy_mix_engine_NumPy混音引擎.py benchmark
+        batch_size = args.batch_size if args.batch_size > 1 else BENCHMARK_BATCH_SIZE
+        return processor.benchmark_batch_mode(args.benchmark, args.workers, batch_size) is not None
+    
+    if args.engine == "numpy":
+        if not processor.white_noise_file:
+            print("❌ 白噪音文件不可用，无法启用 NumPy 引擎")
+            return False
+        processor.enable_numpy_engine()
+    
+    if args.watch:
+        print("\n👀 启动目录监听模式...")
+        return processor.watch_and_process(args.workers, args.poll, args.idle_exit)
+    
     # 开始高性能处理
     print("\n🚀 开始高性能处理...")
-    success = processor.process_all_audio_files()
+    success = processor.process_all_audio_files(args.workers, max(1, args.batch_size))
     
     if success:
         print("\n🎉 高性能处理完成!")
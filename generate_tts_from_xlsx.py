@@ -13,11 +13,19 @@ import time
 import json
 from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
 from typing import Optional
 
 import openpyxl  # type: ignore
 
 
+# 单次编码流程：每句 edge-tts MP3 只解码一次为 PCM，句子与缓存的静音在内存中拼接，
+# 再通过管道交给一个 ffmpeg 进程，同时编码原版 M4A 和增强版 M4A（各只有一代有损编码）
+PCM_SAMPLE_RATE = 24000      # edge-tts 默认输出 24kHz 单声道，PCM 统一为此格式
+PCM_BYTES_PER_SAMPLE = 2     # s16le 单声道
+OUTPUT_BITRATE = "192k"
+
+
 def run(cmd: str) -> None:
     proc = subprocess.run(cmd, shell=True)
     if proc.returncode != 0:
@@ -93,40 +101,135 @@ def split_into_sentences(text: str) -> list[str]:
     return sentences
 
 
-async def tts_segment_async(segment_text: str, voice: str, rate: str, out_m4a: Path, max_retries: int = 5) -> bool:
-    """异步 TTS 生成（edge-tts 默认格式，自动转换为 M4A），自动重试"""
+def pcm_decode_args(input_path: Path, sample_rate: int = PCM_SAMPLE_RATE) -> list[str]:
+    """解码为 s16le 单声道 PCM 并写到 stdout 的 ffmpeg 参数"""
+    return [
+        "ffmpeg", "-threads", "0", "-hide_banner", "-loglevel", "error", "-i", str(input_path),
+        "-f", "s16le", "-ac", "1", "-ar", str(sample_rate), "-",
+    ]
+
+
+async def decode_to_pcm_async(input_path: Path, sample_rate: int = PCM_SAMPLE_RATE) -> bytes:
+    """异步解码音频为 PCM（各句的解码进程与其他句子的 TTS 请求并行）"""
+    proc = await asyncio.create_subprocess_exec(
+        *pcm_decode_args(input_path, sample_rate),
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+    )
+    pcm, err = await proc.communicate()
+    if proc.returncode != 0 or not pcm:
+        raise RuntimeError(f"Decode failed: {input_path}: {err.decode(errors='replace').strip()}")
+    return pcm
+
+
+def decode_to_pcm(input_path: Path, sample_rate: int = PCM_SAMPLE_RATE) -> bytes:
+    proc = subprocess.run(pcm_decode_args(input_path, sample_rate), capture_output=True)
+    if proc.returncode != 0 or not proc.stdout:
+        raise RuntimeError(f"Decode failed: {input_path}: {proc.stderr.decode(errors='replace').strip()}")
+    return proc.stdout
+
+
+async def tts_segment_async(segment_text: str, voice: str, rate: str, temp_file: Path, max_retries: int = 5) -> bytes:
+    """异步 TTS 生成（edge-tts 默认 MP3 直接解码为 PCM，不做中间转码），自动重试"""
     import edge_tts
-    temp_file = out_m4a.with_suffix('.tmp')
     for attempt in range(max_retries):
         try:
             communicate = edge_tts.Communicate(segment_text, voice=voice, rate=rate)
             await communicate.save(str(temp_file))
-            # edge-tts 默认可能输出 mp3/webm，统一转换为 M4A
-            cmd = f"ffmpeg -threads 0 -hide_banner -loglevel error -i {shlex.quote(str(temp_file))} -c:a aac -b:a 192k {shlex.quote(str(out_m4a))} -y"
-            run(cmd)
-            if temp_file.exists():
-                temp_file.unlink()
-            return True
+            return await decode_to_pcm_async(temp_file)
         except Exception as e:
             if attempt < max_retries - 1:
                 await asyncio.sleep(min(2 ** attempt, 10))
                 continue
+            raise
+        finally:
             if temp_file.exists():
                 temp_file.unlink()
-            raise
-    return False
+    return b""
 
 
-def tts_segment(segment_text: str, voice: str, rate: str, volume: str, pitch: str, out_m4a: Path) -> None:
+def tts_segment(segment_text: str, voice: str, rate: str, volume: str, pitch: str, temp_file: Path) -> bytes:
     """同步包装，内部调用异步版本"""
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
     try:
-        loop.run_until_complete(tts_segment_async(segment_text, voice, rate, out_m4a))
+        return loop.run_until_complete(tts_segment_async(segment_text, voice, rate, temp_file))
     finally:
         loop.close()
 
 
+@lru_cache(maxsize=None)
+def silence_pcm(duration_ms: int, sample_rate: int = PCM_SAMPLE_RATE) -> bytes:
+    """句间静音（PCM 全零，按时长缓存，不需要 ffmpeg）"""
+    return bytes(int(sample_rate * duration_ms / 1000) * PCM_BYTES_PER_SAMPLE)
+
+
+def enhancement_filter(noise_volume: float = 0.7, voice_label: str = "[0:a]", noise_label: str = "[1:a]") -> str:
+    """白噪音 + 房间声效滤镜图，输出标签 [output]"""
+    # 白噪音 70%, 房间混响小空间, 动态压缩, EQ, 高通 80Hz, 响度归一
+    return (
+        f"{voice_label}volume=1.0[voice];"
+        f"{noise_label}volume={noise_volume:.2f},aloop=loop=-1:size=2e+09[noise];"
+        f"[voice][noise]amix=inputs=2:duration=longest:weights=1:{noise_volume:.2f}[mixed];"
+        f"[mixed]acompressor=threshold=-18dB:ratio=3:attack=15:release=180:makeup=3,"
+        f"equalizer=f=250:width=120:g=2.0,"
+        f"equalizer=f=3500:width=800:g=2.5,"
+        f"highpass=f=80,"
+        f"loudnorm=I=-19:TP=-2:LRA=9[output]"
+    )
+
+
+def partial_path(path: Path) -> Path:
+    """编码中的临时文件（隐藏文件，完成后原子改名，中断不会留下被当作已完成而跳过的半截文件）"""
+    return path.with_name(f".{path.name}.{os.getpid()}.part")
+
+
+def encode_pcm(
+    pcm: bytes,
+    out_m4a: Path,
+    white_noise_wav: Optional[Path] = None,
+    enhanced_m4a: Optional[Path] = None,
+    noise_volume: float = 0.7,
+    sample_rate: int = PCM_SAMPLE_RATE,
+) -> None:
+    """
+    PCM 经管道交给一个 ffmpeg 进程，一次编码原版 M4A；
+    给出白噪音和 enhanced_m4a 时用 asplit 在同一进程内同时输出增强版
+    """
+    outputs = [(out_m4a, "[plain]")]
+    cmd = [
+        "ffmpeg", "-threads", "0", "-hide_banner", "-loglevel", "error",
+        "-f", "s16le", "-ar", str(sample_rate), "-ac", "1", "-i", "pipe:0",
+    ]
+    if white_noise_wav and enhanced_m4a:
+        outputs.append((enhanced_m4a, "[output]"))
+        cmd += [
+            "-i", str(white_noise_wav),
+            "-filter_complex", "[0:a]asplit=2[plain][voice_in];" + enhancement_filter(noise_volume, "[voice_in]"),
+        ]
+    for path, label in outputs:
+        if len(outputs) > 1:
+            cmd += ["-map", label]
+        cmd += ["-c:a", "aac", "-b:a", OUTPUT_BITRATE, "-f", "ipod", str(partial_path(path))]
+    cmd.append("-y")
+    try:
+        proc = subprocess.run(cmd, input=pcm, stderr=subprocess.PIPE)
+        if proc.returncode != 0:
+            raise RuntimeError(f"Encode failed: {out_m4a}: {proc.stderr.decode(errors='replace').strip()}")
+        for path, _ in outputs:
+            os.replace(partial_path(path), path)
+    finally:
+        for path, _ in outputs:
+            partial_path(path).unlink(missing_ok=True)
+
+
+# ---- 旧的多次编码流程（MP3→M4A→拼接重编码→增强重编码），仅供 --benchmark 对比 ----
+
+def transcode_to_m4a(input_path: Path, out_m4a: Path) -> None:
+    """edge-tts 输出转 M4A（旧流程第一代有损编码）"""
+    cmd = f"ffmpeg -threads 0 -hide_banner -loglevel error -i {shlex.quote(str(input_path))} -c:a aac -b:a 192k {shlex.quote(str(out_m4a))} -y"
+    run(cmd)
+
+
 def make_silence_m4a(duration_ms: int, out_m4a: Path, sample_rate: int = 24000) -> None:
     """生成 M4A 格式静音片段（多线程）"""
     seconds = duration_ms / 1000.0
@@ -150,17 +253,7 @@ def concat_m4a(parts: list[Path], out_m4a: Path) -> None:
 
 def enhance_with_white_noise_and_reverb(input_m4a: Path, white_noise_wav: Path, output_m4a: Path, noise_volume: float = 0.7) -> None:
     """使用 ffmpeg 为音频添加白噪音和房间混响效果（白噪音 70% 音量，多线程处理）"""
-    # 白噪音 70%, 房间混响小空间, 动态压缩, EQ, 高通 80Hz, 响度归一
-    filter_complex = (
-        f"[0:a]volume=1.0[voice];"
-        f"[1:a]volume={noise_volume:.2f},aloop=loop=-1:size=2e+09[noise];"
-        f"[voice][noise]amix=inputs=2:duration=longest:weights=1:{noise_volume:.2f}[mixed];"
-        f"[mixed]acompressor=threshold=-18:ratio=3:attack=15:release=180:makeup=3,"
-        f"equalizer=f=250:width=120:g=2.0,"
-        f"equalizer=f=3500:width=800:g=2.5,"
-        f"highpass=f=80,"
-        f"loudnorm=I=-19:TP=-2:LRA=9[output]"
-    )
+    filter_complex = enhancement_filter(noise_volume)
     # ffmpeg 多线程（-threads 0 自动检测 CPU 核心数）
     cmd = (
         f"ffmpeg -threads 0 -hide_banner -loglevel error "
@@ -214,11 +307,6 @@ def process_workbook(
         print(f"[WARN] white_noise.wav not found, enhancement will be skipped. Please place it at {script_dir / 'white_noise.wav'}")
         white_noise_wav = None
 
-    # Prebuild silence once per run to reuse (M4A format)
-    silence_m4a = out_dir / f"__silence_{silence_ms}ms__.m4a"
-    if not silence_m4a.exists():
-        make_silence_m4a(silence_ms, silence_m4a)
-
     name_columns = ["文件名", "filename", "标题", "title", "名称", "name", "ID", "id", "序号", "index"]
     # 扩展英文文案列集合（含大小写/空格变体）
     english_columns = [
@@ -396,29 +484,28 @@ def process_workbook(
                 async_tasks = []
                 seg_info = []
                 for i, sent in enumerate(sentences):
-                    seg_m4a = td_path / f"seg_{i:03d}.m4a"
+                    seg_mp3 = td_path / f"seg_{i:03d}.mp3"
                     rate_val = baseline["rate"] + math.sin(i * math.pi / 6.0) * 2.0
                     dyn_rate = fmt_rate(rate_val)
-                    seg_info.append((i, seg_m4a))
-                    async_tasks.append(tts_segment_async(sent, file_voice, dyn_rate, seg_m4a))
+                    seg_info.append(i)
+                    async_tasks.append(tts_segment_async(sent, file_voice, dyn_rate, seg_mp3))
                 
                 # 并行执行所有任务
                 results = await asyncio.gather(*async_tasks, return_exceptions=True)
                 
-                # 组装结果
+                # 组装结果（句子 PCM，失败为 None）
                 final_results = []
-                for idx, (result, (seg_idx, seg_m4a)) in enumerate(zip(results, seg_info)):
+                for result, seg_idx in zip(results, seg_info):
                     if isinstance(result, Exception):
                         print(f"[WARN] TTS failed for row {row_idx} sent {seg_idx}: {result}")
-                        final_results.append((seg_idx, seg_m4a, False))
+                        final_results.append((seg_idx, None))
                     else:
-                        final_results.append((seg_idx, seg_m4a, True))
+                        final_results.append((seg_idx, result))
                 return final_results
 
-            parts: list[Path] = []
             with tempfile.TemporaryDirectory() as td:
                 td_path = Path(td)
-                # 并行生成所有句子片段
+                # 并行生成所有句子片段（生成后立即解码为 PCM）
                 loop = asyncio.new_event_loop()
                 asyncio.set_event_loop(loop)
                 try:
@@ -426,49 +513,174 @@ def process_workbook(
                 finally:
                     loop.close()
 
-                # 按顺序组装片段和静音
-                for i, (seg_idx, seg_m4a, success) in enumerate(sorted(segment_results)):
-                    if success and seg_m4a.exists():
-                        parts.append(seg_m4a)
-                    if i < len(sentences) - 1 and row_silence_ms > 0:
-                        cache_sil = out_dir / f"__silence_{row_silence_ms}ms__.m4a"
-                        if not cache_sil.exists():
-                            make_silence_m4a(row_silence_ms, cache_sil)
-                        parts.append(cache_sil)
-
-                if parts:
-                    concat_m4a(parts, out_m4a)
-
-            generated += 1
-            print(f"[{xlsx_path.name}][{ws.title}] row {row_idx} [{emotion}] -> {out_m4a}")
+            # 按顺序在内存中拼接句子和静音
+            pcm_parts: list[bytes] = []
+            for i, (seg_idx, pcm) in enumerate(sorted(segment_results, key=lambda item: item[0])):
+                if pcm:
+                    pcm_parts.append(pcm)
+                if i < len(sentences) - 1 and row_silence_ms > 0:
+                    pcm_parts.append(silence_pcm(row_silence_ms))
 
-            # 增强处理：添加白噪音和房间声效（同样直接放在 xlsx 文件夹，不分子文件夹）
+            # 增强版（白噪音和房间声效）与原版在同一个 ffmpeg 进程中编码，同样直接放在 xlsx 文件夹，不分子文件夹
+            enhanced_m4a = None
             if white_noise_wav and white_noise_wav.exists():
-                # 增强版也放在同一个 xlsx 文件夹
                 enhanced_dir = enhanced_base / xlsx_path.stem
                 enhanced_dir.mkdir(parents=True, exist_ok=True)
                 enhanced_m4a = enhanced_dir / f"{base_name}.m4a"
-                if not enhanced_m4a.exists():
-                    try:
-                        enhance_with_white_noise_and_reverb(out_m4a, white_noise_wav, enhanced_m4a, noise_volume=0.7)
-                        print(f"  -> Enhanced: {enhanced_m4a}")
-                    except Exception as e:
-                        print(f"  [WARN] Enhance failed for {out_m4a}: {e}")
+                if enhanced_m4a.exists():
+                    enhanced_m4a = None
+
+            if any(seg_pcm for _, seg_pcm in segment_results):
+                pcm = b"".join(pcm_parts)
+                try:
+                    encode_pcm(pcm, out_m4a, white_noise_wav, enhanced_m4a, noise_volume=0.7)
+                except Exception as e:
+                    if enhanced_m4a is None:
+                        raise
+                    # 增强失败不影响原版输出
+                    print(f"  [WARN] Enhance failed for {out_m4a}: {e}")
+                    enhanced_m4a = None
+                    encode_pcm(pcm, out_m4a)
+
+            generated += 1
+            print(f"[{xlsx_path.name}][{ws.title}] row {row_idx} [{emotion}] -> {out_m4a}")
+            if enhanced_m4a is not None and enhanced_m4a.exists():
+                print(f"  -> Enhanced: {enhanced_m4a}")
 
     print(f"Done: {xlsx_path}  total_rows={total_rows}  generated={generated}")
 
 
+BENCHMARK_SENTENCES = 6      # 基准测试每行句子数
+
+
+def make_test_sentence(out_mp3: Path, index: int) -> None:
+    """离线测试句子：与 edge-tts 相同格式（24kHz 单声道 48kbps MP3）的调制音，时长 1.5-2.4 秒"""
+    duration = 1.5 + 0.3 * (index % 4)
+    cmd = (
+        f"ffmpeg -hide_banner -loglevel error -f lavfi "
+        f"-i {shlex.quote(f'sine=f={180 + 37 * index}:d={duration}:r={PCM_SAMPLE_RATE},tremolo=f=5:d=0.6')} "
+        f"-ac 1 -c:a libmp3lame -b:a 48k {shlex.quote(str(out_mp3))} -y"
+    )
+    run(cmd)
+
+
+def measure_quality(reference: bytes, output_m4a: Path, max_lag_ms: int = 200) -> dict:
+    """输出解码后与参考 PCM 对齐（互相关找偏移），返回 SNR、偏移和时长差"""
+    import numpy as np
+
+    ref = np.frombuffer(reference, dtype=np.int16).astype(np.float64) / 32768
+    out = np.frombuffer(decode_to_pcm(output_m4a), dtype=np.int16).astype(np.float64) / 32768
+    max_lag = PCM_SAMPLE_RATE * max_lag_ms // 1000
+    size = 1 << int(math.ceil(math.log2(len(ref) + len(out))))
+    corr = np.fft.irfft(np.fft.rfft(out, size) * np.conj(np.fft.rfft(ref, size)), size)
+    lags = np.concatenate([np.arange(0, max_lag + 1), np.arange(-max_lag, 0)])
+    lag = int(lags[np.argmax(np.concatenate([corr[:max_lag + 1], corr[-max_lag:]]))])
+    # lag > 0：输出比参考晚 lag 个采样
+    aligned = out[lag:] if lag >= 0 else np.concatenate([np.zeros(-lag), out])
+    length = min(len(ref), len(aligned))
+    noise = ref[:length] - aligned[:length]
+    snr = 10 * math.log10(float(np.sum(ref[:length] ** 2)) / max(float(np.sum(noise ** 2)), 1e-12))
+    return {
+        "snr_db": round(snr, 1),
+        "lag_ms": round(lag * 1000 / PCM_SAMPLE_RATE, 1),
+        "duration_diff_ms": round((len(out) - len(ref)) * 1000 / PCM_SAMPLE_RATE, 1),
+    }
+
+
+def benchmark_single_pass(rows: int, silence_ms: int = 600) -> dict:
+    """
+    离线对比旧流程（逐句转 M4A → 拼接重编码 → 增强重编码）与单次编码流程：
+    句子用与 edge-tts 同格式的测试 MP3 代替（不访问网络），比较每行耗时、ffmpeg 启动次数，
+    并以句子解码后的 PCM 为参考比较原版输出的 SNR（增强版含白噪音和响度归一，只比较时长）
+    """
+    with tempfile.TemporaryDirectory() as td:
+        work = Path(td)
+        white_noise_wav = work / "white_noise.wav"
+        run(f"ffmpeg -hide_banner -loglevel error -f lavfi -i anoisesrc=d=30:r=44100:a=0.1 -ac 2 {shlex.quote(str(white_noise_wav))} -y")
+        sentences = []
+        for i in range(BENCHMARK_SENTENCES):
+            sentences.append(work / f"sentence_{i}.mp3")
+            make_test_sentence(sentences[-1], i)
+        reference_parts = []
+        for i, sentence in enumerate(sentences):
+            reference_parts.append(decode_to_pcm(sentence))
+            if i < len(sentences) - 1:
+                reference_parts.append(silence_pcm(silence_ms))
+        reference = b"".join(reference_parts)
+
+        report = {"rows": rows, "sentences_per_row": len(sentences)}
+        for mode in ("legacy", "single_pass"):
+            mode_dir = work / mode
+            mode_dir.mkdir()
+            launches = 0
+            start = time.perf_counter()
+            for row in range(rows):
+                plain = mode_dir / f"row_{row}.m4a"
+                enhanced = mode_dir / f"row_{row}_enhanced.m4a"
+                if mode == "legacy":
+                    parts = []
+                    silence_m4a = mode_dir / f"__silence_{silence_ms}ms__.m4a"
+                    for i, sentence in enumerate(sentences):
+                        seg_m4a = mode_dir / f"seg_{i:03d}.m4a"
+                        transcode_to_m4a(sentence, seg_m4a)
+                        parts.append(seg_m4a)
+                        if i < len(sentences) - 1:
+                            if not silence_m4a.exists():
+                                make_silence_m4a(silence_ms, silence_m4a)
+                                launches += 1
+                            parts.append(silence_m4a)
+                    concat_m4a(parts, plain)
+                    enhance_with_white_noise_and_reverb(plain, white_noise_wav, enhanced, noise_volume=0.7)
+                    launches += len(sentences) + 2
+                else:
+                    pcm_parts = []
+                    for i, sentence in enumerate(sentences):
+                        pcm_parts.append(decode_to_pcm(sentence))
+                        if i < len(sentences) - 1:
+                            pcm_parts.append(silence_pcm(silence_ms))
+                    encode_pcm(b"".join(pcm_parts), plain, white_noise_wav, enhanced, noise_volume=0.7)
+                    launches += len(sentences) + 1
+            elapsed = time.perf_counter() - start
+            result = {
+                "seconds_per_row": round(elapsed / rows, 3),
+                "ffmpeg_launches_per_row": round(launches / rows, 2),
+                "lossy_generations": 3 if mode == "legacy" else 1,
+                "enhanced_duration_diff_ms": round(
+                    (len(decode_to_pcm(mode_dir / "row_0_enhanced.m4a")) - len(reference)) * 1000
+                    / PCM_BYTES_PER_SAMPLE / PCM_SAMPLE_RATE, 1),
+            }
+            try:
+                result.update(measure_quality(reference, mode_dir / "row_0.m4a"))
+            except ImportError:
+                print("[WARN] numpy not installed, skipping SNR check")
+            report[mode] = result
+            print(f"{mode:12s} {result}")
+
+    legacy, single = report["legacy"], report["single_pass"]
+    print(f"Speedup: {legacy['seconds_per_row'] / single['seconds_per_row']:.2f}x per row, "
+          f"ffmpeg launches {legacy['ffmpeg_launches_per_row']} -> {single['ffmpeg_launches_per_row']} per row")
+    return report
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description="Generate TTS M4A from XLSX '英文' column using edge-tts (multi-threaded) and ffmpeg (multi-threaded)")
-    parser.add_argument("xlsx", type=str, help="Path to XLSX file")
+    parser.add_argument("xlsx", type=str, nargs="?", help="Path to XLSX file")
     parser.add_argument("--out", type=str, default="out_audio", help="Output directory root")
     parser.add_argument("--voice", type=str, default="en-US-JennyNeural", help="edge-tts voice")
     parser.add_argument("--rate", type=str, default="0%", help="edge-tts rate, e.g., -25%% or 0%%")
     parser.add_argument("--volume", type=str, default="0%", help="edge-tts volume, e.g., -10%% or 0%%")
     parser.add_argument("--pitch", type=str, default="0Hz", help="edge-tts pitch, e.g., -50Hz or 0Hz")
     parser.add_argument("--silence-ms", type=int, default=600, help="Silence duration between sentences in ms")
+    parser.add_argument("--benchmark", type=int, metavar="ROWS",
+                        help="Offline benchmark: legacy multi-encode pipeline vs single-pass encoding over ROWS test rows")
     args = parser.parse_args()
 
+    if args.benchmark:
+        benchmark_single_pass(args.benchmark, args.silence_ms)
+        return
+    if not args.xlsx:
+        parser.error("xlsx is required unless --benchmark is given")
+
     xlsx_path = Path(args.xlsx)
     if not xlsx_path.exists():
         print(f"File not found: {xlsx_path}", file=sys.stderr)